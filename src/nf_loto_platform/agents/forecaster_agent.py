@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import functools
+import importlib
 import logging
 import math
-from typing import Any, Dict, List, Sequence, Optional
+import types
+from typing import Any, Callable, Dict, List, Sequence, Optional
 
 import pandas as pd
 
@@ -17,6 +20,7 @@ except ImportError:
     get_tsfm_adapter = None
 
 from .domain import ExperimentOutcome, ExperimentRecipe, TimeSeriesTaskSpec
+from .sweep_executor import SweepExecutor, SweepTask
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +42,76 @@ def _extract_metric_value(meta: Dict[str, Any], metric_name: str) -> float:
     return float("nan")
 
 
+def _failed_meta(error: str) -> Dict[str, Any]:
+    """実行失敗時の meta (run_single と sweep ワーカーの異常終了で共通)."""
+    return {
+        "status": "failed",
+        "error": error,
+        "run_id": "failed",
+        "metrics": {}
+    }
+
+
+def _failed_outcome(task: TimeSeriesTaskSpec, model_name: str, error: str) -> ExperimentOutcome:
+    """ワーカーの異常終了・RSS 超過時に run_single の失敗結果と同じ形の Outcome を作る."""
+    meta = _failed_meta(error)
+    collected_metrics = {task.objective_metric: float("nan")}
+    return ExperimentOutcome(
+        best_model_name=model_name,
+        metrics=collected_metrics,
+        all_model_metrics={model_name: collected_metrics},
+        run_ids=[str(meta.get("run_id"))],
+        meta={"single_run_meta": meta},
+    )
+
+
+def _select_best_outcome(
+    task: TimeSeriesTaskSpec,
+    recipe: ExperimentRecipe,
+    outcomes: Sequence[ExperimentOutcome],
+) -> ExperimentOutcome:
+    """
+    レシピ順に並んだ各モデルの結果を集約し、最良モデルを選ぶ.
+
+    最小化問題を仮定 (MAE, RMSE等)。NaN はスキップし、同点の場合は
+    レシピ内で先に現れるモデルを優先する。
+    """
+    results_meta: List[Dict[str, Any]] = []
+    best_model = None
+    best_score = float("inf")
+    best_run_id = None
+
+    all_metrics = {}
+    run_ids = []
+
+    for outcome in outcomes:
+        score = outcome.metrics.get(task.objective_metric, float("nan"))
+        all_metrics.update(outcome.all_model_metrics)
+        run_ids.extend(outcome.run_ids)
+
+        if not math.isnan(score):
+            if score < best_score:
+                best_score = score
+                best_model = outcome.best_model_name
+                if outcome.run_ids:
+                    best_run_id = outcome.run_ids[0]
+
+        results_meta.append(outcome.meta)
+
+    # 全モデル失敗、あるいはメトリクス取得不可の場合のフォールバック
+    if best_model is None:
+        best_model = recipe.models[0] if recipe.models else "unknown"
+        best_score = float("nan")
+
+    return ExperimentOutcome(
+        best_model_name=best_model,
+        metrics={task.objective_metric: best_score},
+        all_model_metrics=all_metrics,
+        run_ids=run_ids,
+        meta={"sweep_results": results_meta, "best_run_id": best_run_id},
+    )
+
+
 class ForecasterAgent:
     """
     実験実行エージェント.
@@ -46,8 +120,43 @@ class ForecasterAgent:
     結果を ExperimentOutcome として整形して返す役割を持つ。
     """
 
-    def __init__(self, runner_module=None) -> None:
+    def __init__(self, runner_module=None, sweep_executor: Optional[SweepExecutor] = None) -> None:
         self._runner = runner_module or model_runner
+        # 未指定の場合は NF_SWEEP_MAX_WORKERS が設定されていれば並列スイープにする
+        self._sweep_executor = sweep_executor if sweep_executor is not None else SweepExecutor.from_env()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # spawn で起動するスイープワーカーへ送るときは、モジュールの runner を名前で渡し、
+        # エグゼキュータ (親プロセス側のスケジューラ) は送らない
+        state = self.__dict__.copy()
+        state["_sweep_executor"] = None
+        if isinstance(self._runner, types.ModuleType):
+            state["_runner"] = self._runner.__name__
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        if isinstance(state.get("_runner"), str):
+            state["_runner"] = importlib.import_module(state["_runner"])
+        self.__dict__.update(state)
+
+    def _run_sweep_task(
+        self,
+        task: TimeSeriesTaskSpec,
+        recipe: ExperimentRecipe,
+        table_name: str,
+        loto: str,
+        unique_ids: Sequence[str],
+        sweep_task: SweepTask,
+    ) -> ExperimentOutcome:
+        """スイープワーカー内で 1 モデル分を実行する (spawn でも pickle できるようメソッドにしている)."""
+        return self.run_single(
+            task=task,
+            recipe=recipe,
+            table_name=table_name,
+            loto=loto,
+            unique_ids=unique_ids,
+            model_name=sweep_task.model_name,
+        )
 
     def run_single(
         self,
@@ -88,12 +197,7 @@ class ForecasterAgent:
             logger.error(f"Model execution failed for {model_name}: {e}")
             # 失敗時のフォールバック
             preds = pd.DataFrame()
-            meta = {
-                "status": "failed", 
-                "error": str(e), 
-                "run_id": "failed",
-                "metrics": {}
-            }
+            meta = _failed_meta(str(e))
 
         # メトリクス抽出
         target_metric = task.objective_metric  # e.g. "mae"
@@ -117,66 +221,53 @@ class ForecasterAgent:
         table_name: str,
         loto: str,
         unique_ids: Sequence[str],
+        on_outcome: Optional[Callable[[ExperimentOutcome], None]] = None,
     ) -> ExperimentOutcome:
         """
         レシピに含まれる全モデルを実行し、最良の結果を返す (Sweep実行).
         
-        runner 側に sweep 関数がない場合でも、ここでループ実行して結果を集約する。
+        sweep_executor が設定されている場合はモデルをプロセス並列で実行し、
+        完了したものから順に on_outcome へ ExperimentOutcome を渡す。
+        未設定の場合は従来どおり 1 モデルずつ順番に実行する。
+        どちらの場合もベストモデルの選択はレシピ順で行うため、結果は実行順に依存しない。
         """
-        results_meta: List[Dict[str, Any]] = []
-        best_model = None
-        best_score = float("inf")
-        best_run_id = None
-        
-        all_metrics = {}
-        run_ids = []
-
-        for model_name in recipe.models:
-            logger.info(f"ForecasterAgent sweeping: {model_name}")
-            
-            # TSFM系モデルの場合は backend を 'tsfm' に切り替える判定ロジック
-            # (model_registry 等の情報があればそれを使うが、ここでは簡易判定)
-            current_recipe = recipe
-            if "Time-MoE" in model_name or "Chronos" in model_name:
-                # backend を一時的に上書きしたコピーを作成しても良いが、
-                # 今回は run_single 内で model_runner がよしなに処理することを期待する、
-                # あるいは明示的に backend を渡す設計にする
-                pass 
-
-            # run_single を再利用して実行
-            outcome = self.run_single(
-                task=task,
-                recipe=current_recipe,
-                table_name=table_name,
-                loto=loto,
-                unique_ids=unique_ids,
-                model_name=model_name
-            )
-            
-            # 結果の集計
-            score = outcome.metrics.get(task.objective_metric, float("nan"))
-            all_metrics.update(outcome.all_model_metrics)
-            run_ids.extend(outcome.run_ids)
-            
-            # ベストモデル更新 (最小化問題を仮定: MAE, RMSE等)
-            if not math.isnan(score):
-                if score < best_score:
-                    best_score = score
-                    best_model = outcome.best_model_name
-                    if outcome.run_ids:
-                        best_run_id = outcome.run_ids[0]
-            
-            results_meta.append(outcome.meta)
-
-        # 全モデル失敗、あるいはメトリクス取得不可の場合のフォールバック
-        if best_model is None:
-            best_model = recipe.models[0] if recipe.models else "unknown"
-            best_score = float("nan")
+        outcomes: Dict[int, ExperimentOutcome] = {}
 
-        return ExperimentOutcome(
-            best_model_name=best_model,
-            metrics={task.objective_metric: best_score},
-            all_model_metrics=all_metrics,
-            run_ids=run_ids,
-            meta={"sweep_results": results_meta, "best_run_id": best_run_id},
-        )
\ No newline at end of file
+        if self._sweep_executor is None:
+            for index, model_name in enumerate(recipe.models):
+                logger.info(f"ForecasterAgent sweeping: {model_name}")
+                outcome = self.run_single(
+                    task=task,
+                    recipe=recipe,
+                    table_name=table_name,
+                    loto=loto,
+                    unique_ids=unique_ids,
+                    model_name=model_name
+                )
+                outcomes[index] = outcome
+                if on_outcome is not None:
+                    on_outcome(outcome)
+        else:
+            # 既存の cpus / gpus 引数をタスクごとの予約量として扱う
+            tasks = [
+                SweepTask(
+                    index=index,
+                    model_name=model_name,
+                    cpus=int(recipe.extra_params.get("cpus", 1) or 1),
+                    gpus=int(recipe.extra_params.get("gpus", 0) or 0),
+                    memory_mb=self._sweep_executor.memory_per_task_mb,
+                )
+                for index, model_name in enumerate(recipe.models)
+            ]
+
+            _run = functools.partial(self._run_sweep_task, task, recipe, table_name, loto, list(unique_ids))
+
+            def _failed(sweep_task: SweepTask, error: str) -> ExperimentOutcome:
+                return _failed_outcome(task, sweep_task.model_name, error)
+
+            for sweep_task, outcome in self._sweep_executor.iter_outcomes(_run, tasks, _failed):
+                outcomes[sweep_task.index] = outcome
+                if on_outcome is not None:
+                    on_outcome(outcome)
+
+        return _select_best_outcome(task, recipe, [outcomes[i] for i in sorted(outcomes)])
@@ -56,6 +56,9 @@ class AgentOrchestrator:
     def __init__(self, config_path: Optional[str] = None):
         self.config = self._load_config(config_path)
         self.agents = self._initialize_agents()
+        # NF_TSFM_PREWARM の重みを起動時に一度だけロードしておく
+        # (fork で起動するスイープワーカーにもモデルプールごと引き継がれる)
+        self._prewarm_tsfm()
 
     def _load_config(self, path: Optional[str]) -> Dict[str, Any]:
         """エージェント設定をロード."""
@@ -69,6 +72,15 @@ class AgentOrchestrator:
             logger.warning(f"Failed to load agent config: {e}")
             return {}
 
+    def _prewarm_tsfm(self) -> None:
+        """TSFM 層が使える環境なら NF_TSFM_PREWARM のモデルをプリウォームする."""
+        try:
+            from nf_loto_platform.tsfm.registry import prewarm_from_env
+        except ImportError:
+            logger.info("TSFM layer is not available; skipping prewarm.")
+            return
+        prewarm_from_env()
+
     def _initialize_agents(self) -> Dict[str, Any]:
         """各エージェントを初期化する."""
         agents = {}
@@ -20,8 +20,10 @@ from typing import Any, Dict, List, Optional, Tuple
 import numpy as np
 import pandas as pd
 
-from nf_loto_platform.db.loto_repository import load_panel_by_loto, search_similar_patterns
+from nf_loto_platform.db.loto_repository import load_panel_by_loto
 from nf_loto_platform.agents.llm_client import LLMClient
+from nf_loto_platform.ml_analysis.distance_profile import search_panel
+from nf_loto_platform.ml_analysis.pattern_index import get_default_store
 
 logger = logging.getLogger(__name__)
 
@@ -52,6 +54,9 @@ class RagAgent:
         # 圧縮設定: 長い系列をこの長さに圧縮(Pooling)する
         self.compressed_sequence_length = rag_conf.get("compressed_sequence_length", 64)
 
+        # 永続パターンインデックス (index_dir または NF_PATTERN_INDEX_DIR が設定されている場合のみ)
+        self.pattern_index = get_default_store(rag_conf.get("index_dir"))
+
     def _compress_sequence(self, sequence: np.ndarray, target_len: int) -> List[float]:
         """
         長い時系列データを平均プーリングにより指定の長さに圧縮する。
@@ -100,88 +105,66 @@ class RagAgent:
         lookback = int(horizon * 1.5)
         if lookback < 10: lookback = 10 # 最低限の長さ
         
-        # load_panel_by_loto は全期間を取ってくる仕様なので、ここでフィルタリングする
+        # load_panel_by_loto は全期間を取ってくる仕様なので、この 1 回の取得結果だけで検索する
         df_panel = load_panel_by_loto(table_name, loto, unique_ids)
         if df_panel.empty:
             return {"error": "No data found"}
 
-        results = {}
-        retrieved_counts = 0
-
-        # 2. 系列ごとに類似検索
+        # 2. 全系列のクエリを作成し、まとめて類似検索 (系列ごとの DB 再取得なし)
+        ordered = df_panel.sort_values(["unique_id", "ds"], kind="stable")
+        history = {uid: grp["y"].to_numpy() for uid, grp in ordered.groupby("unique_id", sort=False)}
+        queries = {}
         for uid in unique_ids:
-            # その系列のデータを取得・ソート
-            series_data = df_panel[df_panel["unique_id"] == uid].sort_values("ds")
-            y_values = series_data["y"].values
-            
+            y_values = history.get(uid)
             # データが短すぎる場合はスキップ
-            if len(y_values) < lookback * 2:
+            if y_values is None or len(y_values) < lookback * 2:
                 logger.debug(f"Series {uid} is too short for RAG.")
                 continue
-
             # 直近 lookback 分をクエリとする
-            query_seq = y_values[-lookback:]
-            
-            # DBリポジトリの検索メソッドを呼び出し
-            # top_k * 2 件取得し、後処理でフィルタリングする
-            similar_df = search_similar_patterns(
-                table_name=table_name,
-                loto=loto,
-                unique_id=uid,
-                query_seq=query_seq,
-                top_k=self.top_k * 2
-            )
-            
-            if not similar_df.empty:
-                # 自分自身（直近データ）を除外する簡易フィルタ
-                latest_ds = series_data["ds"].max()
-                similar_df = similar_df[similar_df["ds"] < latest_ds]
-                
-                # top_k に絞る
-                similar_df = similar_df.head(self.top_k)
-                
-                if not similar_df.empty:
-                    # 結果をリスト化
-                    matches = []
-                    next_values_collection = []
+            queries[uid] = np.asarray(y_values[-lookback:], dtype=float)
 
-                    for _, row in similar_df.iterrows():
-                        # window_values (一致した過去の区間データ) があれば圧縮して保持
-                        window_vals = row.get("window_values", [])
-                        compressed_window = []
-                        if isinstance(window_vals, (list, np.ndarray)) and len(window_vals) > 0:
-                            compressed_window = self._compress_sequence(np.array(window_vals), self.compressed_sequence_length)
+        if self.pattern_index is not None:
+            # 永続インデックスを取得済みの履歴で差分更新してから検索する
+            found = self.pattern_index.search_panel(table_name, loto, ordered, queries, top_k=self.top_k)
+        else:
+            found = search_panel(ordered, queries, top_k=self.top_k)
 
-                        match_info = {
-                            "date": str(row["ds"]),
-                            "similarity": float(row["similarity"]),
-                            "next_value": float(row["next_value"]) if "next_value" in row else None,
-                            "compressed_window": compressed_window  # 圧縮済みデータ
-                        }
-                        matches.append(match_info)
-                        if "next_value" in row and row["next_value"] is not None:
-                            next_values_collection.append(float(row["next_value"]))
-                    
-                    # 統計的傾向の計算
-                    trend_stats = {}
-                    if next_values_collection:
-                        current_val = query_seq[-1]
-                        up_count = sum(1 for v in next_values_collection if v > current_val)
-                        direction_prob = up_count / len(next_values_collection)
-                        mean_next = float(np.mean(next_values_collection))
-                        
-                        trend_hint = "Bullish" if direction_prob > 0.6 else ("Bearish" if direction_prob < 0.4 else "Neutral")
-                        trend_stats = {
-                            "trend_hint": trend_hint,
-                            "up_probability": direction_prob,
-                            "mean_next_val": mean_next
-                        }
+        results = {}
+        retrieved_counts = 0
+        for uid in queries:
+            # 直後の値がある窓のみが対象なので、直近データ自身は検索結果に含まれない
+            similar_df = found.for_series(uid)
+            if similar_df.empty:
+                continue
 
-                    results[uid] = {
-                        "matches": matches,
-                        "stats": trend_stats
-                    }
-                    retrieved_counts += 1
+            matches = []
+            for row in similar_df.itertuples(index=False):
+                # window_values (一致した過去の区間データ) があれば圧縮して保持
+                window_vals = row.window_values
+                compressed_window = []
+                if isinstance(window_vals, (list, np.ndarray)) and len(window_vals) > 0:
+                    compressed_window = self._compress_sequence(np.array(window_vals), self.compressed_sequence_length)
+
+                matches.append({
+                    "date": str(row.ds),
+                    "similarity": float(row.similarity),
+                    "next_value": float(row.next_val),
+                    "compressed_window": compressed_window  # 圧縮済みデータ
+                })
+
+            # 統計的傾向 (search_panel で系列ごとに集計済み)
+            stats = found.stats.loc[uid]
+            direction_prob = float(stats["up_probability"])
+            trend_hint = "Bullish" if direction_prob > 0.6 else ("Bearish" if direction_prob < 0.4 else "Neutral")
+            results[uid] = {
+                "matches": matches,
+                "stats": {
+                    "trend_hint": trend_hint,
+                    "up_probability": direction_prob,
+                    "mean_next_val": float(stats["mean_next_val"]),
+                },
+            }
+            retrieved_counts += 1
 
         # 3. 検索結果の要約 (LLMを使って自然言語レポートを生成)
         rag_report = self.generate_rag_report(results, retrieved_counts)
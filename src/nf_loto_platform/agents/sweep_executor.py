@@ -0,0 +1,338 @@
+"""モデルスイープを並列実行するためのリソース考慮型エグゼキュータ.
+
+ForecasterAgent.run_sweep から利用され、レシピ内の各モデルを別プロセスで実行する。
+
+- CPU / GPU / メモリの予算に対して、タスクごとの予約量 (cpus / gpus / memory_mb)
+  が収まる範囲でのみ新しいワーカーを起動する
+- 各ワーカーの RSS を監視し、上限を超えたプロセスは強制終了して失敗扱いにする
+- 完了した結果はジェネレータで 1 件ずつ返す (完了順)
+
+ワーカーは非 daemon プロセスとして起動する (DataLoader の num_workers>0 や
+Ray / Optuna など、ワーカー内でさらに子プロセスを生成するレシピに対応するため)。
+終了処理は executor 側で明示的に行い、ワーカーとその子プロセスを terminate / join する。
+
+ワーカーは既定では fork で起動する。GPU を予約するタスクを含むスイープは、fork 後の
+CUDA 初期化が安全でないため spawn で起動する (fork が使えない環境も spawn)。
+spawn の場合は実行関数が pickle 可能である必要がある。
+
+ForecasterAgent は環境変数 ``NF_SWEEP_MAX_WORKERS`` が設定されていれば
+:meth:`SweepExecutor.from_env` のエグゼキュータでスイープを並列実行する。
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing as mp
+import os
+import queue as queue_mod
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:  # pragma: no cover - psutil may not be installed in all environments
+    import psutil
+    _PSUTIL_AVAILABLE = True
+except Exception:  # pragma: no cover
+    psutil = None  # type: ignore[assignment]
+    _PSUTIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+@dataclass(frozen=True)
+class SweepTask:
+    """スイープ内の 1 モデル分の実行単位と、その予約リソース."""
+
+    index: int
+    model_name: str
+    cpus: int = 1
+    gpus: int = 0
+    memory_mb: float = 2048.0
+
+
+@dataclass
+class _RunningTask:
+    task: SweepTask
+    process: Any
+    started_at: float
+
+
+def _default_memory_budget_mb() -> float:
+    if not _PSUTIL_AVAILABLE:
+        return float("inf")
+    try:
+        return psutil.virtual_memory().available / (1024 ** 2) * 0.8
+    except Exception:  # pragma: no cover - defensive
+        return float("inf")
+
+
+def _limit_worker_threads(cpus: int) -> None:
+    """ワーカー内の BLAS / torch スレッド数を予約 CPU 数に揃え、過剰な並列化を防ぐ."""
+    n = str(max(int(cpus), 1))
+    for var in _THREAD_ENV_VARS:
+        os.environ[var] = n
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        try:
+            torch.set_num_threads(max(int(cpus), 1))
+        except Exception:  # pragma: no cover - defensive
+            pass
+
+
+def _terminate_process(process: Any, timeout: float = 5.0) -> None:
+    """ワーカーとその子プロセスを terminate し、応答がなければ kill して join する."""
+    children: List[Any] = []
+    if _PSUTIL_AVAILABLE and process.pid is not None:
+        try:
+            children = psutil.Process(process.pid).children(recursive=True)
+        except psutil.Error:
+            children = []
+    if process.is_alive():
+        process.terminate()
+    for child in children:
+        try:
+            child.terminate()
+        except psutil.Error:
+            continue
+    process.join(timeout=timeout)
+    if process.is_alive():
+        process.kill()
+        process.join(timeout=timeout)
+    if children:
+        _, alive = psutil.wait_procs(children, timeout=timeout)
+        for child in alive:
+            try:
+                child.kill()
+            except psutil.Error:
+                continue
+
+
+def _prewarm_tsfm() -> None:
+    """NF_TSFM_PREWARM の TSFM 重みをロードする (fork で親から引き継いだ場合は何もしない)."""
+    try:
+        from nf_loto_platform.tsfm.registry import prewarm_from_env
+    except ImportError:  # pragma: no cover - TSFM 層の依存が無い環境
+        return
+    prewarm_from_env()
+
+
+def _worker_main(fn: Callable[[SweepTask], Any], task: SweepTask, result_queue: Any) -> None:
+    """ワーカープロセスのエントリポイント."""
+    _limit_worker_threads(task.cpus)
+    _prewarm_tsfm()
+    try:
+        result = fn(task)
+        result_queue.put((task.index, True, result))
+    except BaseException as exc:  # noqa: BLE001 - 子プロセスの失敗は親に伝える
+        result_queue.put((task.index, False, f"{type(exc).__name__}: {exc}"))
+
+
+class SweepExecutor:
+    """CPU / GPU / メモリ予算に基づいてスイープタスクをプロセス並列で実行する."""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        cpu_budget: Optional[int] = None,
+        gpu_budget: int = 0,
+        memory_budget_mb: Optional[float] = None,
+        memory_per_task_mb: float = 2048.0,
+        max_worker_rss_mb: Optional[float] = None,
+        poll_interval: float = 0.2,
+        start_method: Optional[str] = None,
+    ) -> None:
+        """
+        Args:
+            max_workers: 同時実行ワーカー数の上限 (None の場合は CPU 予算で決まる)
+            cpu_budget: 同時に予約できる CPU 数 (None の場合は os.cpu_count())
+            gpu_budget: 同時に予約できる GPU 数
+            memory_budget_mb: 同時に予約できるメモリ量 (None の場合は空きメモリの 80%)
+            memory_per_task_mb: タスク 1 つあたりに予約するメモリ量の既定値
+            max_worker_rss_mb: ワーカー 1 つあたりの RSS 上限。超過したワーカーは強制終了する
+            poll_interval: 結果待ち・RSS 監視のポーリング間隔 (秒)
+            start_method: multiprocessing の開始方式 (None の場合は fork を優先し、
+                GPU を予約するタスクを含むスイープでは spawn)
+        """
+        self.cpu_budget = int(cpu_budget or os.cpu_count() or 1)
+        self.gpu_budget = int(gpu_budget)
+        self.memory_budget_mb = float(memory_budget_mb) if memory_budget_mb is not None else _default_memory_budget_mb()
+        self.memory_per_task_mb = float(memory_per_task_mb)
+        self.max_workers = int(max_workers) if max_workers else self.cpu_budget
+        self.max_worker_rss_mb = max_worker_rss_mb
+        self.poll_interval = poll_interval
+        self.start_method = start_method
+
+    @classmethod
+    def from_env(cls) -> Optional["SweepExecutor"]:
+        """環境変数から作る. ``NF_SWEEP_MAX_WORKERS`` が未設定 (または 1 以下) なら None (逐次実行).
+
+        ``NF_SWEEP_MAX_WORKER_RSS_MB`` / ``NF_SWEEP_MEMORY_PER_TASK_MB`` / ``NF_SWEEP_GPU_BUDGET``
+        で RSS 上限・タスクあたりの予約メモリ・GPU 予算も指定できる。
+        """
+        max_workers = int(os.getenv("NF_SWEEP_MAX_WORKERS", "0") or 0)
+        if max_workers <= 1:
+            return None
+        rss = os.getenv("NF_SWEEP_MAX_WORKER_RSS_MB")
+        return cls(
+            max_workers=max_workers,
+            gpu_budget=int(os.getenv("NF_SWEEP_GPU_BUDGET", "0") or 0),
+            memory_per_task_mb=float(os.getenv("NF_SWEEP_MEMORY_PER_TASK_MB", "2048")),
+            max_worker_rss_mb=float(rss) if rss else None,
+        )
+
+    def context_for(self, tasks: Sequence[SweepTask]) -> Any:
+        """スイープに使う multiprocessing コンテキスト (GPU を使うタスクがあれば spawn)."""
+        if self.start_method is not None:
+            return mp.get_context(self.start_method)
+        if any(task.gpus > 0 for task in tasks) or "fork" not in mp.get_all_start_methods():
+            return mp.get_context("spawn")
+        return mp.get_context("fork")
+
+    # ------------------------------------------------------------------
+    # Scheduling helpers
+    # ------------------------------------------------------------------
+    def fits(self, task: SweepTask, used: Dict[str, float]) -> bool:
+        """現在の使用量 ``used`` に task の予約を加えても予算内に収まるか."""
+        return (
+            used["cpus"] + task.cpus <= self.cpu_budget
+            and used["gpus"] + task.gpus <= self.gpu_budget
+            and used["memory_mb"] + task.memory_mb <= self.memory_budget_mb
+        )
+
+    def _next_task(self, pending: List[SweepTask], used: Dict[str, float], n_running: int) -> Optional[SweepTask]:
+        if n_running >= self.max_workers:
+            return None
+        for task in pending:
+            if self.fits(task, used):
+                return task
+        # 単独でも予算を超えるタスクは、他に何も動いていないときだけ実行する
+        if n_running == 0 and pending:
+            logger.warning(
+                "Task %s exceeds the sweep budget on its own; running it alone.", pending[0].model_name
+            )
+            return pending[0]
+        return None
+
+    def _rss_mb(self, pid: int) -> float:
+        if not _PSUTIL_AVAILABLE:
+            return 0.0
+        try:
+            proc = psutil.Process(pid)
+            rss = proc.memory_info().rss
+            for child in proc.children(recursive=True):
+                try:
+                    rss += child.memory_info().rss
+                except psutil.Error:
+                    continue
+            return rss / (1024 ** 2)
+        except psutil.Error:
+            return 0.0
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+    def iter_outcomes(
+        self,
+        fn: Callable[[SweepTask], Any],
+        tasks: Sequence[SweepTask],
+        on_failure: Callable[[SweepTask, str], Any],
+    ) -> Iterator[Tuple[SweepTask, Any]]:
+        """タスクを予算内で並列実行し、完了した順に ``(task, result)`` を返す.
+
+        Args:
+            fn: ワーカー内で実行する関数。task を受け取り結果を返す
+            tasks: 実行するタスク群 (先頭から優先的にスケジュールされる)
+            on_failure: 例外・RSS 超過・異常終了時に結果の代わりを生成する関数
+        """
+        pending: List[SweepTask] = list(tasks)
+        running: Dict[int, _RunningTask] = {}
+        used = {"cpus": 0.0, "gpus": 0.0, "memory_mb": 0.0}
+        ctx = self.context_for(pending)
+        result_queue = ctx.Queue()
+
+        def _release(task: SweepTask) -> None:
+            used["cpus"] -= task.cpus
+            used["gpus"] -= task.gpus
+            used["memory_mb"] -= task.memory_mb
+
+        def _finish(index: int, ok: bool, payload: Any) -> Optional[Tuple[SweepTask, Any]]:
+            entry = running.pop(index, None)
+            if entry is None:
+                return None
+            entry.process.join(timeout=5)
+            _release(entry.task)
+            if ok:
+                logger.info(
+                    "Sweep task %s finished in %.1fs", entry.task.model_name, time.time() - entry.started_at
+                )
+                return entry.task, payload
+            logger.error("Sweep task %s failed: %s", entry.task.model_name, payload)
+            return entry.task, on_failure(entry.task, str(payload))
+
+        try:
+            while pending or running:
+                # 1. 予算に収まる限りワーカーを起動
+                while True:
+                    task = self._next_task(pending, used, len(running))
+                    if task is None:
+                        break
+                    pending.remove(task)
+                    proc = ctx.Process(
+                        target=_worker_main,
+                        args=(fn, task, result_queue),
+                        name=f"sweep-{task.model_name}",
+                        daemon=False,
+                    )
+                    proc.start()
+                    running[task.index] = _RunningTask(task=task, process=proc, started_at=time.time())
+                    used["cpus"] += task.cpus
+                    used["gpus"] += task.gpus
+                    used["memory_mb"] += task.memory_mb
+                    logger.info(
+                        "Started sweep task %s (pid=%s, cpus=%d, gpus=%d)",
+                        task.model_name, proc.pid, task.cpus, task.gpus,
+                    )
+
+                # 2. 完了した結果を受け取る
+                try:
+                    index, ok, payload = result_queue.get(timeout=self.poll_interval)
+                except queue_mod.Empty:
+                    pass
+                else:
+                    done = _finish(index, ok, payload)
+                    if done is not None:
+                        yield done
+
+                # 3. RSS 上限の超過・異常終了を検出 (結果が続けて届く間も毎回確認する)
+                for index, entry in list(running.items()):
+                    if index not in running:
+                        continue
+                    if self.max_worker_rss_mb is not None and entry.process.is_alive():
+                        rss = self._rss_mb(entry.process.pid)
+                        if rss > self.max_worker_rss_mb:
+                            _terminate_process(entry.process)
+                            done = _finish(
+                                index, False,
+                                f"worker RSS {rss:.0f}MB exceeded limit {self.max_worker_rss_mb:.0f}MB",
+                            )
+                            if done is not None:
+                                yield done
+                            continue
+                    if not entry.process.is_alive():
+                        # 終了直後はキューに結果が残っている可能性があるので少し待つ
+                        try:
+                            q_index, ok, payload = result_queue.get(timeout=1.0)
+                            done = _finish(q_index, ok, payload)
+                        except queue_mod.Empty:
+                            done = _finish(
+                                index, False, f"worker exited with code {entry.process.exitcode}"
+                            )
+                        if done is not None:
+                            yield done
+        finally:
+            for entry in running.values():
+                _terminate_process(entry.process)
+            result_queue.close()
@@ -24,7 +24,7 @@ Usage example (pseudo code)::
 
 from __future__ import annotations
 
-from typing import Mapping, Sequence, Tuple
+from typing import Any, Dict, Mapping, Sequence, Tuple
 
 from nf_loto_platform.agents.domain import AgentReport, ExperimentOutcome, TimeSeriesTaskSpec
 from nf_loto_platform.agents.orchestrator import AgentOrchestrator
@@ -34,6 +34,25 @@ from nf_loto_platform.db.db_config import DB_CONFIG
 from nf_loto_platform.db.ts_research_store import TSResearchStore
 
 
+def _collect_evaluations(outcome: ExperimentOutcome) -> Dict[str, Any]:
+    """Find the runner's ``EvaluationResult`` per model in single-run or sweep metadata."""
+    run_metas = []
+    if "single_run_meta" in outcome.meta:
+        run_metas.append(outcome.meta["single_run_meta"])
+    for sweep_meta in outcome.meta.get("sweep_results", []) or []:
+        if isinstance(sweep_meta, Mapping) and "single_run_meta" in sweep_meta:
+            run_metas.append(sweep_meta["single_run_meta"])
+
+    evaluations: Dict[str, Any] = {}
+    for run_meta in run_metas:
+        if not isinstance(run_meta, Mapping):
+            continue
+        evaluation = run_meta.get("evaluation")
+        if evaluation is not None and run_meta.get("model_name"):
+            evaluations[run_meta["model_name"]] = evaluation
+    return evaluations
+
+
 class TSResearchOrchestrator:
     """Wrap an AgentOrchestrator and mirror outcomes into ts_research tables."""
 
@@ -148,6 +167,7 @@ class TSResearchOrchestrator:
         trial_ids: dict[str, int] = {}
         framework_name = "neuralforecast"  # from current backend design
 
+        evaluations = _collect_evaluations(outcome)
         for model_name, metrics in outcome.all_model_metrics.items():
             trial_id = self._store.create_trial(
                 experiment_id=experiment_id,
@@ -160,15 +180,18 @@ class TSResearchOrchestrator:
             )
             trial_ids[model_name] = trial_id
 
-            for metric_name, metric_value in metrics.items():
-                if metric_value is None:
-                    continue
-                self._store.insert_model_metric(
-                    trial_id=trial_id,
-                    metric_name=metric_name,
-                    metric_value=float(metric_value),
-                    split="val",
-                    step=None,
+            evaluation = evaluations.get(model_name)
+            if evaluation is not None:
+                # Global, per-step and per-series values computed once by the runner.
+                self._store.insert_evaluation(trial_id, evaluation, split="val")
+            else:
+                self._store.bulk_insert_model_metrics(
+                    trial_id,
+                    [
+                        (metric_name, float(metric_value), "val", None)
+                        for metric_name, metric_value in metrics.items()
+                        if metric_value is not None
+                    ],
                 )
 
             # Mark trial as finished; more detailed resource logging can be
@@ -5,9 +5,8 @@ from __future__ import annotations
 from functools import lru_cache
 from typing import Any
 
-import psycopg2
-
 from nf_loto_platform.agents.llm_client import BaseLLMClient, EchoLLMClient
+from nf_loto_platform.db import connection_pool
 from nf_loto_platform.db.db_config import DB_CONFIG
 from nf_loto_platform.db.ts_research_store import TSResearchStore
 from nf_loto_platform.ml import model_runner as _model_runner
@@ -20,9 +19,12 @@ def _resolved_db_config() -> dict[str, Any]:
 
 
 def get_db_conn():
-    """Return a psycopg2 connection configured for nf_loto_platform apps."""
+    """Borrow a pooled psycopg2 connection configured for nf_loto_platform apps.
+
+    ``close()`` (or leaving a ``with`` block) returns it to the shared pool.
+    """
 
-    return psycopg2.connect(**_resolved_db_config())
+    return connection_pool.get_connection(_resolved_db_config())
 
 
 @lru_cache(maxsize=1)
@@ -0,0 +1,402 @@
+"""プロセス共通の psycopg2 コネクションプール.
+
+``loto_repository`` / ``db_logger`` / ``TSResearchStore`` / ``loto_pg_store`` /
+``apps.dependencies`` は、これまで呼び出しごとに ``psycopg2.connect`` で
+TCP 接続と認証を行っていた。ここでは接続設定 (DSN) ごとにプロセス内で 1 つの
+スレッドセーフなプールを持ち、接続を貸し出して再利用する。
+
+- 最小/最大接続数 (``NF_DB_POOL_MIN`` / ``NF_DB_POOL_MAX``)
+- 一定時間使われなかった接続は貸し出し前に ``SELECT 1`` で死活確認
+- ``statement_timeout`` を接続オプションで設定 (``NF_DB_STATEMENT_TIMEOUT_MS``)
+- fork 後の子プロセスでは親の接続を使わず、新しい接続を張り直す
+- 接続数・待ち時間を Prometheus メトリクスと :meth:`ConnectionPool.stats` で公開
+
+呼び出し側はこれまでどおり ``with get_connection() as conn:`` と書けばよい。
+``with`` を抜けると成功時は commit、例外時は rollback した上でプールに返却する
+(素の psycopg2 接続と異なり、接続は閉じずに再利用される)。
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+
+from nf_loto_platform.monitoring.prometheus_metrics import observe_db_pool
+
+from .db_config import DB_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(psycopg2.pool.PoolError):
+    """上限まで貸し出し中で、待ち時間内に接続を確保できなかった。"""
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+class ConnectionPool:
+    """スレッドセーフで fork 安全な psycopg2 コネクションプール."""
+
+    def __init__(
+        self,
+        dsn: Dict[str, Any],
+        minconn: int = 1,
+        maxconn: int = 10,
+        statement_timeout_ms: Optional[int] = None,
+        health_check_interval: float = 30.0,
+        acquire_timeout: Optional[float] = 30.0,
+        name: str = "default",
+        connect: Callable[..., Any] = None,  # type: ignore[assignment]
+    ) -> None:
+        """
+        Args:
+            dsn: psycopg2.connect に渡す接続設定
+            minconn: 初回利用時に確保しておく接続数
+            maxconn: 同時に開く接続数の上限
+            statement_timeout_ms: 各接続に設定する statement_timeout (None/0 で無効)
+            health_check_interval: この秒数以上アイドルだった接続は貸し出し前に死活確認する
+            acquire_timeout: 空きを待つ最大秒数 (None で無制限)
+            name: メトリクスのラベルに使うプール名
+            connect: 接続生成関数 (既定は psycopg2.connect)
+        """
+        if maxconn < 1 or minconn < 0 or minconn > maxconn:
+            raise ValueError(f"invalid pool size: minconn={minconn}, maxconn={maxconn}")
+        self._dsn = dict(dsn)
+        if statement_timeout_ms:
+            options = self._dsn.get("options", "")
+            self._dsn["options"] = f"{options} -c statement_timeout={int(statement_timeout_ms)}".strip()
+        self.minconn = int(minconn)
+        self.maxconn = int(maxconn)
+        self.health_check_interval = float(health_check_interval)
+        self.acquire_timeout = acquire_timeout
+        self.name = name
+        self._connect = connect or psycopg2.connect
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle: Deque[Tuple[Any, float]] = deque()
+        self._in_use = 0
+        self._opening = 0
+        self._pid = os.getpid()
+        self._prefilled = False
+        self._stats = {
+            "acquired": 0,
+            "created": 0,
+            "discarded": 0,
+            "timeouts": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # 状態
+    # ------------------------------------------------------------------
+    @property
+    def size(self) -> int:
+        """現在開いている (アイドル + 貸し出し中 + 接続中) 接続数."""
+        return len(self._idle) + self._in_use + self._opening
+
+    def stats(self) -> Dict[str, Any]:
+        """プールの統計情報 (Prometheus が無い環境向け)."""
+        with self._cond:
+            return {
+                "name": self.name,
+                "pid": self._pid,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "size": self.size,
+                "minconn": self.minconn,
+                "maxconn": self.maxconn,
+                **self._stats,
+            }
+
+    def _publish(self, wait_seconds: Optional[float] = None) -> None:
+        observe_db_pool(self.name, idle=len(self._idle), in_use=self._in_use, wait_seconds=wait_seconds)
+
+    # ------------------------------------------------------------------
+    # fork 対応
+    # ------------------------------------------------------------------
+    def _reset_after_fork(self) -> None:
+        """子プロセスで親から引き継いだ接続を破棄する.
+
+        親と共有しているソケットに Terminate を送らないよう close() は呼ばず、
+        参照を保持したまま捨てる (GC で閉じられるのも防ぐ)。
+        """
+        _FORK_ORPHANS.extend(conn for conn, _ in self._idle)
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = deque()
+        self._in_use = 0
+        self._opening = 0
+        self._pid = os.getpid()
+        self._prefilled = False
+
+    def _check_pid(self) -> None:
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+
+    # ------------------------------------------------------------------
+    # 貸し出し・返却
+    # ------------------------------------------------------------------
+    def _open(self) -> Any:
+        """新しい接続を開く (ロックの外で呼ぶこと)."""
+        conn = self._connect(**self._dsn)
+        with self._cond:
+            self._stats["created"] += 1
+        return conn
+
+    def _prefill(self) -> None:
+        """minconn まで接続を開いておく.
+
+        接続数は先に ``_opening`` として確保し、接続自体はロックの外で開く
+        (TCP 接続と認証の間、他のスレッドの貸し出し・返却を止めない)。
+        """
+        with self._cond:
+            if self._prefilled:
+                return
+            self._prefilled = True
+            pending = max(self.minconn - self.size, 0)
+            self._opening += pending
+        while pending:
+            try:
+                conn = self._open()
+            except Exception:
+                logger.warning("Failed to prefill connection pool %s", self.name, exc_info=True)
+                with self._cond:
+                    self._opening -= pending
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                pending -= 1
+                self._opening -= 1
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def _is_healthy(self, conn: Any, idle_since: float) -> bool:
+        if getattr(conn, "closed", 0):
+            return False
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            logger.info("Discarding stale pooled connection (%s)", self.name)
+            return False
+
+    def _discard(self, conn: Any) -> None:
+        self._stats["discarded"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self, timeout: Optional[float] = None) -> Any:
+        """接続を 1 つ借りる (返却は :meth:`release`)."""
+        self._check_pid()
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+
+        if not self._prefilled:
+            self._prefill()
+        while True:
+            with self._cond:
+                while not self._idle and self.size >= self.maxconn:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"connection pool {self.name!r} exhausted ({self.maxconn} connections in use)"
+                        )
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    self._in_use += 1
+                    create = False
+                else:
+                    self._opening += 1
+                    create = True
+
+            if create:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._cond:
+                        self._opening -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._opening -= 1
+                    self._in_use += 1
+            elif not self._is_healthy(conn, idle_since):
+                with self._cond:
+                    self._in_use -= 1
+                    self._discard(conn)
+                    self._cond.notify()
+                continue
+
+            waited = time.monotonic() - started
+            with self._cond:
+                self._stats["acquired"] += 1
+                self._stats["wait_seconds_total"] += waited
+                self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+            self._publish(wait_seconds=waited)
+            return conn
+
+    def release(self, conn: Any, discard: bool = False) -> None:
+        """借りた接続を返却する. 壊れた接続・トランザクション途中の接続は後始末する."""
+        if self._pid != os.getpid():
+            # fork 前に借りた接続は子プロセスでは使わない
+            _FORK_ORPHANS.append(conn)
+            return
+        if not discard and not getattr(conn, "closed", 0):
+            status = getattr(conn, "status", psycopg2.extensions.STATUS_READY)
+            if status != psycopg2.extensions.STATUS_READY:
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+        else:
+            discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard or len(self._idle) >= self.maxconn:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        self._publish()
+
+    def connection(self, timeout: Optional[float] = None) -> "PooledConnection":
+        """``with`` で使える貸し出し接続を返す."""
+        return PooledConnection(self, self.acquire(timeout))
+
+    def closeall(self) -> None:
+        """アイドル接続をすべて閉じる (貸し出し中の接続は返却時に閉じられる)."""
+        self._check_pid()
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._discard(conn)
+        self._publish()
+
+
+class PooledConnection:
+    """プールから借りた接続のラッパー.
+
+    ``with`` では素の psycopg2 接続を返し、抜けるときに commit / rollback して
+    プールへ返却する。``close()`` も返却として扱う。その他の属性は
+    素の接続へ委譲する。
+    """
+
+    def __init__(self, pool: ConnectionPool, conn: Any) -> None:
+        self._pool = pool
+        self._conn = conn
+        self._released = False
+
+    @property
+    def raw(self) -> Any:
+        return self._conn
+
+    def __enter__(self) -> Any:
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        try:
+            if not getattr(self._conn, "closed", 0):
+                if exc_type is None:
+                    self._conn.commit()
+                else:
+                    self._conn.rollback()
+        finally:
+            self.close()
+        return False
+
+    def close(self) -> None:
+        if not self._released:
+            self._released = True
+            self._pool.release(self._conn)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+    def __del__(self) -> None:  # pragma: no cover - safety net for leaked borrows
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+# ----------------------------------------------------------------------
+# プロセス共通のプール
+# ----------------------------------------------------------------------
+_POOLS: Dict[Tuple[Tuple[str, str], ...], ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+# fork 後の子プロセスで親から引き継いだ接続 (閉じずに保持する)
+_FORK_ORPHANS: List[Any] = []
+
+
+def _pool_key(dsn: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((str(k), str(v)) for k, v in dsn.items()))
+
+
+def get_pool(dsn: Optional[Dict[str, Any]] = None) -> ConnectionPool:
+    """接続設定ごとのプロセス共通プールを返す (既定は DB_CONFIG)."""
+    dsn = dict(dsn or DB_CONFIG)
+    key = _pool_key(dsn)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = ConnectionPool(
+                dsn,
+                minconn=_env_int("NF_DB_POOL_MIN", 1),
+                maxconn=_env_int("NF_DB_POOL_MAX", 10),
+                statement_timeout_ms=_env_int("NF_DB_STATEMENT_TIMEOUT_MS", 0) or None,
+                name="default" if not _POOLS else f"pool{len(_POOLS)}",
+            )
+            _POOLS[key] = pool
+    return pool
+
+
+def get_connection(dsn: Optional[Dict[str, Any]] = None) -> PooledConnection:
+    """プロセス共通プールから接続を借りる."""
+    return get_pool(dsn).connection()
+
+
+def get_pool_stats() -> List[Dict[str, Any]]:
+    """全プールの統計情報を返す."""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+    return [p.stats() for p in pools]
+
+
+def close_all_pools() -> None:
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.closeall()
+
+
+def _reset_pools_after_fork() -> None:
+    global _POOLS_LOCK
+    _POOLS_LOCK = threading.Lock()
+    for pool in _POOLS.values():
+        pool._reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
@@ -0,0 +1,373 @@
+"""``COPY ... TO STDOUT`` を使った高速な読み取りパス.
+
+``pd.read_sql`` は psycopg2 のカーソルから 1 行ずつ Python のタプルを生成し、
+その後 DataFrame を構築するため、数十万行を超えるパネルでは大半の時間が
+Python オブジェクトの生成に費やされる。
+
+このモジュールでは ``COPY (SELECT ...) TO STDOUT WITH (FORMAT csv)`` の出力を
+パイプ経由で pyarrow の CSV リーダーに直接ストリームし、列指向のバッファとして
+デコードする。``ds`` の datetime 変換と ``y`` の数値化はデコード時の型指定で
+行うため、後段の pandas での変換パスは不要になる。
+
+CSV には型情報が無いため、その他の列の型は同じクエリの ``LIMIT 0`` 実行で得た
+``cursor.description`` の型 OID から決める (``'001'`` のような text 列を数値と
+推論したり、boolean の ``t``/``f`` を文字列のまま返したりしないように)。
+対応表に無い型は文字列で読む。
+
+pyarrow が無い環境では ``pd.read_csv`` に同じ型指定を渡してデコードする。
+
+書き込み側の :func:`copy_frame_to_table` は DataFrame を一定行数ごとに CSV へ
+エンコードしながら ``COPY ... FROM STDIN`` に流し込む (全体を 1 つのバッファに作らない)。
+
+ベンチマーク::
+
+    python -m nf_loto_platform.db.copy_loader --rows 1000000
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional, Sequence
+
+import pandas as pd
+import psycopg2
+import psycopg2.extensions
+
+try:  # pragma: no cover - import validation is environment dependent
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    _PYARROW_AVAILABLE = True
+except Exception:  # pragma: no cover
+    pa = None  # type: ignore[assignment]
+    pacsv = None  # type: ignore[assignment]
+    _PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# パネル列の既定の型 (デコード時に適用)
+PANEL_DTYPES: Dict[str, str] = {"ds": "datetime", "y": "float64"}
+
+_PIPE_BUFFER = 1 << 20
+
+# PostgreSQL の型 OID -> デコード時の型 (対応表に無い型は "str")
+_OID_KINDS: Dict[int, str] = {
+    16: "bool",  # boolean
+    20: "int64",  # bigint
+    21: "int16",  # smallint
+    23: "int32",  # integer
+    700: "float64",  # real
+    701: "float64",  # double precision
+    1700: "float64",  # numeric
+    1082: "datetime",  # date
+    1114: "datetime",  # timestamp without time zone
+}
+
+# PostgreSQL の CSV 出力での boolean の表記
+_TRUE_VALUES = ["t"]
+_FALSE_VALUES = ["f"]
+
+
+def supports_copy(conn: Any) -> bool:
+    """COPY による読み取りが可能な (実際の psycopg2) 接続か."""
+    return isinstance(conn, psycopg2.extensions.connection)
+
+
+def _bind_query(conn: Any, query: str, params: Optional[Sequence[Any]]) -> str:
+    """パラメータを埋め込んだ SELECT 文を返す (COPY はバインド変数を受け付けない)."""
+    if params:
+        with conn.cursor() as cur:
+            encoding = psycopg2.extensions.encodings.get(conn.encoding, "utf-8")
+            query = cur.mogrify(query, list(params)).decode(encoding)
+    return query.strip().rstrip(";")
+
+
+def _copy_sql(query: str) -> str:
+    return f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+
+
+def _column_kinds(conn: Any, query: str) -> Dict[str, str]:
+    """``query`` を ``LIMIT 0`` で実行し、結果列の型 OID からデコード時の型を決める."""
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT * FROM ({query}) AS _copy_q LIMIT 0")
+        description = cur.description or []
+    return {col[0]: _OID_KINDS.get(col[1], "str") for col in description}
+
+
+def _arrow_convert_options(dtypes: Dict[str, str]) -> "pacsv.ConvertOptions":
+    column_types = {}
+    for col, kind in dtypes.items():
+        if kind == "datetime":
+            column_types[col] = pa.timestamp("ns")
+        elif kind == "str":
+            column_types[col] = pa.string()
+        else:
+            column_types[col] = pa.from_numpy_dtype(pd.api.types.pandas_dtype(kind))
+    # PostgreSQL の CSV 出力では NULL は空文字 (クォートなし)、空文字列は "" になる
+    return pacsv.ConvertOptions(
+        column_types=column_types,
+        null_values=[""],
+        true_values=_TRUE_VALUES,
+        false_values=_FALSE_VALUES,
+        strings_can_be_null=True,
+        quoted_strings_can_be_null=False,
+    )
+
+
+class _DrainingPipeWriter:
+    """パイプの書き込み端。読み取り側が先に閉じた場合は残りの出力を読み捨てる.
+
+    デコード側が途中で失敗してパイプを閉じても ``copy_expert`` は最後まで COPY の出力を
+    受け取って正常終了するため、接続は COPY 途中の状態で放置されない。
+    """
+
+    def __init__(self, fd: int) -> None:
+        self._file = os.fdopen(fd, "wb", buffering=_PIPE_BUFFER)
+        self._broken = False
+
+    def write(self, data: bytes) -> int:
+        if not self._broken:
+            try:
+                self._file.write(data)
+            except BrokenPipeError:
+                self._broken = True
+        return len(data)
+
+    def close(self) -> None:
+        try:
+            self._file.close()
+        except BrokenPipeError:
+            pass
+
+    def __enter__(self) -> "_DrainingPipeWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def _stream_copy(conn: Any, copy_sql: str, consume):
+    """COPY の出力をパイプに流しつつ、読み取り側で ``consume(file)`` を実行する.
+
+    COPY 自体が失敗した場合 (SQL エラー・権限不足・接続断など) は、読み取り側で
+    起きた二次的なエラー (空の CSV 等) ではなく COPY 側の例外を送出する。
+    """
+    r_fd, w_fd = os.pipe()
+    errors = []
+
+    def _produce() -> None:
+        try:
+            with _DrainingPipeWriter(w_fd) as writer, conn.cursor() as cur:
+                cur.copy_expert(copy_sql, writer, size=_PIPE_BUFFER)
+        except BaseException as exc:  # noqa: BLE001 - 読み取り側で再送出する
+            errors.append(exc)
+
+    producer = threading.Thread(target=_produce, name="copy-loader", daemon=True)
+    producer.start()
+    try:
+        with os.fdopen(r_fd, "rb", buffering=_PIPE_BUFFER) as reader:
+            result = consume(reader)
+    except BaseException as exc:
+        producer.join()
+        if errors:
+            raise errors[0] from exc
+        raise
+    producer.join()
+    if errors:
+        raise errors[0]
+    return result
+
+
+def read_frame_copy(
+    conn: Any,
+    query: str,
+    params: Optional[Sequence[Any]] = None,
+    dtypes: Optional[Dict[str, str]] = None,
+) -> pd.DataFrame:
+    """COPY で ``query`` の結果を取得し DataFrame を返す.
+
+    Args:
+        conn: psycopg2 接続
+        query: SELECT 文 (``%s`` プレースホルダ可)
+        params: プレースホルダに渡すパラメータ
+        dtypes: デコード時に適用する列の型 (``"datetime"``, ``"float64"``, ``"str"`` 等)。
+            指定の無い列は DB の列の型から決める。
+            指定した列の変換に失敗した場合 (タイムゾーン付きの値や数値化できない値) は
+            文字列で読み直し、pandas 側で ``read_sql`` 経由と同じ変換を行う。
+
+    COPY 自体のエラーはそのまま送出する (読み直しもロールバックも行わないため、
+    呼び出し側のトランザクションには手を付けない)。
+    """
+    dtypes = dict(dtypes or {})
+    query = _bind_query(conn, query, params)
+    column_kinds = _column_kinds(conn, query)
+    copy_sql = _copy_sql(query)
+
+    if _PYARROW_AVAILABLE:
+        read_options = pacsv.ReadOptions(block_size=_PIPE_BUFFER * 4)
+
+        def _read(options):
+            return _stream_copy(
+                conn, copy_sql, lambda f: pacsv.read_csv(f, read_options=read_options, convert_options=options)
+            )
+
+        try:
+            table = _read(_arrow_convert_options({**column_kinds, **dtypes}))
+        except pa.ArrowInvalid as exc:
+            # ここに来るのは COPY 自体は成功し、型付きデコードだけが失敗した場合のみ
+            logger.debug("Typed COPY decode failed (%s); retrying with string columns.", exc)
+            table = _read(_arrow_convert_options({**column_kinds, **{c: "str" for c in dtypes}}))
+            return _coerce_with_pandas(table.to_pandas(), dtypes)
+        return table.to_pandas()
+
+    buf = io.BytesIO()
+    with conn.cursor() as cur:
+        cur.copy_expert(copy_sql, buf, size=_PIPE_BUFFER)
+    buf.seek(0)
+    # 文字列・浮動小数の列は DB の型で読み (先頭のゼロを保つ)、NULL を含みうる整数や真偽値は推論に任せる
+    strings = {c: k for c, k in column_kinds.items() if k in ("str", "float64") and c not in dtypes}
+    options = dict(keep_default_na=False, na_values=[""], true_values=_TRUE_VALUES, false_values=_FALSE_VALUES)
+    parse_dates = [c for c, k in {**column_kinds, **dtypes}.items() if k == "datetime"]
+    other = {c: k for c, k in dtypes.items() if k not in ("datetime",)}
+    try:
+        df = pd.read_csv(buf, parse_dates=parse_dates, dtype={**strings, **other}, **options)
+    except (ValueError, TypeError):
+        buf.seek(0)
+        df = pd.read_csv(buf, dtype={**strings, **{c: str for c in dtypes}}, **options)
+        return _coerce_with_pandas(df, dtypes)
+    return df
+
+
+def _coerce_with_pandas(df: pd.DataFrame, dtypes: Dict[str, str]) -> pd.DataFrame:
+    for col, kind in dtypes.items():
+        if col not in df.columns:
+            continue
+        if kind == "datetime":
+            df[col] = pd.to_datetime(df[col])
+        elif kind != "str":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(kind)
+    return df
+
+
+def read_frame(
+    query: str,
+    conn: Any,
+    params: Optional[Sequence[Any]] = None,
+    dtypes: Optional[Dict[str, str]] = None,
+) -> pd.DataFrame:
+    """COPY が使える接続なら :func:`read_frame_copy`、そうでなければ ``pd.read_sql`` で読む."""
+    if supports_copy(conn):
+        return read_frame_copy(conn, query, params=params, dtypes=dtypes)
+    if params is None:
+        return pd.read_sql(query, conn)
+    return pd.read_sql(query, conn, params=params)
+
+
+# ----------------------------------------------------------------------
+# 書き込み (COPY ... FROM STDIN)
+# ----------------------------------------------------------------------
+class _CsvChunkStream:
+    """DataFrame を chunk_rows 行ずつ CSV にエンコードして返す、``copy_expert`` 用の読み取りストリーム."""
+
+    def __init__(self, df: pd.DataFrame, chunk_rows: int) -> None:
+        self._df = df
+        self._chunk_rows = max(int(chunk_rows), 1)
+        self._pos = 0
+        self._buf = b""
+
+    def _next_chunk(self) -> bytes:
+        chunk = self._df.iloc[self._pos : self._pos + self._chunk_rows]
+        self._pos += len(chunk)
+        # NULL は空文字 (クォートなし) で表す (COPY の CSV 形式の既定)
+        return chunk.to_csv(header=False, index=False, na_rep="", date_format="%Y-%m-%d %H:%M:%S").encode("utf-8")
+
+    def read(self, size: int = -1) -> bytes:
+        while (size < 0 or len(self._buf) < size) and self._pos < len(self._df):
+            self._buf += self._next_chunk()
+        if size < 0:
+            out, self._buf = self._buf, b""
+        else:
+            out, self._buf = self._buf[:size], self._buf[size:]
+        return out
+
+    def readline(self, size: int = -1) -> bytes:  # pragma: no cover - copy_expert は read のみ使う
+        return self.read(size)
+
+
+def copy_frame_to_table(
+    conn: Any,
+    df: pd.DataFrame,
+    table: str,
+    columns: Optional[Sequence[str]] = None,
+    chunk_rows: int = 100_000,
+) -> int:
+    """``COPY table (columns) FROM STDIN`` で DataFrame を流し込み、行数を返す.
+
+    ``table`` / ``columns`` は呼び出し側で検証済みの識別子であること。
+    値は CSV にエンコードされるため、列は事前に DB の型へ変換しておく
+    (NaN / None / NaT は NULL になる)。
+    """
+    columns = list(columns or df.columns)
+    copy_sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    with conn.cursor() as cur:
+        cur.copy_expert(copy_sql, _CsvChunkStream(df[columns], chunk_rows), size=_PIPE_BUFFER)
+    return len(df)
+
+
+# ----------------------------------------------------------------------
+# ベンチマーク
+# ----------------------------------------------------------------------
+_BENCH_DDL = """
+    CREATE TEMP TABLE nf_copy_bench AS
+    SELECT
+        'loto6'::text AS loto,
+        (g / 100) AS num,
+        (DATE '2000-01-01' + (g / 100)) AS ds,
+        'N' || (g % 100) AS unique_id,
+        ((g * 7919) % 43)::numeric AS y,
+        ((g * 31) % 1000)::numeric AS hist_a,
+        ((g * 17) % 977)::double precision AS hist_b,
+        (g % 7)::integer AS futr_dow
+    FROM generate_series(0, %s - 1) AS g
+"""
+
+
+def _benchmark(n_rows: int, repeat: int) -> None:  # pragma: no cover - requires a live database
+    import time
+
+    from .loto_repository import get_connection
+
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS nf_copy_bench")
+            cur.execute(_BENCH_DDL, [n_rows])
+        query = "SELECT * FROM nf_copy_bench WHERE loto = %s ORDER BY unique_id, ds"
+
+        def _read_sql():
+            df = pd.read_sql(query, conn, params=["loto6"])
+            df["ds"] = pd.to_datetime(df["ds"])
+            df["y"] = pd.to_numeric(df["y"], errors="coerce")
+            return df
+
+        def _copy():
+            return read_frame_copy(conn, query, params=["loto6"], dtypes=PANEL_DTYPES)
+
+        for name, fn in (("read_sql", _read_sql), ("copy", _copy)):
+            best = float("inf")
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                df = fn()
+                best = min(best, time.perf_counter() - t0)
+            print(f"{name:>8}: {best:7.3f}s  rows={len(df):,}  ({len(df) / best:,.0f} rows/s)")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    import argparse
+
+    parser = argparse.ArgumentParser(description="COPY ローダーと pd.read_sql の読み取り速度を比較する")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    _benchmark(args.rows, args.repeat)
@@ -1,8 +1,19 @@
 
+import io
+import logging
 import re
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterator
 from urllib.parse import urlparse
+import numpy as np
 import pandas as pd
 
+from .jp_dates import normalize_jp_dates
+from .source_fetch import FetchedSource, SourceFetcher
+
 # ---- input URLs ----
 URLS = [
     "https://loto-life.net/csv/mini",
@@ -16,19 +27,28 @@ URLS = [
 # short names for numbers3/4
 NAME_MAP = {"numbers3": "num3", "numbers4": "num4"}
 
+DEFAULT_CHUNKSIZE = 50_000
+
+logger = logging.getLogger(__name__)
+
 
 def _loto_name_from_url(u: str) -> str:
     tail = urlparse(u).path.strip("/").split("/")[-1]
     return NAME_MAP.get(tail, tail)
 
 
+def _parse_csv(content: bytes, encoding: str) -> pd.DataFrame:
+    """Parse raw CSV bytes whose encoding was already detected by the fetch layer."""
+    try:
+        return pd.read_csv(io.BytesIO(content), encoding=encoding)
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame()
+
+
 def _read_csv_jp(u: str) -> pd.DataFrame:
-    for enc in ("cp932", "sjis", "utf-8"):
-        try:
-            return pd.read_csv(u, encoding=enc)
-        except Exception:
-            continue
-    return pd.read_csv(u)
+    """Fetch a single source (HTTP cache / NF_LOTO_SOURCE_DIR aware) and parse it once."""
+    source = SourceFetcher.from_env().fetch(u)
+    return _parse_csv(source.content, source.encoding)
 
 
 def _find_date_col(cols) -> str | None:
@@ -39,14 +59,16 @@ def _find_date_col(cols) -> str | None:
 
 
 def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+    # each step only adds/replaces columns, so a shallow copy keeps the input untouched
+    # without duplicating its data
+    df = df.copy(deep=False)
     df.columns = [str(c).strip() for c in df.columns]
     return df
 
 
-def _rename_core_columns(df: pd.DataFrame) -> pd.DataFrame:
+def _rename_core_columns(df: pd.DataFrame, source: str | None = None) -> pd.DataFrame:
     """
-    - rename date column to ds and parse
+    - rename date column to ds and parse (jp_dates; parse failures are reported per source)
     - 第*数字 -> N*
     - *等口数 -> N*NU
     - *等賞金 -> N*PM
@@ -59,15 +81,7 @@ def _rename_core_columns(df: pd.DataFrame) -> pd.DataFrame:
     if date_col and date_col != "ds":
         df = df.rename(columns={date_col: "ds"})
     if "ds" in df.columns:
-        ds_clean = (
-            df["ds"].astype(str)
-            .str.replace(r"\(.*?\)", "", regex=True)
-            .str.replace("年", "-")
-            .str.replace("月", "-")
-            .str.replace("日", "")
-            .str.replace("/", "-")
-        )
-        df["ds"] = pd.to_datetime(ds_clean, errors="coerce")
+        df["ds"] = normalize_jp_dates(df["ds"], source=source)
 
     ren: dict[str, str] = {}
 
@@ -112,7 +126,7 @@ def _rename_core_columns(df: pd.DataFrame) -> pd.DataFrame:
 
 def _expand_num_draw_columns(df: pd.DataFrame, loto_name: str) -> pd.DataFrame:
     """Expand the "抽選数字" column of numbers3/4 into digit columns N1..N3/N4."""
-    df = df.copy()
+    df = df.copy(deep=False)
     if "抽選数字" not in df.columns:
         return df
 
@@ -140,7 +154,7 @@ def _expand_num_draw_columns(df: pd.DataFrame, loto_name: str) -> pd.DataFrame:
 
 def _melt_numbers_long(df: pd.DataFrame, loto_name: str) -> pd.DataFrame:
     """Keep only N* columns as 'y' in long format."""
-    df = df.copy()
+    df = df.copy(deep=False)
     df["loto"] = loto_name
 
     n_cols = [c for c in df.columns if re.fullmatch(r"N\d+", str(c))]
@@ -159,20 +173,62 @@ def _melt_numbers_long(df: pd.DataFrame, loto_name: str) -> pd.DataFrame:
     return long_df
 
 
-def build_long_dataframe(urls: list[str]) -> pd.DataFrame:
-    out_frames: list[pd.DataFrame] = []
-
-    for u in urls:
-        loto = _loto_name_from_url(u)
-        raw = _read_csv_jp(u)
-        norm = _rename_core_columns(raw)
-
-        if loto in ("num3", "num4"):
-            norm = _expand_num_draw_columns(norm, loto)
-
-        long = _melt_numbers_long(norm, loto)
-        out_frames.append(long)
+def _to_long(raw: pd.DataFrame, loto: str) -> pd.DataFrame:
+    norm = _rename_core_columns(raw, source=loto)
+    if loto in ("num3", "num4"):
+        norm = _expand_num_draw_columns(norm, loto)
+    return _melt_numbers_long(norm, loto)
+
+
+def _drop_old_draws(raw: pd.DataFrame, after_num: int | None) -> pd.DataFrame:
+    """Keep only draws with 開催回 > after_num (before the melt, so old draws are never expanded)."""
+    if after_num is None or raw.empty:
+        return raw
+    raw = _normalize_columns(raw)
+    if "開催回" not in raw.columns:
+        return raw
+    num = pd.to_numeric(raw["開催回"], errors="coerce")
+    return raw[num > after_num]
+
+
+def _parse_source(source: FetchedSource, after_num: int | None = None) -> pd.DataFrame:
+    """Parse stage for one fetched source (runs in a worker process)."""
+    raw = _drop_old_draws(_parse_csv(source.content, source.encoding), after_num)
+    return _to_long(raw, _loto_name_from_url(source.url))
+
+
+def _fetch_and_parse(
+    urls: list[str],
+    parse: Callable,
+    fetcher: SourceFetcher | None,
+    parse_workers: int | None,
+    after_num: dict[str, int] | None,
+) -> list:
+    """Fetch all sources concurrently and run `parse(source, after_num)` on each (in a process pool)."""
+    fetcher = fetcher or SourceFetcher.from_env()
+    sources = fetcher.fetch_all(urls)
+    after = [(after_num or {}).get(_loto_name_from_url(src.url)) for src in sources]
+
+    if parse_workers == 0 or len(sources) <= 1:
+        return [parse(src, a) for src, a in zip(sources, after)]
+    with ProcessPoolExecutor(max_workers=parse_workers or len(sources)) as pool:
+        return list(pool.map(parse, sources, after))
+
+
+def build_long_dataframe(
+    urls: list[str],
+    fetcher: SourceFetcher | None = None,
+    parse_workers: int | None = None,
+    after_num: dict[str, int] | None = None,
+) -> pd.DataFrame:
+    """
+    Download all sources concurrently, then parse each one in a process pool.
 
+    - fetcher: defaults to SourceFetcher.from_env() (NF_LOTO_SOURCE_DIR / NF_LOTO_HTTP_CACHE_DIR)
+    - parse_workers: process pool size (None = one per source, 0 = parse in this process)
+    - after_num: {loto: num}; only draws with 開催回 > num are parsed (incremental mode)
+    """
+    out_frames = _fetch_and_parse(urls, _parse_source, fetcher, parse_workers, after_num)
     out_frames = [f for f in out_frames if f is not None and not f.empty]
     if not out_frames:
         return pd.DataFrame(columns=["loto", "num", "ds", "unique_id", "y", "CO"])
@@ -201,7 +257,7 @@ def finalize_df(df: pd.DataFrame) -> pd.DataFrame:
       - y and all other numeric columns (including N*) as float64
       - drop bonus/unused columns
     """
-    df = df.copy()
+    df = df.copy(deep=False)
 
     if "開催回" in df.columns:
         df["num"] = _to_int64(df["開催回"])
@@ -237,14 +293,215 @@ def finalize_df(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def build_df_final(urls: list[str] | None = None) -> pd.DataFrame:
+def build_df_final(
+    urls: list[str] | None = None,
+    fetcher: SourceFetcher | None = None,
+    after_num: dict[str, int] | None = None,
+) -> pd.DataFrame:
     urls_ = urls or URLS
-    df_long = build_long_dataframe(urls_)
+    df_long = build_long_dataframe(urls_, fetcher=fetcher, after_num=after_num)
     df_final = finalize_df(df_long)
     return df_final
 
 
+# ---- normalized layout (per-draw facts + narrow numbers) ----
+# _melt_numbers_long copies every prize column onto each number row of a draw.
+# The normalized tables store them once per draw (nf_loto_draws) and keep the
+# numbers narrow (nf_loto_numbers: loto, num, position, value).
+DRAW_PRIZE_COLS = [
+    "N1NU", "N1PM", "N2NU", "N2PM", "N3NU", "N3PM", "N4NU", "N4PM",
+    "N5NU", "N5PM", "N6NU", "N6PM", "N7NU", "N7PM",
+    "snu", "spm", "bnu", "bpm", "ssnu", "sspm", "sbnu", "sbpm", "mininu", "minipm",
+]
+DRAW_COLS = ["loto", "num", "ds", "CO", *DRAW_PRIZE_COLS]
+NUMBER_COLS = ["loto", "num", "position", "value"]
+
+
+def _empty_normalized() -> tuple[pd.DataFrame, pd.DataFrame]:
+    return pd.DataFrame(columns=DRAW_COLS), pd.DataFrame(columns=NUMBER_COLS)
+
+
+def _to_normalized(raw: pd.DataFrame, loto: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Split one source into (draws, numbers) without melting the prize columns.
+
+    - draws: one row per draw; prize columns the source does not have are NULL
+    - numbers: one row per drawn number; missing numbers are dropped
+    """
+    if raw.empty:
+        return _empty_normalized()
+    norm = _rename_core_columns(raw, source=loto)
+    if loto in ("num3", "num4"):
+        norm = _expand_num_draw_columns(norm, loto)
+
+    n = len(norm)
+    num = _to_int64(norm["開催回"]) if "開催回" in norm.columns else pd.Series(0, index=norm.index, dtype="int64")
+    draws = pd.DataFrame(
+        {
+            "loto": loto,
+            "num": num,
+            "ds": norm["ds"] if "ds" in norm.columns else pd.Series(pd.NaT, index=norm.index, dtype="datetime64[ns]"),
+            "CO": _to_int64(norm["キャリーオーバー"]) if "キャリーオーバー" in norm.columns else pd.NA,
+        },
+        index=norm.index,
+    )
+    for c in DRAW_PRIZE_COLS:
+        draws[c] = _to_int64(norm[c]) if c in norm.columns else pd.Series(pd.NA, index=norm.index, dtype="Int64")
+    draws = draws.astype({"CO": "Int64"}).reset_index(drop=True)
+
+    n_cols = sorted(
+        (c for c in norm.columns if re.fullmatch(r"N\d+", str(c))), key=lambda x: int(x[1:])
+    )
+    if not n_cols:
+        return draws, pd.DataFrame(columns=NUMBER_COLS)
+    values = norm[n_cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype="float64").ravel()
+    numbers = pd.DataFrame(
+        {
+            "loto": loto,
+            "num": np.repeat(num.to_numpy(), len(n_cols)),
+            "position": np.tile(np.array([int(c[1:]) for c in n_cols], dtype="int16"), n),
+            "value": values,
+        }
+    )
+    numbers = numbers[~np.isnan(values)].astype({"value": "int16"}).reset_index(drop=True)
+    return draws, numbers
+
+
+def _parse_source_normalized(
+    source: FetchedSource, after_num: int | None = None
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    raw = _drop_old_draws(_parse_csv(source.content, source.encoding), after_num)
+    return _to_normalized(raw, _loto_name_from_url(source.url))
+
+
+def build_normalized_frames(
+    urls: list[str] | None = None,
+    fetcher: SourceFetcher | None = None,
+    parse_workers: int | None = None,
+    after_num: dict[str, int] | None = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Build (draws, numbers) for the normalized tables (see loto_pg_store.upsert_normalized).
+
+    Fetching, parse_workers and after_num behave as in build_long_dataframe.
+    """
+    parsed = _fetch_and_parse(urls or URLS, _parse_source_normalized, fetcher, parse_workers, after_num)
+    draws = [d for d, _ in parsed if not d.empty]
+    numbers = [x for _, x in parsed if not x.empty]
+    if not draws:
+        return _empty_normalized()
+    return (
+        pd.concat(draws, ignore_index=True),
+        pd.concat(numbers, ignore_index=True) if numbers else pd.DataFrame(columns=NUMBER_COLS),
+    )
+
+
+# ---- streaming pipeline (bounded memory) ----
+def _read_csv_chunks(source: FetchedSource, chunksize: int) -> Iterator[pd.DataFrame]:
+    try:
+        yield from pd.read_csv(io.BytesIO(source.content), encoding=source.encoding, chunksize=chunksize)
+    except pd.errors.EmptyDataError:
+        return
+
+
+def iter_final_chunks(
+    urls: list[str] | None = None,
+    fetcher: SourceFetcher | None = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    after_num: dict[str, int] | None = None,
+) -> Iterator[tuple[str, pd.DataFrame]]:
+    """
+    Yield (loto, finalized chunk) per `chunksize` draws of each source.
+
+    Rename, digit expansion, melt and typing run per chunk, so only one chunk of one
+    source is materialized at a time (plus the raw bytes of the fetched sources).
+    """
+    fetcher = fetcher or SourceFetcher.from_env()
+    for source in fetcher.fetch_all(urls or URLS):
+        loto = _loto_name_from_url(source.url)
+        after = (after_num or {}).get(loto)
+        for raw in _read_csv_chunks(source, chunksize):
+            long = _to_long(_drop_old_draws(raw, after), loto)
+            if long.empty:
+                continue
+            yield loto, finalize_df(long)
+
+
+@dataclass
+class StreamingEtlStats:
+    """Result of run_streaming_etl."""
+
+    rows: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+    peak_memory_mb: float | None = None
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float("inf")
+
+
+def run_streaming_etl(
+    urls: list[str] | None = None,
+    fetcher: SourceFetcher | None = None,
+    sink: Callable[[pd.DataFrame], object] | None = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    after_num: dict[str, int] | None = None,
+    trace_memory: bool = True,
+) -> StreamingEtlStats:
+    """
+    Stream every source chunk by chunk into `sink` (default: loto_pg_store.bulk_upsert_df).
+
+    With trace_memory, the peak memory allocated while the pipeline ran is measured
+    with tracemalloc and reported as peak_memory_mb.
+    """
+    if sink is None:
+        from .loto_pg_store import bulk_upsert_df as sink
+
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if trace_memory:
+        tracemalloc.reset_peak()
+
+    stats = StreamingEtlStats()
+    start = time.perf_counter()
+    try:
+        for _, chunk in iter_final_chunks(urls, fetcher=fetcher, chunksize=chunksize, after_num=after_num):
+            sink(chunk)
+            stats.rows += len(chunk)
+            stats.chunks += 1
+        if trace_memory:
+            stats.peak_memory_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+    stats.seconds = time.perf_counter() - start
+
+    logger.info(
+        "Streaming loto ETL: %d rows in %d chunks, %.2fs, peak memory %s MB",
+        stats.rows,
+        stats.chunks,
+        stats.seconds,
+        "n/a" if stats.peak_memory_mb is None else f"{stats.peak_memory_mb:.1f}",
+    )
+    return stats
+
+
 if __name__ == "__main__":
-    df_final = build_df_final()
-    print(df_final.info())
-    print(df_final.head())
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the loto long dataframe from the source CSVs.")
+    parser.add_argument("--source-dir", help="read <name>.csv files from this directory instead of the URLs")
+    parser.add_argument("--stream", action="store_true", help="stream chunks into the bulk loader")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    fetcher = SourceFetcher(source_dir=args.source_dir) if args.source_dir else None
+    if args.stream:
+        stats = run_streaming_etl(fetcher=fetcher, chunksize=args.chunksize)
+        print(f"rows={stats.rows} chunks={stats.chunks} peak={stats.peak_memory_mb:.1f}MB ({stats.rows_per_sec:,.0f} rows/s)")
+    else:
+        df_final = build_df_final(fetcher=fetcher)
+        print(df_final.info())
+        print(df_final.head())
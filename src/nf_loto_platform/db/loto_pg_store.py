@@ -1,10 +1,19 @@
 # df_final を PostgreSQL に保存し、高速な CRUD を提供するモジュール
-from typing import Optional, List, Tuple
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, List, Tuple
+import numpy as np
 import pandas as pd
 import psycopg2
 from psycopg2.extras import execute_values
 from datetime import datetime
+from nf_loto_platform.monitoring.prometheus_metrics import observe_etl_rows
+from . import connection_pool, copy_loader
 from .db_config import DB_CONFIG, TABLE_PREFIX
+from .loto_etl import DRAW_COLS, DRAW_PRIZE_COLS, NUMBER_COLS
+
+logger = logging.getLogger(__name__)
 
 TABLE_NAME = f"{TABLE_PREFIX}loto_final"
 
@@ -27,49 +36,449 @@ UPSERT_SQL_TEMPLATE = f"""
         {', '.join([f"{c} = EXCLUDED.{c}" for c in COLS[6:]])}
 """
 
-def _connect():
-    return psycopg2.connect(**DB_CONFIG)
+# ROW_HASH_MIGRATION_SQL 適用済みのテーブルでは、全件ロードでも row_hash を書き込む
+# (インクリメンタル ETL のスキップ判定が古いハッシュを見ないように)
+UPSERT_WITH_ROW_HASH_SQL_TEMPLATE = f"""
+    INSERT INTO {TABLE_NAME} ({', '.join(COLS)}, row_hash)
+    VALUES %s
+    ON CONFLICT (loto, num, unique_id) DO UPDATE SET
+        ds = EXCLUDED.ds,
+        y  = EXCLUDED.y,
+        CO = EXCLUDED.CO,
+        {', '.join([f"{c} = EXCLUDED.{c}" for c in COLS[6:]])},
+        row_hash = EXCLUDED.row_hash
+"""
 
-def _prepare_rows(df: pd.DataFrame) -> List[Tuple]:
-    data = df.copy()
+ROW_HASH_COLUMN_SQL = """
+    SELECT 1 FROM pg_attribute
+    WHERE attrelid = to_regclass(%s) AND attname = 'row_hash' AND NOT attisdropped
+"""
 
-    # 欠損列は作成（ゼロ埋め対象）
-    for c in COLS:
-        if c not in data.columns:
-            data[c] = 0 if c != "ds" else None
+def _connect():
+    return connection_pool.get_connection(DB_CONFIG)
 
-    # 数値列は 0 埋めして int64 化（dsは別処理）
+def _prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """COLS の順・DB の型に揃えた DataFrame を列単位で作る (行ループなし)."""
+    n = len(df)
+    data: Dict[str, object] = {}
     for c in COLS:
-        if c in ("loto", "unique_id", "ds"):
-            continue
-        data[c] = pd.to_numeric(data[c], errors="coerce").fillna(0).astype("int64")
+        if c == "ds":
+            # 欠損列は NULL
+            data[c] = pd.to_datetime(df[c], errors="coerce") if c in df.columns else pd.Series(pd.NaT, index=df.index)
+        elif c in ("loto", "unique_id"):
+            data[c] = df[c] if c in df.columns else pd.Series(None, index=df.index, dtype=object)
+        elif c in df.columns:
+            # 数値列は 0 埋めして int64 化
+            data[c] = pd.to_numeric(df[c], errors="coerce").fillna(0).astype("int64")
+        else:
+            data[c] = pd.Series(np.zeros(n, dtype="int64"), index=df.index)
+    return pd.DataFrame(data, index=df.index)[COLS]
+
 
-    data["ds"] = pd.to_datetime(data["ds"], errors="coerce")
-    data = data[COLS].astype(object)
+def _prepare_rows(df: pd.DataFrame) -> List[Tuple]:
+    data = _prepare_frame(df).astype(object)
     data = data.where(pd.notna(data), None)
+    return list(data.itertuples(index=False, name=None))
+
+
+def _row_hashes(frame: pd.DataFrame) -> np.ndarray:
+    """_prepare_frame の各行の内容ハッシュ (符号付き 64bit) を列単位で計算する.
+
+    全件ロード (COPY / execute_values) とインクリメンタル ETL で同じ値になるよう、
+    日時の単位と文字列列の dtype を揃えてからハッシュする。
+    """
+    normalized = frame[COLS].astype({"ds": "datetime64[ns]", "loto": object, "unique_id": object})
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy().view("int64")
+
+
+def _hashed_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """_prepare_frame に row_hash 列を付けたもの (列順は COLS + row_hash)."""
+    frame = _prepare_frame(df)
+    return frame.assign(row_hash=_row_hashes(frame))
+
+
+def _has_row_hash(conn) -> bool:
+    """本テーブルに row_hash 列があるか (ROW_HASH_MIGRATION_SQL 適用済みか)."""
+    with conn.cursor() as cur:
+        cur.execute(ROW_HASH_COLUMN_SQL, (TABLE_NAME,))
+        return bool(cur.fetchall())
 
-    return [tuple(row[c] for c in COLS) for _, row in data.iterrows()]
 
 def upsert_df(df: pd.DataFrame, batch_size: int = 5000):
     """
     データフレームをDBにUPSERTする。
-    
+
+    COPY が使える接続 (実際の psycopg2 接続) では :func:`bulk_upsert_df` の
+    COPY + ステージングテーブル経由で書き込み、それ以外は execute_values で batch_size 行ずつ送る。
+
     Note:
         テーブルが存在しない場合、この関数は psycopg2.errors.UndefinedTable エラーを発生させます。
         事前に sql/ ディレクトリ内のマイグレーションスクリプトを実行してください。
+        ROW_HASH_MIGRATION_SQL 適用済みのテーブルでは row_hash も更新します。
     """
     if df.empty:
         return 0
-    
+
     # DDL操作（ensure_table, migrate_to_bigint）は廃止
-    
-    rows = _prepare_rows(df)
+
+    with _connect() as conn:
+        if copy_loader.supports_copy(conn):
+            return _bulk_upsert(conn, df).rows
+
+        if _has_row_hash(conn):
+            rows, sql = _frame_rows(_hashed_frame(df)), UPSERT_WITH_ROW_HASH_SQL_TEMPLATE
+        else:
+            rows, sql = _prepare_rows(df), UPSERT_SQL_TEMPLATE
+        with conn.cursor() as cur:
+            for i in range(0, len(rows), batch_size):
+                chunk = rows[i:i+batch_size]
+                execute_values(cur, sql, chunk, page_size=len(chunk))
+        conn.commit()
+    return len(rows)
+
+
+# ======= COPY + ステージングテーブルによる一括ロード =======
+STAGING_TABLE = f"{TABLE_NAME}_staging"
+
+# 一時テーブルは WAL に書かれず、コミット時に破棄される
+STAGING_DDL = f"""
+    CREATE TEMP TABLE {STAGING_TABLE} (LIKE {TABLE_NAME} INCLUDING DEFAULTS) ON COMMIT DROP
+"""
+
+# 同じキーが複数行ある場合は 1 行に絞る (ON CONFLICT DO UPDATE は同じ行を 2 回更新できない)
+MERGE_FROM_STAGING_SQL = f"""
+    INSERT INTO {TABLE_NAME} ({', '.join(COLS)})
+    SELECT DISTINCT ON (loto, num, unique_id) {', '.join(COLS)}
+    FROM {STAGING_TABLE}
+    ORDER BY loto, num, unique_id
+    ON CONFLICT (loto, num, unique_id) DO UPDATE SET
+        ds = EXCLUDED.ds,
+        y  = EXCLUDED.y,
+        CO = EXCLUDED.CO,
+        {', '.join([f"{c} = EXCLUDED.{c}" for c in COLS[6:]])}
+"""
+
+MERGE_WITH_ROW_HASH_FROM_STAGING_SQL = f"""
+    INSERT INTO {TABLE_NAME} ({', '.join(COLS)}, row_hash)
+    SELECT DISTINCT ON (loto, num, unique_id) {', '.join(COLS)}, row_hash
+    FROM {STAGING_TABLE}
+    ORDER BY loto, num, unique_id
+    ON CONFLICT (loto, num, unique_id) DO UPDATE SET
+        ds = EXCLUDED.ds,
+        y  = EXCLUDED.y,
+        CO = EXCLUDED.CO,
+        {', '.join([f"{c} = EXCLUDED.{c}" for c in COLS[6:]])},
+        row_hash = EXCLUDED.row_hash
+"""
+
+
+@dataclass
+class BulkLoadStats:
+    """一括ロードの行数と所要時間."""
+
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float("inf")
+
+
+def _bulk_upsert(conn, df: pd.DataFrame, chunk_rows: int = 100_000) -> BulkLoadStats:
+    start = time.perf_counter()
+    with_row_hash = _has_row_hash(conn)
+    frame = _hashed_frame(df) if with_row_hash else _prepare_frame(df)
+    with conn.cursor() as cur:
+        cur.execute(STAGING_DDL)
+    copy_loader.copy_frame_to_table(conn, frame, STAGING_TABLE, list(frame.columns), chunk_rows=chunk_rows)
+    with conn.cursor() as cur:
+        cur.execute(MERGE_WITH_ROW_HASH_FROM_STAGING_SQL if with_row_hash else MERGE_FROM_STAGING_SQL)
+    conn.commit()
+    stats = BulkLoadStats(rows=len(frame), seconds=time.perf_counter() - start)
+    logger.info(
+        "Bulk upserted %d rows into %s in %.2fs (%.0f rows/s)", stats.rows, TABLE_NAME, stats.seconds, stats.rows_per_sec
+    )
+    return stats
+
+
+def bulk_upsert_df(df: pd.DataFrame, chunk_rows: int = 100_000) -> BulkLoadStats:
+    """
+    列単位で型を揃えた DataFrame を COPY で一時ステージングテーブルへ流し込み、
+    1 回の INSERT ... SELECT ... ON CONFLICT で本テーブルへ反映する (全件リロード用)。
+    ROW_HASH_MIGRATION_SQL 適用済みのテーブルでは row_hash も同時に書き込む。
+    """
+    if df.empty:
+        return BulkLoadStats(rows=0, seconds=0.0)
+    with _connect() as conn:
+        return _bulk_upsert(conn, df, chunk_rows=chunk_rows)
+
+# ======= インクリメンタル ETL =======
+# 行内容のハッシュ列 (マイグレーションとして事前に適用する)
+ROW_HASH_MIGRATION_SQL = f"""
+    ALTER TABLE {TABLE_NAME} ADD COLUMN IF NOT EXISTS row_hash BIGINT
+"""
+
+# 内容が変わっていない行 (row_hash が一致) は UPDATE しない (新しいタプル版・WAL を作らない)。
+# RETURNING は実際に書き込んだ行だけを返し、xmax = 0 なら INSERT、それ以外は UPDATE。
+INCREMENTAL_UPSERT_SQL_TEMPLATE = f"""
+    INSERT INTO {TABLE_NAME} ({', '.join(COLS)}, row_hash)
+    VALUES %s
+    ON CONFLICT (loto, num, unique_id) DO UPDATE SET
+        ds = EXCLUDED.ds,
+        y  = EXCLUDED.y,
+        CO = EXCLUDED.CO,
+        {', '.join([f"{c} = EXCLUDED.{c}" for c in COLS[6:]])},
+        row_hash = EXCLUDED.row_hash
+    WHERE {TABLE_NAME}.row_hash IS DISTINCT FROM EXCLUDED.row_hash
+    RETURNING loto, (xmax = 0) AS inserted
+"""
+
+MAX_NUM_SQL = f"""SELECT loto, MAX(num) FROM {TABLE_NAME} GROUP BY loto"""
+
+
+@dataclass
+class UpsertStats:
+    """インクリメンタル UPSERT の結果 (loto ごとの件数も保持)."""
+
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    by_loto: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+    @property
+    def total(self) -> int:
+        return self.inserted + self.updated + self.skipped
+
+    def _add(self, loto: str, action: str, n: int = 1) -> None:
+        setattr(self, action, getattr(self, action) + n)
+        counts = self.by_loto.setdefault(loto, {"inserted": 0, "updated": 0, "skipped": 0})
+        counts[action] += n
+
+
+def fetch_max_nums() -> Dict[str, int]:
+    """DB に保存済みの loto ごとの最大回号."""
+    with _connect() as conn, conn.cursor() as cur:
+        cur.execute(MAX_NUM_SQL)
+        return {str(loto): int(num) for loto, num in cur.fetchall() if num is not None}
+
+
+def upsert_df_incremental(df: pd.DataFrame, batch_size: int = 5000) -> UpsertStats:
+    """
+    行ハッシュ付きで UPSERT し、挿入・更新・スキップ (内容が同一) の件数を返す。
+
+    Note:
+        ROW_HASH_MIGRATION_SQL を事前に適用しておくこと。
+    """
+    stats = UpsertStats()
+    if df.empty:
+        return stats
+
+    rows = _frame_rows(_hashed_frame(df))
+    sent: Dict[str, int] = {}
     with _connect() as conn, conn.cursor() as cur:
         for i in range(0, len(rows), batch_size):
             chunk = rows[i:i+batch_size]
-            execute_values(cur, UPSERT_SQL_TEMPLATE, chunk, page_size=len(chunk))
+            for row in chunk:
+                sent[row[0]] = sent.get(row[0], 0) + 1
+            written = execute_values(cur, INCREMENTAL_UPSERT_SQL_TEMPLATE, chunk, page_size=len(chunk), fetch=True)
+            for loto, inserted in written or []:
+                stats._add(loto, "inserted" if inserted else "updated")
         conn.commit()
-    return len(rows)
+
+    for loto, n in sent.items():
+        counts = stats.by_loto.get(loto, {"inserted": 0, "updated": 0})
+        stats._add(loto, "skipped", n - counts["inserted"] - counts["updated"])
+        counts = stats.by_loto[loto]
+        observe_etl_rows(loto, counts["inserted"], counts["updated"], counts["skipped"])
+    return stats
+
+
+def run_incremental_etl(
+    urls: Optional[List[str]] = None,
+    fetcher=None,
+    lookback: int = 0,
+    batch_size: int = 5000,
+) -> UpsertStats:
+    """
+    DB の最大回号より新しい抽選だけを取得元から解析して UPSERT する (夜間ジョブ用)。
+
+    lookback > 0 の場合は直近 lookback 回分も再解析する (後から確定する口数・賞金の反映用)。
+    内容が変わっていない行は行ハッシュでスキップされる。
+    """
+    from .loto_etl import build_df_final
+
+    max_nums = fetch_max_nums()
+    after_num = {loto: num - int(lookback) for loto, num in max_nums.items()}
+    df_new = build_df_final(urls, fetcher=fetcher, after_num=after_num)
+    stats = upsert_df_incremental(df_new, batch_size=batch_size)
+    logger.info(
+        "Incremental loto ETL: inserted=%d updated=%d skipped=%d (after_num=%s)",
+        stats.inserted,
+        stats.updated,
+        stats.skipped,
+        after_num,
+    )
+    return stats
+
+# ======= 正規化スキーマ (抽選ファクト + 数字の縦持ち) =======
+# nf_loto_final は抽選 1 回の賞金・キャリーオーバー列を数字の個数 (3〜7 行) だけ複製して持つ。
+# 正規化スキーマでは賞金類を抽選単位のファクト (nf_loto_draws) に 1 回だけ置き、
+# 数字は (loto, num, position, value SMALLINT) の細いテーブル (nf_loto_numbers) に分ける。
+# load_panel_by_loto 用の unique_id, ds, y はビュー nf_loto_panel が組み立て、
+# 賞金類は hist_* 列としてビュー nf_loto_panel_exog で必要なときだけ結合する。
+DRAWS_TABLE = f"{TABLE_PREFIX}loto_draws"
+NUMBERS_TABLE = f"{TABLE_PREFIX}loto_numbers"
+PANEL_VIEW = f"{TABLE_PREFIX}loto_panel"
+PANEL_EXOG_VIEW = f"{TABLE_PREFIX}loto_panel_exog"
+
+_PANEL_COLUMNS = "n.loto, n.num, d.ds::timestamp AS ds, 'N' || n.position::text AS unique_id, n.value::double precision AS y"
+_PANEL_FROM = f"{NUMBERS_TABLE} AS n JOIN {DRAWS_TABLE} AS d ON d.loto = n.loto AND d.num = n.num"
+
+# マイグレーションとして事前に適用する (アプリケーションからは実行しない)
+NORMALIZED_SCHEMA_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {DRAWS_TABLE} (
+        loto TEXT NOT NULL,
+        num  INTEGER NOT NULL,
+        ds   DATE,
+        CO   BIGINT,
+        {', '.join(f"{c} BIGINT" for c in DRAW_PRIZE_COLS)},
+        PRIMARY KEY (loto, num)
+    );
+
+    CREATE TABLE IF NOT EXISTS {NUMBERS_TABLE} (
+        loto     TEXT NOT NULL,
+        num      INTEGER NOT NULL,
+        position SMALLINT NOT NULL,
+        value    SMALLINT NOT NULL,
+        PRIMARY KEY (loto, num, position),
+        FOREIGN KEY (loto, num) REFERENCES {DRAWS_TABLE} (loto, num) ON DELETE CASCADE
+    );
+
+    CREATE OR REPLACE VIEW {PANEL_VIEW} AS
+    SELECT {_PANEL_COLUMNS}
+    FROM {_PANEL_FROM};
+
+    CREATE OR REPLACE VIEW {PANEL_EXOG_VIEW} AS
+    SELECT {_PANEL_COLUMNS},
+        d.CO AS hist_co,
+        {', '.join(f"d.{c} AS hist_{c.lower()}" for c in DRAW_PRIZE_COLS)}
+    FROM {_PANEL_FROM};
+"""
+
+# 既存の nf_loto_final から正規化テーブルへ移す (数値の unique_id N<k> の行のみ)
+MIGRATE_FROM_FINAL_SQL = f"""
+    INSERT INTO {DRAWS_TABLE} (loto, num, ds, CO, {', '.join(COLS[6:])})
+    SELECT DISTINCT ON (loto, num) loto, num, ds, CO, {', '.join(COLS[6:])}
+    FROM {TABLE_NAME}
+    ORDER BY loto, num
+    ON CONFLICT (loto, num) DO NOTHING;
+
+    INSERT INTO {NUMBERS_TABLE} (loto, num, position, value)
+    SELECT loto, num, substr(unique_id, 2)::smallint, y::smallint
+    FROM {TABLE_NAME}
+    WHERE unique_id ~ '^N[0-9]+$' AND y IS NOT NULL
+    ON CONFLICT (loto, num, position) DO NOTHING;
+"""
+
+_NORMALIZED_TARGETS = (
+    (DRAWS_TABLE, DRAW_COLS, ("loto", "num")),
+    (NUMBERS_TABLE, NUMBER_COLS, ("loto", "num", "position")),
+)
+
+
+def _normalized_upsert_sql(table: str, cols: List[str], key: Tuple[str, ...], source: Optional[str] = None) -> str:
+    """正規化テーブルへの UPSERT 文 (source 指定時はステージングテーブルからの INSERT ... SELECT)."""
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in cols if c not in key)
+    if source is None:
+        body = "VALUES %s"
+    else:
+        body = f"SELECT DISTINCT ON ({', '.join(key)}) {', '.join(cols)} FROM {source} ORDER BY {', '.join(key)}"
+    return f"""
+    INSERT INTO {table} ({', '.join(cols)})
+    {body}
+    ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates}
+"""
+
+
+def _frame_rows(frame: pd.DataFrame) -> List[Tuple]:
+    data = frame.astype(object)
+    data = data.where(pd.notna(data), None)
+    return list(data.itertuples(index=False, name=None))
+
+
+def upsert_normalized(
+    draws: pd.DataFrame,
+    numbers: pd.DataFrame,
+    batch_size: int = 5000,
+    chunk_rows: int = 100_000,
+) -> BulkLoadStats:
+    """
+    loto_etl.build_normalized_frames の (draws, numbers) を 1 トランザクションで UPSERT する。
+
+    COPY が使える接続ではテーブルごとに一時ステージングテーブル経由、それ以外は execute_values。
+    draws を先に書くため、numbers の外部キーは同じトランザクション内で満たされる。
+
+    Note:
+        NORMALIZED_SCHEMA_DDL を事前に適用しておくこと。
+    """
+    start = time.perf_counter()
+    frames = [draws.reindex(columns=DRAW_COLS), numbers.reindex(columns=NUMBER_COLS)]
+    if all(f.empty for f in frames):
+        return BulkLoadStats(rows=0, seconds=0.0)
+
+    with _connect() as conn:
+        use_copy = copy_loader.supports_copy(conn)
+        for (table, cols, key), frame in zip(_NORMALIZED_TARGETS, frames):
+            if frame.empty:
+                continue
+            if use_copy:
+                staging = f"{table}_staging"
+                with conn.cursor() as cur:
+                    cur.execute(f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+                copy_loader.copy_frame_to_table(conn, frame, staging, cols, chunk_rows=chunk_rows)
+                with conn.cursor() as cur:
+                    cur.execute(_normalized_upsert_sql(table, cols, key, source=staging))
+            else:
+                rows = _frame_rows(frame)
+                sql = _normalized_upsert_sql(table, cols, key)
+                with conn.cursor() as cur:
+                    for i in range(0, len(rows), batch_size):
+                        chunk = rows[i:i+batch_size]
+                        execute_values(cur, sql, chunk, page_size=len(chunk))
+        conn.commit()
+
+    stats = BulkLoadStats(rows=sum(len(f) for f in frames), seconds=time.perf_counter() - start)
+    logger.info(
+        "Upserted %d draws / %d numbers into %s / %s in %.2fs",
+        len(frames[0]),
+        len(frames[1]),
+        DRAWS_TABLE,
+        NUMBERS_TABLE,
+        stats.seconds,
+    )
+    return stats
+
+
+def run_normalized_etl(
+    urls: Optional[List[str]] = None,
+    fetcher=None,
+    incremental: bool = True,
+    lookback: int = 0,
+) -> BulkLoadStats:
+    """
+    取得元を正規化テーブルへ反映する。
+
+    incremental=True の場合は nf_loto_draws の最大回号 (- lookback) より新しい抽選だけを解析する。
+    """
+    from .loto_etl import build_normalized_frames
+
+    after_num = None
+    if incremental:
+        with _connect() as conn, conn.cursor() as cur:
+            cur.execute(f"SELECT loto, MAX(num) FROM {DRAWS_TABLE} GROUP BY loto")
+            after_num = {str(loto): int(num) - int(lookback) for loto, num in cur.fetchall() if num is not None}
+    draws, numbers = build_normalized_frames(urls, fetcher=fetcher, after_num=after_num)
+    return upsert_normalized(draws, numbers)
 
 # ======= CRUD ヘルパ =======
 def read_by_loto_num(loto: str, num: int) -> list[dict]:
@@ -123,7 +532,16 @@ def delete_by_loto_num(loto: str, num: int) -> int:
         return affected
 
 if __name__ == "__main__":
-    from .loto_etl import build_df_final
-    df_final = build_df_final()
-    n = upsert_df(df_final, batch_size=5000)
-    print(f"UPSERT行数: {n}")
\ No newline at end of file
+    import sys
+
+    if "--normalized" in sys.argv:
+        stats = run_normalized_etl(incremental="--full" not in sys.argv)
+        print(f"UPSERT行数: {stats.rows} ({stats.rows_per_sec:,.0f} rows/s)")
+    elif "--full" in sys.argv:
+        from .loto_etl import build_df_final
+        df_final = build_df_final()
+        stats = bulk_upsert_df(df_final)
+        print(f"UPSERT行数: {stats.rows} ({stats.rows_per_sec:,.0f} rows/s)")
+    else:
+        stats = run_incremental_etl()
+        print(f"INSERT: {stats.inserted} / UPDATE: {stats.updated} / SKIP: {stats.skipped}")
\ No newline at end of file
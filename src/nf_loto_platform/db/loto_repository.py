@@ -13,6 +13,9 @@ PostgreSQL 上の nf_loto% テーブルにアクセスするためのユーテ
     - unique_id:  TEXT      (系列ID, N1/N2/... 等)
     - y:          NUMERIC   (目的変数)
     - その他:     外生変数 (hist_*, stat_*, futr_* 接頭辞付き)
+
+正規化スキーマ (loto_pg_store.NORMALIZED_SCHEMA_DDL) ではビュー nf_loto_panel
+(loto, num, ds, unique_id, y) / nf_loto_panel_exog (+ 賞金類の hist_*) が同じ構成を提供する。
 """
 
 from __future__ import annotations
@@ -22,14 +25,27 @@ from typing import Iterable, Sequence, List, Dict, Any, Optional
 
 import numpy as np
 import pandas as pd
-import psycopg2
 
+from nf_loto_platform.ml_analysis.distance_profile import MATCH_COLUMNS, build_match_frame, find_similar_windows
+
+from . import connection_pool
+from .copy_loader import PANEL_DTYPES, read_frame
 from .db_config import DB_CONFIG
+from .panel_cache import (
+    PanelFingerprint,
+    fingerprint_params,
+    fingerprint_sql,
+    get_default_cache,
+    parse_fingerprint_frame,
+)
 
 
 def get_connection():
-    """psycopg2 接続を返すシンプルなヘルパー。"""
-    return psycopg2.connect(**DB_CONFIG)
+    """プロセス共通のコネクションプールから psycopg2 接続を借りる。
+
+    ``with get_connection() as conn:`` を抜けると commit/rollback の上でプールに返却される。
+    """
+    return connection_pool.get_connection(DB_CONFIG)
 
 
 def _validate_table_name(table_name: str) -> str:
@@ -39,10 +55,18 @@ def _validate_table_name(table_name: str) -> str:
     return table_name
 
 
+def _validate_column_names(columns: Sequence[str]) -> List[str]:
+    """列名もテーブル名と同じく英数とアンダースコアのみに制限。"""
+    for col in columns:
+        if not re.match(r"^[A-Za-z0-9_]+$", str(col)):
+            raise ValueError(f"不正な列名です: {col!r}")
+    return [str(c) for c in columns]
+
+
 def list_loto_tables() -> pd.DataFrame:
     """nf_loto% で始まるテーブル一覧を返す。"""
     with get_connection() as conn:
-        df = pd.read_sql(
+        df = read_frame(
             """
             SELECT tablename
             FROM pg_catalog.pg_tables
@@ -60,7 +84,7 @@ def list_loto_values(table_name: str) -> pd.DataFrame:
     table_name = _validate_table_name(table_name)
     query = f"""SELECT DISTINCT loto FROM {table_name} ORDER BY loto"""
     with get_connection() as conn:
-        df = pd.read_sql(query, conn)
+        df = read_frame(query, conn)
     return df
 
 
@@ -74,7 +98,7 @@ def list_unique_ids(table_name: str, loto: str) -> pd.DataFrame:
         ORDER BY unique_id
     """
     with get_connection() as conn:
-        df = pd.read_sql(query, conn, params=[loto])
+        df = read_frame(query, conn, params=[loto])
     return df
 
 
@@ -82,6 +106,7 @@ def load_panel_by_loto(
     table_name: str,
     loto: str,
     unique_ids: Sequence[str],
+    exog_cols: Optional[Sequence[str]] = None,
 ) -> pd.DataFrame:
     """nf_loto テーブルから、指定された loto × unique_ids のパネルデータを取得。
 
@@ -93,23 +118,65 @@ def load_panel_by_loto(
             - hist_* : 過去のみ既知の外生
             - stat_* : 静的外生
             - futr_* : 未来まで既知の外生
+
+    exog_cols を指定した場合は ``SELECT *`` ではなく ``unique_id, ds, y`` と指定した外生列だけを
+    取得する。正規化スキーマのビュー (``nf_loto_panel_exog``, loto_pg_store 参照) では
+    使わない列の転送を省ける。
+
+    環境変数 NF_PANEL_CACHE_DIR が設定されている場合はローカルの Parquet キャッシュ
+    (db.panel_cache) を経由し、変更のない行の再取得を省略する。
     """
     table_name = _validate_table_name(table_name)
     if not unique_ids:
         raise ValueError("unique_ids が空です。最低 1 件指定してください。")
+    if exog_cols is not None:
+        exog_cols = _validate_column_names(exog_cols)
+
+    cache = get_default_cache()
+    if cache is None:
+        return _fetch_panel(table_name, loto, unique_ids, exog_cols=exog_cols)
+
+    def _fingerprint(since_ds: Optional[str]) -> Dict[str, PanelFingerprint]:
+        query = fingerprint_sql(table_name, len(unique_ids))
+        with get_connection() as conn:
+            fp = read_frame(query, conn, params=fingerprint_params(loto, unique_ids, since_ds))
+        return parse_fingerprint_frame(fp)
+
+    # 取得する列が違えば別のキャッシュエントリにする
+    cache_name = table_name if exog_cols is None else f"{table_name}({','.join(exog_cols)})"
+    return cache.load(
+        cache_name,
+        loto,
+        unique_ids,
+        fingerprint_fn=_fingerprint,
+        fetch_fn=lambda after_ds: _fetch_panel(table_name, loto, unique_ids, after_ds=after_ds, exog_cols=exog_cols),
+    )
 
+
+def _fetch_panel(
+    table_name: str,
+    loto: str,
+    unique_ids: Sequence[str],
+    after_ds: Optional[str] = None,
+    exog_cols: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """DB からパネルを取得する (after_ds 指定時は ds > after_ds の行のみ)。"""
     # IN 句をプレースホルダで安全に構築
     placeholders = ",".join(["%s"] * len(unique_ids))
+    since_clause = "\n          AND ds > %s" if after_ds is not None else ""
+    select_list = "*" if exog_cols is None else ", ".join(["unique_id", "ds", "y", *exog_cols])
     query = f"""
-        SELECT *
+        SELECT {select_list}
         FROM {table_name}
         WHERE loto = %s
-          AND unique_id IN ({placeholders})
+          AND unique_id IN ({placeholders}){since_clause}
         ORDER BY unique_id, ds
     """
     params = [loto, *list(unique_ids)]
+    if after_ds is not None:
+        params.append(after_ds)
     with get_connection() as conn:
-        df = pd.read_sql(query, conn, params=params)
+        df = read_frame(query, conn, params=params, dtypes=PANEL_DTYPES)
 
     # NeuralForecast の標準カラム名が揃っているか軽くチェック
     if not df.empty:
@@ -119,12 +186,12 @@ def load_panel_by_loto(
             # データが存在するのに必須カラムがない場合はエラー
             raise ValueError(f"必要なカラムが不足しています: {missing}")
             
-        # dsをdatetime型に強制変換
-        if "ds" in df.columns:
+        # dsをdatetime型に強制変換 (COPY 経由ではデコード時に変換済み)
+        if "ds" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["ds"]):
             df["ds"] = pd.to_datetime(df["ds"])
         
-        # yを数値型に強制変換
-        if "y" in df.columns:
+        # yを数値型に強制変換 (COPY 経由ではデコード時に変換済み)
+        if "y" in df.columns and not pd.api.types.is_float_dtype(df["y"]):
             df["y"] = pd.to_numeric(df["y"], errors='coerce')
 
     return df
@@ -140,10 +207,11 @@ def search_similar_patterns(
     unique_id: str,
     query_seq: Sequence[float],
     top_k: int = 5,
+    normalize: bool = False,
 ) -> pd.DataFrame:
     """指定された系列の過去データから、query_seq に類似した波形パターンを検索する (RAG用)。
 
-    単純なユークリッド距離に基づく類似度検索を行い、
+    ユークリッド距離に基づく類似度検索を行い、
     「類似した過去の状況」と「その直後に何が起きたか」を特定する。
 
     Args:
@@ -152,6 +220,7 @@ def search_similar_patterns(
         unique_id: 検索対象の系列ID
         query_seq: 直近の観測値リスト (検索クエリ)。この長さ(N)と同じ長さの過去窓を検索する。
         top_k: 返却する類似パターンの数
+        normalize: True の場合は各窓とクエリを z 正規化して形状のみを比較する
 
     Returns:
         pd.DataFrame: 以下のカラムを持つデータフレーム (類似度順)
@@ -171,16 +240,13 @@ def search_similar_patterns(
     """
     
     with get_connection() as conn:
-        df_hist = pd.read_sql(query, conn, params=[loto, unique_id])
+        df_hist = read_frame(query, conn, params=[loto, unique_id], dtypes=PANEL_DTYPES)
     
     # カラムが無い、データが無い場合の空返し
     if df_hist.empty or "y" not in df_hist.columns:
-        return pd.DataFrame(columns=["ds", "similarity", "next_val", "window_values"])
-    
-    # 2. スライディングウィンドウによる検索 (Python側で実行)
-    # Note: データ量が膨大な場合は pgvector 等の利用を検討すべきだが、
-    # ロト/ナンバーズ程度のデータ量(数千~数万行)であれば numpy で十分高速。
+        return pd.DataFrame(columns=MATCH_COLUMNS)
     
+    # 2. 距離プロファイルによる検索 (全窓との距離を 1 パスで計算)
     y_hist = pd.to_numeric(df_hist["y"], errors='coerce').fillna(0).to_numpy(dtype=float)
     ds_hist = pd.to_datetime(df_hist["ds"]).to_numpy()
     
@@ -188,46 +254,13 @@ def search_similar_patterns(
     q_vec = np.array(query_seq, dtype=float)
     
     # 検索には「クエリ長 + 直後の1点」が必要
-    if len(y_hist) < q_len + 1:
-        return pd.DataFrame(columns=["ds", "similarity", "next_val", "window_values"])
+    if q_len == 0 or len(y_hist) < q_len + 1:
+        return pd.DataFrame(columns=MATCH_COLUMNS)
 
-    results = []
-    
-    # 履歴を走査
-    # 最後のウィンドウは、その「次(未来)」がデータセット内に存在する必要があるため
-    # ループ範囲は len(y_hist) - q_len まで (スライスは i+q_len を参照、next_valは i+q_len を参照)
-    # i + q_len < len(y_hist) である必要がある -> i < len(y_hist) - q_len
-    
-    for i in range(len(y_hist) - q_len):
-        # ウィンドウ切り出し
-        window = y_hist[i : i + q_len]
-        
-        # 距離計算 (Euclidean Distance)
-        dist = np.linalg.norm(window - q_vec)
-        
-        # 類似度へ変換 (距離0 -> 1.0, 距離大 -> 0.0)
-        # 正規化定数はデータのスケールに依存するが、簡易的に 1 / (1 + dist) を使用
-        similarity = 1.0 / (1.0 + dist)
-        
-        # next_val (パターンの直後の値)
-        next_val = y_hist[i + q_len]
-        
-        # match_date (パターン終了日)
-        match_date = ds_hist[i + q_len - 1] 
-        
-        results.append({
-            "ds": match_date,
-            "similarity": similarity,
-            "next_val": next_val,
-            "window_values": window.tolist()
-        })
-    
-    # 3. 結果の整形とソート
-    df_res = pd.DataFrame(results)
-    if df_res.empty:
-        return df_res
-        
-    # 類似度が高い順にソート
-    df_res = df_res.sort_values("similarity", ascending=False).head(top_k)
-    
-    return df_res.reset_index(drop=True)
\ No newline at end of file
+    # 直後の値 (next_val) がデータセット内に存在する窓のみが対象: 開始位置 i < len(y_hist) - q_len
+    starts, dist = find_similar_windows(
+        y_hist, q_vec, top_k=top_k, normalize=normalize, max_start=len(y_hist) - q_len
+    )
+
+    # 3. 上位 top_k 件についてのみ結果を組み立てる (類似度の高い順)
+    return build_match_frame(ds_hist, y_hist, starts, dist, q_len)
\ No newline at end of file
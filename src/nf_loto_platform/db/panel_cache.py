@@ -0,0 +1,303 @@
+"""パネルデータのローカル Parquet キャッシュ.
+
+``loto_repository.load_panel_by_loto`` の結果を ``(table, loto, unique_ids)``
+単位でローカルディスクに Parquet として保存し、同じパネルの再ロード時に
+DB からの全件 SELECT と DataFrame 構築を省略する。
+
+キャッシュの妥当性はサーバー側で計算する軽量なフィンガープリント
+(行数 + max(ds) + max(ds) の日付の行だけの行ハッシュの総和) で判定する。
+行ハッシュは全行ではなく末尾の日付の行についてのみ計算するため、検証の
+コストはパネルの長さによらずほぼ行数のカウント分で済む。
+
+- フィンガープリントが一致       -> Parquet をそのまま返す
+- キャッシュ済み期間 (ds <= キャッシュの max(ds)) の行数と、キャッシュの
+  max(ds) の日付の行ハッシュが一致 -> ds > max(ds) の新しい行だけを取得して追記
+- それ以外 (行の削除、末尾の日付の行の更新など) -> 全件を取り直す
+
+行数を変えない過去行 (キャッシュの max(ds) より前) の更新は検出しない。
+過去データを書き換えた場合はキャッシュディレクトリのエントリを削除すること。
+
+ディレクトリ全体のサイズが ``max_bytes`` を超えた場合は、最終アクセスが
+古いエントリから削除する (LRU)。
+
+有効化は環境変数 ``NF_PANEL_CACHE_DIR`` で行う (未設定ならキャッシュしない)。
+サイズ上限は ``NF_PANEL_CACHE_MAX_MB`` (既定 2048MB)。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+try:  # pragma: no cover - import validation is environment dependent
+    import pyarrow  # noqa: F401
+    _PYARROW_AVAILABLE = True
+except Exception:  # pragma: no cover
+    _PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_MB = 2048
+
+
+@dataclass(frozen=True)
+class PanelFingerprint:
+    """サーバー側で計算したパネルのフィンガープリント."""
+
+    n_rows: int
+    max_ds: Optional[str]
+    row_hash: int
+
+
+@dataclass
+class _CacheEntry:
+    key: str
+    table_name: str
+    loto: str
+    unique_ids: List[str]
+    fingerprint: Dict[str, Any]
+    n_bytes: int
+    last_access: float
+
+
+def _fingerprint_from_row(n_rows: Any, max_ds: Any, row_hash: Any) -> PanelFingerprint:
+    n = int(n_rows or 0)
+    ts = None if n == 0 or max_ds is None or pd.isna(max_ds) else pd.Timestamp(max_ds).isoformat()
+    h = 0 if row_hash is None or pd.isna(row_hash) else int(row_hash)
+    return PanelFingerprint(n_rows=n, max_ds=ts, row_hash=h)
+
+
+def fingerprint_sql(table_name: str, n_unique_ids: int) -> str:
+    """フィンガープリント取得用の SQL を返す (パラメータは :func:`fingerprint_params`).
+
+    全体の ``n_rows`` / ``max_ds`` は行を数えるだけで計算し、``hashtext`` による行ハッシュは
+    ``max_ds`` の日付の行 (``row_hash``) と ``since_ds`` (キャッシュ済みの max(ds)) の日付の行
+    (``prefix_hash``) についてのみ計算する。``prefix_rows`` は ``ds <= since_ds`` の行数。
+    ``table_name`` は呼び出し側で検証済みであること。
+    """
+    placeholders = ",".join(["%s"] * n_unique_ids)
+    return f"""
+        SELECT
+            m.n_rows,
+            m.max_ds,
+            m.prefix_rows,
+            (
+                SELECT COALESCE(SUM(hashtext(t::text)::bigint), 0)
+                FROM {table_name} AS t
+                WHERE t.loto = %s AND t.unique_id IN ({placeholders}) AND t.ds = m.max_ds
+            ) AS row_hash,
+            (
+                SELECT COALESCE(SUM(hashtext(t::text)::bigint), 0)
+                FROM {table_name} AS t
+                WHERE t.loto = %s AND t.unique_id IN ({placeholders}) AND t.ds = %s
+            ) AS prefix_hash
+        FROM (
+            SELECT
+                COUNT(*) AS n_rows,
+                MAX(ds) AS max_ds,
+                COUNT(*) FILTER (WHERE ds <= %s) AS prefix_rows
+            FROM {table_name}
+            WHERE loto = %s AND unique_id IN ({placeholders})
+        ) AS m
+    """
+
+
+def fingerprint_params(loto: str, unique_ids: Sequence[str], since_ds: Optional[str]) -> List[Any]:
+    """:func:`fingerprint_sql` に渡すパラメータを並べる."""
+    uids = list(unique_ids)
+    return [loto, *uids, loto, *uids, since_ds, since_ds, loto, *uids]
+
+
+def parse_fingerprint_frame(df: pd.DataFrame) -> Dict[str, PanelFingerprint]:
+    """:func:`fingerprint_sql` の結果 1 行を ``{"full": ..., "prefix": ...}`` に変換する."""
+    row = df.iloc[0]
+    full = _fingerprint_from_row(row["n_rows"], row["max_ds"], row["row_hash"])
+    prefix = PanelFingerprint(
+        n_rows=int(row["prefix_rows"] or 0),
+        max_ds=None,
+        row_hash=int(row["prefix_hash"] or 0),
+    )
+    return {"full": full, "prefix": prefix}
+
+
+class PanelCache:
+    """``(table, loto, unique_ids)`` をキーとする Parquet キャッシュ."""
+
+    def __init__(self, cache_dir: os.PathLike | str, max_bytes: int = DEFAULT_MAX_MB * 1024 ** 2) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = int(max_bytes)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.stats = {"hits": 0, "incremental": 0, "misses": 0}
+
+    # ------------------------------------------------------------------
+    # キー・パス
+    # ------------------------------------------------------------------
+    @staticmethod
+    def make_key(table_name: str, loto: str, unique_ids: Sequence[str]) -> str:
+        payload = json.dumps([table_name, loto, sorted(str(u) for u in unique_ids)])
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _data_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.parquet"
+
+    def _meta_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    # ------------------------------------------------------------------
+    # メタデータ
+    # ------------------------------------------------------------------
+    def _read_entry(self, key: str) -> Optional[_CacheEntry]:
+        meta_path = self._meta_path(key)
+        if not meta_path.exists() or not self._data_path(key).exists():
+            return None
+        try:
+            return _CacheEntry(**json.loads(meta_path.read_text(encoding="utf-8")))
+        except Exception:
+            logger.warning("Broken panel cache metadata: %s", meta_path)
+            return None
+
+    def _write_entry(self, entry: _CacheEntry) -> None:
+        tmp = self._meta_path(entry.key).with_suffix(f".json.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(asdict(entry)), encoding="utf-8")
+        os.replace(tmp, self._meta_path(entry.key))
+
+    def _write_data(self, key: str, df: pd.DataFrame) -> int:
+        path = self._data_path(key)
+        tmp = path.with_suffix(f".parquet.{os.getpid()}.tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        return path.stat().st_size
+
+    def entries(self) -> List[_CacheEntry]:
+        """保存済みエントリの一覧 (最終アクセスが古い順)."""
+        found = []
+        for meta_path in self.cache_dir.glob("*.json"):
+            entry = self._read_entry(meta_path.stem)
+            if entry is not None:
+                found.append(entry)
+        return sorted(found, key=lambda e: e.last_access)
+
+    def remove(self, key: str) -> None:
+        for path in (self._meta_path(key), self._data_path(key)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """合計サイズが上限を下回るまで LRU でエントリを削除する."""
+        entries = self.entries()
+        total = sum(e.n_bytes for e in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry.key == keep:
+                continue
+            logger.info("Evicting panel cache entry %s (%s/%s)", entry.key, entry.table_name, entry.loto)
+            self.remove(entry.key)
+            total -= entry.n_bytes
+
+    # ------------------------------------------------------------------
+    # ロード
+    # ------------------------------------------------------------------
+    def load(
+        self,
+        table_name: str,
+        loto: str,
+        unique_ids: Sequence[str],
+        fingerprint_fn: Callable[[Optional[str]], Dict[str, PanelFingerprint]],
+        fetch_fn: Callable[[Optional[str]], pd.DataFrame],
+    ) -> pd.DataFrame:
+        """キャッシュを検証しつつパネルを返す.
+
+        Args:
+            fingerprint_fn: キャッシュ済みの max(ds) (なければ None) を受け取り、
+                :func:`parse_fingerprint_frame` 形式のフィンガープリントを返す関数
+            fetch_fn: ``after_ds`` を受け取り、``ds > after_ds`` の行
+                (None の場合は全行) を ``(unique_id, ds)`` 順で返す関数
+        """
+        key = self.make_key(table_name, loto, unique_ids)
+        entry = self._read_entry(key)
+        cached_max = entry.fingerprint.get("max_ds") if entry is not None else None
+        server = fingerprint_fn(cached_max)
+        full: PanelFingerprint = server["full"]
+
+        df: Optional[pd.DataFrame] = None
+        if entry is not None:
+            cached = PanelFingerprint(**entry.fingerprint)
+            if full == cached:
+                df = self._read_data(key)
+                if df is not None:
+                    self.stats["hits"] += 1
+                    entry.last_access = time.time()
+                    self._write_entry(entry)
+                    return df
+            elif (
+                cached_max is not None
+                and server["prefix"].n_rows == cached.n_rows
+                and server["prefix"].row_hash == cached.row_hash
+            ):
+                base = self._read_data(key)
+                if base is not None:
+                    new_rows = fetch_fn(cached_max)
+                    df = pd.concat([base, new_rows], ignore_index=True) if len(new_rows) else base
+                    if {"unique_id", "ds"}.issubset(df.columns):
+                        df = df.sort_values(["unique_id", "ds"], kind="stable").reset_index(drop=True)
+                    self.stats["incremental"] += 1
+
+        if df is None:
+            df = fetch_fn(None)
+            self.stats["misses"] += 1
+
+        if len(df) != full.n_rows:
+            # 取得中に更新が入った場合は次回に全件取り直す
+            logger.info("Panel changed while loading %s/%s; not caching.", table_name, loto)
+            self.remove(key)
+            return df
+
+        n_bytes = self._write_data(key, df)
+        self._write_entry(
+            _CacheEntry(
+                key=key,
+                table_name=table_name,
+                loto=loto,
+                unique_ids=sorted(str(u) for u in unique_ids),
+                fingerprint=asdict(full),
+                n_bytes=n_bytes,
+                last_access=time.time(),
+            )
+        )
+        self.evict(keep=key)
+        return df
+
+    def _read_data(self, key: str) -> Optional[pd.DataFrame]:
+        try:
+            return pd.read_parquet(self._data_path(key))
+        except Exception:
+            logger.warning("Broken panel cache data for %s; reloading.", key)
+            self.remove(key)
+            return None
+
+
+_DEFAULT_CACHES: Dict[str, PanelCache] = {}
+
+
+def get_default_cache() -> Optional[PanelCache]:
+    """環境変数で設定されたキャッシュを返す (未設定・pyarrow 不在なら None)."""
+    cache_dir = os.getenv("NF_PANEL_CACHE_DIR")
+    if not cache_dir or not _PYARROW_AVAILABLE:
+        return None
+    max_mb = float(os.getenv("NF_PANEL_CACHE_MAX_MB", str(DEFAULT_MAX_MB)))
+    cache = _DEFAULT_CACHES.get(cache_dir)
+    if cache is None or cache.max_bytes != int(max_mb * 1024 ** 2):
+        cache = PanelCache(cache_dir, max_bytes=int(max_mb * 1024 ** 2))
+        _DEFAULT_CACHES[cache_dir] = cache
+    return cache
@@ -0,0 +1,176 @@
+"""ロト ETL の取得元 CSV を並列に取得するフェッチ層.
+
+``loto_etl.build_long_dataframe`` は ``URLS`` を 1 件ずつ直列にダウンロードし、
+``_read_csv_jp`` がエンコーディングを推測するたびに同じファイルを最大 3 回
+取得・パースし直していた。ここでは
+
+- 全ソースをスレッドで並列に取得する
+- ローカルの HTTP キャッシュ (本体 + ETag / Last-Modified) を持ち、条件付き GET で
+  再検証する (304 ならキャッシュ済みの本体を使う)
+- エンコーディングは取得したバイト列から 1 回だけ判定する
+- ``source_dir`` を指定した場合はネットワークに出ず、URL の末尾名
+  (``loto6`` -> ``loto6.csv`` / ``loto6``) のファイルを読む (オフライン実行・テスト用)
+
+環境変数:
+    NF_LOTO_SOURCE_DIR:     取得元の代わりに読むローカルディレクトリ
+    NF_LOTO_HTTP_CACHE_DIR: HTTP キャッシュの保存先 (未設定ならキャッシュしない)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+#: 判定順。cp932 のバイト列が UTF-8 として偶然デコードできることはほぼ無いため UTF-8 を先に試す
+ENCODINGS = ("utf-8", "cp932")
+DEFAULT_TIMEOUT = 30.0
+USER_AGENT = "nf-loto-platform-etl"
+
+
+@dataclass(frozen=True)
+class FetchedSource:
+    """取得したソース 1 件 (生のバイト列と判定済みエンコーディング)."""
+
+    url: str
+    content: bytes
+    encoding: str
+    origin: str  # "network" / "cache" (304) / "local"
+
+
+def detect_encoding(content: bytes) -> str:
+    """バイト列から CSV のエンコーディングを判定する (BOM 付き UTF-8 も扱う)."""
+    if content.startswith(b"\xef\xbb\xbf"):
+        return "utf-8-sig"
+    for enc in ENCODINGS:
+        try:
+            content.decode(enc)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return ENCODINGS[-1]
+
+
+def source_name(url: str) -> str:
+    """URL の末尾のパス要素 (``https://.../csv/loto6`` -> ``loto6``)."""
+    return urlparse(url).path.strip("/").split("/")[-1]
+
+
+class SourceFetcher:
+    """URL 群を並列に取得し、HTTP キャッシュで再ダウンロードを省略する."""
+
+    def __init__(
+        self,
+        cache_dir: Optional[os.PathLike | str] = None,
+        source_dir: Optional[os.PathLike | str] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_workers: Optional[int] = None,
+    ) -> None:
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.source_dir = Path(source_dir) if source_dir else None
+        self.timeout = float(timeout)
+        self.max_workers = max_workers
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "SourceFetcher":
+        return cls(
+            cache_dir=os.getenv("NF_LOTO_HTTP_CACHE_DIR") or None,
+            source_dir=os.getenv("NF_LOTO_SOURCE_DIR") or None,
+        )
+
+    # ------------------------------------------------------------------
+    # キャッシュ
+    # ------------------------------------------------------------------
+    def _cache_paths(self, url: str) -> tuple[Path, Path]:
+        assert self.cache_dir is not None
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{key}.body", self.cache_dir / f"{key}.json"
+
+    def _read_cache(self, url: str) -> Optional[tuple[bytes, Dict[str, str]]]:
+        if self.cache_dir is None:
+            return None
+        body_path, meta_path = self._cache_paths(url)
+        if not body_path.exists() or not meta_path.exists():
+            return None
+        try:
+            return body_path.read_bytes(), json.loads(meta_path.read_text(encoding="utf-8"))
+        except Exception:
+            logger.warning("Broken HTTP cache entry for %s; refetching.", url)
+            return None
+
+    def _write_cache(self, url: str, content: bytes, meta: Dict[str, str]) -> None:
+        if self.cache_dir is None:
+            return
+        body_path, meta_path = self._cache_paths(url)
+        for path, data in ((body_path, content), (meta_path, json.dumps(meta).encode("utf-8"))):
+            tmp = path.with_suffix(f"{path.suffix}.{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+
+    # ------------------------------------------------------------------
+    # 取得
+    # ------------------------------------------------------------------
+    def _local_path(self, url: str) -> Path:
+        assert self.source_dir is not None
+        name = source_name(url)
+        for candidate in (self.source_dir / f"{name}.csv", self.source_dir / name):
+            if candidate.is_file():
+                return candidate
+        raise FileNotFoundError(f"No local source for {url} in {self.source_dir}")
+
+    def fetch(self, url: str) -> FetchedSource:
+        """1 件取得する. キャッシュがあれば条件付き GET で再検証する."""
+        if self.source_dir is not None:
+            content = self._local_path(url).read_bytes()
+            return FetchedSource(url, content, detect_encoding(content), "local")
+
+        cached = self._read_cache(url)
+        request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+        if cached is not None:
+            meta = cached[1]
+            if meta.get("etag"):
+                request.add_header("If-None-Match", meta["etag"])
+            if meta.get("last_modified"):
+                request.add_header("If-Modified-Since", meta["last_modified"])
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                content = response.read()
+                headers = response.headers
+        except urllib.error.HTTPError as exc:
+            if exc.code == 304 and cached is not None:
+                logger.info("Source not modified: %s", url)
+                return FetchedSource(url, cached[0], cached[1].get("encoding") or detect_encoding(cached[0]), "cache")
+            raise
+
+        encoding = detect_encoding(content)
+        self._write_cache(
+            url,
+            content,
+            {
+                "url": url,
+                "etag": headers.get("ETag") or "",
+                "last_modified": headers.get("Last-Modified") or "",
+                "encoding": encoding,
+            },
+        )
+        return FetchedSource(url, content, encoding, "network")
+
+    def fetch_all(self, urls: Sequence[str]) -> List[FetchedSource]:
+        """全 URL を並列に取得し、入力と同じ順で返す."""
+        urls = list(urls)
+        if len(urls) <= 1:
+            return [self.fetch(u) for u in urls]
+        with ThreadPoolExecutor(max_workers=self.max_workers or len(urls)) as pool:
+            return list(pool.map(self.fetch, urls))
@@ -2,7 +2,8 @@
 
 This is intentionally conservative: it only uses plain psycopg2 and the
 existing DB_CONFIG dictionary so that it can run in the same environments
-as the existing nf_model_runs logger.
+as the existing nf_model_runs logger. Connections are borrowed from the
+shared pool in ``nf_loto_platform.db.connection_pool``.
 """
 
 from __future__ import annotations
@@ -12,9 +13,11 @@ import json
 from dataclasses import dataclass
 from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
 
+import numpy as np
 import psycopg2
 from psycopg2.extras import execute_values
 
+from nf_loto_platform.db import connection_pool
 from nf_loto_platform.db.db_config import DB_CONFIG
 from nf_loto_platform.db_metadata.ts_research_schema import (
     TS_RESEARCH_SCHEMA,
@@ -62,7 +65,8 @@ class TSResearchStore:
         self._dsn = dsn or DB_CONFIG
 
     def _conn(self):
-        return psycopg2.connect(**self._dsn)
+        # Borrow from the process-wide pool; leaving the ``with`` block returns it.
+        return connection_pool.get_connection(self._dsn)
 
     # ------------------------------------------------------------------
     # Schema management
@@ -232,19 +236,112 @@ class TSResearchStore:
         metric_value: float,
         split: str = "val",
         step: Optional[int] = None,
+        unique_id: Optional[str] = None,
     ) -> None:
         with self._conn() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     f"""
                     INSERT INTO {TS_RESEARCH_SCHEMA}.model_metrics
-                    (trial_id, metric_name, metric_value, split, step)
-                    VALUES (%s, %s, %s, %s, %s)
+                    (trial_id, metric_name, metric_value, split, step, unique_id)
+                    VALUES (%s, %s, %s, %s, %s, %s)
                     """,
-                    (trial_id, metric_name, float(metric_value), split, step),
+                    (trial_id, metric_name, float(metric_value), split, step, unique_id),
                 )
             conn.commit()
 
+    def bulk_insert_model_metrics(
+        self,
+        trial_id: int,
+        metric_rows: Iterable[Sequence[Any]],
+    ) -> int:
+        """Insert ``(metric_name, metric_value, split, step[, unique_id])`` rows in one statement.
+
+        ``unique_id`` is optional (``NULL`` = aggregated over all series).
+        Returns the number of rows written.
+        """
+        rows = []
+        for row in metric_rows:
+            name, value, split, step = row[:4]
+            unique_id = row[4] if len(row) > 4 else None
+            rows.append((
+                trial_id,
+                name,
+                float(value),
+                split,
+                None if step is None else int(step),
+                None if unique_id is None else str(unique_id),
+            ))
+        if not rows:
+            return 0
+
+        with self._conn() as conn:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    f"""
+                    INSERT INTO {TS_RESEARCH_SCHEMA}.model_metrics
+                    (trial_id, metric_name, metric_value, split, step, unique_id)
+                    VALUES %s
+                    """,
+                    rows,
+                )
+            conn.commit()
+        return len(rows)
+
+    def insert_evaluation(self, trial_id: int, evaluation: Any, split: str = "val") -> int:
+        """Write an ``ml_analysis.evaluation.EvaluationResult`` (global, per-step and per-series values).
+
+        Per-step rows carry ``step`` and per-series rows carry ``unique_id``
+        (see ``EvaluationResult.metric_rows``).
+        """
+        return self.bulk_insert_model_metrics(trial_id, evaluation.metric_rows(split=split))
+
+    def insert_backtest_windows(
+        self,
+        trial_id: int,
+        windows: Iterable[Mapping[str, Any]],
+    ) -> int:
+        """Store one row per cross-validation cutoff (see ``run_loto_cross_validation``).
+
+        Each mapping provides ``window``, ``cutoff``, ``horizon``, ``step_size``,
+        ``refit``, ``n_train_rows`` and a ``metrics`` dict. Non-finite metric
+        values are stored as JSON ``null``.
+        """
+        rows = [
+            (
+                trial_id,
+                int(w["window"]),
+                w["cutoff"],
+                int(w["horizon"]),
+                int(w["step_size"]),
+                bool(w["refit"]),
+                int(w["n_train_rows"]),
+                json.dumps(
+                    {k: (float(v) if v is not None and np.isfinite(v) else None) for k, v in w["metrics"].items()}
+                ),
+            )
+            for w in windows
+        ]
+        if not rows:
+            return 0
+
+        with self._conn() as conn:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    f"""
+                    INSERT INTO {TS_RESEARCH_SCHEMA}.backtest_windows
+                    (trial_id, window_index, cutoff, horizon, step_size,
+                     refit, n_train_rows, metrics)
+                    VALUES %s
+                    """,
+                    rows,
+                    template="(%s, %s, %s, %s, %s, %s, %s, %s::jsonb)",
+                )
+            conn.commit()
+        return len(rows)
+
     def bulk_insert_forecasts(
         self,
         trial_id: int,
@@ -264,6 +361,38 @@ class TSResearchStore:
                     r.get("upper_95"),
                 ]
             )
+        self._insert_forecast_rows(rows)
+
+    def insert_forecast_result(self, trial_id: int, result: Any) -> int:
+        """Write a columnar ``tsfm.base.ForecastResult`` without building a DataFrame.
+
+        The 80%/95% bounds are read from the ``lo-80``/``hi-80``/``lo-95``/``hi-95``
+        quantile matrices when present. Returns the number of rows written.
+        """
+        n_rows = result.n_series * result.horizon
+        if n_rows == 0:
+            return 0
+
+        def _column(suffix: str) -> List[Any]:
+            values = result.quantiles.get(suffix)
+            return [None] * n_rows if values is None else values.ravel().tolist()
+
+        rows = list(
+            zip(
+                [trial_id] * n_rows,
+                result.dates().ravel().astype("datetime64[us]").tolist(),
+                np.repeat(result.ids, result.horizon).astype(str).tolist(),
+                result.point.ravel().tolist(),
+                _column("lo-80"),
+                _column("hi-80"),
+                _column("lo-95"),
+                _column("hi-95"),
+            )
+        )
+        self._insert_forecast_rows(rows)
+        return n_rows
+
+    def _insert_forecast_rows(self, rows: Sequence[Sequence[Any]]) -> None:
         if not rows:
             return
 
@@ -390,9 +519,31 @@ class TSResearchStore:
 
         This helper is intentionally simple and conservative:
         - It only exposes the raw columns from ``model_metrics`` joined with ``trials``.
+        - Only aggregated rows (``step IS NULL AND unique_id IS NULL``) are returned,
+          one per trial, metric and split; use ``get_metric_breakdown_for_experiment``
+          for per-step / per-series values.
         - It returns a list of dict rows so that callers (including LLM agents) can
           decide how深く解析するかを後段で制御できるようにしている。
         """
+        return self._query_metrics(
+            experiment_id, "mm.step IS NULL AND mm.unique_id IS NULL", ()
+        )
+
+    def get_metric_breakdown_for_experiment(
+        self,
+        experiment_id: int,
+        split: str = "val",
+    ) -> Sequence[Mapping[str, Any]]:
+        """Fetch per-step and per-series metric rows of one split for an experiment."""
+        return self._query_metrics(
+            experiment_id,
+            "mm.split = %s AND (mm.step IS NOT NULL OR mm.unique_id IS NOT NULL)",
+            (split,),
+        )
+
+    def _query_metrics(
+        self, experiment_id: int, condition: str, params: Sequence[Any]
+    ) -> list[dict[str, Any]]:
         query = f"""
             SELECT
                 mm.trial_id,
@@ -401,17 +552,18 @@ class TSResearchStore:
                 mm.metric_name,
                 mm.metric_value,
                 mm.split,
-                mm.step
+                mm.step,
+                mm.unique_id
             FROM {TS_RESEARCH_SCHEMA}.model_metrics AS mm
             JOIN {TS_RESEARCH_SCHEMA}.trials AS t
               ON mm.trial_id = t.id
-            WHERE t.experiment_id = %s
-            ORDER BY mm.metric_name, mm.split, mm.step NULLS FIRST, mm.trial_id
+            WHERE t.experiment_id = %s AND {condition}
+            ORDER BY mm.metric_name, mm.split, mm.step NULLS FIRST, mm.unique_id NULLS FIRST, mm.trial_id
         """
         rows: list[dict[str, Any]] = []
         with self._conn() as conn:
             with conn.cursor() as cur:
-                cur.execute(query, (experiment_id,))
+                cur.execute(query, (experiment_id, *params))
                 colnames = [c.name for c in cur.description]  # type: ignore[attr-defined]
                 for rec in cur.fetchall():
                     row = {name: value for name, value in zip(colnames, rec)}
@@ -93,6 +93,19 @@ CREATE INDEX IF NOT EXISTS idx_nf_model_runs_agent_metadata ON nf_model_runs USI
 CREATE INDEX IF NOT EXISTS idx_nf_model_runs_uncertainty_metrics ON nf_model_runs USING gin (uncertainty_metrics);
 """
 
+DDL_FEATURE_STORE_EXTENSION = """
+-- nf_feature_sets as the registry of materialized feature sets (features.store)
+
+ALTER TABLE nf_feature_sets
+ADD COLUMN IF NOT EXISTS feature_names TEXT[],
+ADD COLUMN IF NOT EXISTS spec_hash TEXT;
+
+COMMENT ON COLUMN nf_feature_sets.feature_names IS 'マテリアライズ対象の特徴量名 (hist_*/futr_*) の一覧';
+COMMENT ON COLUMN nf_feature_sets.spec_hash IS '特徴量名リストの SHA1。同名でも定義が変われば別の特徴量セットとして登録する';
+
+CREATE INDEX IF NOT EXISTS idx_nf_feature_sets_name_hash ON nf_feature_sets (name, spec_hash);
+"""
+
 
 def get_extend_metadata_ddl() -> str:
     """Return the SQL DDL used to create all metadata tables."""
@@ -101,4 +114,9 @@ def get_extend_metadata_ddl() -> str:
 
 def get_agent_rag_extension_ddl() -> str:
     """Return the SQL DDL for Agent/RAG extensions."""
-    return DDL_AGENT_RAG_EXTENSION
\ No newline at end of file
+    return DDL_AGENT_RAG_EXTENSION
+
+
+def get_feature_store_extension_ddl() -> str:
+    """Return the SQL DDL that turns nf_feature_sets into the feature store registry."""
+    return DDL_FEATURE_STORE_EXTENSION
@@ -56,7 +56,21 @@ CREATE TABLE IF NOT EXISTS ts_research.model_metrics (
     metric_name  TEXT NOT NULL,
     metric_value DOUBLE PRECISION NOT NULL,
     split        TEXT NOT NULL,
-    step         INT
+    step         INT,
+    unique_id    TEXT
+);
+
+CREATE TABLE IF NOT EXISTS ts_research.backtest_windows (
+    id           SERIAL PRIMARY KEY,
+    trial_id     INT NOT NULL REFERENCES ts_research.trials(id),
+    window_index INT NOT NULL,
+    cutoff       TIMESTAMPTZ NOT NULL,
+    horizon      INT NOT NULL,
+    step_size    INT NOT NULL,
+    refit        BOOLEAN NOT NULL,
+    n_train_rows INT NOT NULL,
+    metrics      JSONB NOT NULL,
+    created_at   TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
 CREATE TABLE IF NOT EXISTS ts_research.forecasts (
@@ -106,6 +120,17 @@ CREATE TABLE IF NOT EXISTS ts_research.anomalies (
 """
 
 
+# Idempotent migrations for databases created before a column was added.
+TS_RESEARCH_MIGRATIONS = """
+-- model_metrics.unique_id: per-series breakdown rows (NULL = aggregated over all series)
+ALTER TABLE ts_research.model_metrics ADD COLUMN IF NOT EXISTS unique_id TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_model_metrics_trial_split
+    ON ts_research.model_metrics (trial_id, split)
+    WHERE step IS NULL AND unique_id IS NULL;
+"""
+
+
 def get_ts_research_ddl() -> str:
     """Return the SQL DDL for creating the ts_research schema and tables."""
-    return TS_RESEARCH_DDL
+    return TS_RESEARCH_DDL + TS_RESEARCH_MIGRATIONS
@@ -2,6 +2,10 @@
 
 本番ではより多くの特徴量をここに集約していく想定だが、
 テストしやすい最小機能としてラグ特徴量付与のユーティリティを提供する。
+
+``config/features.yaml`` に基づく一括生成は :mod:`nf_loto_platform.features.generator`
+(:class:`FeatureGenerator` / :func:`generate_features`) を使い、
+新しい行だけを計算して保存する場合は :mod:`nf_loto_platform.features.store` を使う。
 """
 
 from __future__ import annotations
@@ -47,4 +51,20 @@ def add_lag_feature(
     return df
 
 
-__all__ = ["add_lag_feature"]
+from nf_loto_platform.features.generator import (  # noqa: E402
+    FeatureGenerator,
+    expand_preset,
+    generate_features,
+    parse_feature_name,
+)
+from nf_loto_platform.features.store import FeatureStore, load_panel_with_features  # noqa: E402
+
+__all__ = [
+    "add_lag_feature",
+    "FeatureGenerator",
+    "FeatureStore",
+    "expand_preset",
+    "generate_features",
+    "load_panel_with_features",
+    "parse_feature_name",
+]
@@ -0,0 +1,341 @@
+"""設定駆動のベクトル化特徴量生成エンジン.
+
+``config/features.yaml`` の特徴量名 (``hist_y_mean_w7`` など) とプリセット
+(``light`` / ``full``) から、ラグ・移動統計・カレンダー・系列統計の列を生成する。
+
+- パネルは :class:`~nf_loto_platform.ml.panel.ColumnarPanel` で 1 回だけ
+  ``(unique_id, ds)`` 順に並べ、系列境界はオフセット演算で扱う
+- ラグはインデックスのずらし、移動平均・標準偏差は累積和の差分、
+  移動最小・最大は ``sliding_window_view`` (stride trick) で計算する
+- 結果は事前確保した float32 のブロックに書き込み、DataFrame は最後に 1 回だけ組み立てる
+
+列名の接頭辞 (``hist_`` / ``futr_`` / ``stat_``) はそのまま出力されるため、
+``automodel_builder.split_exog_columns`` で外生変数として振り分けられる。
+
+対応する特徴量名:
+
+- ``hist_{col}_lag{k}``: k 期前の値
+- ``hist_{col}_{mean|std|min|max}_w{w}``: 現在時点を含む直近 w 点の統計 (``min_periods=1``)
+- ``futr_{time_col}_{year|quarter|month|week|day|dow|dayofyear|is_weekend|is_month_start|is_month_end}``
+- ``stat_{col}_{mean|std|min|max}``: 系列全体の統計 (各行に同じ値)
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from nf_loto_platform.ml.panel import ColumnarPanel
+
+ROLLING_STATS = ("mean", "std", "min", "max")
+STATIC_STATS = ("mean", "std", "min", "max")
+CALENDAR_PARTS = (
+    "year",
+    "quarter",
+    "month",
+    "week",
+    "day",
+    "dow",
+    "dayofyear",
+    "is_weekend",
+    "is_month_start",
+    "is_month_end",
+)
+#: プリセットで展開する移動窓の候補 (max_windows 以下のものを使う)
+PRESET_WINDOWS = (7, 14, 30, 60, 90, 180, 365)
+
+_LAG_RE = re.compile(r"^hist_(?P<col>.+)_lag(?P<param>\d+)$")
+_ROLLING_RE = re.compile(rf"^hist_(?P<col>.+)_(?P<stat>{'|'.join(ROLLING_STATS)})_w(?P<param>\d+)$")
+_CALENDAR_RE = re.compile(rf"^futr_(?P<col>.+)_(?P<stat>{'|'.join(CALENDAR_PARTS)})$")
+_STATIC_RE = re.compile(rf"^stat_(?P<col>.+)_(?P<stat>{'|'.join(STATIC_STATS)})$")
+
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    """特徴量名を解析した結果."""
+
+    name: str
+    kind: str  # "lag" / "rolling" / "calendar" / "static"
+    column: str
+    stat: Optional[str] = None
+    param: Optional[int] = None
+
+
+def parse_feature_name(name: str) -> FeatureSpec:
+    """``hist_y_mean_w7`` のような特徴量名を解析する. 解釈できない名前は ValueError."""
+    m = _LAG_RE.match(name)
+    if m:
+        return FeatureSpec(name, "lag", m["col"], param=int(m["param"]))
+    m = _ROLLING_RE.match(name)
+    if m:
+        return FeatureSpec(name, "rolling", m["col"], stat=m["stat"], param=int(m["param"]))
+    m = _CALENDAR_RE.match(name)
+    if m:
+        return FeatureSpec(name, "calendar", m["col"], stat=m["stat"])
+    m = _STATIC_RE.match(name)
+    if m:
+        return FeatureSpec(name, "static", m["col"], stat=m["stat"])
+    raise ValueError(f"Unsupported feature name: {name!r}")
+
+
+def expand_preset(
+    max_lags: int,
+    max_windows: int,
+    target_col: str = "y",
+    windows: Sequence[int] = PRESET_WINDOWS,
+    stats: Sequence[str] = ROLLING_STATS,
+) -> List[str]:
+    """プリセット (最大ラグ数・最大窓幅) を特徴量名のリストに展開する."""
+    names = [f"hist_{target_col}_lag{k}" for k in range(1, int(max_lags) + 1)]
+    for w in windows:
+        if w <= max_windows:
+            names.extend(f"hist_{target_col}_{stat}_w{w}" for stat in stats)
+    return names
+
+
+# ---------------------------------------------------------------------------
+# カーネル (連結配列 + 系列先頭位置で系列境界を扱う)
+# ---------------------------------------------------------------------------
+
+
+def _lag(values: np.ndarray, row_starts: np.ndarray, k: int) -> np.ndarray:
+    src = np.arange(len(values)) - k
+    out = np.full(len(values), np.nan)
+    ok = src >= row_starts
+    out[ok] = values[src[ok]]
+    return out
+
+
+class _CumulativeWindows:
+    """系列ごとに中心化した累積和から、任意の窓幅の移動平均・標準偏差を O(n) で求める."""
+
+    def __init__(self, values: np.ndarray, codes: np.ndarray, row_starts: np.ndarray, n_series: int) -> None:
+        finite = np.isfinite(values)
+        # 桁落ちを抑えるため系列平均で中心化してから累積する (分散は平行移動で不変)
+        counts = np.bincount(codes, weights=finite, minlength=n_series)
+        sums = np.bincount(codes, weights=np.where(finite, values, 0.0), minlength=n_series)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self._offset = np.where(counts > 0, sums / np.maximum(counts, 1.0), 0.0)[codes]
+        centered = np.where(finite, values - self._offset, 0.0)
+        self._cs = np.concatenate([[0.0], np.cumsum(centered)])
+        self._cs2 = np.concatenate([[0.0], np.cumsum(centered * centered)])
+        self._cc = np.concatenate([[0.0], np.cumsum(finite)])
+        self._idx = np.arange(len(values))
+        self._row_starts = row_starts
+
+    def _window(self, w: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        lo = np.maximum(self._idx - w + 1, self._row_starts)
+        hi = self._idx + 1
+        return self._cs[hi] - self._cs[lo], self._cs2[hi] - self._cs2[lo], self._cc[hi] - self._cc[lo]
+
+    def mean(self, w: int) -> np.ndarray:
+        s, _, n = self._window(w)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(n > 0, s / n + self._offset, np.nan)
+
+    def std(self, w: int) -> np.ndarray:
+        s, s2, n = self._window(w)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            var = np.maximum(s2 - s * s / n, 0.0) / (n - 1)
+        return np.where(n > 1, np.sqrt(var), np.nan)
+
+
+def _rolling_extreme(values: np.ndarray, codes: np.ndarray, w: int, stat: str) -> np.ndarray:
+    """系列の前に w-1 個の番兵を置いた配列上で stride trick により移動 min / max を取る."""
+    fill = np.inf if stat == "min" else -np.inf
+    pad = w - 1
+    dest = np.arange(len(values)) + (codes + 1) * pad
+    n_series = int(codes.max()) + 1 if len(codes) else 0
+    padded = np.full(len(values) + n_series * pad, fill)
+    padded[dest] = np.where(np.isnan(values), fill, values)
+    windows = sliding_window_view(padded, w)
+    reduced = windows.min(axis=1) if stat == "min" else windows.max(axis=1)
+    out = reduced[dest - pad]
+    out[np.isinf(out)] = np.nan  # 窓内に有効値が無い
+    return out
+
+
+def _calendar(ds: pd.DatetimeIndex, part: str) -> np.ndarray:
+    if part == "dow":
+        values = ds.dayofweek
+    elif part == "week":
+        values = ds.isocalendar().week.to_numpy()
+    elif part == "is_weekend":
+        values = ds.dayofweek >= 5
+    else:
+        values = getattr(ds, part)
+    return np.asarray(values, dtype=float)
+
+
+def _static(values: np.ndarray, codes: np.ndarray, n_series: int, stat: str) -> np.ndarray:
+    finite = np.isfinite(values)
+    if stat in ("mean", "std"):
+        n = np.bincount(codes, weights=finite, minlength=n_series)
+        s = np.bincount(codes, weights=np.where(finite, values, 0.0), minlength=n_series)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = s / n
+            if stat == "mean":
+                return mean[codes]
+            dev = np.where(finite, values - mean[codes], 0.0)
+            var = np.bincount(codes, weights=dev * dev, minlength=n_series) / (n - 1)
+        return np.where(n > 1, np.sqrt(var), np.nan)[codes]
+    fill = np.inf if stat == "min" else -np.inf
+    out = np.full(n_series, fill)
+    ufunc = np.minimum if stat == "min" else np.maximum
+    ufunc.at(out, codes[finite], values[finite])
+    out[np.isinf(out)] = np.nan
+    return out[codes]
+
+
+# ---------------------------------------------------------------------------
+# エンジン
+# ---------------------------------------------------------------------------
+
+
+class FeatureGenerator:
+    """特徴量名のリストからパネルの特徴量列を 1 パスで生成する."""
+
+    def __init__(
+        self,
+        features: Sequence[str],
+        id_col: str = "unique_id",
+        time_col: str = "ds",
+        target_col: str = "y",
+        dtype: Any = np.float32,
+    ) -> None:
+        # 重複は最初の出現だけを残す (宣言済みの列とプリセットが重なる場合)
+        self.specs = [parse_feature_name(name) for name in dict.fromkeys(features)]
+        self.id_col = id_col
+        self.time_col = time_col
+        self.target_col = target_col
+        self.dtype = dtype
+
+    @property
+    def feature_names(self) -> List[str]:
+        return [spec.name for spec in self.specs]
+
+    @property
+    def context_length(self) -> int:
+        """各行の hist_ 特徴量を計算するのに必要な、その行より前の行数."""
+        needed = [0]
+        for spec in self.specs:
+            if spec.kind == "lag":
+                needed.append(spec.param)
+            elif spec.kind == "rolling":
+                needed.append(spec.param - 1)
+        return max(needed)
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Optional[Mapping[str, Any]] = None,
+        preset: Optional[str] = None,
+        config_path: Optional[Path] = None,
+    ) -> "FeatureGenerator":
+        """features.yaml (既定は ``config/features.yaml``) の宣言とプリセットから生成器を作る."""
+        if config is None:
+            config = load_feature_config(config_path)
+        dataset = config.get("dataset", {}) or {}
+        target_col = dataset.get("target_column", "y")
+        declared = config.get("features", {}) or {}
+        names: List[str] = []
+        for group in ("hist", "futr", "stat"):
+            names.extend(declared.get(group, []) or [])
+        if preset is not None:
+            presets = config.get("presets", {}) or {}
+            if preset not in presets:
+                raise ValueError(f"Unknown feature preset: {preset!r}. Available: {sorted(presets)}")
+            spec = presets[preset] or {}
+            names.extend(expand_preset(spec.get("max_lags", 0), spec.get("max_windows", 0), target_col=target_col))
+        return cls(
+            names,
+            id_col=dataset.get("id_column", "unique_id"),
+            time_col=dataset.get("time_column", "ds"),
+            target_col=target_col,
+        )
+
+    def compute(self, panel: ColumnarPanel) -> np.ndarray:
+        """パネル (全行) の特徴量を ``(n_rows, n_features)`` の float32 ブロックで返す."""
+        n_rows = len(panel.frame)
+        block = np.empty((len(self.specs), n_rows), dtype=self.dtype)
+        codes = np.repeat(np.arange(panel.n_series), panel.lengths)
+        row_starts = np.repeat(panel.starts, panel.lengths)
+        columns: Dict[str, np.ndarray] = {}
+        cumulative: Dict[str, _CumulativeWindows] = {}
+        ds_index: Optional[pd.DatetimeIndex] = None
+
+        def _values(col: str) -> np.ndarray:
+            if col not in columns:
+                if col == panel.target_col:
+                    columns[col] = panel.y
+                else:
+                    columns[col] = pd.to_numeric(panel.frame[col], errors="coerce").to_numpy(dtype=float)
+            return columns[col]
+
+        for j, spec in enumerate(self.specs):
+            if spec.kind == "lag":
+                block[j] = _lag(_values(spec.column), row_starts, spec.param)
+            elif spec.kind == "rolling":
+                if spec.stat in ("mean", "std"):
+                    if spec.column not in cumulative:
+                        cumulative[spec.column] = _CumulativeWindows(
+                            _values(spec.column), codes, row_starts, panel.n_series
+                        )
+                    windows = cumulative[spec.column]
+                    block[j] = windows.mean(spec.param) if spec.stat == "mean" else windows.std(spec.param)
+                else:
+                    block[j] = _rolling_extreme(_values(spec.column), codes, spec.param, spec.stat)
+            elif spec.kind == "calendar":
+                if spec.column != panel.ts_col:
+                    raise ValueError(f"Calendar feature {spec.name!r} must refer to the time column {panel.ts_col!r}")
+                if ds_index is None:
+                    ds_index = pd.DatetimeIndex(panel.ds)
+                block[j] = _calendar(ds_index, spec.stat)
+            else:
+                block[j] = _static(_values(spec.column), codes, panel.n_series, spec.stat)
+        return block.T
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """``(id, time)`` 順に並べた df に特徴量列を追加した DataFrame を返す (入力は変更しない)."""
+        panel = ColumnarPanel.from_frame(df, id_col=self.id_col, ts_col=self.time_col, target_col=self.target_col)
+        features = pd.DataFrame(self.compute(panel), columns=self.feature_names, copy=False)
+        base = panel.frame.drop(columns=[c for c in self.feature_names if c in panel.frame.columns])
+        return pd.concat([base, features], axis=1)
+
+
+def load_feature_config(path: Optional[Path] = None) -> Dict[str, Any]:
+    """features.yaml を読み込む (既定は ``config/features.yaml``)."""
+    from nf_loto_platform.core.settings import get_config_dir, load_yaml
+
+    return load_yaml(Path(path) if path is not None else get_config_dir() / "features.yaml")
+
+
+def generate_features(
+    df: pd.DataFrame,
+    features: Optional[Sequence[str]] = None,
+    preset: Optional[str] = None,
+    config_path: Optional[Path] = None,
+) -> pd.DataFrame:
+    """特徴量を付与したパネルを返す.
+
+    features を渡した場合はそれだけを、省略した場合は features.yaml の宣言
+    (+ preset 指定時はそのプリセット) を生成する。
+    """
+    if features is not None:
+        config = load_feature_config(config_path) if config_path is not None else {}
+        dataset = config.get("dataset", {}) or {}
+        generator = FeatureGenerator(
+            features,
+            id_col=dataset.get("id_column", "unique_id"),
+            time_col=dataset.get("time_column", "ds"),
+            target_col=dataset.get("target_column", "y"),
+        )
+    else:
+        generator = FeatureGenerator.from_config(preset=preset, config_path=config_path)
+    return generator.transform(df)
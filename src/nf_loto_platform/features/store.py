@@ -0,0 +1,409 @@
+"""特徴量のインクリメンタルなマテリアライズストア.
+
+:class:`~nf_loto_platform.features.generator.FeatureGenerator` は毎回全履歴の特徴量を
+計算し直すため、新しい抽選が 1 回分増えただけでも全期間を再計算していた。
+ここでは ``hist_`` / ``futr_`` 特徴量を系列ごとの Parquet パーティションに保存し、
+次回は新しい行の分だけを計算して追記する。
+
+レイアウト::
+
+    <root>/<table>/<loto>/<feature_set>-<spec_hash>/
+        _state.json          # 系列ごとの最終 ds・行数・窓の延長に必要な末尾の値
+        <unique_id>.parquet  # unique_id, ds, 特徴量列 (float32)
+
+- 末尾の値 (``context_length`` 行) を状態として持つため、新しい行だけを渡しても
+  ラグ・移動統計を全履歴で計算した場合と同じ値で延長できる
+- 渡すパネルは全履歴でも、保存済み履歴の末尾と重なる直近の行 + 新しい行だけでもよい
+- 全履歴を渡した系列で既存部分が状態と食い違う場合 (過去行の修正など) は全期間を再計算する。
+  直近の行だけを渡した系列が食い違う場合は、保存済みの履歴を消さないよう ValueError にする
+- ``stat_`` 特徴量は系列全体に依存するため保存せず、配信時に ``as_of`` 以前の行だけから計算する
+  (どの列も ``as_of`` より後のデータを参照しない)
+- 特徴量セットは ``nf_feature_sets`` に ``(name, spec_hash)`` で登録する
+  (:class:`FeatureSetRegistry`)
+
+有効化は環境変数 ``NF_FEATURE_STORE_DIR`` で行う (:func:`get_default_feature_store`)。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from nf_loto_platform.features.generator import FeatureGenerator
+from nf_loto_platform.ml.panel import ColumnarPanel
+
+try:  # pragma: no cover - import validation is environment dependent
+    import pyarrow  # noqa: F401
+    _PYARROW_AVAILABLE = True
+except Exception:  # pragma: no cover
+    _PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "_state.json"
+_NEW_FLAG = "__nf_feature_new"
+
+
+def feature_set_hash(features: Sequence[str]) -> str:
+    """特徴量名のリストから特徴量セットの定義ハッシュを計算する (順序も含む)."""
+    return hashlib.sha1(json.dumps(list(features)).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class MaterializeStats:
+    """:meth:`FeatureStore.materialize` の結果 (系列数と計算した行数)."""
+
+    appended: int = 0
+    recomputed: int = 0
+    unchanged: int = 0
+    rows_computed: int = 0
+
+
+class FeatureSetRegistry:
+    """``nf_feature_sets`` を特徴量セットのレジストリとして使う."""
+
+    def __init__(self, connection_factory: Callable[[], Any]) -> None:
+        self._connect = connection_factory
+
+    def register(self, name: str, features: Sequence[str], description: Optional[str] = None) -> int:
+        """``(name, spec_hash)`` の行を返す. 無ければ登録して ID を返す."""
+        spec_hash = feature_set_hash(features)
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT id FROM nf_feature_sets WHERE name = %s AND spec_hash = %s ORDER BY id LIMIT 1",
+                    (name, spec_hash),
+                )
+                row = cur.fetchone()
+                if row is not None:
+                    return int(row[0])
+                cur.execute(
+                    """
+                    INSERT INTO nf_feature_sets (name, description, feature_names, spec_hash)
+                    VALUES (%s, %s, %s, %s)
+                    RETURNING id
+                    """,
+                    (name, description, list(features), spec_hash),
+                )
+                return int(cur.fetchone()[0])
+
+
+def _to_json_values(values: np.ndarray) -> List[Optional[float]]:
+    return [None if not np.isfinite(v) else float(v) for v in np.asarray(values, dtype=float)]
+
+
+def _from_json_values(values: Sequence[Optional[float]]) -> np.ndarray:
+    return np.asarray([np.nan if v is None else v for v in values], dtype=float)
+
+
+class FeatureStore:
+    """``(table, loto, unique_id, feature_set)`` 単位の Parquet 特徴量ストア."""
+
+    def __init__(self, root: os.PathLike | str, registry: Optional[FeatureSetRegistry] = None) -> None:
+        self.root = Path(root)
+        self.registry = registry
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # パス・状態
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _materialized(generator: FeatureGenerator) -> FeatureGenerator:
+        names = [spec.name for spec in generator.specs if spec.kind != "static"]
+        return FeatureGenerator(
+            names,
+            id_col=generator.id_col,
+            time_col=generator.time_col,
+            target_col=generator.target_col,
+            dtype=generator.dtype,
+        )
+
+    def set_dir(self, table_name: str, loto: str, generator: FeatureGenerator, name: str = "default") -> Path:
+        spec_hash = feature_set_hash(self._materialized(generator).feature_names)
+        return self.root / quote(table_name, safe="") / quote(loto, safe="") / f"{quote(name, safe='')}-{spec_hash[:12]}"
+
+    @staticmethod
+    def _series_path(set_dir: Path, unique_id: Any) -> Path:
+        return set_dir / f"{quote(str(unique_id), safe='')}.parquet"
+
+    @staticmethod
+    def _read_state(set_dir: Path) -> Dict[str, Any]:
+        path = set_dir / STATE_FILE
+        if path.exists():
+            try:
+                return json.loads(path.read_text(encoding="utf-8"))
+            except Exception:
+                logger.warning("Broken feature store state: %s; recomputing.", path)
+        return {"series": {}}
+
+    @staticmethod
+    def _write_state(set_dir: Path, state: Dict[str, Any]) -> None:
+        path = set_dir / STATE_FILE
+        tmp = path.with_suffix(f".json.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _write_series(path: Path, df: pd.DataFrame) -> None:
+        tmp = path.with_suffix(f".parquet.{os.getpid()}.tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+
+    # ------------------------------------------------------------------
+    # マテリアライズ
+    # ------------------------------------------------------------------
+    def materialize(
+        self,
+        table_name: str,
+        loto: str,
+        panel: pd.DataFrame,
+        generator: FeatureGenerator,
+        name: str = "default",
+    ) -> MaterializeStats:
+        """パネルのうち未計算の行の特徴量を計算して保存する.
+
+        panel は全履歴でも、保存済み履歴の途中以降 (前回以降の新しい行だけを含む) でもよい。
+
+        Raises:
+            ValueError: 保存済み履歴の途中から始まるパネルの重なり部分が、保存済みの
+                末尾と一致しない場合 (全履歴を渡せば再計算される)
+        """
+        gen = self._materialized(generator)
+        set_dir = self.set_dir(table_name, loto, generator, name)
+        set_dir.mkdir(parents=True, exist_ok=True)
+        state = self._read_state(set_dir)
+        state.update({"name": name, "features": gen.feature_names})
+        if self.registry is not None and state.get("feature_set_id") is None:
+            try:
+                state["feature_set_id"] = self.registry.register(name, gen.feature_names)
+            except Exception as exc:
+                logger.warning("Failed to register feature set %s in nf_feature_sets: %s", name, exc)
+
+        context = gen.context_length
+        context_cols = sorted({spec.column for spec in gen.specs if spec.kind in ("lag", "rolling")})
+        source = ColumnarPanel.from_frame(panel, id_col=gen.id_col, ts_col=gen.time_col, target_col=gen.target_col)
+        frame = source.frame.assign(**{gen.time_col: source.ds})
+        stats = MaterializeStats()
+        parts: List[pd.DataFrame] = []
+        appended: set = set()
+
+        for uid, start, stop in zip(source.ids, source.starts, source.stops):
+            rows = frame.iloc[start:stop]
+            ds = source.ds[start:stop]
+            entry = state["series"].get(str(uid))
+            if entry is not None:
+                n_old = int(np.searchsorted(ds, np.datetime64(pd.Timestamp(entry["last_ds"])), side="right"))
+                # 保存済み履歴の先頭より後から始まるパネル (直近の行だけを渡した場合)
+                partial = n_old < entry["n_rows"] and (
+                    entry.get("first_ds") is None or ds[0] > np.datetime64(pd.Timestamp(entry["first_ds"]))
+                )
+                if (n_old == entry["n_rows"] or partial) and self._tail_matches(rows.iloc[:n_old], entry, gen, context_cols):
+                    if n_old == len(rows):
+                        stats.unchanged += 1
+                        continue
+                    parts.append(self._tail_frame(uid, entry, gen, context_cols).assign(**{_NEW_FLAG: False}))
+                    parts.append(rows.iloc[n_old:].assign(**{_NEW_FLAG: True}))
+                    appended.add(uid)
+                    continue
+                if partial:
+                    raise ValueError(
+                        f"Feature store history for {table_name}/{loto}/{uid} does not match the stored tail; "
+                        "pass the full history to recompute it"
+                    )
+                logger.info("Feature store history changed for %s/%s/%s; recomputing.", table_name, loto, uid)
+            parts.append(rows.assign(**{_NEW_FLAG: True}))
+
+        if not parts:
+            self._write_state(set_dir, state)
+            return stats
+
+        work = ColumnarPanel.from_frame(
+            pd.concat(parts, ignore_index=True), id_col=gen.id_col, ts_col=gen.time_col, target_col=gen.target_col
+        )
+        block = gen.compute(work)
+        keep = work.frame[_NEW_FLAG].to_numpy(dtype=bool)
+        features = pd.DataFrame(block[keep], columns=gen.feature_names, copy=False)
+        features.insert(0, gen.time_col, work.ds[keep])
+        features.insert(0, gen.id_col, work.frame[gen.id_col].to_numpy()[keep])
+        stats.rows_computed = int(keep.sum())
+
+        # 保存する行は work と同じ (unique_id, ds) 順なので、系列ごとに連続している
+        kept_counts = np.bincount(work.series_codes()[keep], minlength=work.n_series)
+        kept_stops = np.cumsum(kept_counts)
+        kept_starts = kept_stops - kept_counts
+        for uid, start, stop, k_start, k_stop in zip(work.ids, work.starts, work.stops, kept_starts, kept_stops):
+            new_rows = features.iloc[k_start:k_stop]
+            path = self._series_path(set_dir, uid)
+            if uid in appended and path.exists():
+                new_rows = pd.concat([pd.read_parquet(path), new_rows], ignore_index=True)
+                stats.appended += 1
+            else:
+                stats.recomputed += 1
+            self._write_series(path, new_rows.reset_index(drop=True))
+
+            tail_start = max(int(start), int(stop) - context)
+            # 追記した系列の work は保存済みの末尾から始まるため、先頭日は状態から引き継ぐ
+            previous = state["series"].get(str(uid), {}) if uid in appended else {}
+            state["series"][str(uid)] = {
+                "first_ds": previous.get("first_ds") or pd.Timestamp(new_rows[gen.time_col].iloc[0]).isoformat(),
+                "last_ds": pd.Timestamp(work.ds[stop - 1]).isoformat(),
+                "n_rows": int(len(new_rows)),
+                "tail_ds": [pd.Timestamp(v).isoformat() for v in work.ds[tail_start:stop]],
+                "tail": {
+                    col: _to_json_values(pd.to_numeric(work.frame[col].iloc[tail_start:stop], errors="coerce"))
+                    for col in context_cols
+                },
+            }
+        self._write_state(set_dir, state)
+        return stats
+
+    @staticmethod
+    def _tail_frame(uid: Any, entry: Dict[str, Any], gen: FeatureGenerator, context_cols: Sequence[str]) -> pd.DataFrame:
+        data: Dict[str, Any] = {gen.id_col: uid, gen.time_col: pd.to_datetime(entry["tail_ds"])}
+        for col in context_cols:
+            data[col] = _from_json_values(entry["tail"].get(col, []))
+        if gen.target_col not in data:
+            data[gen.target_col] = np.nan
+        return pd.DataFrame(data)
+
+    @staticmethod
+    def _tail_matches(old: pd.DataFrame, entry: Dict[str, Any], gen: FeatureGenerator, context_cols: Sequence[str]) -> bool:
+        # 渡された既存部分が保存済みの末尾より短い場合は、その長さ分だけ比較する
+        n_tail = min(len(entry["tail_ds"]), len(old))
+        if n_tail == 0:
+            return True
+        tail = old.iloc[len(old) - n_tail :]
+        stored_ds = pd.to_datetime(entry["tail_ds"][len(entry["tail_ds"]) - n_tail :]).to_numpy()
+        if not np.array_equal(tail[gen.time_col].to_numpy(), stored_ds):
+            return False
+        for col in context_cols:
+            current = pd.to_numeric(tail[col], errors="coerce").to_numpy(dtype=float)
+            stored = _from_json_values(entry["tail"].get(col, []))
+            if not np.array_equal(current, stored[len(stored) - n_tail :], equal_nan=True):
+                return False
+        return True
+
+    # ------------------------------------------------------------------
+    # 配信
+    # ------------------------------------------------------------------
+    def load(
+        self,
+        table_name: str,
+        loto: str,
+        unique_ids: Sequence[Any],
+        generator: FeatureGenerator,
+        name: str = "default",
+        as_of: Optional[Any] = None,
+    ) -> pd.DataFrame:
+        """保存済みの ``hist_`` / ``futr_`` 特徴量を ``(unique_id, ds)`` 順で返す (``ds <= as_of``)."""
+        gen = self._materialized(generator)
+        set_dir = self.set_dir(table_name, loto, generator, name)
+        frames = []
+        for uid in unique_ids:
+            path = self._series_path(set_dir, uid)
+            if path.exists():
+                frames.append(pd.read_parquet(path))
+        if not frames:
+            return pd.DataFrame(columns=[gen.id_col, gen.time_col, *gen.feature_names])
+        out = pd.concat(frames, ignore_index=True)
+        if as_of is not None:
+            out = out[out[gen.time_col] <= pd.Timestamp(as_of)]
+        return out.sort_values([gen.id_col, gen.time_col], kind="stable").reset_index(drop=True)
+
+    def features_for(
+        self,
+        table_name: str,
+        loto: str,
+        panel: pd.DataFrame,
+        generator: FeatureGenerator,
+        name: str = "default",
+        as_of: Optional[Any] = None,
+    ) -> pd.DataFrame:
+        """パネルの未計算部分をマテリアライズし、``as_of`` 時点の特徴量付きパネルを返す.
+
+        出力は ``generator.transform(panel[ds <= as_of])`` と同じ列・行順になる。
+        """
+        self.materialize(table_name, loto, panel, generator, name)
+        base = ColumnarPanel.from_frame(
+            panel, id_col=generator.id_col, ts_col=generator.time_col, target_col=generator.target_col
+        )
+        frame = base.frame
+        if as_of is not None:
+            frame = frame[base.ds <= np.datetime64(pd.Timestamp(as_of))].reset_index(drop=True)
+        frame = frame.drop(columns=[c for c in generator.feature_names if c in frame.columns])
+
+        stored = self.load(table_name, loto, list(base.ids), generator, name, as_of=as_of)
+        keys = [generator.id_col, generator.time_col]
+        stored[generator.time_col] = stored[generator.time_col].astype("datetime64[ns]")
+        rows = pd.MultiIndex.from_arrays(
+            [frame[generator.id_col], pd.to_datetime(frame[generator.time_col]).astype("datetime64[ns]")]
+        )
+        materialized = stored.set_index(keys).reindex(rows).reset_index(drop=True)
+        out = pd.concat([frame, materialized], axis=1)
+
+        static = [spec.name for spec in generator.specs if spec.kind == "static"]
+        if static:
+            stat_gen = FeatureGenerator(
+                static, id_col=generator.id_col, time_col=generator.time_col, target_col=generator.target_col
+            )
+            served = ColumnarPanel.from_frame(
+                frame, id_col=generator.id_col, ts_col=generator.time_col, target_col=generator.target_col
+            )
+            out = pd.concat([out, pd.DataFrame(stat_gen.compute(served), columns=static, copy=False)], axis=1)
+        return out[[*frame.columns, *generator.feature_names]]
+
+
+_DEFAULT_STORES: Dict[str, FeatureStore] = {}
+
+
+def get_default_feature_store(registry: Optional[FeatureSetRegistry] = None) -> Optional[FeatureStore]:
+    """``NF_FEATURE_STORE_DIR`` で設定されたストアを返す (未設定・pyarrow 不在なら None)."""
+    root = os.getenv("NF_FEATURE_STORE_DIR")
+    if not root or not _PYARROW_AVAILABLE:
+        return None
+    store = _DEFAULT_STORES.get(root)
+    if store is None:
+        store = FeatureStore(root, registry=registry)
+        _DEFAULT_STORES[root] = store
+    elif registry is not None and store.registry is None:
+        store.registry = registry
+    return store
+
+
+def load_panel_with_features(
+    table_name: str,
+    loto: str,
+    unique_ids: Sequence[str],
+    features: Optional[Sequence[str]] = None,
+    preset: Optional[str] = None,
+    feature_set: str = "default",
+    as_of: Optional[Any] = None,
+) -> pd.DataFrame:
+    """``load_panel_by_loto`` のパネルに特徴量を付与して返す.
+
+    ``NF_FEATURE_STORE_DIR`` が設定されていればストア経由で新しい行だけを計算し、
+    未設定なら毎回全期間を計算する。どちらも ``ds <= as_of`` の行だけを使う。
+    """
+    from nf_loto_platform.db import loto_repository
+
+    panel = loto_repository.load_panel_by_loto(table_name, loto, unique_ids)
+    if features is not None:
+        generator = FeatureGenerator(features)
+    else:
+        generator = FeatureGenerator.from_config(preset=preset)
+
+    store = get_default_feature_store(registry=FeatureSetRegistry(loto_repository.get_connection))
+    if store is None:
+        if as_of is not None:
+            panel = panel[pd.to_datetime(panel["ds"]) <= pd.Timestamp(as_of)]
+        return generator.transform(panel)
+    return store.features_for(table_name, loto, panel, generator, name=feature_set, as_of=as_of)
@@ -12,6 +12,7 @@ from typing import Any, Dict, Optional, Sequence
 
 import psycopg2
 
+from nf_loto_platform.db import connection_pool
 from nf_loto_platform.db.db_config import DB_CONFIG
 
 
@@ -19,7 +20,7 @@ logger = logging.getLogger(__name__)
 
 
 def get_connection():
-    return psycopg2.connect(**DB_CONFIG)
+    return connection_pool.get_connection(DB_CONFIG)
 
 
 def log_run_start(
@@ -1,3 +1,5 @@
 from .tslib_backend import TSLibExperimentConfig, TSLibExperimentResult, run_tslib_experiment
 
 from .tslib_dataset_adapter import NfPanel, TSLibDatasetSpec, nfpanel_from_dataframe, to_tslib_long_format
+
+from .panel import ColumnarPanel
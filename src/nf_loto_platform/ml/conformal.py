@@ -8,17 +8,35 @@ Conformal Prediction (適合予測) モジュール。
 - Standard Residual: 点予測に対する絶対残差に基づく固定幅の区間推定
 - CQR (Conformalized Quantile Regression): 分位点回帰の出力を補正する手法
 - Adaptive Residual: 直近の変動(Volatility)に応じて区間幅を動的に調整する手法
+- Online (ACI): 新しい実測ごとに残差を逐次追加し、alpha を目標カバレッジへ適応させる手法
 """
 
 from __future__ import annotations
 
+import bisect
+import hashlib
+import json
 import logging
+import math
+import os
+from collections import deque
 from dataclasses import dataclass
-from typing import Dict, Literal, Optional, Tuple, Union
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Literal, Mapping, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
 
+try:
+    from sortedcontainers import SortedList
+    _SORTEDCONTAINERS_AVAILABLE = True
+except ImportError:  # pragma: no cover - 依存に含まれるが、無い場合は bisect による O(n) の挿入・削除で代替
+    SortedList = None  # type: ignore[assignment]
+    _SORTEDCONTAINERS_AVAILABLE = False
+
+if TYPE_CHECKING:  # pragma: no cover
+    from nf_loto_platform.tsfm.base import ForecastResult
+
 logger = logging.getLogger(__name__)
 
 
@@ -47,8 +65,44 @@ class PredictionIntervals:
         return df
 
 
+GroupBy = Optional[Literal["series", "step", "series_step"]]
+
+
+def _finite_sample_index(n: np.ndarray, alpha: float) -> np.ndarray:
+    """長さ n の昇順スコア列で (1-alpha) 分位点 (有限標本補正・"higher") を指す位置."""
+    n = np.asarray(n, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        q_level = np.clip((1.0 - alpha) * (1.0 + 1.0 / n), 0.0, 1.0)
+    return np.ceil(q_level * np.maximum(n - 1.0, 0.0)).astype(np.int64)
+
+
+def grouped_conformal_quantiles(scores: np.ndarray, codes: np.ndarray, n_groups: int, alpha: float) -> np.ndarray:
+    """グループ番号 ``codes`` ごとの (1-alpha) 分位点を一括で計算する.
+
+    (グループ, スコア) で 1 回だけ lexsort し、各グループの先頭位置 + 有限標本補正の
+    順位で分位点を取り出す。NaN のスコアは除外し、スコアの無いグループは inf。
+    """
+    scores = np.asarray(scores, dtype=float).ravel()
+    codes = np.asarray(codes, dtype=np.int64).ravel()
+    valid = ~np.isnan(scores)
+    scores, codes = scores[valid], codes[valid]
+
+    sorted_scores = scores[np.lexsort((scores, codes))]
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    out = np.full(n_groups, np.inf)
+    has = counts > 0
+    out[has] = sorted_scores[starts[has] + _finite_sample_index(counts[has], alpha)]
+    return out
+
+
 class BaseConformalPredictor:
-    """Conformal Predictorの基底クラス."""
+    """Conformal Predictorの基底クラス.
+
+    ``calibrate(..., unique_ids=..., group_by=...)`` で (系列 × ホライズン) のスコア行列から
+    系列別・ステップ別・系列×ステップ別の補正値表 (:attr:`q_table`) を一括で計算できる。
+    その場合 ``predict(..., unique_ids=...)`` は補正値をブロードキャストで適用する。
+    """
 
     def __init__(self, alpha: float = 0.1):
         """
@@ -60,6 +114,10 @@ class BaseConformalPredictor:
             raise ValueError(f"alpha must be between 0 and 1, got {alpha}")
         self.alpha = alpha
         self.q_val: Optional[float] = None  # Calibrationにより決定される補正値
+        # グループ別キャリブレーション時のみ設定される
+        self.group_by: GroupBy = None
+        self.q_table: Optional[np.ndarray] = None  # series: (n_ids,), step: (h,), series_step: (n_ids, h)
+        self.group_ids: Optional[pd.Index] = None
 
     def _calculate_quantile(self, scores: np.ndarray) -> float:
         """Non-conformity scores から (1-alpha) 分位点を計算する (有限標本補正付き)."""
@@ -74,6 +132,64 @@ class BaseConformalPredictor:
         q_level = np.clip((1.0 - self.alpha) * (1.0 + 1.0 / n), 0.0, 1.0)
         return float(np.quantile(scores, q_level, method="higher"))
 
+    def _fit_scores(
+        self,
+        scores: np.ndarray,
+        unique_ids: Optional[np.ndarray] = None,
+        group_by: GroupBy = None,
+    ) -> None:
+        """スコアから q_val (全体) と、group_by 指定時はグループ別の q_table を求める.
+
+        group_by を使う場合、scores は ``(n_samples, h)`` 行列 (行 = 1 回の予測) で、
+        unique_ids は各行の系列 ID。
+        """
+        scores = np.asarray(scores, dtype=float)
+        self.q_val = self._calculate_quantile(scores[~np.isnan(scores)].ravel())
+        self.group_by, self.q_table, self.group_ids = group_by, None, None
+        if group_by is None:
+            return
+        if group_by not in ("series", "step", "series_step"):
+            raise ValueError(f"Unknown group_by: {group_by}. Choose from ['series', 'step', 'series_step']")
+
+        scores = np.atleast_2d(scores)
+        n_rows, horizon = scores.shape
+        steps = np.broadcast_to(np.arange(horizon), scores.shape)
+        if group_by == "step":
+            self.q_table = grouped_conformal_quantiles(scores, steps, horizon, self.alpha)
+            return
+
+        if unique_ids is None or len(unique_ids) != n_rows:
+            raise ValueError(f"group_by='{group_by}' requires unique_ids for each of the {n_rows} score rows")
+        codes, ids = pd.factorize(np.asarray(unique_ids, dtype=object), sort=True)
+        self.group_ids = pd.Index(ids)
+        row_codes = np.broadcast_to(codes[:, None], scores.shape)
+        if group_by == "series":
+            self.q_table = grouped_conformal_quantiles(scores, row_codes, len(ids), self.alpha)
+        else:
+            table = grouped_conformal_quantiles(scores, row_codes * horizon + steps, len(ids) * horizon, self.alpha)
+            self.q_table = table.reshape(len(ids), horizon)
+
+    def _q_for(self, shape: Tuple[int, ...], unique_ids: Optional[np.ndarray] = None) -> Union[float, np.ndarray]:
+        """予測 (``shape``) にブロードキャストできる補正値. 未知の系列は全体の q_val を使う."""
+        if self.q_val is None:
+            raise RuntimeError("Predictor is not calibrated. Call calibrate() first.")
+        if self.q_table is None:
+            return self.q_val
+        if self.group_by == "step":
+            if shape[-1] != len(self.q_table):
+                raise ValueError(f"horizon mismatch: calibrated with {len(self.q_table)} steps, got {shape[-1]}")
+            return self.q_table
+        if unique_ids is None:
+            raise ValueError(f"unique_ids are required to apply group_by='{self.group_by}' intervals")
+        codes = self.group_ids.get_indexer(pd.Index(np.asarray(unique_ids, dtype=object)))
+        known = codes >= 0
+        if self.group_by == "series":
+            q = np.where(known, self.q_table[np.maximum(codes, 0)], self.q_val)
+            return q[:, None] if len(shape) == 2 else q
+        if shape[-1] != self.q_table.shape[1]:
+            raise ValueError(f"horizon mismatch: calibrated with {self.q_table.shape[1]} steps, got {shape[-1]}")
+        return np.where(known[:, None], self.q_table[np.maximum(codes, 0)], self.q_val)
+
     def calibrate(self, y_true: np.ndarray, y_pred: Union[np.ndarray, Tuple[np.ndarray, ...]], **kwargs) -> None:
         """キャリブレーションデータを用いて q_val を決定する (抽象メソッド)."""
         raise NotImplementedError
@@ -83,18 +199,42 @@ class BaseConformalPredictor:
         raise NotImplementedError
 
     @staticmethod
-    def evaluate_coverage(y_true: np.ndarray, y_lower: np.ndarray, y_upper: np.ndarray) -> Dict[str, float]:
-        """実測カバレッジと平均区間幅を評価する."""
+    def evaluate_coverage(
+        y_true: np.ndarray,
+        y_lower: np.ndarray,
+        y_upper: np.ndarray,
+        groups: Optional[np.ndarray] = None,
+    ) -> Dict[str, Any]:
+        """実測カバレッジと平均区間幅を評価する.
+
+        groups (y_true にブロードキャストできるラベル。例: 系列 ID ``ids[:, None]``、
+        ステップ ``np.arange(h)``) を渡すと、グループ別の集計を ``by_group`` (DataFrame) に加える。
+        """
         covered = (y_true >= y_lower) & (y_true <= y_upper)
         coverage_rate = np.mean(covered)
         mean_width = np.mean(y_upper - y_lower)
         
-        return {
+        result: Dict[str, Any] = {
             "coverage_rate": float(coverage_rate),
             "mean_width": float(mean_width),
             "covered_count": int(np.sum(covered)),
             "total_count": len(y_true)
         }
+        if groups is not None:
+            labels = np.broadcast_to(np.asarray(groups), np.shape(covered)).ravel()
+            codes, uniques = pd.factorize(labels, sort=True)
+            n = len(uniques)
+            total = np.bincount(codes, minlength=n)
+            hits = np.bincount(codes, weights=np.ravel(covered).astype(float), minlength=n)
+            widths = np.bincount(codes, weights=np.ravel(np.asarray(y_upper) - np.asarray(y_lower)), minlength=n)
+            result["by_group"] = pd.DataFrame({
+                "group": uniques,
+                "coverage_rate": hits / total,
+                "mean_width": widths / total,
+                "covered_count": hits.astype(int),
+                "total_count": total,
+            })
+        return result
 
 
 class ResidualConformalPredictor(BaseConformalPredictor):
@@ -103,23 +243,31 @@ class ResidualConformalPredictor(BaseConformalPredictor):
     点予測モデルに対して一定幅の区間を付与する。
     """
 
-    def calibrate(self, y_true: np.ndarray, y_pred: np.ndarray, **kwargs) -> None:
+    def calibrate(
+        self,
+        y_true: np.ndarray,
+        y_pred: np.ndarray,
+        unique_ids: Optional[np.ndarray] = None,
+        group_by: GroupBy = None,
+        **kwargs
+    ) -> None:
         """
         Args:
             y_true: 正解値配列
             y_pred: 点予測値配列
+            unique_ids: 各行の系列 ID (group_by="series" / "series_step" の場合)
+            group_by: None (全体で 1 つ), "series", "step", "series_step"
         """
         # Non-conformity score: 絶対誤差 |y - y_hat|
         scores = np.abs(y_true - y_pred)
-        self.q_val = self._calculate_quantile(scores)
+        self._fit_scores(scores, unique_ids, group_by)
         logger.info(f"Calibrated Residual CP: q_val (interval half-width) = {self.q_val:.4f}")
 
-    def predict(self, y_pred: np.ndarray, **kwargs) -> PredictionIntervals:
-        if self.q_val is None:
-            raise RuntimeError("Predictor is not calibrated. Call calibrate() first.")
+    def predict(self, y_pred: np.ndarray, unique_ids: Optional[np.ndarray] = None, **kwargs) -> PredictionIntervals:
+        q = self._q_for(np.shape(y_pred), unique_ids)
         
-        y_lower = y_pred - self.q_val
-        y_upper = y_pred + self.q_val
+        y_lower = y_pred - q
+        y_upper = y_pred + q
         
         return PredictionIntervals(
             y_hat=y_pred,
@@ -143,6 +291,8 @@ class CQRConformalPredictor(BaseConformalPredictor):
         self, 
         y_true: np.ndarray, 
         y_pred_interval: Tuple[np.ndarray, np.ndarray],  # (lower, upper)
+        unique_ids: Optional[np.ndarray] = None,
+        group_by: GroupBy = None,
         **kwargs
     ) -> None:
         """
@@ -150,6 +300,7 @@ class CQRConformalPredictor(BaseConformalPredictor):
             y_true: 正解値
             y_pred_interval: (y_lower_hat, y_upper_hat) のタプル。
                              モデルが出力した生の分位点予測。
+            unique_ids, group_by: グループ別キャリブレーション (ResidualConformalPredictor と同じ)
         """
         y_lower_hat, y_upper_hat = y_pred_interval
         
@@ -158,12 +309,13 @@ class CQRConformalPredictor(BaseConformalPredictor):
         # もし y_i が区間内なら E_i は負、区間外なら正（不足距離）となる。
         
         scores = np.maximum(y_lower_hat - y_true, y_true - y_upper_hat)
-        self.q_val = self._calculate_quantile(scores)
+        self._fit_scores(scores, unique_ids, group_by)
         logger.info(f"Calibrated CQR: q_val (correction term) = {self.q_val:.4f}")
 
     def predict(
         self, 
         y_pred_interval: Tuple[np.ndarray, np.ndarray, np.ndarray], # (y_hat, lower, upper)
+        unique_ids: Optional[np.ndarray] = None,
         **kwargs
     ) -> PredictionIntervals:
         """
@@ -172,12 +324,11 @@ class CQRConformalPredictor(BaseConformalPredictor):
         """
         y_hat, y_lower_hat, y_upper_hat = y_pred_interval
         
-        if self.q_val is None:
-            raise RuntimeError("Predictor is not calibrated.")
+        q = self._q_for(np.shape(y_hat), unique_ids)
 
         # 補正を適用 (区間を広げる、あるいは狭める)
-        y_lower_corrected = y_lower_hat - self.q_val
-        y_upper_corrected = y_upper_hat + self.q_val
+        y_lower_corrected = y_lower_hat - q
+        y_upper_corrected = y_upper_hat + q
         
         return PredictionIntervals(
             y_hat=y_hat,
@@ -203,6 +354,8 @@ class AdaptiveConformalPredictor(BaseConformalPredictor):
         y_true: np.ndarray, 
         y_pred: np.ndarray, 
         sigma_hat: np.ndarray,
+        unique_ids: Optional[np.ndarray] = None,
+        group_by: GroupBy = None,
         **kwargs
     ) -> None:
         """
@@ -210,27 +363,28 @@ class AdaptiveConformalPredictor(BaseConformalPredictor):
             y_true: 正解値
             y_pred: 点予測
             sigma_hat: 推定された局所的な標準偏差や不確実性指標 (例: 残差の移動標準偏差)
+            unique_ids, group_by: グループ別キャリブレーション (ResidualConformalPredictor と同じ)
         """
         # 0除算防止
         safe_sigma = np.clip(sigma_hat, 1e-6, None)
         
         # Scaled non-conformity score
         scores = np.abs(y_true - y_pred) / safe_sigma
-        self.q_val = self._calculate_quantile(scores)
+        self._fit_scores(scores, unique_ids, group_by)
         logger.info(f"Calibrated Adaptive CP: q_val (multiplier) = {self.q_val:.4f}")
 
     def predict(
         self, 
         y_pred: np.ndarray, 
         sigma_hat: np.ndarray,
+        unique_ids: Optional[np.ndarray] = None,
         **kwargs
     ) -> PredictionIntervals:
-        if self.q_val is None:
-            raise RuntimeError("Predictor is not calibrated.")
+        q = self._q_for(np.shape(y_pred), unique_ids)
 
         safe_sigma = np.clip(sigma_hat, 1e-6, None)
         
-        width = self.q_val * safe_sigma
+        width = q * safe_sigma
         y_lower = y_pred - width
         y_upper = y_pred + width
         
@@ -244,12 +398,238 @@ class AdaptiveConformalPredictor(BaseConformalPredictor):
         )
 
 
+class _SortedScores:
+    """昇順に保持した non-conformity score.
+
+    ``sortedcontainers.SortedList`` (プロジェクトの依存) で挿入・削除・順位参照を O(log n) で行う。
+    import できない環境では list + bisect で代替する (挿入・削除は O(n))。
+    """
+
+    def __init__(self, values: Iterable[float] = ()) -> None:
+        values = sorted(float(v) for v in values)
+        self._items = SortedList(values) if _SORTEDCONTAINERS_AVAILABLE else values
+
+    def add(self, value: float) -> None:
+        if _SORTEDCONTAINERS_AVAILABLE:
+            self._items.add(value)
+        else:
+            bisect.insort(self._items, value)
+
+    def remove(self, value: float) -> None:
+        if _SORTEDCONTAINERS_AVAILABLE:
+            self._items.remove(value)
+        else:
+            del self._items[bisect.bisect_left(self._items, value)]
+
+    def __getitem__(self, k: int) -> float:
+        return self._items[k]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class OnlineConformalPredictor(BaseConformalPredictor):
+    """
+    オンライン適応型 Conformal Prediction (Adaptive Conformal Inference, ACI).
+
+    絶対残差をソート済み構造に保持し、新しい実測が入るたびに
+
+    1. 直前の区間でカバーできたかを判定し (err_t = 0/1)
+    2. alpha_t <- alpha_t + gamma * (alpha - err_t) で有効 alpha を目標カバレッジへ寄せ
+    3. 残差を O(log n) で追加 (window 指定時は最古の残差を O(log n) で削除)
+
+    する。q_val は ``ceil((n+1)(1-alpha_t))`` 番目の残差で、全残差の再計算は行わない。
+    状態は :meth:`to_state` / :meth:`from_state` で系列ごとに保存・復元できる。
+    """
+
+    def __init__(self, alpha: float = 0.1, gamma: float = 0.005, window: Optional[int] = None):
+        """
+        Args:
+            alpha: 目標の許容誤差率 (目標カバレッジ = 1 - alpha)
+            gamma: ACI のステップ幅 (0 なら alpha は固定で、通常の逐次 split CP になる)
+            window: 保持する直近の残差数 (None なら全履歴)
+        """
+        super().__init__(alpha=alpha)
+        if gamma < 0:
+            raise ValueError(f"gamma must be non-negative, got {gamma}")
+        if window is not None and window <= 0:
+            raise ValueError(f"window must be positive, got {window}")
+        self.gamma = float(gamma)
+        self.window = window
+        self.alpha_t = self.alpha
+        self.n_updates = 0
+        self.n_covered = 0
+        self._history: deque = deque()
+        self._sorted = _SortedScores()
+        # 最後に保存 (または読み込み) してから状態が変わったか (save_online_states 用)
+        self._dirty = True
+
+    # ------------------------------------------------------------------
+    # 分位点
+    # ------------------------------------------------------------------
+    def _current_quantile(self) -> float:
+        n = len(self._sorted)
+        if self.alpha_t >= 1.0:
+            return 0.0
+        if n == 0 or self.alpha_t <= 0.0:
+            return float("inf")
+        k = math.ceil((n + 1) * (1.0 - self.alpha_t))
+        if k > n:
+            return float("inf")
+        return float(self._sorted[max(k, 1) - 1])
+
+    def _push(self, score: float) -> None:
+        self._history.append(score)
+        self._sorted.add(score)
+        if self.window is not None and len(self._history) > self.window:
+            self._sorted.remove(self._history.popleft())
+
+    # ------------------------------------------------------------------
+    # 学習・更新
+    # ------------------------------------------------------------------
+    def calibrate(self, y_true: np.ndarray, y_pred: np.ndarray, **kwargs) -> None:
+        """初期キャリブレーション (残差をまとめて登録し、alpha_t を目標値に戻す)."""
+        scores = np.abs(np.asarray(y_true, dtype=float) - np.asarray(y_pred, dtype=float)).ravel()
+        if self.window is not None:
+            scores = scores[-self.window:]
+        self._history = deque(scores.tolist())
+        self._sorted = _SortedScores(self._history)
+        self.alpha_t = self.alpha
+        self.q_val = self._current_quantile()
+        self._dirty = True
+        logger.info(f"Calibrated Online CP: q_val (interval half-width) = {self.q_val:.4f}")
+
+    def update(self, y_true: Union[float, np.ndarray], y_pred: Union[float, np.ndarray]) -> np.ndarray:
+        """新しい実測と (その時点で出していた) 点予測で状態を更新する.
+
+        配列を渡した場合は時刻順に 1 点ずつ更新する。
+        Returns: 各点が更新前の区間でカバーされていたか (bool 配列)
+        """
+        y_arr = np.atleast_1d(np.asarray(y_true, dtype=float)).ravel()
+        pred_arr = np.atleast_1d(np.asarray(y_pred, dtype=float)).ravel()
+        if y_arr.shape != pred_arr.shape:
+            raise ValueError(f"shape mismatch: y_true={y_arr.shape}, y_pred={pred_arr.shape}")
+
+        covered = np.empty(len(y_arr), dtype=bool)
+        q = self._current_quantile()
+        for i, score in enumerate(np.abs(y_arr - pred_arr).tolist()):
+            covered[i] = score <= q
+            err = 0.0 if covered[i] else 1.0
+            self.alpha_t += self.gamma * (self.alpha - err)
+            self.n_updates += 1
+            self.n_covered += int(covered[i])
+            self._push(score)
+            q = self._current_quantile()
+        self.q_val = q
+        self._dirty = self._dirty or len(y_arr) > 0
+        return covered
+
+    def predict(self, y_pred: np.ndarray, **kwargs) -> PredictionIntervals:
+        if self.q_val is None:
+            raise RuntimeError("Predictor is not calibrated. Call calibrate() or update() first.")
+
+        y_pred = np.asarray(y_pred, dtype=float)
+        return PredictionIntervals(
+            y_hat=y_pred,
+            y_lower=y_pred - self.q_val,
+            y_upper=y_pred + self.q_val,
+            method="OnlineACI",
+            confidence_level=1.0 - self.alpha,
+            q_val=self.q_val
+        )
+
+    @property
+    def empirical_coverage(self) -> float:
+        """update() で観測した実測カバレッジ."""
+        return self.n_covered / self.n_updates if self.n_updates else float("nan")
+
+    # ------------------------------------------------------------------
+    # 永続化
+    # ------------------------------------------------------------------
+    def to_state(self) -> Dict[str, Any]:
+        """JSON で保存できる状態 (残差は到着順)."""
+        return {
+            "alpha": self.alpha,
+            "gamma": self.gamma,
+            "window": self.window,
+            "alpha_t": self.alpha_t,
+            "n_updates": self.n_updates,
+            "n_covered": self.n_covered,
+            "scores": list(self._history),
+        }
+
+    @classmethod
+    def from_state(cls, state: Mapping[str, Any]) -> "OnlineConformalPredictor":
+        predictor = cls(alpha=state["alpha"], gamma=state["gamma"], window=state.get("window"))
+        predictor._history = deque(float(v) for v in state["scores"])
+        predictor._sorted = _SortedScores(predictor._history)
+        predictor.alpha_t = float(state["alpha_t"])
+        predictor.n_updates = int(state.get("n_updates", 0))
+        predictor.n_covered = int(state.get("n_covered", 0))
+        if predictor._history or predictor.n_updates:
+            predictor.q_val = predictor._current_quantile()
+        predictor._dirty = False
+        return predictor
+
+
+def _state_file(directory: Path, unique_id: str) -> Path:
+    digest = hashlib.sha1(unique_id.encode("utf-8")).hexdigest()[:20]
+    return directory / f"{digest}.json"
+
+
+def save_online_states(path: Union[str, Path], predictors: Mapping[str, OnlineConformalPredictor]) -> int:
+    """系列 ID -> OnlineConformalPredictor の状態を ``path`` ディレクトリに保存する.
+
+    系列ごとに 1 ファイル (アトミックに置き換え) で、前回の保存・読み込み以降に
+    calibrate / update された系列だけを書き込む (毎回全系列の履歴を書き直さない)。
+
+    Returns:
+        書き込んだ系列数
+
+    Raises:
+        NotADirectoryError: ``path`` にディレクトリ以外が存在する場合
+    """
+    directory = Path(path)
+    if directory.exists() and not directory.is_dir():
+        raise NotADirectoryError(f"online conformal state path is not a directory: {directory}")
+    directory.mkdir(parents=True, exist_ok=True)
+    written = 0
+    for uid, predictor in predictors.items():
+        target = _state_file(directory, str(uid))
+        if not predictor._dirty and target.exists():
+            continue
+        tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"unique_id": str(uid), "state": predictor.to_state()}), encoding="utf-8")
+        os.replace(tmp, target)
+        predictor._dirty = False
+        written += 1
+    return written
+
+
+def load_online_states(path: Union[str, Path]) -> Dict[str, OnlineConformalPredictor]:
+    """save_online_states で ``path`` ディレクトリに保存した状態を読み込む (無ければ空).
+
+    Raises:
+        NotADirectoryError: ``path`` にディレクトリ以外が存在する場合
+    """
+    path = Path(path)
+    if not path.exists():
+        return {}
+    if not path.is_dir():
+        raise NotADirectoryError(f"online conformal state path is not a directory: {path}")
+    predictors: Dict[str, OnlineConformalPredictor] = {}
+    for file in sorted(path.glob("*.json")):
+        record = json.loads(file.read_text(encoding="utf-8"))
+        predictors[record["unique_id"]] = OnlineConformalPredictor.from_state(record["state"])
+    return predictors
+
+
 def get_conformal_predictor(method: str = "residual", alpha: float = 0.1) -> BaseConformalPredictor:
     """
     Conformal Predictor のファクトリー関数.
     
     Args:
-        method: "residual", "cqr", "adaptive"
+        method: "residual", "cqr", "adaptive", "online"
         alpha: Significance level (default: 0.1 for 90% coverage)
     """
     method = method.lower()
@@ -259,5 +639,39 @@ def get_conformal_predictor(method: str = "residual", alpha: float = 0.1) -> Bas
         return CQRConformalPredictor(alpha=alpha)
     elif method == "adaptive":
         return AdaptiveConformalPredictor(alpha=alpha)
+    elif method == "online":
+        return OnlineConformalPredictor(alpha=alpha)
+    else:
+        raise ValueError(f"Unknown conformal method: {method}. Choose from ['residual', 'cqr', 'adaptive', 'online']")
+
+
+def conformalize_forecast(
+    result: "ForecastResult",
+    predictor: BaseConformalPredictor,
+    sigma_hat: Optional[np.ndarray] = None,
+) -> "ForecastResult":
+    """キャリブレーション済みの predictor で ForecastResult に予測区間を付与する.
+
+    予測行列 ``(n_series, horizon)`` のまま区間を計算し、
+    ``lo-{水準}`` / ``hi-{水準}`` (例: ``lo-90``) の分位行列として result.quantiles に追加する。
+    CQR は同じ水準の既存の分位行列を補正し、Adaptive は ``sigma_hat`` (予測行列と同形) を使う。
+    グループ別にキャリブレーションした predictor は result.ids で系列ごとの補正値を引く。
+    """
+    level = int(round((1.0 - predictor.alpha) * 100))
+    lo_key, hi_key = f"lo-{level}", f"hi-{level}"
+    if isinstance(predictor, CQRConformalPredictor):
+        if lo_key not in result.quantiles or hi_key not in result.quantiles:
+            raise ValueError(f"CQR requires '{lo_key}' and '{hi_key}' quantiles in the forecast result")
+        intervals = predictor.predict(
+            (result.point, result.quantiles[lo_key], result.quantiles[hi_key]), unique_ids=result.ids
+        )
+    elif isinstance(predictor, AdaptiveConformalPredictor):
+        if sigma_hat is None:
+            raise ValueError("AdaptiveConformalPredictor requires sigma_hat")
+        intervals = predictor.predict(
+            result.point, sigma_hat=np.broadcast_to(sigma_hat, result.point.shape), unique_ids=result.ids
+        )
     else:
-        raise ValueError(f"Unknown conformal method: {method}. Choose from ['residual', 'cqr', 'adaptive']")
\ No newline at end of file
+        intervals = predictor.predict(result.point, unique_ids=result.ids)
+
+    return result.add_quantiles({lo_key: intervals.y_lower, hi_key: intervals.y_upper})
@@ -18,16 +18,18 @@
 
 実験ランナー:
 - run_loto_experiment: データロード、学習、推論、評価を一括実行し、DBへログ保存する
+- run_loto_cross_validation: 複数カットオフのローリングオリジン検証 (ウィンドウ並列)
 """
 
 from __future__ import annotations
 
 import logging
-import math
+import os
 import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import pandas as pd
@@ -58,6 +60,8 @@ except ImportError as e:
         "Failed to import 'nf_loto_platform.db.loto_repository'. System cannot start without data layer."
     ) from e
 
+from nf_loto_platform.ml.panel import ColumnarPanel
+
 try:
     from nf_loto_platform.ml.automodel_builder import build_automodel
 except ImportError:
@@ -66,11 +70,13 @@ except ImportError:
 
 # TSFM (Time Series Foundation Models) 関連のインポート
 try:
+    from nf_loto_platform.tsfm.base import ForecastResult
     from nf_loto_platform.tsfm.registry import get_adapter
     TSFM_AVAILABLE = True
 except ImportError:
     logger.warning("⚠️ 'nf_loto_platform.tsfm' not found. TSFM backend will be disabled.")
     TSFM_AVAILABLE = False
+    ForecastResult = None
     get_adapter = None
 
 # DBロガーのインポート（実験記録用）
@@ -90,113 +96,61 @@ except ImportError:
     def log_run_error(*args, **kwargs): pass
 
 
-ArrayLike = Sequence[float] | np.ndarray | Iterable[float]
-
-
 # ---------------------------------------------------------------------------
 # Metrics Functions (Existing)
 # ---------------------------------------------------------------------------
+# 実装は ml_analysis.metrics に一本化している (集計器ベース)。
+from nf_loto_platform.ml_analysis.metrics import (  # noqa: E402
+    ArrayLike,
+    coverage,
+    coverage_error,
+    directional_accuracy,
+    mae,
+    mape,
+    max_drawdown,
+    pinball_loss,
+    rmse,
+    sharpe_ratio,
+    smape,
+)
+from nf_loto_platform.ml_analysis.evaluation import EvaluationResult, evaluate_all, long_to_matrices  # noqa: E402
+
+
+def _with_model_column(preds: pd.DataFrame, model_name: str) -> pd.DataFrame:
+    """TSFMアダプタが model_name をカラム名にしていない場合のフォールバック."""
+    if model_name in preds.columns:
+        return preds
+    # "yhat" や "mean" などの数値カラムを探す
+    numeric_cols = preds.select_dtypes(include=[np.number]).columns
+    exclude = {"ds", "unique_id", "y"}
+    candidates = [c for c in numeric_cols if c not in exclude]
+    if candidates:
+        return preds.rename(columns={candidates[0]: model_name})
+    return preds
+
+
+def _evaluate_forecast(
+    ids: np.ndarray,
+    y_mat: np.ndarray,
+    yhat_mat: np.ndarray,
+    interval_90: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+) -> Tuple[Dict[str, float], Optional[EvaluationResult]]:
+    """実測値と予測値の (n_series, h) 行列 (欠損を含みうる) から評価メトリクスを計算する.
+
+    全体の値は meta["metrics"] 用の辞書、系列別・ステップ別を含む全結果は
+    EvaluationResult として返す (ts_research.model_metrics への一括書き込み用)。
+    """
+    y_mat = np.asarray(y_mat, dtype=float)
+    yhat_mat = np.asarray(yhat_mat, dtype=float)
+    valid = ~(np.isnan(y_mat) | np.isnan(yhat_mat))
+    if not valid.any():
+        return {}, None
 
-def _to_numpy(y: ArrayLike, yhat: ArrayLike) -> tuple[np.ndarray, np.ndarray]:
-    y_arr = np.asarray(list(y), dtype=float)
-    yhat_arr = np.asarray(list(yhat), dtype=float)
-    if y_arr.shape != yhat_arr.shape:
-        raise ValueError(f"shape mismatch: y={y_arr.shape}, yhat={yhat_arr.shape}")
-    return y_arr, yhat_arr
-
-
-def smape(y: ArrayLike, yhat: ArrayLike, eps: float = 1e-8) -> float:
-    """対称 MAPE (sMAPE) を計算する."""
-    y_arr, yhat_arr = _to_numpy(y, yhat)
-    num = np.abs(yhat_arr - y_arr)
-    denom = np.abs(y_arr) + np.abs(yhat_arr) + eps
-    return float(200.0 * np.mean(num / denom))
-
-
-def mape(y: ArrayLike, yhat: ArrayLike, eps: float = 1e-8) -> float:
-    """Mean Absolute Percentage Error (百分率)."""
-    y_arr, yhat_arr = _to_numpy(y, yhat)
-    num = np.abs(yhat_arr - y_arr)
-    denom = np.maximum(np.abs(y_arr), eps)
-    return float(100.0 * np.mean(num / denom))
-
-
-def mae(y: ArrayLike, yhat: ArrayLike) -> float:
-    """Mean Absolute Error."""
-    y_arr, yhat_arr = _to_numpy(y, yhat)
-    return float(np.mean(np.abs(yhat_arr - y_arr)))
-
-
-def rmse(y: ArrayLike, yhat: ArrayLike) -> float:
-    """Root Mean Squared Error."""
-    y_arr, yhat_arr = _to_numpy(y, yhat)
-    return float(math.sqrt(np.mean((yhat_arr - y_arr) ** 2)))
-
-
-def pinball_loss(y: ArrayLike, yhat: ArrayLike, q: float) -> float:
-    """分位 q に対する pinball loss を計算する."""
-    if not (0.0 < q < 1.0):
-        raise ValueError("q must be in (0, 1)")
-    y_arr, yhat_arr = _to_numpy(y, yhat)
-    diff = yhat_arr - y_arr
-    return float(np.mean(np.maximum(q * diff, (q - 1.0) * diff)))
-
-
-def coverage(y: ArrayLike, y_lower: ArrayLike, y_upper: ArrayLike) -> float:
-    """予測区間 [y_lower, y_upper] に対する被覆率 (coverage) を計算する."""
-    y_arr, lower = _to_numpy(y, y_lower)
-    y_arr2, upper = _to_numpy(y, y_upper)
-    _ = y_arr2
-    inside = (y_arr >= lower) & (y_arr <= upper)
-    return float(np.mean(inside.astype(float)))
-
-
-def coverage_error(y: ArrayLike, y_lower: ArrayLike, y_upper: ArrayLike, target: float = 0.9) -> float:
-    """目標とする被覆率との乖離 (符号付き) を計算する."""
-    actual_cov = coverage(y, y_lower, y_upper)
-    return float(actual_cov - target)
-
-
-def directional_accuracy(y: ArrayLike, yhat: ArrayLike) -> float:
-    """方向正解率 (Directional Accuracy) を計算する."""
-    y_arr, yhat_arr = _to_numpy(y, yhat)
-    if len(y_arr) < 2:
-        return np.nan 
-    diff_y = np.diff(y_arr)
-    diff_yhat = np.diff(yhat_arr)
-    matches = (np.sign(diff_y) == np.sign(diff_yhat))
-    return float(np.mean(matches.astype(float)))
-
-
-def max_drawdown(y: ArrayLike) -> float:
-    """最大ドローダウン (Max Drawdown) を計算する."""
-    arr = np.asarray(list(y), dtype=float)
-    if len(arr) == 0:
-        return 0.0
-    running_max = np.maximum.accumulate(arr)
-    valid_mask = running_max > 1e-9
-    if not np.any(valid_mask):
-        return 0.0
-    drawdowns = np.zeros_like(arr)
-    drawdowns[valid_mask] = (running_max[valid_mask] - arr[valid_mask]) / running_max[valid_mask]
-    return float(np.max(drawdowns))
-
-
-def sharpe_ratio(y: ArrayLike, risk_free_rate: float = 0.0) -> float:
-    """(簡易版) シャープレシオを計算する."""
-    arr = np.asarray(list(y), dtype=float)
-    if len(arr) < 2:
-        return 0.0
-    with np.errstate(divide='ignore', invalid='ignore'):
-        returns = np.diff(arr) / arr[:-1]
-    returns = returns[np.isfinite(returns)]
-    if len(returns) == 0:
-        return 0.0
-    mean_ret = np.mean(returns)
-    std_ret = np.std(returns)
-    if std_ret < 1e-9:
-        return 0.0
-    return float((mean_ret - risk_free_rate) / std_ret)
+    lower, upper = interval_90 if interval_90 is not None else (None, None)
+    evaluation = evaluate_all(y_mat, yhat_mat, lower=lower, upper=upper, ids=ids)
+    metric_results = evaluation.overall()
+    metric_results["max_drawdown"] = max_drawdown(yhat_mat[valid])
+    return metric_results, evaluation
 
 
 # ---------------------------------------------------------------------------
@@ -223,6 +177,125 @@ def _get_resource_snapshot() -> Dict[str, float]:
         return {}
 
 
+@dataclass
+class _WindowForecast:
+    """1 つの予測ウィンドウ (ホールドアウト or CV のカットオフ) の予測と評価用行列."""
+    preds: pd.DataFrame
+    ids: Optional[np.ndarray] = None
+    y_mat: Optional[np.ndarray] = None
+    yhat_mat: Optional[np.ndarray] = None
+    interval_90: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def evaluate(self) -> Tuple[Dict[str, float], Optional[EvaluationResult]]:
+        if self.yhat_mat is None:
+            return {}, None
+        return _evaluate_forecast(self.ids, self.y_mat, self.yhat_mat, self.interval_90)
+
+
+def _build_tsfm_adapter(model_name: str):
+    if not TSFM_AVAILABLE or get_adapter is None:
+        raise ImportError("TSFM backend requested but 'nf_loto_platform.tsfm' is not available.")
+
+    logger.info(f"Using TSFM backend adapter for: {model_name}")
+
+    # アダプタの取得
+    try:
+        return get_adapter(model_name)
+    except ValueError as e:
+        raise ValueError(f"TSFM model '{model_name}' not found in registry.") from e
+
+
+def _forecast_tsfm(
+    adapter,
+    df_train: pd.DataFrame,
+    test_panel: ColumnarPanel,
+    model_name: str,
+    horizon: int,
+    **kwargs,
+) -> _WindowForecast:
+    """TSFM アダプタで予測し、テスト用パネルと突き合わせる."""
+    forecast_result = adapter.predict(
+        history=df_train,
+        horizon=horizon,
+        freq='D', # ロトデータは日次とみなすか、引数で受け取るか
+        **kwargs
+    )
+
+    if not isinstance(forecast_result, ForecastResult):
+        # yhat (long 形式 DataFrame) だけを返す旧形式のアダプタ
+        forecast_result = ForecastResult.from_frame(
+            _with_model_column(forecast_result.yhat, model_name), model_name
+        )
+    # カラム名の整合性を確保 (NeuralForecastとの互換性のため)
+    forecast_result = forecast_result.renamed(model_name)
+
+    # 実測値との突き合わせ・評価は予測行列のまま行う
+    y_all = test_panel.align(
+        np.repeat(forecast_result.ids, forecast_result.horizon), forecast_result.dates().ravel()
+    )
+    lo_90 = forecast_result.quantiles.get("lo-90")
+    hi_90 = forecast_result.quantiles.get("hi-90")
+
+    # 返却用の long 形式 DataFrame はここで一度だけ組み立てる
+    # (yhat は ForecastResult がキャッシュしているので、列の追加はコピーに対して行う)
+    preds = forecast_result.yhat.assign(y=y_all)
+    return _WindowForecast(
+        preds=preds,
+        ids=forecast_result.ids,
+        y_mat=y_all.reshape(forecast_result.point.shape),
+        yhat_mat=forecast_result.point,
+        interval_90=(lo_90, hi_90) if lo_90 is not None and hi_90 is not None else None,
+    )
+
+
+def _build_neuralforecast(
+    model_name: str,
+    backend: str,
+    horizon: int,
+    num_samples: int,
+    cpus: int,
+    gpus: int,
+    **kwargs,
+) -> Tuple[NeuralForecast, List[str]]:
+    models = []
+    if build_automodel:
+        model = build_automodel(
+            model_name=model_name,
+            backend=backend,
+            num_samples=num_samples,
+            cpus=cpus,
+            gpus=gpus,
+            **kwargs
+        )
+        models.append(model)
+    else:
+        logger.warning("automodel_builder not found. Falling back to default AutoNHITS.")
+        models.append(AutoNHITS(h=horizon, config=None, num_samples=num_samples))
+
+    models_info = [str(m) for m in models]
+    nf = NeuralForecast(
+        models=models,
+        freq='D'
+    )
+    return nf, models_info
+
+
+def _window_from_long(preds: pd.DataFrame, model_name: str) -> _WindowForecast:
+    """実測値列 y を持つ long 形式の予測 (NeuralForecast の出力) を評価用行列に並べる."""
+    if model_name not in preds.columns:
+        return _WindowForecast(preds=preds)
+    interval_cols = [f"{model_name}-lo-90", f"{model_name}-hi-90"]
+    has_interval = all(c in preds.columns for c in interval_cols)
+    ids, mats = long_to_matrices(preds, ["y", model_name] + (interval_cols if has_interval else []))
+    return _WindowForecast(
+        preds=preds,
+        ids=ids,
+        y_mat=mats[0],
+        yhat_mat=mats[1],
+        interval_90=(mats[2], mats[3]) if has_interval else None,
+    )
+
+
 def run_loto_experiment(
     table_name: str,
     loto: str,
@@ -298,120 +371,51 @@ def run_loto_experiment(
             raise ValueError(f"No data found for {unique_ids} in {table_name}")
 
         # データセット分割 (Train/Test)
-        df_test = df.groupby("unique_id").tail(horizon).reset_index(drop=True)
-        df_train = df.groupby("unique_id").apply(lambda x: x.iloc[:-horizon]).reset_index(drop=True)
+        # 列指向パネル上のオフセット演算で分割し、groupby().apply による系列ごとのコピーを避ける
+        panel = ColumnarPanel.from_frame(df)
+        train_panel, test_panel = panel.split(horizon)
 
-        if df_train.empty or df_test.empty:
+        if train_panel.n_rows == 0 or test_panel.n_rows == 0:
             raise ValueError("Data insufficient for the requested horizon.")
 
-        # 3. モデル構築と予測
-        models_info = [] # ログ用モデル情報
+        df_train = train_panel.to_frame()
 
+        # 3. モデル構築と予測
         if backend == "tsfm":
             # =================================================================
             # TSFM (Time Series Foundation Model) Backend
             # =================================================================
-            if not TSFM_AVAILABLE or get_adapter is None:
-                raise ImportError("TSFM backend requested but 'nf_loto_platform.tsfm' is not available.")
-            
-            logger.info(f"Using TSFM backend adapter for: {model_name}")
-            
-            # アダプタの取得
-            try:
-                adapter = get_adapter(model_name)
-            except ValueError as e:
-                raise ValueError(f"TSFM model '{model_name}' not found in registry.") from e
-            
-            models_info.append(str(adapter))
+            adapter = _build_tsfm_adapter(model_name)
+            models_info = [str(adapter)]  # ログ用モデル情報
 
             # 推論実行 (Zero-shot or Fine-tune)
             # BaseTSFMAdapter.fit は通常Zero-shotでは何もしない
             adapter.fit(df_train, **kwargs)
-            
-            # 予測
-            forecast_result = adapter.predict(
-                history=df_train,
-                horizon=horizon,
-                freq='D', # ロトデータは日次とみなすか、引数で受け取るか
-                **kwargs
-            )
-            
-            preds = forecast_result.yhat
-            
-            # カラム名の整合性を確保 (NeuralForecastとの互換性のため)
-            # TSFMアダプタが model_name をカラム名にしていない場合のフォールバック
-            if model_name not in preds.columns:
-                # "yhat" や "mean" などの数値カラムを探す
-                numeric_cols = preds.select_dtypes(include=[np.number]).columns
-                exclude = {"ds", "unique_id", "y"}
-                candidates = [c for c in numeric_cols if c not in exclude]
-                if candidates:
-                    preds = preds.rename(columns={candidates[0]: model_name})
-        
+            window = _forecast_tsfm(adapter, df_train, test_panel, model_name, horizon, **kwargs)
+
         else:
             # =================================================================
             # NeuralForecast Backend
             # =================================================================
-            models = []
-            if build_automodel:
-                model = build_automodel(
-                    model_name=model_name,
-                    backend=backend,
-                    num_samples=num_samples,
-                    cpus=cpus,
-                    gpus=gpus,
-                    **kwargs
-                )
-                models.append(model)
-            else:
-                logger.warning("automodel_builder not found. Falling back to default AutoNHITS.")
-                models.append(AutoNHITS(h=horizon, config=None, num_samples=num_samples))
-            
-            models_info = [str(m) for m in models]
-
-            # 学習と予測
-            nf = NeuralForecast(
-                models=models,
-                freq='D'
-            )
-            
+            nf, models_info = _build_neuralforecast(model_name, backend, horizon, num_samples, cpus, gpus, **kwargs)
+
             logger.info("Fitting model...")
             nf.fit(df=df_train)
-            
+
             logger.info("Predicting...")
             preds = nf.predict()
             preds = preds.reset_index()
 
-        # 4. 結果の統合 (Testデータとの結合)
-        # preds は [unique_id, ds, model_name] を持っている前提
-        preds = preds.merge(df_test[["unique_id", "ds", "y"]], on=["unique_id", "ds"], how="left")
+            # 4. 結果の統合 (Testデータとの突き合わせ)
+            # preds は [unique_id, ds, model_name] を持っている前提。
+            # merge の代わりにテスト用パネルの (unique_id, ds) キー検索で実測値を並べる。
+            preds["y"] = test_panel.align(preds["unique_id"].to_numpy(), preds["ds"].to_numpy())
+            window = _window_from_long(preds, model_name)
+
+        preds = window.preds
 
         # 5. 評価メトリクスの計算
-        metric_results = {}
-        model_col = model_name
-        
-        if model_col in preds.columns and "y" in preds.columns:
-            valid_preds = preds.dropna(subset=["y", model_col])
-            if not valid_preds.empty:
-                y_true = valid_preds["y"].values
-                y_hat = valid_preds[model_col].values
-                
-                metric_results = {
-                    "mae": mae(y_true, y_hat),
-                    "rmse": rmse(y_true, y_hat),
-                    "smape": smape(y_true, y_hat),
-                    "mape": mape(y_true, y_hat),
-                    "directional_accuracy": directional_accuracy(y_true, y_hat),
-                    "max_drawdown": max_drawdown(y_hat)
-                }
-                
-                # 分位予測の評価 (例: 90%区間)
-                if f"{model_col}-lo-90" in valid_preds.columns and f"{model_col}-hi-90" in valid_preds.columns:
-                    metric_results["coverage_90"] = coverage(
-                        y_true, 
-                        valid_preds[f"{model_col}-lo-90"].values,
-                        valid_preds[f"{model_col}-hi-90"].values
-                    )
+        metric_results, evaluation = window.evaluate()
 
         logger.info(f"Experiment finished. Metrics: {metric_results}")
 
@@ -437,6 +441,7 @@ def run_loto_experiment(
             "backend": backend,
             "duration_seconds": duration,
             "metrics": metric_results,
+            "evaluation": evaluation,
             "status": "success",
             "agent_metadata": agent_metadata or {},
             "params": kwargs
@@ -448,4 +453,200 @@ def run_loto_experiment(
         # 7. DBログ: エラー発生 (FAILED状態)
         logger.error(f"Experiment failed with error: {e}")
         log_run_error(run_id=run_id, exc=e)
-        raise e
\ No newline at end of file
+        raise e
+
+# ---------------------------------------------------------------------------
+# Rolling-origin Cross Validation
+# ---------------------------------------------------------------------------
+
+def _mean_metrics(per_window: Sequence[Dict[str, float]]) -> Dict[str, float]:
+    """ウィンドウごとのメトリクスの平均 (NaN のウィンドウは除く)."""
+    names = [name for m in per_window for name in m]
+    out: Dict[str, float] = {}
+    for name in dict.fromkeys(names):
+        values = np.array([m.get(name, np.nan) for m in per_window], dtype=float)
+        out[name] = float(np.nanmean(values)) if np.isfinite(values).any() else float("nan")
+    return out
+
+
+def run_loto_cross_validation(
+    table_name: str,
+    loto: str,
+    unique_ids: List[str],
+    model_name: str = "AutoNHITS",
+    backend: str = "optuna",
+    horizon: int = 28,
+    n_windows: int = 3,
+    step_size: Optional[int] = None,
+    refit: Union[bool, int] = False,
+    num_samples: int = 10,
+    cpus: int = 1,
+    gpus: int = 0,
+    max_workers: Optional[int] = None,
+    store: Any = None,
+    trial_id: Optional[int] = None,
+    agent_metadata: Optional[Dict[str, Any]] = None,
+    **kwargs
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    ローリングオリジン (複数カットオフ) で時系列予測を評価する.
+
+    パネルは 1 回だけロードし、各カットオフの学習/テストは ColumnarPanel のビュー
+    (コピーなし) として切り出す。ウィンドウ w のテストは末尾から
+    ``step_size * (n_windows - 1 - w)`` 点手前で終わる ``horizon`` 点。
+
+    - NeuralForecast: ``NeuralForecast.cross_validation`` に委譲する。``refit=False`` では
+      最も古いカットオフで 1 回だけ学習し、以降のウィンドウは同じモデルで予測する
+      (``refit=k`` なら k ウィンドウごとに再学習)。
+    - TSFM: ``refit=False`` では 1 つのアダプタ (重みはモデルプールで共有) を全ウィンドウで使い回す。
+
+    ウィンドウごとの予測 (TSFM) と評価はスレッドプールで並列に行う。
+    ``store`` (TSResearchStore) と ``trial_id`` を渡すと、カットオフごとの結果を
+    ``ts_research.backtest_windows`` に、ウィンドウ平均を ``model_metrics`` (split="cv") に書き込む。
+
+    Args:
+        n_windows: カットオフ数
+        step_size: カットオフ間の間隔 (既定は horizon)
+        refit: 再学習ポリシー (False: 1 回だけ学習, True: 毎ウィンドウ, int: k ウィンドウごと)
+        max_workers: 並列実行するウィンドウ数の上限
+        その他の引数は run_loto_experiment と同じ。
+
+    Returns:
+        Tuple[pd.DataFrame, Dict[str, Any]]:
+            - preds: 全ウィンドウの予測結果 (unique_id, ds, cutoff, window, y, model_name...)
+            - meta: ウィンドウ平均の metrics と、ウィンドウごとの windows / evaluations
+    """
+    start_time = time.time()
+    step_size = horizon if step_size is None else int(step_size)
+    cv_config = {"n_windows": n_windows, "step_size": step_size, "refit": refit}
+
+    resource_start = _get_resource_snapshot()
+    run_id = log_run_start(
+        table_name=table_name,
+        loto=loto,
+        unique_ids=unique_ids,
+        model_name=model_name,
+        backend=backend,
+        horizon=horizon,
+        loss=kwargs.get("loss", "default"),
+        metric="mae",
+        optimization_config={
+            "num_samples": num_samples,
+            "cpus": cpus,
+            "gpus": gpus,
+            "cross_validation": cv_config,
+        },
+        search_space=kwargs,
+        resource_snapshot=resource_start,
+        system_info=agent_metadata
+    )
+
+    logger.info(f"Starting cross validation run_id={run_id} for {unique_ids} ({cv_config})")
+
+    try:
+        df = loto_repository.load_panel_data(table_name, loto, unique_ids)
+        if df.empty:
+            raise ValueError(f"No data found for {unique_ids} in {table_name}")
+
+        panel = ColumnarPanel.from_frame(df)
+        views = panel.cutoff_views(horizon, n_windows, step_size)
+        if views[0][0].n_rows == 0 or views[0][1].n_rows == 0:
+            raise ValueError("Data insufficient for the requested cross-validation windows.")
+
+        workers = max_workers or min(n_windows, os.cpu_count() or 1)
+
+        if backend == "tsfm":
+            adapter = _build_tsfm_adapter(model_name)
+            models_info = [str(adapter)]
+            adapter.fit(views[0][0].to_frame(), **kwargs)
+            refit_every = int(refit)
+
+            def _run_window(w: int) -> _WindowForecast:
+                train, test = views[w]
+                df_train = train.to_frame()
+                window_adapter = adapter
+                if refit_every and w % refit_every == 0 and w > 0:
+                    window_adapter = _build_tsfm_adapter(model_name)
+                    window_adapter.fit(df_train, **kwargs)
+                window = _forecast_tsfm(window_adapter, df_train, test, model_name, horizon, **kwargs)
+                last = train.last_index()
+                cutoffs = pd.Series(train.ds[last], index=train.ids)[last >= 0]
+                window.preds["cutoff"] = window.preds["unique_id"].map(cutoffs)
+                return window
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                windows = list(pool.map(_run_window, range(n_windows)))
+        else:
+            nf, models_info = _build_neuralforecast(model_name, backend, horizon, num_samples, cpus, gpus, **kwargs)
+            logger.info("Running NeuralForecast cross validation...")
+            cv = nf.cross_validation(
+                df=panel.to_frame(), n_windows=n_windows, step_size=step_size, refit=refit
+            ).reset_index()
+            if "index" in cv.columns:
+                cv = cv.drop(columns="index")
+            # 系列ごとのカットオフの順位がウィンドウ番号
+            window_index = cv.groupby("unique_id")["cutoff"].rank(method="dense").to_numpy(dtype=int) - 1
+            windows = [
+                _window_from_long(cv[window_index == w].reset_index(drop=True), model_name)
+                for w in range(n_windows)
+            ]
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            evaluated = list(pool.map(lambda window: window.evaluate(), windows))
+
+        window_summaries: List[Dict[str, Any]] = []
+        frames = []
+        for w, ((train, _), window, (metrics_w, _)) in enumerate(zip(views, windows, evaluated)):
+            last = train.last_index()
+            cutoff = pd.Timestamp(train.ds[last[last >= 0]].max())
+            window_summaries.append({
+                "window": w,
+                "cutoff": cutoff,
+                "n_train_rows": train.n_rows,
+                "metrics": metrics_w,
+            })
+            frames.append(window.preds.assign(window=w))
+        preds = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        metric_results = _mean_metrics([m for m, _ in evaluated])
+
+        logger.info(f"Cross validation finished. Mean metrics: {metric_results}")
+
+        if store is not None and trial_id is not None:
+            store.insert_backtest_windows(
+                trial_id,
+                [{**summary, "horizon": horizon, "step_size": step_size, "refit": bool(refit)}
+                 for summary in window_summaries],
+            )
+            store.bulk_insert_model_metrics(
+                trial_id,
+                [(name, value, "cv", None) for name, value in metric_results.items() if np.isfinite(value)],
+            )
+
+        log_run_end(
+            run_id=run_id,
+            status="success",
+            metrics=metric_results,
+            best_params={},
+            model_properties={"models": models_info, "cross_validation": cv_config},
+            resource_after=_get_resource_snapshot()
+        )
+
+        meta = {
+            "run_id": run_id,
+            "model_name": model_name,
+            "backend": backend,
+            "duration_seconds": time.time() - start_time,
+            "metrics": metric_results,
+            "cross_validation": cv_config,
+            "windows": window_summaries,
+            "evaluations": [e for _, e in evaluated],
+            "status": "success",
+            "agent_metadata": agent_metadata or {},
+            "params": kwargs
+        }
+        return preds, meta
+
+    except Exception as e:
+        logger.error(f"Cross validation failed with error: {e}")
+        log_run_error(run_id=run_id, exc=e)
+        raise e
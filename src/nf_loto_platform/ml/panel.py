@@ -0,0 +1,236 @@
+"""列指向 (columnar) のパネルデータ構造.
+
+``unique_id, ds, y`` 形式の long DataFrame を、
+
+- ``(unique_id, ds)`` 順にソートされた連続配列 (ds / y)
+- 系列ごとの ``[start, stop)`` オフセット
+
+として保持する。学習/テスト分割・tail・予測値と実測値の突き合わせを
+``groupby().apply`` や DataFrame の merge を使わずにインデックス演算だけで行う。
+
+分割や tail で得られるパネルは基底配列を共有するビューであり、
+行データのコピーは発生しない。DataFrame が必要な場合
+(NeuralForecast への入力など) のみ :meth:`ColumnarPanel.to_frame` で一度だけ
+gather して実体化する。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def _ranges_to_index(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """``[starts[i], stops[i])`` を連結した行インデックス配列を返す (Python ループなし)."""
+    lengths = np.maximum(stops - starts, 0).astype(np.int64)
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    # 出力位置 k の行は starts[i] + (k - 出力上の区間先頭) に対応する
+    out_heads = np.cumsum(lengths) - lengths
+    return np.arange(total, dtype=np.int64) + np.repeat(starts - out_heads, lengths)
+
+
+@dataclass(frozen=True)
+class ColumnarPanel:
+    """ソート済み連続配列 + 系列オフセットで表現したパネルデータ.
+
+    Attributes:
+        ids: 系列 ID (ソート済み, 形状 ``(n_series,)``)
+        starts: 各系列の先頭行 (基底配列上の位置)
+        stops: 各系列の終端行 (排他的)
+        ds: 基底の日付配列 (``datetime64[ns]``)
+        y: 基底の目的変数配列 (``float64``)
+        frame: ``(unique_id, ds)`` でソート済みの基底 DataFrame (外生変数を含む)
+    """
+
+    ids: np.ndarray
+    starts: np.ndarray
+    stops: np.ndarray
+    ds: np.ndarray
+    y: np.ndarray
+    frame: pd.DataFrame
+    id_col: str = "unique_id"
+    ts_col: str = "ds"
+    target_col: str = "y"
+
+    # ------------------------------------------------------------------
+    # 構築
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_frame(
+        cls,
+        df: pd.DataFrame,
+        id_col: str = "unique_id",
+        ts_col: str = "ds",
+        target_col: str = "y",
+    ) -> "ColumnarPanel":
+        """long 形式 DataFrame からパネルを構築する.
+
+        既に ``(id_col, ts_col)`` 順に並んでいる場合 (``load_panel_by_loto`` の出力など)
+        は並べ替えを行わない。そうでない場合も並べ替えは 1 回だけ行う。
+        """
+        missing = {id_col, ts_col, target_col}.difference(df.columns)
+        if missing:
+            raise ValueError(f"required columns are missing: {sorted(missing)}")
+
+        codes, uniques = pd.factorize(df[id_col], sort=True)
+        ds = pd.to_datetime(df[ts_col]).to_numpy(dtype="datetime64[ns]")
+        ds_i8 = ds.view(np.int64)
+
+        frame = df
+        if len(codes) > 1:
+            dc = np.diff(codes)
+            ordered = (dc > 0) | ((dc == 0) & (np.diff(ds_i8) >= 0))
+            if not ordered.all():
+                order = np.lexsort((ds_i8, codes))
+                codes = codes[order]
+                ds = ds[order]
+                frame = df.take(order)
+        frame = frame.reset_index(drop=True)
+
+        y = pd.to_numeric(frame[target_col], errors="coerce").to_numpy(dtype=float)
+        counts = np.bincount(codes, minlength=len(uniques)).astype(np.int64)
+        stops = np.cumsum(counts)
+        starts = stops - counts
+
+        return cls(
+            ids=np.asarray(uniques, dtype=object),
+            starts=starts,
+            stops=stops,
+            ds=ds,
+            y=y,
+            frame=frame,
+            id_col=id_col,
+            ts_col=ts_col,
+            target_col=target_col,
+        )
+
+    # ------------------------------------------------------------------
+    # 基本プロパティ
+    # ------------------------------------------------------------------
+    @property
+    def n_series(self) -> int:
+        return int(len(self.ids))
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return self.stops - self.starts
+
+    @property
+    def n_rows(self) -> int:
+        return int(self.lengths.sum())
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def row_index(self) -> np.ndarray:
+        """このビューに含まれる行の基底配列上の位置 (``(unique_id, ds)`` 順)."""
+        return _ranges_to_index(self.starts, self.stops)
+
+    def series_codes(self) -> np.ndarray:
+        """:meth:`row_index` の各行が属する系列番号."""
+        return np.repeat(np.arange(self.n_series), self.lengths)
+
+    # ------------------------------------------------------------------
+    # ビュー操作 (コピーなし)
+    # ------------------------------------------------------------------
+    def _with_bounds(self, starts: np.ndarray, stops: np.ndarray) -> "ColumnarPanel":
+        return replace(self, starts=starts, stops=stops)
+
+    def head(self, drop_last: int) -> "ColumnarPanel":
+        """各系列の末尾 ``drop_last`` 点を除いたビュー (``x.iloc[:-drop_last]`` 相当)."""
+        if drop_last <= 0:
+            return self
+        return self._with_bounds(self.starts, np.maximum(self.starts, self.stops - drop_last))
+
+    def tail(self, n: int) -> "ColumnarPanel":
+        """各系列の末尾 ``n`` 点のビュー (``groupby().tail(n)`` 相当)."""
+        n = max(int(n), 0)
+        return self._with_bounds(np.maximum(self.starts, self.stops - n), self.stops)
+
+    def split(self, horizon: int) -> Tuple["ColumnarPanel", "ColumnarPanel"]:
+        """学習用 (末尾 horizon 点を除く) とテスト用 (末尾 horizon 点) のビューを返す."""
+        return self.head(horizon), self.tail(horizon)
+
+    def cutoff_views(
+        self, horizon: int, n_windows: int = 1, step_size: Optional[int] = None
+    ) -> List[Tuple["ColumnarPanel", "ColumnarPanel"]]:
+        """ローリングオリジン検証用の ``(学習, テスト)`` ビューを古いカットオフから順に返す.
+
+        ウィンドウ w (0 始まり) のテストは、各系列の末尾から
+        ``step_size * (n_windows - 1 - w)`` 点手前で終わる ``horizon`` 点。
+        学習はその直前までの全履歴。すべて同じ基底配列のビューでコピーは発生しない。
+        """
+        if horizon <= 0 or n_windows <= 0:
+            raise ValueError("horizon and n_windows must be positive")
+        step = horizon if step_size is None else int(step_size)
+        if step <= 0:
+            raise ValueError("step_size must be positive")
+        views = []
+        for w in range(n_windows):
+            offset = step * (n_windows - 1 - w)
+            upto = self.head(offset)
+            views.append((upto.head(horizon), upto.tail(horizon)))
+        return views
+
+    def series(self, i: int) -> Tuple[object, np.ndarray, np.ndarray]:
+        """i 番目の系列の ``(unique_id, ds, y)`` をビューとして返す."""
+        sl = slice(int(self.starts[i]), int(self.stops[i]))
+        return self.ids[i], self.ds[sl], self.y[sl]
+
+    def iter_series(self) -> Iterator[Tuple[object, np.ndarray, np.ndarray]]:
+        """空でない系列について ``(unique_id, ds, y)`` のビューを順に返す."""
+        for i in range(self.n_series):
+            if self.stops[i] > self.starts[i]:
+                yield self.series(i)
+
+    def last_index(self) -> np.ndarray:
+        """各系列の最終行の位置 (空系列は -1)."""
+        return np.where(self.stops > self.starts, self.stops - 1, -1)
+
+    # ------------------------------------------------------------------
+    # 実体化・突き合わせ
+    # ------------------------------------------------------------------
+    def to_frame(self) -> pd.DataFrame:
+        """ビューを DataFrame として実体化する (外生変数列も含む)."""
+        idx = self.row_index()
+        if len(idx) == len(self.frame):
+            return self.frame
+        return self.frame.take(idx).reset_index(drop=True)
+
+    def lookup(self, unique_ids: Sequence[object], ds: Sequence[object]) -> np.ndarray:
+        """``(unique_id, ds)`` の組に対応する基底配列上の行位置を返す.
+
+        ビューに存在しない組は -1 となる。DataFrame の left merge と同じ
+        突き合わせを、系列番号と日付ランクを合成したキーの二分探索で行う。
+        """
+        q_codes = pd.Index(self.ids).get_indexer(pd.Index(unique_ids, dtype=object))
+        q_ds = pd.to_datetime(pd.Index(ds)).to_numpy(dtype="datetime64[ns]")
+        result = np.full(len(q_codes), -1, dtype=np.int64)
+
+        idx = self.row_index()
+        if len(idx) == 0 or len(q_codes) == 0:
+            return result
+
+        v_ds = self.ds[idx]
+        ranks, inverse = np.unique(np.concatenate([v_ds, q_ds]), return_inverse=True)
+        n_ranks = np.int64(len(ranks))
+        v_key = self.series_codes() * n_ranks + inverse[: len(idx)]
+        q_key = q_codes.astype(np.int64) * n_ranks + inverse[len(idx):]
+
+        pos = np.clip(np.searchsorted(v_key, q_key), 0, len(v_key) - 1)
+        matched = (q_codes >= 0) & (v_key[pos] == q_key)
+        result[matched] = idx[pos[matched]]
+        return result
+
+    def align(self, unique_ids: Sequence[object], ds: Sequence[object]) -> np.ndarray:
+        """``(unique_id, ds)`` の組に対応する実測値を返す (該当なしは NaN)."""
+        pos = self.lookup(unique_ids, ds)
+        out = np.full(len(pos), np.nan)
+        hit = pos >= 0
+        out[hit] = self.y[pos[hit]]
+        return out
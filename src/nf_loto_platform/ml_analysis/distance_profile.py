@@ -0,0 +1,322 @@
+"""スライディングウィンドウ距離プロファイル (MASS) の計算エンジン.
+
+長さ ``n`` の系列と長さ ``m`` のクエリについて、全 ``n - m + 1`` 個の窓との
+ユークリッド距離 (距離プロファイル) を 1 パスで計算する。
+
+    ||w_i - q||^2 = ||w_i||^2 - 2 <w_i, q> + ||q||^2
+
+- ``<w_i, q>`` (スライディング内積) は FFT による畳み込みで O(n log n)
+  (クエリが短い場合は窓ビューと行列積の方が速く誤差も小さいのでそちらを使う)
+- ``||w_i||^2`` と窓ごとの平均・標準偏差は累積和から O(n)
+- z 正規化距離 (形状のみを比較) は MASS の式
+  ``d^2 = 2m (1 - (<w_i, q> - m μ_w μ_q) / (m σ_w σ_q))`` で計算する
+
+上位 k 件の選択は ``argpartition`` で行い、全件のソートは行わない。
+:func:`search_panel` はメモリ上のパネルの全系列を、同じ長さの系列ごとに
+2 次元配列へ積んでまとめて検索する (系列ごとの DB 再取得・マスク抽出なし)。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 類似検索結果の列 (loto_repository.search_similar_patterns / RagAgent と共通)
+MATCH_COLUMNS = ["ds", "similarity", "next_val", "window_values"]
+PANEL_MATCH_COLUMNS = ["unique_id", "rank"] + MATCH_COLUMNS
+PANEL_STATS_COLUMNS = ["query_last", "n_matches", "up_probability", "mean_next_val"]
+
+# クエリ長がこれ以下なら FFT ではなく窓ビュー @ クエリで内積を計算する
+_DIRECT_DOT_MAX_M = 64
+
+
+def _as_1d(x) -> np.ndarray:
+    arr = np.asarray(x, dtype=float)
+    if arr.ndim != 1:
+        raise ValueError(f"expected a 1-D array, got shape {arr.shape}")
+    return arr
+
+
+def rolling_sum(x: np.ndarray, m: int) -> np.ndarray:
+    """長さ m の窓ごとの総和 (累積和の差分). 2 次元配列は行ごとに計算する."""
+    x = np.asarray(x, dtype=float)
+    c = np.cumsum(x, axis=-1)
+    c = np.concatenate((np.zeros(x.shape[:-1] + (1,)), c), axis=-1)
+    return c[..., m:] - c[..., :-m]
+
+
+def rolling_mean_std(x: np.ndarray, m: int) -> Tuple[np.ndarray, np.ndarray]:
+    """長さ m の窓ごとの平均と (母) 標準偏差."""
+    x = np.asarray(x, dtype=float)
+    # 桁落ちを抑えるため (行ごとの) 全体平均を引いてから二乗和を取る
+    shift = x.mean(axis=-1, keepdims=True) if x.shape[-1] else 0.0
+    xc = x - shift
+    mean_c = rolling_sum(xc, m) / m
+    var = rolling_sum(xc * xc, m) / m - mean_c ** 2
+    return mean_c + shift, np.sqrt(np.maximum(var, 0.0))
+
+
+def _as_batch(series, query) -> Tuple[np.ndarray, np.ndarray]:
+    t = np.asarray(series, dtype=float)
+    q = np.asarray(query, dtype=float)
+    if t.ndim not in (1, 2) or q.ndim != t.ndim or q.shape[:-1] != t.shape[:-1]:
+        raise ValueError(f"incompatible series/query shapes: {t.shape} vs {q.shape}")
+    return t, q
+
+
+def sliding_dot_product(query, series) -> np.ndarray:
+    """``series`` の各窓とクエリの内積 (長さ ``n - m + 1``).
+
+    2 次元配列 (系列数, n) / (系列数, m) を渡すと行ごとの内積をまとめて計算する。
+    """
+    t, q = _as_batch(series, query)
+    m, n = q.shape[-1], t.shape[-1]
+    if m == 0 or n < m:
+        return np.empty(t.shape[:-1] + (0,))
+    if m <= _DIRECT_DOT_MAX_M:
+        windows = np.lib.stride_tricks.sliding_window_view(t, m, axis=-1)
+        return (windows @ q[..., :, None])[..., 0]
+    size = 1 << int(np.ceil(np.log2(n + m)))
+    prod = np.fft.irfft(np.fft.rfft(t, size, axis=-1) * np.fft.rfft(q[..., ::-1], size, axis=-1), size, axis=-1)
+    return prod[..., m - 1 : n]
+
+
+def distance_profile(series, query, normalize: bool = False) -> np.ndarray:
+    """全窓とのユークリッド距離を返す.
+
+    Args:
+        series: 検索対象の系列 (長さ n)。同じ長さの系列を積んだ (系列数, n) も可。
+        query: クエリ (長さ m)。series が 2 次元の場合は行ごとのクエリ (系列数, m)。
+        normalize: True の場合は窓・クエリをそれぞれ z 正規化した距離 (形状の類似度)
+
+    Returns:
+        長さ ``n - m + 1`` の距離配列 (2 次元入力なら行ごと)。i 番目は ``series[..., i:i+m]`` との距離。
+    """
+    t, q = _as_batch(series, query)
+    m = q.shape[-1]
+    if m == 0 or t.shape[-1] < m:
+        return np.empty(t.shape[:-1] + (0,))
+
+    qt = sliding_dot_product(q, t)
+
+    if not normalize:
+        w_sq = rolling_sum(t * t, m)
+        d2 = w_sq - 2.0 * qt + (q * q).sum(axis=-1, keepdims=True)
+        return np.sqrt(np.maximum(d2, 0.0))
+
+    mu_w, sd_w = rolling_mean_std(t, m)
+    mu_q = q.mean(axis=-1, keepdims=True)
+    sd_q = q.std(axis=-1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = (qt - m * mu_w * mu_q) / (m * sd_w * sd_q)
+    d2 = 2.0 * m * (1.0 - np.clip(corr, -1.0, 1.0))
+    # 定数窓/定数クエリ: 両方定数なら同一形状 (距離 0)、片方のみなら sqrt(m)
+    flat_w = sd_w <= 1e-12 * np.maximum(1.0, np.abs(t).max(axis=-1, keepdims=True))
+    flat_q = sd_q <= 1e-12 * np.maximum(1.0, np.abs(q).max(axis=-1, keepdims=True))
+    d2 = np.where(flat_q, np.where(flat_w, 0.0, float(m)), np.where(flat_w, float(m), d2))
+    return np.sqrt(np.maximum(d2, 0.0))
+
+
+def exact_distances(series, query, starts: np.ndarray, normalize: bool = False) -> np.ndarray:
+    """指定した窓についてのみ距離を直接計算する (FFT の丸め誤差を含まない)."""
+    t = _as_1d(series)
+    q = _as_1d(query)
+    m = len(q)
+    if len(starts) == 0:
+        return np.empty(0)
+    windows = t[np.asarray(starts)[:, None] + np.arange(m)]
+    if normalize:
+        def _z(a: np.ndarray) -> np.ndarray:
+            sd = a.std(axis=-1, keepdims=True)
+            return np.where(sd > 0, (a - a.mean(axis=-1, keepdims=True)) / np.where(sd > 0, sd, 1.0), 0.0)
+
+        diff = _z(windows) - _z(q[None, :])
+        # 片方のみ定数の場合は distance_profile と同じく sqrt(m) に揃える
+        flat_w = windows.std(axis=-1) == 0
+        flat_q = q.std() == 0
+        d = np.sqrt((diff * diff).sum(axis=-1))
+        return np.where(flat_w != flat_q, np.sqrt(m), d)
+    diff = windows - q[None, :]
+    return np.sqrt((diff * diff).sum(axis=-1))
+
+
+def top_k_indices(profile: np.ndarray, k: int) -> np.ndarray:
+    """距離の小さい順に上位 k 個の位置を返す (同距離は位置の小さい順)."""
+    profile = np.asarray(profile, dtype=float)
+    profile = np.where(np.isnan(profile), np.inf, profile)
+    n = len(profile)
+    k = min(int(k), n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(profile, k - 1)[:k]
+        # 境界と同じ距離の要素は位置の小さいものを優先する
+        kth = profile[candidates].max()
+        ties = np.flatnonzero(profile == kth)
+        candidates = np.union1d(candidates[profile[candidates] < kth], ties)
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, profile[candidates]))
+    return candidates[order][:k].astype(np.int64)
+
+
+def find_similar_windows(
+    series,
+    query,
+    top_k: int = 5,
+    normalize: bool = False,
+    max_start: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """クエリに最も近い窓の開始位置と距離を返す.
+
+    Args:
+        series: 検索対象の系列
+        query: クエリ
+        top_k: 返す件数
+        normalize: z 正規化距離を使うか
+        max_start: 窓の開始位置の上限 (排他的)。直後の値が必要な場合は ``n - m`` を指定する。
+
+    Returns:
+        (開始位置, 距離) のタプル。距離の昇順。
+    """
+    profile = distance_profile(_as_1d(series), _as_1d(query), normalize=normalize)
+    if max_start is not None:
+        profile = profile[: max(int(max_start), 0)]
+    return _rerank(series, query, profile, top_k, normalize)
+
+
+def _rerank(series, query, profile: np.ndarray, top_k: int, normalize: bool) -> Tuple[np.ndarray, np.ndarray]:
+    if len(profile) == 0 or top_k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    # 近似プロファイルで少し多めに候補を取り、候補だけ厳密な距離で並べ直す
+    candidates = top_k_indices(profile, min(len(profile), 2 * int(top_k) + 8))
+    exact = exact_distances(series, query, candidates, normalize=normalize)
+    order = np.lexsort((candidates, exact))[:top_k]
+    return candidates[order], exact[order]
+
+
+def build_match_frame(ds: np.ndarray, y: np.ndarray, starts: np.ndarray, dist: np.ndarray, m: int) -> pd.DataFrame:
+    """検索結果 (窓の開始位置と距離) を類似検索の出力形式に整形する.
+
+    - ds: パターン終了日
+    - similarity: 1 / (1 + 距離) (距離0 -> 1.0, 距離大 -> 0.0)
+    - next_val: パターンの直後の値
+    - window_values: マッチした区間の値 (上位件数分のみ生成)
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    if len(starts) == 0:
+        return pd.DataFrame(columns=MATCH_COLUMNS)
+    return pd.DataFrame({
+        "ds": ds[starts + m - 1],
+        "similarity": 1.0 / (1.0 + np.asarray(dist, dtype=float)),
+        "next_val": y[starts + m],
+        "window_values": [y[i : i + m].tolist() for i in starts],
+    })
+
+
+@dataclass
+class PanelMatches:
+    """複数系列の類似検索結果.
+
+    Attributes:
+        matches: 系列ごとの上位マッチ (``PANEL_MATCH_COLUMNS``、系列内は rank 順)
+        stats: unique_id をインデックスとする系列ごとの統計 (``PANEL_STATS_COLUMNS``)
+            - query_last: クエリの最終値
+            - n_matches: マッチ件数
+            - up_probability: 直後の値がクエリの最終値を上回ったマッチの割合
+            - mean_next_val: 直後の値の平均
+    """
+
+    matches: pd.DataFrame
+    stats: pd.DataFrame
+
+    @classmethod
+    def from_matches(cls, matches: pd.DataFrame, query_last: Mapping[str, float]) -> "PanelMatches":
+        """マッチ一覧とクエリの最終値から統計を集計して組み立てる."""
+        last = pd.Series(dict(query_last), dtype=float)
+        if matches.empty:
+            stats = pd.DataFrame(columns=PANEL_STATS_COLUMNS, index=pd.Index([], name="unique_id"))
+            return cls(pd.DataFrame(columns=PANEL_MATCH_COLUMNS), stats)
+        next_val = matches["next_val"].astype(float)
+        grouped = next_val.groupby(matches["unique_id"], sort=False)
+        up = (next_val > matches["unique_id"].map(last)).groupby(matches["unique_id"], sort=False)
+        stats = pd.DataFrame({
+            "n_matches": grouped.size(),
+            "up_probability": up.mean(),
+            "mean_next_val": grouped.mean(),
+        })
+        stats.insert(0, "query_last", last.reindex(stats.index))
+        stats.index.name = "unique_id"
+        return cls(matches.reset_index(drop=True), stats)
+
+    def for_series(self, unique_id: str) -> pd.DataFrame:
+        """1 系列分のマッチ (``MATCH_COLUMNS``) を返す."""
+        if self.matches.empty:
+            return pd.DataFrame(columns=MATCH_COLUMNS)
+        rows = self.matches[self.matches["unique_id"] == unique_id]
+        return rows[MATCH_COLUMNS].reset_index(drop=True)
+
+
+def _tag_matches(frame: pd.DataFrame, unique_id: str) -> pd.DataFrame:
+    frame.insert(0, "rank", np.arange(1, len(frame) + 1))
+    frame.insert(0, "unique_id", unique_id)
+    return frame
+
+
+def search_panel(
+    panel: pd.DataFrame,
+    queries: Mapping[str, Sequence[float]],
+    top_k: int = 5,
+    normalize: bool = False,
+) -> PanelMatches:
+    """パネル (unique_id, ds, y) の複数系列をまとめて類似検索する.
+
+    系列ごとに、その系列の履歴からクエリに近い窓を探す
+    (:func:`loto_repository.search_similar_patterns` と同じく直後の値がある窓のみ)。
+    履歴長とクエリ長が同じ系列は 2 次元配列に積んで距離プロファイルを一括計算する。
+
+    Args:
+        panel: 取得済みのパネルデータ
+        queries: unique_id -> クエリ系列
+        top_k: 系列ごとの件数
+        normalize: z 正規化距離を使うか
+
+    Returns:
+        :class:`PanelMatches`。履歴がクエリ長 + 1 に満たない系列は含まれない。
+    """
+    frame = panel[panel["unique_id"].isin(list(queries))].sort_values(["unique_id", "ds"], kind="stable")
+    uids = frame["unique_id"].to_numpy()
+    y_all = pd.to_numeric(frame["y"], errors="coerce").fillna(0).to_numpy(dtype=float)
+    ds_all = pd.to_datetime(frame["ds"]).to_numpy()
+    # ソート済みなので各系列は連続区間になる
+    change = np.flatnonzero(uids[1:] != uids[:-1]) + 1
+    bounds = np.concatenate(([0], change, [len(uids)])) if len(uids) else np.empty(0, dtype=np.int64)
+    segments = {uids[lo]: (lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:])}
+
+    q_vecs = {uid: np.asarray(q, dtype=float) for uid, q in queries.items()}
+    groups: Dict[Tuple[int, int], List[str]] = {}
+    for uid, q in q_vecs.items():
+        if uid not in segments or len(q) == 0:
+            continue
+        lo, hi = segments[uid]
+        if hi - lo < len(q) + 1:
+            continue
+        groups.setdefault((hi - lo, len(q)), []).append(uid)
+
+    found: Dict[str, pd.DataFrame] = {}
+    for (n, m), members in groups.items():
+        Y = np.stack([y_all[slice(*segments[uid])] for uid in members])
+        Q = np.stack([q_vecs[uid] for uid in members])
+        profiles = distance_profile(Y, Q, normalize=normalize)[:, : n - m]
+        for uid, y, q, profile in zip(members, Y, Q, profiles):
+            starts, dist = _rerank(y, q, profile, top_k, normalize)
+            ds = ds_all[slice(*segments[uid])]
+            found[uid] = _tag_matches(build_match_frame(ds, y, starts, dist, m), uid)
+
+    frames = [found[uid] for uid in q_vecs if uid in found and not found[uid].empty]
+    matches = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=PANEL_MATCH_COLUMNS)
+    query_last = {uid: float(q[-1]) for uid, q in q_vecs.items() if uid in found}
+    return PanelMatches.from_matches(matches, query_last)
@@ -3,16 +3,107 @@
 
 - build_error_breakdown: セグメント単位 (例: loto, unique_id) で誤差指標を集計
 - build_time_series_metrics: 時系列単位 (例: 月次) で誤差指標を集計
+- group_error_metrics: 任意の多段キー + 時間バケットでの集計 (上記 2 つの共通エンジン)
+
+集計はグループキーを 1 回だけ因子化 (``groupby().ngroup()``) し、絶対誤差・二乗誤差・
+sMAPE 項の総和を ``np.bincount`` で一括に求める。グループごとに Python の
+コールバックを呼ばないため、大きな予測アーカイブでも線形時間で終わる。
 
 将来的には特徴量分布や外生変数の統計もここで扱う。
 """
 from __future__ import annotations
 
-from typing import Iterable, Sequence
+from typing import Dict, Optional, Sequence
 
+import numpy as np
 import pandas as pd
 
-from .metrics import mae, rmse, smape
+from .metrics import SMAPE, pointwise_terms
+
+METRIC_COLUMNS = ["mae", "rmse", "smape"]
+
+
+def segment_reduce(
+    codes: np.ndarray,
+    n_groups: int,
+    y: np.ndarray,
+    yhat: np.ndarray,
+    eps: float = 1e-8,
+) -> Dict[str, np.ndarray]:
+    """グループ番号 ``codes`` (0..n_groups-1) ごとの mae / rmse / smape を返す.
+
+    値は ``metrics`` の純粋関数と同じ定義 (欠損を含むグループは NaN、行の無いグループも NaN)。
+    """
+    codes = np.asarray(codes, dtype=np.intp)
+    y = np.asarray(y, dtype=float)
+    yhat = np.asarray(yhat, dtype=float)
+    count = np.bincount(codes, minlength=n_groups).astype(float)
+
+    def _mean(terms: np.ndarray, scale: float = 1.0) -> np.ndarray:
+        total = np.bincount(codes, weights=terms, minlength=n_groups)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(count > 0, scale * total / np.maximum(count, 1.0), np.nan)
+
+    return {
+        "mae": _mean(pointwise_terms("mae", y, yhat)),
+        "rmse": np.sqrt(_mean(pointwise_terms("rmse", y, yhat))),
+        "smape": _mean(pointwise_terms("smape", y, yhat, eps), SMAPE.scale),
+    }
+
+
+def group_error_metrics(
+    df: pd.DataFrame,
+    group_keys: Sequence[str] = (),
+    freq: Optional[str] = None,
+    y_col: str = "y",
+    yhat_col: str = "y_hat",
+    ds_col: str = "ds",
+    sort: bool = False,
+) -> pd.DataFrame:
+    """多段キー (+ 任意で freq 単位の時間バケット) ごとの誤差指標を 1 回の走査で集計する.
+
+    Args:
+        df: 予測結果を含む DataFrame
+        group_keys: 集計キーとなるカラム名 (欠損値もひとつのグループとして扱う)
+        freq: 指定すると ds_col を freq 単位でバケット化したものを最後のキーに加える
+        y_col: 実測値カラム名
+        yhat_col: 予測値カラム名
+        ds_col: 日付カラム名 (freq 指定時のみ使用)
+        sort: キーでソートするか (False の場合は出現順)
+
+    Returns:
+        group_keys (+ "ds") + ["mae", "rmse", "smape"] を持つ DataFrame。
+    """
+    keys = list(group_keys)
+    required = set(keys) | {y_col, yhat_col} | ({ds_col} if freq is not None else set())
+    missing = required.difference(df.columns)
+    if missing:
+        raise ValueError(f"必要なカラムが不足しています: {missing}")
+
+    by: list = list(keys)
+    if freq is not None:
+        if not pd.api.types.is_datetime64_any_dtype(df[ds_col]):
+            df = df.assign(**{ds_col: pd.to_datetime(df[ds_col])})
+        by.append(pd.Grouper(key=ds_col, freq=freq))
+
+    grouped = df.groupby(by, sort=sort, dropna=False)
+    # size() の index は ngroup() の番号順に並ぶ (時間バケットは空のバケットも含む)
+    groups = grouped.size().index
+    codes = grouped.ngroup().to_numpy(dtype=float)
+    valid = ~np.isnan(codes)  # ds が欠損の行はどのバケットにも入らない
+    values = segment_reduce(
+        codes[valid],
+        len(groups),
+        df[y_col].to_numpy(dtype=float)[valid],
+        df[yhat_col].to_numpy(dtype=float)[valid],
+    )
+
+    out = groups.to_frame(index=False)
+    if freq is not None:
+        out = out.rename(columns={ds_col: "ds"})
+    for name in METRIC_COLUMNS:
+        out[name] = values[name]
+    return out
 
 
 def build_error_breakdown(
@@ -32,25 +123,7 @@ def build_error_breakdown(
     Returns:
         group_keys + ["mae", "rmse", "smape"] を持つ DataFrame。
     """
-    required = set(group_keys) | {y_col, yhat_col}
-    missing = required.difference(df.columns)
-    if missing:
-        raise ValueError(f"必要なカラムが不足しています: {missing}")
-
-    def _agg(group: pd.DataFrame) -> pd.Series:
-        y = group[y_col].to_numpy()
-        yhat = group[yhat_col].to_numpy()
-        return pd.Series(
-            {
-                "mae": mae(y, yhat),
-                "rmse": rmse(y, yhat),
-                "smape": smape(y, yhat),
-            }
-        )
-
-    grouped = df.groupby(list(group_keys), dropna=False, sort=False)
-    out = grouped.apply(_agg).reset_index()
-    return out
+    return group_error_metrics(df, group_keys=group_keys, y_col=y_col, yhat_col=yhat_col, sort=False)
 
 
 def build_time_series_metrics(
@@ -73,27 +146,4 @@ def build_time_series_metrics(
         ["ds", "mae", "rmse", "smape"] を持つ DataFrame。
         ds は resample 後の代表日時（period の左端）になる。
     """
-    required = {y_col, yhat_col, ds_col}
-    missing = required.difference(df.columns)
-    if missing:
-        raise ValueError(f"必要なカラムが不足しています: {missing}")
-
-    tmp = df.copy()
-    tmp[ds_col] = pd.to_datetime(tmp[ds_col])
-
-    tmp = tmp.set_index(ds_col)
-
-    def _agg(group: pd.DataFrame) -> pd.Series:
-        y = group[y_col].to_numpy()
-        yhat = group[yhat_col].to_numpy()
-        return pd.Series(
-            {
-                "mae": mae(y, yhat),
-                "rmse": rmse(y, yhat),
-                "smape": smape(y, yhat),
-            }
-        )
-
-    out = tmp.resample(freq).apply(_agg)
-    out = out.reset_index().rename(columns={ds_col: "ds"})
-    return out
+    return group_error_metrics(df, freq=freq, y_col=y_col, yhat_col=yhat_col, ds_col=ds_col)
@@ -0,0 +1,237 @@
+"""(系列 × ホライズン) 行列に対する一括評価エンジン.
+
+``run_loto_experiment`` は予測を 1 本のベクトルに平坦化してメトリクスを計算していたため、
+系列別・ステップ別の内訳を見るには再計算が必要だった。ここでは整列済みの
+``(n_series, h)`` 行列 (実測・予測・区間) を受け取り、登録済みの全メトリクスについて
+
+- 全体 (global)
+- 系列別 (per-series)
+- ホライズンのステップ別 (per-step, 1 始まり)
+
+の値を、要素ごとの寄与行列を 1 回作って各軸で総和を取るだけで求める。
+欠損 (NaN) の要素は各メトリクスのマスクで除外される。
+
+結果は :meth:`EvaluationResult.metric_rows` で ``ts_research.model_metrics`` の行
+(``metric_name, metric_value, split, step, unique_id``) に変換でき、
+``TSResearchStore.insert_evaluation`` で一括書き込みできる。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .metrics import MAPE, SMAPE, pointwise_terms
+
+#: 要素ごとの寄与とマスクを返す関数: ``fn(y, yhat, lower, upper) -> (terms, mask)``.
+#: 区間を必要とするメトリクスは lower/upper が None のとき None を返す。
+TermsFn = Callable[
+    [np.ndarray, np.ndarray, Optional[np.ndarray], Optional[np.ndarray]],
+    Optional[Tuple[np.ndarray, np.ndarray]],
+]
+
+
+@dataclass(frozen=True)
+class MetricSpec:
+    """行列評価に登録するメトリクス: 値 = finalize(scale * Σ terms / Σ mask)."""
+
+    name: str
+    terms: TermsFn
+    scale: float = 1.0
+    finalize: Optional[Callable[[np.ndarray], np.ndarray]] = None
+
+
+def _valid(y: np.ndarray, yhat: np.ndarray) -> np.ndarray:
+    return ~(np.isnan(y) | np.isnan(yhat))
+
+
+def _pointwise(name: str) -> TermsFn:
+    def _terms(y, yhat, lower, upper):
+        return pointwise_terms(name, y, yhat), _valid(y, yhat)
+
+    return _terms
+
+
+def _directional_terms(y, yhat, lower, upper):
+    # ステップ t (>=1) の寄与は t-1 -> t の変化方向の一致。ステップ 0 は常にマスク外。
+    terms = np.zeros_like(y)
+    mask = np.zeros(y.shape, dtype=bool)
+    terms[:, 1:] = np.sign(np.diff(y, axis=1)) == np.sign(np.diff(yhat, axis=1))
+    valid = _valid(y, yhat)
+    mask[:, 1:] = valid[:, 1:] & valid[:, :-1]
+    return terms, mask
+
+
+def _coverage_terms(y, yhat, lower, upper):
+    if lower is None or upper is None:
+        return None
+    mask = ~(np.isnan(y) | np.isnan(lower) | np.isnan(upper))
+    return ((y >= lower) & (y <= upper)).astype(float), mask
+
+
+METRICS: Dict[str, MetricSpec] = {}
+
+
+def register_metric(spec: MetricSpec) -> MetricSpec:
+    """``evaluate_all`` が計算するメトリクスを登録する (同名は上書き)."""
+    METRICS[spec.name] = spec
+    return spec
+
+
+register_metric(MetricSpec("mae", _pointwise("mae")))
+register_metric(MetricSpec("rmse", _pointwise("rmse"), finalize=np.sqrt))
+register_metric(MetricSpec("smape", _pointwise("smape"), scale=SMAPE.scale))
+register_metric(MetricSpec("mape", _pointwise("mape"), scale=MAPE.scale))
+register_metric(MetricSpec("directional_accuracy", _directional_terms))
+register_metric(MetricSpec("coverage_90", _coverage_terms))
+
+
+@dataclass
+class EvaluationResult:
+    """``evaluate_all`` の結果 (メトリクス × {全体, 系列, ステップ})."""
+
+    ids: np.ndarray
+    metric_names: List[str]
+    overall_values: np.ndarray  # (n_metrics,)
+    series_values: np.ndarray  # (n_metrics, n_series)
+    step_values: np.ndarray  # (n_metrics, h)
+    counts: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def horizon(self) -> int:
+        return int(self.step_values.shape[1])
+
+    def overall(self) -> Dict[str, float]:
+        """全体の値 (``meta["metrics"]`` と同じ形の辞書)."""
+        return {name: float(v) for name, v in zip(self.metric_names, self.overall_values)}
+
+    def per_series(self) -> pd.DataFrame:
+        """系列別の値 (index: unique_id, columns: メトリクス名)."""
+        return pd.DataFrame(self.series_values.T, index=pd.Index(self.ids, name="unique_id"), columns=self.metric_names)
+
+    def per_step(self) -> pd.DataFrame:
+        """ステップ別の値 (index: 1 始まりの step, columns: メトリクス名)."""
+        steps = pd.RangeIndex(1, self.horizon + 1, name="step")
+        return pd.DataFrame(self.step_values.T, index=steps, columns=self.metric_names)
+
+    def metric_rows(self, split: str = "val") -> List[Tuple[str, float, str, Optional[int], Optional[str]]]:
+        """``model_metrics`` 用の ``(metric_name, metric_value, split, step, unique_id)`` 行.
+
+        全体は ``step=NULL, unique_id=NULL``、ステップ別は ``step=1..h``、
+        系列別は ``unique_id`` に系列 ID を入れる (``split`` はどの行も同じ値)。
+        値が NaN の行 (データ不足) は出力しない。
+        """
+        rows: List[Tuple[str, float, str, Optional[int], Optional[str]]] = []
+        for k, name in enumerate(self.metric_names):
+            if np.isfinite(self.overall_values[k]):
+                rows.append((name, float(self.overall_values[k]), split, None, None))
+            for step, value in enumerate(self.step_values[k].tolist(), start=1):
+                if np.isfinite(value):
+                    rows.append((name, value, split, step, None))
+            for uid, value in zip(self.ids.tolist(), self.series_values[k].tolist()):
+                if np.isfinite(value):
+                    rows.append((name, value, split, None, uid))
+        return rows
+
+
+def _reduce(terms: np.ndarray, mask: np.ndarray, axis: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+    total = np.where(mask, terms, 0.0).sum(axis=axis)
+    count = mask.sum(axis=axis)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.where(count > 0, total / np.maximum(count, 1), np.nan)
+    return mean, count
+
+
+def _as_matrix(x, shape: Optional[Tuple[int, int]] = None) -> np.ndarray:
+    arr = np.asarray(x, dtype=float)
+    if arr.ndim == 1:
+        arr = arr.reshape(1, -1) if shape is None else arr.reshape(shape)
+    if shape is not None and arr.shape != shape:
+        raise ValueError(f"shape mismatch: expected {shape}, got {arr.shape}")
+    return arr
+
+
+def evaluate_all(
+    y: np.ndarray,
+    yhat: np.ndarray,
+    lower: Optional[np.ndarray] = None,
+    upper: Optional[np.ndarray] = None,
+    ids: Optional[Sequence[str]] = None,
+    metrics: Optional[Sequence[str]] = None,
+) -> EvaluationResult:
+    """整列済みの ``(n_series, h)`` 行列から全メトリクスの全体・系列別・ステップ別の値を計算する.
+
+    Args:
+        y, yhat: 実測値・予測値 (欠損は NaN)
+        lower, upper: 90% 予測区間 (任意)。無い場合 coverage_90 は出力しない
+        ids: 行に対応する系列 ID (省略時は行番号)
+        metrics: 計算するメトリクス名 (省略時は登録済みの全て)
+    """
+    yhat = _as_matrix(yhat)
+    y = _as_matrix(y, yhat.shape)
+    lower = None if lower is None else _as_matrix(lower, yhat.shape)
+    upper = None if upper is None else _as_matrix(upper, yhat.shape)
+    n_series, horizon = yhat.shape
+    ids_arr = np.asarray(ids if ids is not None else np.arange(n_series)).astype(str)
+    if len(ids_arr) != n_series:
+        raise ValueError(f"len(ids)={len(ids_arr)} does not match n_series={n_series}")
+
+    names: List[str] = []
+    overall: List[float] = []
+    per_series: List[np.ndarray] = []
+    per_step: List[np.ndarray] = []
+    counts: Dict[str, int] = {}
+    for name in metrics or list(METRICS):
+        spec = METRICS[name]
+        evaluated = spec.terms(y, yhat, lower, upper)
+        if evaluated is None:
+            continue
+        terms, mask = evaluated
+        values = []
+        for axis in (None, 1, 0):
+            mean, count = _reduce(terms, mask, axis)
+            value = spec.scale * mean
+            if spec.finalize is not None:
+                value = spec.finalize(value)
+            values.append(np.asarray(value, dtype=float))
+            if axis is None:
+                counts[name] = int(count)
+        names.append(name)
+        overall.append(float(values[0]))
+        per_series.append(values[1])
+        per_step.append(values[2])
+
+    return EvaluationResult(
+        ids=ids_arr,
+        metric_names=names,
+        overall_values=np.asarray(overall, dtype=float),
+        series_values=np.asarray(per_series, dtype=float).reshape(len(names), n_series),
+        step_values=np.asarray(per_step, dtype=float).reshape(len(names), horizon),
+        counts=counts,
+    )
+
+
+def long_to_matrices(
+    df: pd.DataFrame,
+    columns: Sequence[str],
+    id_col: str = "unique_id",
+    time_col: str = "ds",
+) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """long 形式の予測フレームを ``(n_series, h)`` 行列に並べ替える.
+
+    系列は ID 順、各系列内は時刻順に並べ、長さが足りない系列は NaN で埋める。
+    Returns: ``(ids, [columns ごとの行列])``
+    """
+    ordered = df.sort_values([id_col, time_col], kind="stable")
+    codes, ids = pd.factorize(ordered[id_col], sort=True)
+    steps = ordered.groupby(id_col, sort=False).cumcount().to_numpy()
+    width = int(steps.max()) + 1 if len(steps) else 0
+    matrices = []
+    for col in columns:
+        mat = np.full((len(ids), width), np.nan)
+        mat[codes, steps] = pd.to_numeric(ordered[col], errors="coerce").to_numpy(dtype=float)
+        matrices.append(mat)
+    return np.asarray(ids).astype(str), matrices
@@ -18,11 +18,17 @@
 
 実運用では NeuralForecast 側の実装や既存の分析基盤と整合を取る必要があるが、
 ここではテストしやすい最小限の純粋関数として定義する。
+
+大量の点を扱う場合は ``MAE`` / ``RMSE`` / ``SMAPE`` / ``MAPE`` / ``Pinball`` /
+``Coverage`` / ``DirectionalAccuracy`` の集計器を使い、チャンクごとに ``update()``、
+並列ワーカーの部分状態を ``merge()``、最後に ``result()`` で値を得る。
+純粋関数はこれらの薄いラッパーである。
 """
 
 from __future__ import annotations
 
-from typing import Iterable, Sequence
+from collections.abc import Iterator
+from typing import Dict, Iterable, Optional, Sequence, Tuple
 
 import math
 
@@ -32,44 +38,260 @@ import numpy as np
 ArrayLike = Sequence[float] | np.ndarray | Iterable[float]
 
 
+def _as_array(x: ArrayLike) -> np.ndarray:
+    """1 次元 float 配列に変換する (float64 の ndarray はコピーせずビューを返す)."""
+    if isinstance(x, Iterator):
+        return np.fromiter(x, dtype=float)
+    return np.asarray(x, dtype=float).reshape(-1)
+
+
 def _to_numpy(y: ArrayLike, yhat: ArrayLike) -> tuple[np.ndarray, np.ndarray]:
-    y_arr = np.asarray(list(y), dtype=float)
-    yhat_arr = np.asarray(list(yhat), dtype=float)
+    y_arr = _as_array(y)
+    yhat_arr = _as_array(yhat)
     if y_arr.shape != yhat_arr.shape:
         raise ValueError(f"shape mismatch: y={y_arr.shape}, yhat={yhat_arr.shape}")
     return y_arr, yhat_arr
 
 
+# ---------------------------------------------------------------------------
+# ストリーミング集計 (accumulator)
+# ---------------------------------------------------------------------------
+# update() でチャンクごとに部分和だけを更新し、merge() で並列ワーカーの部分状態を
+# 合算、result() で最終値を返す。全データを保持しないため、数百万点のバックテストでも
+# メモリは定数で、各チャンクは 1 回だけ走査される。
+
+
+class MetricAccumulator:
+    """メトリクス集計器の基底クラス."""
+
+    def update(self, y: ArrayLike, yhat: ArrayLike) -> "MetricAccumulator":
+        raise NotImplementedError
+
+    def merge(self, other: "MetricAccumulator") -> "MetricAccumulator":
+        raise NotImplementedError
+
+    def result(self) -> float:
+        raise NotImplementedError
+
+    def _check_mergeable(self, other: "MetricAccumulator") -> None:
+        if type(other) is not type(self):
+            raise TypeError(f"cannot merge {type(other).__name__} into {type(self).__name__}")
+
+
+class _MeanAccumulator(MetricAccumulator):
+    """要素ごとの値の平均を取る指標 (総和と件数だけを保持する)."""
+
+    scale = 1.0
+
+    def __init__(self) -> None:
+        self.total = 0.0
+        self.count = 0
+
+    def _terms(self, y: np.ndarray, yhat: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def update(self, y: ArrayLike, yhat: ArrayLike) -> "_MeanAccumulator":
+        y_arr, yhat_arr = _to_numpy(y, yhat)
+        self.total += float(np.sum(self._terms(y_arr, yhat_arr)))
+        self.count += int(y_arr.size)
+        return self
+
+    def merge(self, other: "_MeanAccumulator") -> "_MeanAccumulator":
+        self._check_mergeable(other)
+        self.total += other.total
+        self.count += other.count
+        return self
+
+    def result(self) -> float:
+        if self.count == 0:
+            return float("nan")
+        return float(self.scale * self.total / self.count)
+
+
+class MAE(_MeanAccumulator):
+    """Mean Absolute Error."""
+
+    def _terms(self, y, yhat):
+        return np.abs(yhat - y)
+
+
+class RMSE(_MeanAccumulator):
+    """Root Mean Squared Error (二乗誤差の総和を保持する)."""
+
+    def _terms(self, y, yhat):
+        diff = yhat - y
+        return diff * diff
+
+    def result(self) -> float:
+        return float(math.sqrt(super().result()))
+
+
+class SMAPE(_MeanAccumulator):
+    """対称 MAPE: 200 / N * Σ |ŷ_t - y_t| / (|y_t| + |ŷ_t| + eps)."""
+
+    scale = 200.0
+
+    def __init__(self, eps: float = 1e-8) -> None:
+        super().__init__()
+        self.eps = eps
+
+    def _terms(self, y, yhat):
+        return np.abs(yhat - y) / (np.abs(y) + np.abs(yhat) + self.eps)
+
+
+class MAPE(_MeanAccumulator):
+    """Mean Absolute Percentage Error (百分率)."""
+
+    scale = 100.0
+
+    def __init__(self, eps: float = 1e-8) -> None:
+        super().__init__()
+        self.eps = eps
+
+    def _terms(self, y, yhat):
+        return np.abs(yhat - y) / np.maximum(np.abs(y), self.eps)
+
+
+class Pinball(_MeanAccumulator):
+    """分位 q に対する pinball loss (0 < q < 1)."""
+
+    def __init__(self, q: float) -> None:
+        if not (0.0 < q < 1.0):
+            raise ValueError("q must be in (0, 1)")
+        super().__init__()
+        self.q = q
+
+    def _terms(self, y, yhat):
+        # NOTE: y < y_hat のケースで q を大きくすると loss も増える挙動
+        diff = yhat - y
+        return np.maximum(self.q * diff, (self.q - 1.0) * diff)
+
+    def merge(self, other: "Pinball") -> "Pinball":
+        if getattr(other, "q", None) != self.q:
+            raise ValueError(f"cannot merge pinball losses for different quantiles: {self.q} vs {getattr(other, 'q', None)}")
+        return super().merge(other)
+
+
+class Coverage(_MeanAccumulator):
+    """予測区間 [y_lower, y_upper] の被覆率. ``update(y, y_lower, y_upper)`` で更新する."""
+
+    def update(self, y: ArrayLike, y_lower: ArrayLike, y_upper: ArrayLike) -> "Coverage":  # type: ignore[override]
+        y_arr, lower = _to_numpy(y, y_lower)
+        _, upper = _to_numpy(y_arr, y_upper)
+        self.total += float(np.count_nonzero((y_arr >= lower) & (y_arr <= upper)))
+        self.count += int(y_arr.size)
+        return self
+
+
+class DirectionalAccuracy(MetricAccumulator):
+    """方向正解率: mean( sign(y_{t+1} - y_t) == sign(ŷ_{t+1} - ŷ_t) ).
+
+    系列を時系列順のチャンクで与える。チャンク境界をまたぐ階差のために
+    先頭と末尾の点を保持しており、``a.merge(b)`` は b が a の直後の区間である前提で
+    境界の 1 ペアも数える。
+    """
+
+    def __init__(self) -> None:
+        self.matches = 0
+        self.pairs = 0
+        self.first: Optional[Tuple[float, float]] = None
+        self.last: Optional[Tuple[float, float]] = None
+
+    @staticmethod
+    def _same_direction(prev: Tuple[float, float], cur: Tuple[float, float]) -> bool:
+        # 両方0ならTrue、片方だけ0ならFalseとなる np.sign の比較を採用
+        return bool(np.sign(cur[0] - prev[0]) == np.sign(cur[1] - prev[1]))
+
+    def update(self, y: ArrayLike, yhat: ArrayLike) -> "DirectionalAccuracy":
+        y_arr, yhat_arr = _to_numpy(y, yhat)
+        if y_arr.size == 0:
+            return self
+        head = (float(y_arr[0]), float(yhat_arr[0]))
+        if self.last is not None:
+            self.matches += self._same_direction(self.last, head)
+            self.pairs += 1
+        self.matches += int(np.count_nonzero(np.sign(np.diff(y_arr)) == np.sign(np.diff(yhat_arr))))
+        self.pairs += int(y_arr.size - 1)
+        if self.first is None:
+            self.first = head
+        self.last = (float(y_arr[-1]), float(yhat_arr[-1]))
+        return self
+
+    def merge(self, other: "DirectionalAccuracy") -> "DirectionalAccuracy":
+        self._check_mergeable(other)
+        if other.first is None:
+            return self
+        if self.last is not None:
+            self.matches += self._same_direction(self.last, other.first)
+            self.pairs += 1
+        self.matches += other.matches
+        self.pairs += other.pairs
+        if self.first is None:
+            self.first = other.first
+        self.last = other.last
+        return self
+
+    def result(self) -> float:
+        if self.pairs == 0:
+            return float("nan")  # データ不足
+        return float(self.matches / self.pairs)
+
+
+def point_metric_accumulators(eps: float = 1e-8) -> Dict[str, MetricAccumulator]:
+    """点予測の標準メトリクス一式の集計器 (名前 -> accumulator)."""
+    return {
+        "mae": MAE(),
+        "rmse": RMSE(),
+        "smape": SMAPE(eps),
+        "mape": MAPE(eps),
+        "directional_accuracy": DirectionalAccuracy(),
+    }
+
+
+_POINTWISE_ACCUMULATORS = {"mae": MAE, "rmse": RMSE, "smape": SMAPE, "mape": MAPE}
+
+
+def pointwise_terms(name: str, y: np.ndarray, yhat: np.ndarray, eps: float = 1e-8) -> np.ndarray:
+    """平均を取る前の要素ごとの寄与 (``mae`` / ``rmse`` / ``smape`` / ``mape``).
+
+    y / yhat は同じ形の配列 (形はそのまま保たれる)。指標の値は
+    ``scale * mean(terms)`` (rmse はさらに平方根) で、scale は各集計器クラスの ``scale``。
+    """
+    try:
+        cls = _POINTWISE_ACCUMULATORS[name]
+    except KeyError as exc:
+        raise ValueError(f"unknown pointwise metric: {name!r}") from exc
+    acc = cls(eps) if cls in (SMAPE, MAPE) else cls()
+    return acc._terms(np.asarray(y, dtype=float), np.asarray(yhat, dtype=float))
+
+
+# ---------------------------------------------------------------------------
+# 純粋関数 (accumulator の薄いラッパー)
+# ---------------------------------------------------------------------------
+
+
 def smape(y: ArrayLike, yhat: ArrayLike, eps: float = 1e-8) -> float:
     """対称 MAPE (sMAPE) を計算する.
 
     定義:
         200 / N * Σ |ŷ_t - y_t| / (|y_t| + |ŷ_t| + eps)
     """
-    y_arr, yhat_arr = _to_numpy(y, yhat)
-    num = np.abs(yhat_arr - y_arr)
-    denom = np.abs(y_arr) + np.abs(yhat_arr) + eps
-    return float(200.0 * np.mean(num / denom))
+    return SMAPE(eps).update(y, yhat).result()
 
 
 def mape(y: ArrayLike, yhat: ArrayLike, eps: float = 1e-8) -> float:
     """Mean Absolute Percentage Error (百分率)."""
-    y_arr, yhat_arr = _to_numpy(y, yhat)
-    num = np.abs(yhat_arr - y_arr)
-    denom = np.maximum(np.abs(y_arr), eps)
-    return float(100.0 * np.mean(num / denom))
+    return MAPE(eps).update(y, yhat).result()
 
 
 def mae(y: ArrayLike, yhat: ArrayLike) -> float:
     """Mean Absolute Error."""
-    y_arr, yhat_arr = _to_numpy(y, yhat)
-    return float(np.mean(np.abs(yhat_arr - y_arr)))
+    return MAE().update(y, yhat).result()
 
 
 def rmse(y: ArrayLike, yhat: ArrayLike) -> float:
     """Root Mean Squared Error."""
-    y_arr, yhat_arr = _to_numpy(y, yhat)
-    return float(math.sqrt(np.mean((yhat_arr - y_arr) ** 2)))
+    return RMSE().update(y, yhat).result()
 
 
 def pinball_loss(y: ArrayLike, yhat: ArrayLike, q: float) -> float:
@@ -77,22 +299,12 @@ def pinball_loss(y: ArrayLike, yhat: ArrayLike, q: float) -> float:
 
     0 < q < 1 を想定。
     """
-    if not (0.0 < q < 1.0):
-        raise ValueError("q must be in (0, 1)")
-    y_arr, yhat_arr = _to_numpy(y, yhat)
-    # NOTE: y < y_hat のケースで q を大きくすると loss も増える挙動
-    diff = yhat_arr - y_arr
-    return float(np.mean(np.maximum(q * diff, (q - 1.0) * diff)))
+    return Pinball(q).update(y, yhat).result()
 
 
 def coverage(y: ArrayLike, y_lower: ArrayLike, y_upper: ArrayLike) -> float:
     """予測区間 [y_lower, y_upper] に対する被覆率 (coverage) を計算する."""
-    y_arr, lower = _to_numpy(y, y_lower)
-    y_arr2, upper = _to_numpy(y, y_upper)
-    # 上で shape チェック済み
-    _ = y_arr2
-    inside = (y_arr >= lower) & (y_arr <= upper)
-    return float(np.mean(inside.astype(float)))
+    return Coverage().update(y, y_lower, y_upper).result()
 
 
 def coverage_error(y: ArrayLike, y_lower: ArrayLike, y_upper: ArrayLike, target: float = 0.9) -> float:
@@ -115,21 +327,7 @@ def directional_accuracy(y: ArrayLike, yhat: ArrayLike) -> float:
     定義:
         mean( sign(y_{t+1} - y_t) == sign(ŷ_{t+1} - ŷ_t) )
     """
-    y_arr, yhat_arr = _to_numpy(y, yhat)
-    
-    if len(y_arr) < 2:
-        return np.nan # データ不足
-        
-    # 階差 (t+1 - t) をとる
-    diff_y = np.diff(y_arr)
-    diff_yhat = np.diff(yhat_arr)
-    
-    # 符号の一致を確認
-    # signが一致するかどうか。0 (変化なし) の扱いについては、
-    # 両方0ならTrue、片方だけ0ならFalseとなる np.sign の比較を採用。
-    matches = (np.sign(diff_y) == np.sign(diff_yhat))
-    
-    return float(np.mean(matches.astype(float)))
+    return DirectionalAccuracy().update(y, yhat).result()
 
 
 def max_drawdown(y: ArrayLike) -> float:
@@ -139,7 +337,7 @@ def max_drawdown(y: ArrayLike) -> float:
     予測された軌道が大きな下落リスクを含んでいるかの評価などに使用。
     y は価格や資産価値のような「レベル」を表す系列を想定。
     """
-    arr = np.asarray(list(y), dtype=float)
+    arr = _as_array(y)
     if len(arr) == 0:
         return 0.0
     
@@ -166,7 +364,7 @@ def sharpe_ratio(y: ArrayLike, risk_free_rate: float = 0.0) -> float:
     定義: 平均リターン / リターンの標準偏差
     y は「価格」や「累積値」の系列を想定し、内部で変化率(リターン)に変換して計算する。
     """
-    arr = np.asarray(list(y), dtype=float)
+    arr = _as_array(y)
     if len(arr) < 2:
         return 0.0
     
@@ -0,0 +1,475 @@
+"""RAG 検索用の永続・差分更新型パターンインデックス.
+
+``(table, loto, unique_id, 窓長)`` ごとに、系列値と全窓の PAA スケッチ
+(窓を ``n_segments`` 区間に分けた区間平均) をメモリマップファイルとして保持する。
+
+- 更新: 既存の履歴と先頭が一致する限り、新しく増えた点と、それによって
+  生じた新しい窓のスケッチだけを追記する (過去の値が変わった場合は作り直す)。
+  一致の確認には保存済みファイルを読まず、メタデータに持つ末尾 1 窓分の値と
+  先頭部分の CRC32 (追記ごとに差分で更新) だけを使う。
+- 検索: 窓を ``_BLOCK_SIZE`` 個ずつのブロックにまとめ、ブロックごとの PAA の
+  区間別 min/max から求めた下界で、ブロック単位に候補を絞り込む。下界の小さい
+  ブロックから順に、ブロック内の窓の下界 (LB_PAA <= 真のユークリッド距離) と
+  厳密距離で評価し、k 番目の厳密距離が次のブロックの下界を下回った時点で
+  打ち切るため、結果は全件走査と一致する。履歴が伸びても毎回走査するのは
+  ブロック数分の min/max だけで、窓単位の計算は少数のブロックに限られる。
+
+ファイル構成 (``<key>`` は ``<table>__<4 つ組のハッシュ>``)::
+
+    <key>.json        メタデータ (点数・窓長・区間数など)
+    <key>.values.f64  系列値 (float64, 追記のみ)
+    <key>.ds.i64      日付 (datetime64[ns] の int64 表現, 追記のみ)
+    <key>.paa.f32     窓ごとの PAA スケッチ (float32, n_windows x n_segments, 追記のみ)
+    <key>.blk.f32     ブロックごとの PAA の min/max (float32, n_blocks x 2 x n_segments,
+                      末尾の未完成ブロックのみ書き換え)
+
+書き込みはプロセス内の 1 ライターを前提とする (ETL 後の更新や RagAgent からの遅延更新)。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import zlib
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .distance_profile import (
+    MATCH_COLUMNS,
+    PANEL_MATCH_COLUMNS,
+    PanelMatches,
+    build_match_frame,
+    exact_distances,
+)
+
+logger = logging.getLogger(__name__)
+
+_INDEX_VERSION = 3
+
+# 検索時の枝刈り単位 (1 ブロックあたりの窓数)
+_BLOCK_SIZE = 256
+
+# float32 で保存したスケッチの相対丸め誤差 (下界は区間ごとに eps * 値の大きさだけ緩める)
+_SKETCH_EPS = float(np.finfo(np.float32).eps)
+
+
+def _crc(values: np.ndarray, crc: int = 0) -> int:
+    """配列のバイト列の CRC32 (``crc`` を渡すと連結したバイト列の値として継続計算する)."""
+    return zlib.crc32(np.ascontiguousarray(values), crc)
+
+
+def _segment_bounds(m: int, n_segments: int) -> np.ndarray:
+    """窓内の区間境界 (長さ n_segments + 1, 先頭 0, 末尾 m)."""
+    n_segments = max(1, min(int(n_segments), int(m)))
+    return np.linspace(0, m, n_segments + 1).round().astype(np.int64)
+
+
+def paa_sketches(values: np.ndarray, m: int, bounds: np.ndarray) -> np.ndarray:
+    """全窓の PAA スケッチをまとめて計算する (形状 ``(n - m + 1, n_segments)``).
+
+    区間和は窓ごとに直接足す。系列全体の累積和の差を使うと、値の大きい長い系列で
+    桁落ちし、誤差が float32 の丸めの評価 (``_SKETCH_EPS``) に収まらなくなる。
+    """
+    values = np.asarray(values, dtype=float)
+    n_windows = len(values) - m + 1
+    if n_windows <= 0:
+        return np.empty((0, len(bounds) - 1), dtype=np.float32)
+    windows = np.lib.stride_tricks.sliding_window_view(values, m)
+    sums = np.add.reduceat(windows, bounds[:-1], axis=1)
+    return (sums / np.diff(bounds)).astype(np.float32)
+
+
+def block_envelopes(paa: np.ndarray, block_size: int) -> np.ndarray:
+    """PAA スケッチを block_size 窓ずつまとめた区間別の min/max (形状 ``(n_blocks, 2, n_segments)``)."""
+    n_segments = paa.shape[1]
+    if len(paa) == 0:
+        return np.empty((0, 2, n_segments), dtype=np.float32)
+    starts = np.arange(0, len(paa), block_size)
+    lo = np.minimum.reduceat(paa, starts, axis=0)
+    hi = np.maximum.reduceat(paa, starts, axis=0)
+    return np.stack([lo, hi], axis=1).astype(np.float32)
+
+
+class PatternIndex:
+    """1 系列 x 1 窓長分のパターンインデックス."""
+
+    def __init__(self, path_prefix: Path, window: int, n_segments: int = 8) -> None:
+        self.prefix = Path(path_prefix)
+        self.window = int(window)
+        self.bounds = _segment_bounds(self.window, n_segments)
+        self.n_segments = len(self.bounds) - 1
+        self.seg_len = np.diff(self.bounds).astype(float)
+        self.n_values = 0
+        self._crc_values = 0
+        self._crc_ds = 0
+        self._tail_values = np.empty(0)
+        self._tail_ds = np.empty(0, dtype=np.int64)
+        self._values: Optional[np.ndarray] = None
+        self._ds: Optional[np.ndarray] = None
+        self._paa: Optional[np.ndarray] = None
+        self._blocks: Optional[np.ndarray] = None
+        self._load_meta()
+
+    # ------------------------------------------------------------------
+    # ファイル
+    # ------------------------------------------------------------------
+    def _path(self, suffix: str) -> Path:
+        return self.prefix.with_name(self.prefix.name + suffix)
+
+    def _load_meta(self) -> None:
+        meta_path = self._path(".json")
+        if not meta_path.exists():
+            return
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except Exception:
+            logger.warning("Broken pattern index metadata %s; rebuilding.", meta_path)
+            self._reset()
+            return
+        if (
+            meta.get("version") != _INDEX_VERSION
+            or meta.get("window") != self.window
+            or meta.get("bounds") != self.bounds.tolist()
+            or meta.get("block_size") != _BLOCK_SIZE
+        ):
+            # 古い形式のファイルに追記しないよう作り直す
+            self._reset()
+            return
+        self.n_values = int(meta["n_values"])
+        self._crc_values = int(meta["crc_values"])
+        self._crc_ds = int(meta["crc_ds"])
+        self._tail_values = np.asarray(meta["tail_values"], dtype=np.float64)
+        self._tail_ds = np.asarray(meta["tail_ds"], dtype=np.int64)
+
+    def _write_meta(self) -> None:
+        meta = {
+            "version": _INDEX_VERSION,
+            "window": self.window,
+            "bounds": self.bounds.tolist(),
+            "block_size": _BLOCK_SIZE,
+            "n_values": self.n_values,
+            "crc_values": self._crc_values,
+            "crc_ds": self._crc_ds,
+            "tail_values": self._tail_values.tolist(),
+            "tail_ds": self._tail_ds.tolist(),
+        }
+        tmp = self._path(f".json.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, self._path(".json"))
+
+    def _map(self) -> None:
+        """追記後のファイルを読み取り専用でメモリマップし直す."""
+        n = self.n_values
+        n_windows = max(n - self.window + 1, 0)
+        self._values = np.memmap(self._path(".values.f64"), dtype=np.float64, mode="r", shape=(n,)) if n else np.empty(0)
+        self._ds = np.memmap(self._path(".ds.i64"), dtype=np.int64, mode="r", shape=(n,)) if n else np.empty(0, np.int64)
+        self._paa = (
+            np.memmap(self._path(".paa.f32"), dtype=np.float32, mode="r", shape=(n_windows, self.n_segments))
+            if n_windows
+            else np.empty((0, self.n_segments), dtype=np.float32)
+        )
+        n_blocks = -(-n_windows // _BLOCK_SIZE)
+        self._blocks = (
+            np.memmap(self._path(".blk.f32"), dtype=np.float32, mode="r", shape=(n_blocks, 2, self.n_segments))
+            if n_blocks
+            else np.empty((0, 2, self.n_segments), dtype=np.float32)
+        )
+
+    def _reset(self) -> None:
+        for suffix in (".values.f64", ".ds.i64", ".paa.f32", ".blk.f32", ".json"):
+            try:
+                self._path(suffix).unlink()
+            except FileNotFoundError:
+                pass
+        self.n_values = 0
+        self._crc_values = self._crc_ds = 0
+        self._tail_values = np.empty(0)
+        self._tail_ds = np.empty(0, dtype=np.int64)
+        self._values = self._ds = self._paa = self._blocks = None
+
+    # ------------------------------------------------------------------
+    # 更新
+    # ------------------------------------------------------------------
+    @property
+    def n_windows(self) -> int:
+        return max(self.n_values - self.window + 1, 0)
+
+    def _extends_stored(self, d: np.ndarray, y: np.ndarray, verify_prefix: bool) -> bool:
+        """受け取った履歴が保存済みの履歴をそのまま先頭に含むか.
+
+        保存済みファイルは読まず、末尾 1 窓分の値と先頭部分の CRC32 だけで判定する。
+        ``verify_prefix=False`` の場合は末尾の比較のみ (O(窓長)) で済ませる。
+        """
+        old_n = self.n_values
+        if len(y) < old_n:
+            return False
+        k = len(self._tail_values)
+        if not (
+            np.array_equal(d[old_n - k : old_n], self._tail_ds)
+            and np.array_equal(y[old_n - k : old_n], self._tail_values, equal_nan=True)
+        ):
+            return False
+        if not verify_prefix:
+            return True
+        return _crc(d[:old_n]) == self._crc_ds and _crc(y[:old_n]) == self._crc_values
+
+    def _write_at(self, suffix: str, n_before: int, rows: np.ndarray) -> None:
+        """ファイルを先頭 n_before 行 (rows と同じ行の形) に切り詰めてから rows を追記する.
+
+        メタデータを書く前に落ちた更新の書きかけ部分は、次の更新でここで捨てられるため、
+        各ファイルの長さはメタデータの ``n_values`` とずれない。
+        """
+        path = self._path(suffix)
+        offset = n_before * rows.itemsize * int(np.prod(rows.shape[1:], dtype=np.int64))
+        with open(path, "r+b" if path.exists() else "wb") as f:
+            f.truncate(offset)
+            f.seek(offset)
+            rows.tofile(f)
+
+    def _write_blocks(self, first_window: int, sketches: np.ndarray) -> None:
+        """追記した窓 (開始位置 first_window 以降) を含むブロックの min/max を書き直す."""
+        first_block = first_window // _BLOCK_SIZE
+        lo = first_block * _BLOCK_SIZE
+        # 末尾の未完成ブロックに含まれる既存の窓と、新しい窓を合わせて計算し直す
+        paa = np.concatenate([np.asarray(self._paa[lo:first_window]), sketches]) if first_window > lo else sketches
+        self._write_at(".blk.f32", first_block, block_envelopes(paa, _BLOCK_SIZE))
+
+    def update(self, ds, values, verify_prefix: bool = True) -> int:
+        """履歴全体 (ds 昇順) を受け取り、増えた点と新しい窓のスケッチだけを追記する.
+
+        Args:
+            ds: 日付 (昇順)
+            values: 値
+            verify_prefix: False の場合、過去の値の変更検出を末尾 1 窓分の比較だけで行う
+                (確定済みの履歴に追記するだけの ETL 後の更新向け)
+
+        Returns:
+            追記した点の数 (作り直した場合は全点数)
+        """
+        y = np.asarray(values, dtype=np.float64)
+        d = pd.to_datetime(pd.Index(ds)).to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+        if self._paa is None and self.n_values:
+            self._map()
+
+        old_n = self.n_values
+        if old_n and not self._extends_stored(d, y, verify_prefix):
+            logger.info("History changed for %s; rebuilding pattern index.", self.prefix.name)
+            self._reset()
+            old_n = 0
+        if len(y) == old_n:
+            return 0
+
+        self.prefix.parent.mkdir(parents=True, exist_ok=True)
+        self._write_at(".values.f64", old_n, y[old_n:])
+        self._write_at(".ds.i64", old_n, d[old_n:])
+        # 新しい窓は開始位置 max(old_n - m + 1, 0) 以降
+        first_new = max(old_n - self.window + 1, 0)
+        sketches = paa_sketches(y[first_new:], self.window, self.bounds)
+        self._write_at(".paa.f32", first_new, sketches)
+        if len(sketches):
+            self._write_blocks(first_new, sketches)
+
+        self._crc_values = _crc(y[old_n:], self._crc_values)
+        self._crc_ds = _crc(d[old_n:], self._crc_ds)
+        self._tail_values = y[-self.window :].copy()
+        self._tail_ds = d[-self.window :].copy()
+        self.n_values = len(y)
+        self._write_meta()
+        self._map()
+        return len(y) - old_n
+
+    # ------------------------------------------------------------------
+    # 検索
+    # ------------------------------------------------------------------
+    def _query_paa(self, query: np.ndarray) -> np.ndarray:
+        return paa_sketches(np.asarray(query, dtype=float), self.window, self.bounds)[0].astype(float)
+
+    def _lb(self, lo: np.ndarray, hi: np.ndarray, q_paa: np.ndarray, tol: float = 0.0) -> np.ndarray:
+        """区間ごとの範囲 [lo, hi] とクエリのスケッチの距離の下界 (各区間の差を tol だけ小さく見積もる)."""
+        gap = np.maximum(lo - q_paa - tol, 0.0) + np.maximum(q_paa - hi - tol, 0.0)
+        return np.sqrt((gap * gap) @ self.seg_len)
+
+    def _sketch_tol(self, q_paa: np.ndarray) -> float:
+        """保存済みスケッチとクエリのスケッチの float32 丸め誤差の上限 (区間ごとの絶対値).
+
+        丸め誤差は下界ではなく値の大きさに比例するため、全ブロックの min/max の
+        絶対値の最大から求める (オフセットの大きい系列でも真の近傍を枝刈りしない)。
+        """
+        scale = float(np.abs(np.asarray(self._blocks)).max(initial=0.0)) + float(np.abs(q_paa).max(initial=0.0))
+        return _SKETCH_EPS * scale
+
+    def lower_bounds(self, query: np.ndarray, max_start: Optional[int] = None) -> np.ndarray:
+        """各窓とクエリの距離の下界 (LB_PAA)."""
+        if self._paa is None:
+            self._map()
+        paa = self._paa if max_start is None else self._paa[: max(int(max_start), 0)]
+        paa = np.asarray(paa, dtype=float)
+        q_paa = self._query_paa(query)
+        return self._lb(paa, paa, q_paa, self._sketch_tol(q_paa))
+
+    def block_lower_bounds(self, query: np.ndarray) -> np.ndarray:
+        """各ブロック (``_BLOCK_SIZE`` 窓) 内のすべての窓に対する距離の下界."""
+        if self._blocks is None:
+            self._map()
+        blocks = np.asarray(self._blocks, dtype=float)
+        q_paa = self._query_paa(query)
+        return self._lb(blocks[:, 0], blocks[:, 1], q_paa, self._sketch_tol(q_paa))
+
+    def search(
+        self,
+        query,
+        top_k: int = 5,
+        max_start: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """クエリに最も近い窓の開始位置と厳密距離を返す (距離の昇順)."""
+        q = np.asarray(query, dtype=float)
+        if len(q) != self.window:
+            raise ValueError(f"query length {len(q)} does not match index window {self.window}")
+        if self._paa is None:
+            self._map()
+        n = self.n_windows if max_start is None else min(max(int(max_start), 0), self.n_windows)
+        top_k = min(int(top_k), n)
+        if top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        q_paa = self._query_paa(q)
+        tol = self._sketch_tol(q_paa)
+        n_blocks = -(-n // _BLOCK_SIZE)
+        block_lb = self.block_lower_bounds(q)[:n_blocks]
+
+        best_idx = np.empty(0, dtype=np.int64)
+        best_dist = np.empty(0)
+        # 下界の小さいブロックから順に評価する
+        for block in np.argsort(block_lb, kind="stable"):
+            full = len(best_dist) == top_k
+            # 残りのブロックの下界がすべて現在の k 番目より大きければ打ち切り
+            # (同距離は位置の小さい方を残すため >)
+            if full and block_lb[block] > best_dist[-1]:
+                break
+            lo = int(block) * _BLOCK_SIZE
+            hi = min(lo + _BLOCK_SIZE, n)
+            cand = np.arange(lo, hi)
+            if full:
+                paa = np.asarray(self._paa[lo:hi], dtype=float)
+                cand = cand[self._lb(paa, paa, q_paa, tol) <= best_dist[-1]]
+                if not len(cand):
+                    continue
+            dist = exact_distances(self._values, q, cand)
+            best_idx = np.concatenate([best_idx, cand])
+            best_dist = np.concatenate([best_dist, dist])
+            order = np.lexsort((best_idx, best_dist))[:top_k]
+            best_idx, best_dist = best_idx[order], best_dist[order]
+        return best_idx, best_dist
+
+    def search_frame(self, query, top_k: int = 5) -> pd.DataFrame:
+        """直後の値が存在する窓のみを対象に検索し、類似検索の出力形式で返す."""
+        q = np.asarray(query, dtype=float)
+        if self.n_values < len(q) + 1:
+            return pd.DataFrame(columns=MATCH_COLUMNS)
+        starts, dist = self.search(q, top_k=top_k, max_start=self.n_values - len(q))
+        ds = np.asarray(self._ds).view("datetime64[ns]")
+        return build_match_frame(ds, np.asarray(self._values), starts, dist, len(q))
+
+
+class PatternIndexStore:
+    """ディレクトリ配下の :class:`PatternIndex` を管理する."""
+
+    def __init__(self, root: os.PathLike | str, n_segments: int = 8) -> None:
+        self.root = Path(root)
+        self.n_segments = int(n_segments)
+        self._open: Dict[Tuple[str, str, str, int], PatternIndex] = {}
+
+    def get(self, table_name: str, loto: str, unique_id: str, window: int) -> PatternIndex:
+        key = (str(table_name), str(loto), str(unique_id), int(window))
+        index = self._open.get(key)
+        if index is None:
+            digest = hashlib.sha1(json.dumps(list(key)).encode("utf-8")).hexdigest()[:20]
+            index = PatternIndex(self.root / f"{table_name}__{digest}", window, n_segments=self.n_segments)
+            self._open[key] = index
+        return index
+
+    def search(
+        self,
+        table_name: str,
+        loto: str,
+        unique_id: str,
+        ds,
+        values,
+        query,
+        top_k: int = 5,
+    ) -> pd.DataFrame:
+        """履歴でインデックスを差分更新してから検索する."""
+        index = self.get(table_name, loto, unique_id, len(query))
+        index.update(ds, values)
+        return index.search_frame(query, top_k=top_k)
+
+    def search_panel(
+        self,
+        table_name: str,
+        loto: str,
+        panel: pd.DataFrame,
+        queries: Mapping[str, Sequence[float]],
+        top_k: int = 5,
+    ) -> PanelMatches:
+        """:func:`distance_profile.search_panel` と同じ形式で、系列ごとのインデックスを使って検索する."""
+        frame = panel[panel["unique_id"].isin(list(queries))].sort_values(["unique_id", "ds"], kind="stable")
+        history = {uid: grp for uid, grp in frame.groupby("unique_id", sort=False)}
+        frames = []
+        query_last = {}
+        for uid, query in queries.items():
+            grp = history.get(uid)
+            if grp is None:
+                continue
+            y = pd.to_numeric(grp["y"], errors="coerce").fillna(0).to_numpy(dtype=float)
+            q = np.asarray(query, dtype=float)
+            found = self.search(table_name, loto, uid, grp["ds"], y, q, top_k=top_k)
+            if found.empty:
+                continue
+            found.insert(0, "rank", np.arange(1, len(found) + 1))
+            found.insert(0, "unique_id", uid)
+            frames.append(found)
+            query_last[uid] = float(q[-1])
+        matches = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=PANEL_MATCH_COLUMNS)
+        return PanelMatches.from_matches(matches, query_last)
+
+    def refresh(self, table_name: str, loto: str, panel: pd.DataFrame, windows) -> Dict[str, int]:
+        """パネル (unique_id, ds, y) で各系列・各窓長のインデックスを差分更新する (ETL 後用)."""
+        appended: Dict[str, int] = {}
+        for uid, grp in panel.sort_values(["unique_id", "ds"]).groupby("unique_id", sort=False):
+            y = pd.to_numeric(grp["y"], errors="coerce").fillna(0).to_numpy(dtype=float)
+            for window in windows:
+                n_new = self.get(table_name, loto, str(uid), int(window)).update(grp["ds"], y)
+                appended[f"{uid}:{window}"] = n_new
+        return appended
+
+
+def get_default_store(config_dir: Optional[str] = None) -> Optional[PatternIndexStore]:
+    """設定 (または環境変数 NF_PATTERN_INDEX_DIR) のディレクトリのストアを返す. 未設定なら None."""
+    root = config_dir or os.getenv("NF_PATTERN_INDEX_DIR")
+    return PatternIndexStore(root) if root else None
+
+
+if __name__ == "__main__":  # pragma: no cover - requires a live database
+    import argparse
+
+    from nf_loto_platform.db.loto_repository import list_unique_ids, load_panel_by_loto
+
+    parser = argparse.ArgumentParser(description="ETL 後にパターンインデックスを差分更新する")
+    parser.add_argument("--table", required=True)
+    parser.add_argument("--loto", required=True)
+    parser.add_argument("--windows", type=int, nargs="+", default=[10])
+    parser.add_argument("--index-dir", default=os.getenv("NF_PATTERN_INDEX_DIR"))
+    args = parser.parse_args()
+    if not args.index_dir:
+        parser.error("--index-dir or NF_PATTERN_INDEX_DIR is required")
+
+    uids = list_unique_ids(args.table, args.loto)["unique_id"].tolist()
+    panel = load_panel_by_loto(args.table, args.loto, uids)
+    result = PatternIndexStore(args.index_dir).refresh(args.table, args.loto, panel, args.windows)
+    print(f"appended points: {sum(result.values())} ({len(result)} indexes)")
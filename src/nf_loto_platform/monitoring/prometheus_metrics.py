@@ -41,8 +41,42 @@ if _PROM_AVAILABLE:
         "Latest validation loss value.",
         ["model_name", "backend"],
     )
+    DB_POOL_CONNECTIONS = Gauge(
+        "nf_db_pool_connections",
+        "Number of pooled database connections by state.",
+        ["pool", "state"],
+    )
+    DB_POOL_WAIT = Histogram(
+        "nf_db_pool_wait_seconds",
+        "Time spent waiting to borrow a pooled database connection.",
+        ["pool"],
+        buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+    )
+    TSFM_POOL_REQUESTS = Counter(
+        "nf_tsfm_pool_requests_total",
+        "TSFM model pool lookups by result (hit/miss).",
+        ["model_id", "result"],
+    )
+    TSFM_MODEL_LOAD = Histogram(
+        "nf_tsfm_model_load_seconds",
+        "Time spent loading TSFM model weights into the model pool.",
+        ["model_id"],
+        buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+    )
+    TSFM_POOL_RESIDENT = Gauge(
+        "nf_tsfm_pool_resident_megabytes",
+        "Estimated memory held by models resident in the TSFM model pool.",
+    )
+    ETL_ROWS = Counter(
+        "nf_loto_etl_rows_total",
+        "Rows handled by the loto ETL upsert by action (inserted/updated/skipped).",
+        ["loto", "action"],
+    )
 else:  # pragma: no cover - when prometheus_client is entirely unavailable
     RUNS_STARTED = RUNS_COMPLETED = RUN_DURATION = TRAIN_LOSS = VAL_LOSS = None  # type: ignore[assignment]
+    DB_POOL_CONNECTIONS = DB_POOL_WAIT = None  # type: ignore[assignment]
+    TSFM_POOL_REQUESTS = TSFM_MODEL_LOAD = TSFM_POOL_RESIDENT = None  # type: ignore[assignment]
+    ETL_ROWS = None  # type: ignore[assignment]
 
 
 def init_metrics_server(port: int = 8000) -> None:
@@ -127,3 +161,38 @@ def observe_run_error(model_name: str, backend: str) -> None:
     # a run fails, and we can later attach concrete Prometheus counters
     # without changing the public API.
     return
+
+
+def observe_db_pool(pool: str, idle: int, in_use: int, wait_seconds: Optional[float] = None) -> None:
+    """Update connection-pool gauges and, if given, record one borrow wait time."""
+    if not _PROM_AVAILABLE:
+        return
+    DB_POOL_CONNECTIONS.labels(pool=pool, state="idle").set(idle)  # type: ignore[call-arg]
+    DB_POOL_CONNECTIONS.labels(pool=pool, state="in_use").set(in_use)  # type: ignore[call-arg]
+    if wait_seconds is not None:
+        DB_POOL_WAIT.labels(pool=pool).observe(wait_seconds)  # type: ignore[call-arg]
+
+
+def observe_model_pool(
+    model_id: str,
+    hit: bool,
+    load_seconds: Optional[float] = None,
+    resident_mb: Optional[float] = None,
+) -> None:
+    """Record one TSFM model pool lookup and, on a miss, its load time."""
+    if not _PROM_AVAILABLE:
+        return
+    TSFM_POOL_REQUESTS.labels(model_id=model_id, result="hit" if hit else "miss").inc()  # type: ignore[call-arg]
+    if load_seconds is not None:
+        TSFM_MODEL_LOAD.labels(model_id=model_id).observe(load_seconds)  # type: ignore[call-arg]
+    if resident_mb is not None:
+        TSFM_POOL_RESIDENT.set(resident_mb)  # type: ignore[union-attr]
+
+
+def observe_etl_rows(loto: str, inserted: int, updated: int, skipped: int) -> None:
+    """Record how many rows one loto ETL upsert inserted, updated and skipped as unchanged."""
+    if not _PROM_AVAILABLE:
+        return
+    for action, n in (("inserted", inserted), ("updated", updated), ("skipped", skipped)):
+        if n:
+            ETL_ROWS.labels(loto=loto, action=action).inc(n)  # type: ignore[union-attr]
@@ -12,7 +12,8 @@ from .base import (
     TSFMHub,
 )
 from .chronos_adapter import Chronos2ZeroShotAdapter
-from .registry import get_adapter
+from .model_pool import ModelPool, get_model_pool
+from .registry import get_adapter, list_adapters, prewarm, prewarm_from_env
 
 __all__ = [
     "TSFMCapabilities",
@@ -22,4 +23,9 @@ __all__ = [
     "TSFMHub",
     "Chronos2ZeroShotAdapter",
     "get_adapter",
+    "list_adapters",
+    "prewarm",
+    "prewarm_from_env",
+    "ModelPool",
+    "get_model_pool",
 ]
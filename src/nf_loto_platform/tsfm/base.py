@@ -8,15 +8,84 @@ TSFM (Time Series Foundation Models) アダプタの基底クラス定義。
 from __future__ import annotations
 
 import logging
+import os
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional, Sequence, Union, Mapping
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union, Mapping
 
 import pandas as pd
 import numpy as np
 
+from nf_loto_platform.ml.panel import ColumnarPanel
+
 logger = logging.getLogger(__name__)
 
+# 1 回のフォワードパスに入れる系列数の既定値 (アダプタの batch_size 引数で上書き可)
+DEFAULT_BATCH_SIZE = int(os.getenv("NF_TSFM_BATCH_SIZE", "32"))
+
+
+def future_dates(last_ds: np.ndarray, horizon: int, freq: str) -> np.ndarray:
+    """各系列の最終日付から horizon ステップ先までの日付行列 ``(n_series, horizon)`` を返す.
+
+    固定長の頻度 (``H`` など) はブロードキャストで一括計算し、
+    カレンダー依存の頻度 (月次、pandas 3 以降の ``D`` など) は
+    最終日付の種類ごとに 1 回だけ ``date_range`` を使う。
+    """
+    last_ds = np.asarray(last_ds, dtype="datetime64[ns]")
+    offset = pd.tseries.frequencies.to_offset(freq)
+    if isinstance(offset, pd.offsets.Tick):
+        step = np.timedelta64(pd.Timedelta(offset).value, "ns")
+        return last_ds[:, None] + step * np.arange(1, horizon + 1)
+    starts, inverse = np.unique(last_ds, return_inverse=True)
+    out = np.empty((len(starts), horizon), dtype="datetime64[ns]")
+    for i, start in enumerate(starts):
+        out[i] = pd.date_range(start=start, periods=horizon + 1, freq=offset)[1:].to_numpy(dtype="datetime64[ns]")
+    return out[inverse.reshape(-1)]
+
+
+def pad_context(panel: ColumnarPanel, context_length: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """各系列の直近 ``context_length`` 点を左パディングした ``(n_series, width)`` 配列と系列長を返す.
+
+    最新値が右端に揃うように並べる。パディング部分は各系列の先頭値で埋めるため、
+    マスクを受け取らないモデルにも「先頭が平坦な系列」として渡せる。
+    """
+    view = panel.tail(context_length) if context_length else panel
+    lengths = view.lengths.astype(np.int64)
+    width = int(lengths.max()) if len(lengths) else 0
+    out = np.zeros((view.n_series, width))
+    if width == 0:
+        return out, lengths
+    rows = view.row_index()
+    codes = view.series_codes()
+    pos = np.arange(len(rows)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    out[codes, width - lengths[codes] + pos] = view.y[rows]
+    first = np.where(lengths > 0, view.y[np.minimum(view.starts, max(len(view.y) - 1, 0))], 0.0)
+    return np.where(~padding_mask(lengths, width), first[:, None], out), lengths
+
+
+def _infer_panel_freq(panel: ColumnarPanel) -> str:
+    """3 点以上ある最初の系列から頻度を推定する (推定できなければ ``D``)."""
+    for _, ds, _ in panel.iter_series():
+        if len(ds) >= 3:
+            return pd.infer_freq(pd.DatetimeIndex(ds)) or "D"
+    return "D"
+
+
+def padding_mask(lengths: np.ndarray, width: int) -> np.ndarray:
+    """左パディング配列の観測値位置を True とするマスク ``(n_series, width)``."""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    return np.arange(width)[None, :] >= (width - lengths)[:, None]
+
+
+def length_buckets(lengths: np.ndarray, batch_size: int) -> List[np.ndarray]:
+    """系列長の順に並べてから ``batch_size`` 件ずつに分けた系列番号のリストを返す.
+
+    長さの近い系列が同じバッチに入るため、バッチごとのパディングが最小になる。
+    """
+    order = np.argsort(np.asarray(lengths), kind="stable")
+    batch_size = max(int(batch_size), 1)
+    return [order[i : i + batch_size] for i in range(0, len(order), batch_size)]
+
 
 @dataclass(frozen=True)
 class TSFMCapabilities:
@@ -47,10 +116,113 @@ class CostEstimate:
 
 @dataclass
 class ForecastResult:
-    """予測結果を保持するコンテナ."""
-    yhat: pd.DataFrame                  # 予測結果 (unique_id, ds, {model_name}, ...)
-    raw_output: Optional[Any] = None    # モデル固有の生の出力 (np.arrayなど)
-    meta: Dict[str, Any] = field(default_factory=dict) # 推論にかかった時間やトークン数などのメタデータ
+    """予測結果を保持するコンテナ (列指向).
+
+    予測は系列 × ステップの行列として保持し、long 形式の DataFrame
+    (``unique_id, ds, {model_name}, {model_name}-lo-90, ...``) は :attr:`yhat` に
+    アクセスされたときに一度だけ組み立てる。ランナー・conformal・DB 書き込みは
+    行列 (:attr:`point` / :attr:`quantiles`) と :meth:`dates` を直接読む。
+
+    Attributes:
+        ids: 系列 ID ``(n_series,)``
+        start: 各系列の最初の予測日時 ``(n_series,)``
+        point: 点予測 ``(n_series, horizon)``
+        freq: 予測日時の頻度 (``D`` など)
+        quantiles: 列名のサフィックス (``lo-90``, ``hi-90`` など) -> ``(n_series, horizon)``
+        model_name: long 形式にしたときの予測値の列名
+        raw_output: モデル固有の生の出力 (np.arrayなど)
+        meta: 推論にかかった時間やトークン数などのメタデータ
+    """
+    ids: np.ndarray
+    start: np.ndarray
+    point: np.ndarray
+    freq: str = "D"
+    quantiles: Dict[str, np.ndarray] = field(default_factory=dict)
+    model_name: str = "yhat"
+    raw_output: Optional[Any] = None
+    meta: Dict[str, Any] = field(default_factory=dict)
+    _frame: Optional[pd.DataFrame] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.ids = np.asarray(self.ids, dtype=object)
+        self.start = np.asarray(self.start, dtype="datetime64[ns]")
+        self.point = np.asarray(self.point, dtype=float).reshape(len(self.ids), -1)
+
+    @property
+    def n_series(self) -> int:
+        return int(len(self.ids))
+
+    @property
+    def horizon(self) -> int:
+        return int(self.point.shape[1])
+
+    def dates(self) -> np.ndarray:
+        """予測日時の行列 ``(n_series, horizon)``."""
+        if self.horizon == 0:
+            return np.empty((self.n_series, 0), dtype="datetime64[ns]")
+        return np.concatenate([self.start[:, None], future_dates(self.start, self.horizon - 1, self.freq)], axis=1)
+
+    def renamed(self, model_name: str) -> "ForecastResult":
+        """予測値の列名だけを変えた結果を返す (配列は共有)."""
+        if model_name == self.model_name:
+            return self
+        return replace(self, model_name=model_name)
+
+    def add_quantiles(self, quantiles: Mapping[str, np.ndarray]) -> "ForecastResult":
+        """分位行列を追加・上書きする (組み立て済みの long 形式は破棄する)."""
+        for suffix, values in quantiles.items():
+            self.quantiles[suffix] = np.asarray(values, dtype=float).reshape(self.point.shape)
+        self._frame = None
+        return self
+
+    @property
+    def yhat(self) -> pd.DataFrame:
+        """long 形式の予測 DataFrame (初回アクセス時に組み立ててキャッシュする)."""
+        if self._frame is None:
+            data = {
+                "unique_id": np.repeat(self.ids, self.horizon),
+                "ds": self.dates().ravel(),
+                self.model_name: self.point.ravel(),
+            }
+            for suffix, values in self.quantiles.items():
+                data[f"{self.model_name}-{suffix}"] = np.asarray(values, dtype=float).ravel()
+            self._frame = pd.DataFrame(data)
+        return self._frame
+
+    @classmethod
+    def from_frame(
+        cls,
+        yhat: pd.DataFrame,
+        model_name: str,
+        freq: Optional[str] = None,
+        raw_output: Optional[Any] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> "ForecastResult":
+        """long 形式の予測 DataFrame から組み立てる (全系列のステップ数が同じであること)."""
+        frame = yhat.sort_values(["unique_id", "ds"], kind="stable")
+        ids, counts = np.unique(frame["unique_id"].to_numpy(), return_counts=True)
+        if len(counts) and (counts != counts[0]).any():
+            raise ValueError("all series must have the same number of forecast steps")
+        shape = (len(ids), int(counts[0]) if len(counts) else 0)
+        ds = pd.to_datetime(frame["ds"]).to_numpy(dtype="datetime64[ns]").reshape(shape)
+        if freq is None:
+            freq = (pd.infer_freq(pd.DatetimeIndex(ds[0])) if shape[1] >= 3 else None) or "D"
+        prefix = f"{model_name}-"
+        result = cls(
+            ids=ids,
+            start=ds[:, 0] if shape[1] else np.empty(len(ids), dtype="datetime64[ns]"),
+            point=frame[model_name].to_numpy(dtype=float).reshape(shape),
+            freq=freq,
+            quantiles={
+                c[len(prefix):]: frame[c].to_numpy(dtype=float).reshape(shape)
+                for c in frame.columns if str(c).startswith(prefix)
+            },
+            model_name=model_name,
+            raw_output=raw_output,
+            meta=dict(meta or {}),
+        )
+        result._frame = yhat
+        return result
 
 
 class BaseTSFMAdapter(ABC):
@@ -71,6 +243,7 @@ class BaseTSFMAdapter(ABC):
         self.name = name
         self.capabilities = capabilities
         self.kwargs = kwargs
+        self.batch_size = int(kwargs.get("batch_size") or DEFAULT_BATCH_SIZE)
         
         # モデルのロード状態
         self._is_loaded = False
@@ -95,6 +268,10 @@ class BaseTSFMAdapter(ABC):
             logger.warning(f"{self.name} fit method is not implemented or not supported.")
         return self
 
+    def warmup(self) -> 'BaseTSFMAdapter':
+        """重みのロードなど初回推論前の準備を行う (起動時のプリウォーム用). 既定では何もしない."""
+        return self
+
     @abstractmethod
     def predict(
         self, 
@@ -118,6 +295,85 @@ class BaseTSFMAdapter(ABC):
         """
         raise NotImplementedError
 
+    def _predict_batch(self, context: np.ndarray, mask: np.ndarray, horizon: int) -> np.ndarray:
+        """1 バッチ分の推論 (配列ネイティブなプロトコル).
+
+        Args:
+            context: 左パディング済みの履歴 ``(batch, width)``
+            mask: 観測値位置が True のマスク ``(batch, width)``
+            horizon: 予測期間
+
+        Returns:
+            予測値 ``(batch, horizon)``
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not implement batched prediction")
+
+    def predict_arrays(
+        self,
+        context: np.ndarray,
+        lengths: np.ndarray,
+        horizon: int,
+        batch_size: Optional[int] = None,
+    ) -> np.ndarray:
+        """左パディング済み配列 ``(n_series, context)`` をまとめて予測する.
+
+        系列長の近いもの同士でバッチを組み、各バッチはそのバッチの最大長まで
+        切り詰めてから :meth:`_predict_batch` に渡す。推論に失敗したバッチの系列は NaN になる。
+        アダプタが :meth:`_predict_batch` を実装していない場合は最初に NotImplementedError を送出する。
+
+        Returns:
+            予測値 ``(n_series, horizon)``
+        """
+        if type(self)._predict_batch is BaseTSFMAdapter._predict_batch:
+            raise NotImplementedError(f"{type(self).__name__} does not implement batched prediction")
+        context = np.asarray(context, dtype=float)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        out = np.full((len(context), horizon), np.nan)
+        for idx in length_buckets(lengths, batch_size or self.batch_size):
+            width = int(lengths[idx].max())
+            if width == 0:
+                continue
+            values = context[idx, context.shape[1] - width :]
+            try:
+                pred = np.asarray(self._predict_batch(values, padding_mask(lengths[idx], width), horizon), dtype=float)
+            except Exception as e:
+                logger.error(f"{self.name}: prediction failed for a batch of {len(idx)} series: {e}")
+                continue
+            pred = pred.reshape(len(idx), -1)
+            if pred.shape[1] < horizon:
+                logger.warning(f"{self.name}: model returned {pred.shape[1]} steps for horizon={horizon}")
+                out[idx, : pred.shape[1]] = pred
+            else:
+                out[idx] = pred[:, -horizon:]
+        return out
+
+    def predict_frame(
+        self,
+        history: pd.DataFrame,
+        horizon: int,
+        freq: str | None = None,
+        context_length: Optional[int] = None,
+        column: Optional[str] = None,
+    ) -> ForecastResult:
+        """DataFrame 入力を配列に変換して :meth:`predict_arrays` で予測する.
+
+        予測は行列のまま :class:`ForecastResult` に入れて返す (long 形式は
+        :attr:`ForecastResult.yhat` に初めてアクセスされたときに組み立てる)。
+
+        Returns:
+            予測値の列名が ``column`` (既定はアダプタ名) の ForecastResult
+        """
+        # DataFrame から構築したパネルには空の系列は含まれない
+        panel = self.to_panel(history)
+        context, lengths = pad_context(panel, context_length or self.capabilities.context_length)
+        preds = self.predict_arrays(context, lengths, horizon)
+
+        if freq is None:
+            freq = _infer_panel_freq(panel)
+        # 各系列の最初の予測日だけを求め、日付行列は ForecastResult.dates() で展開する
+        start = future_dates(panel.ds[panel.last_index()], 1, freq)[:, 0]
+        return ForecastResult(ids=panel.ids, start=start, point=preds, freq=freq, model_name=column or self.name)
+
     def validate_input(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         共通の入力検証と前処理を行う。
@@ -150,6 +406,17 @@ class BaseTSFMAdapter(ABC):
         
         return df
 
+    def to_panel(self, history: pd.DataFrame) -> ColumnarPanel:
+        """履歴 DataFrame を列指向パネルに変換する.
+
+        系列ごとのフィルタリング (``df[df['unique_id'] == uid]``) の代わりに
+        オフセットでスライスできるため、系列数が多い場合の前処理コストを抑えられる。
+        """
+        required = {"unique_id", "ds", "y"}
+        if not required.issubset(history.columns):
+            raise ValueError(f"Input dataframe must contain {required} columns. Found: {history.columns.tolist()}")
+        return ColumnarPanel.from_frame(history)
+
     def format_output(
         self, 
         preds: pd.DataFrame, 
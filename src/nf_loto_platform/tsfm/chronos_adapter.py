@@ -5,7 +5,7 @@ from typing import Mapping
 import pandas as pd
 import numpy as np
 
-from .base import BaseTSFMAdapter, ForecastResult, TSFMCapabilities
+from .base import BaseTSFMAdapter, ForecastResult, TSFMCapabilities, future_dates
 
 
 class Chronos2ZeroShotAdapter(BaseTSFMAdapter):
@@ -28,7 +28,7 @@ class Chronos2ZeroShotAdapter(BaseTSFMAdapter):
                 task_types=["forecasting"],
                 input_arity="both",
                 supports_exogenous=True,
-                zero_shot=True,
+                is_zero_shot=True,
                 finetuneable=False,
                 max_context_length=512,
                 max_horizon=None,
@@ -60,60 +60,47 @@ class Chronos2ZeroShotAdapter(BaseTSFMAdapter):
         if history.empty:
             raise ValueError("history dataframe must not be empty")
 
-        df = history.copy()
-        # ds列をdatetime型に変換
-        if "ds" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["ds"]):
-            df["ds"] = pd.to_datetime(df["ds"])
-            
+        # 列指向パネルに変換 (ソートは高々 1 回、系列ごとの DataFrame は作らない)
+        panel = self.to_panel(history)
+
         # 頻度の推論 (指定がない場合)
         inferred_freq = freq
         if inferred_freq is None:
-            if len(df) > 1:
-                inferred_freq = pd.infer_freq(df.sort_values("ds")["ds"])
+            if panel.n_rows > 1:
+                inferred_freq = pd.infer_freq(pd.DatetimeIndex(np.sort(panel.ds)))
             
             # 推論できなかった場合のデフォルト
             if inferred_freq is None:
                 inferred_freq = "D"
 
-        forecasts = []
-        grouped = df.sort_values("ds").groupby("unique_id")
-        
-        for uid, group in grouped:
-            # 本来はここで Chronos モデルに推論を投げる
-            # 今回はモックとして、最後の値を水平に延ばす (Naive Forecast) 
-            # または、単純なトレンドを加味するロジックを実装
-            
-            last_row = group.iloc[-1]
-            last_value = float(last_row["y"])
-            start_ds = last_row["ds"]
-            
-            # 予測期間の日付インデックスを作成
-            future_index = pd.date_range(
-                start=start_ds, 
-                periods=horizon + 1, 
-                freq=inferred_freq
-            )[1:] # start_ds (=historyの最後) は含めない
-            
-            # 簡易ロジック: 直近の変動を少し加味したランダムウォーク (モック用)
-            # ※ 実際のChronos統合時はここを pipeline(context=group["y"]) に置き換える
-            np.random.seed(42) # 再現性のため固定
-            random_walk = np.random.normal(0, last_value * 0.01, size=horizon)
-            predictions = last_value + np.cumsum(random_walk)
-            
-            for ts, pred in zip(future_index, predictions):
-                forecasts.append({
-                    "unique_id": uid, 
-                    "ds": ts, 
-                    self.name: float(pred), # モデル名 (Chronos) をカラム名にする
-                    # 信頼区間 (モック)
-                    f"{self.name}-lo-90": float(pred * 0.95),
-                    f"{self.name}-hi-90": float(pred * 1.05)
-                })
+        # 本来はここで Chronos モデルに推論を投げる
+        # 今回はモックとして、最後の値を起点としたランダムウォークを全系列まとめて生成する
+        # ※ 実際のChronos統合時はここを pipeline(context=...) に置き換える
+        last_idx = panel.last_index()
+        last_idx = last_idx[last_idx >= 0]
+        uids = panel.ids[panel.lengths > 0]
+        last_values = panel.y[last_idx]
+        start_ds = panel.ds[last_idx]
 
-        yhat = pd.DataFrame(forecasts)
-        
+        # 各系列の最初の予測日 (historyの最後は含めない)。日付行列は ForecastResult.dates() で展開する
+        first_ds = future_dates(start_ds, 1, inferred_freq)[:, 0]
+
+        # 簡易ロジック: 直近の変動を少し加味したランダムウォーク (モック用)
+        # 再現性のため全系列で同じ乱数列 (seed=42) を系列の水準でスケールして使う
+        shocks = np.random.RandomState(42).standard_normal(horizon)
+        predictions = last_values[:, None] + np.cumsum(
+            (last_values * 0.01)[:, None] * shocks[None, :], axis=1
+        )
+
+        # long 形式の DataFrame は ForecastResult.yhat に初めてアクセスされたときに組み立てる
         return ForecastResult(
-            yhat=yhat, 
+            ids=uids,
+            start=first_ds,
+            point=predictions,
+            freq=inferred_freq,
+            # 信頼区間 (モック)
+            quantiles={"lo-90": predictions * 0.95, "hi-90": predictions * 1.05},
+            model_name=self.name, # モデル名 (Chronos) をカラム名にする
             raw_output=None, 
             meta={
                 "strategy": "mock_chronos_random_walk", 
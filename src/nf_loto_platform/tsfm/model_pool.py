@@ -0,0 +1,247 @@
+"""TSFM モデルのプロセス内ウォームプール.
+
+``TimeMoEAdapter`` / ``MomentAdapter`` はインスタンスごとに ``from_pretrained`` で
+重みをディスクから読み直していたため、オーケストレータの反復やスイープの
+各ステップでロード時間を毎回支払っていた。ここでは ``(model_id, dtype, device)``
+をキーに、ロード済みモデルをプロセス内で共有する。
+
+- 最近使われていないものから追い出す LRU (常駐メモリ予算 ``NF_TSFM_POOL_MAX_MB``)
+- モデルごとの常駐メモリはロード前後の RSS の増分 (取れない場合はパラメータのバイト数)
+- 起動時の明示的なプリウォーム (:meth:`ModelPool.prewarm`)
+- ロード時間・ヒット率を :meth:`ModelPool.stats` と Prometheus メトリクスで公開
+
+アダプタ側は ``get_model_pool().get(model_id, loader, dtype=..., device=...)`` で
+モデルを取得する。``loader`` はプールに無い場合のみ呼ばれる。
+"""
+
+from __future__ import annotations
+
+import gc
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from nf_loto_platform.monitoring.prometheus_metrics import observe_model_pool
+
+try:
+    import psutil
+    _PSUTIL_AVAILABLE = True
+except ImportError:  # pragma: no cover - psutil は通常インストールされている
+    psutil = None  # type: ignore[assignment]
+    _PSUTIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+ModelKey = Tuple[str, str, str]
+
+
+def _rss_mb() -> Optional[float]:
+    if not _PSUTIL_AVAILABLE:
+        return None
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def _param_mb(model: Any) -> float:
+    """torch.nn.Module のパラメータ・バッファのバイト数 (MB). 対応しないオブジェクトは 0."""
+    total = 0
+    for attr in ("parameters", "buffers"):
+        tensors = getattr(model, attr, None)
+        if not callable(tensors):
+            continue
+        try:
+            total += sum(t.numel() * t.element_size() for t in tensors())
+        except Exception:
+            return 0.0
+    return total / (1024 * 1024)
+
+
+@dataclass
+class PooledModel:
+    """プールに常駐しているモデルと、そのロード情報."""
+
+    key: ModelKey
+    model: Any
+    size_mb: float
+    load_seconds: float
+    hits: int = 0
+
+
+class ModelPool:
+    """``(model_id, dtype, device)`` をキーにしたスレッドセーフな LRU モデルプール."""
+
+    def __init__(self, max_mb: Optional[float] = None, rss_fn: Callable[[], Optional[float]] = _rss_mb) -> None:
+        """
+        Args:
+            max_mb: 常駐させるモデルの合計メモリ予算 (MB)。None/0 で無制限。
+            rss_fn: 現在のプロセス RSS (MB) を返す関数 (テスト用に差し替え可能)
+        """
+        self.max_mb = float(max_mb) if max_mb else None
+        self._rss_fn = rss_fn
+        self._models: "OrderedDict[ModelKey, PooledModel]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 同じモデルを複数スレッドが同時にロードしないよう、キーごとにロード用ロックを持つ
+        self._loading: Dict[ModelKey, threading.Lock] = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._load_seconds: Dict[ModelKey, List[float]] = {}
+
+    # ------------------------------------------------------------------
+    # 取得・ロード
+    # ------------------------------------------------------------------
+    def get(
+        self,
+        model_id: str,
+        loader: Callable[[], Any],
+        dtype: str = "float32",
+        device: str = "cpu",
+    ) -> Any:
+        """プール内のモデルを返す. 無ければ ``loader()`` でロードして登録する."""
+        key: ModelKey = (str(model_id), str(dtype), str(device))
+        model = self._lookup(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            load_lock = self._loading.setdefault(key, threading.Lock())
+        with load_lock:
+            # 待っている間に他のスレッドがロードを終えていればそれを使う
+            model = self._lookup(key)
+            if model is not None:
+                return model
+            return self._load(key, loader)
+
+    def _lookup(self, key: ModelKey) -> Any:
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None:
+                return None
+            self._models.move_to_end(key)
+            entry.hits += 1
+            self._hits += 1
+        observe_model_pool(key[0], hit=True)
+        return entry.model
+
+    def _load(self, key: ModelKey, loader: Callable[[], Any]) -> Any:
+        rss_before = self._rss_fn()
+        start = time.perf_counter()
+        model = loader()
+        elapsed = time.perf_counter() - start
+        rss_after = self._rss_fn()
+
+        size_mb = _param_mb(model)
+        if rss_before is not None and rss_after is not None:
+            size_mb = max(size_mb, rss_after - rss_before)
+
+        entry = PooledModel(key=key, model=model, size_mb=size_mb, load_seconds=elapsed)
+        with self._lock:
+            self._misses += 1
+            self._load_seconds.setdefault(key, []).append(elapsed)
+            self._models[key] = entry
+            evicted = self._evict_over_budget(keep=key)
+            resident_mb = self._resident_mb()
+        logger.info(f"Loaded TSFM model {key[0]} ({key[1]}, {key[2]}) in {elapsed:.2f}s, ~{size_mb:.0f}MB")
+        observe_model_pool(key[0], hit=False, load_seconds=elapsed, resident_mb=resident_mb)
+        if evicted:
+            gc.collect()
+        return model
+
+    def prewarm(self, specs: Iterable[Tuple[str, Callable[[], Any], str, str]]) -> Dict[ModelKey, float]:
+        """``(model_id, loader, dtype, device)`` の列を事前にロードし、ロード秒数を返す (起動時用)."""
+        loaded: Dict[ModelKey, float] = {}
+        for model_id, loader, dtype, device in specs:
+            key: ModelKey = (str(model_id), str(dtype), str(device))
+            self.get(model_id, loader, dtype=dtype, device=device)
+            with self._lock:
+                entry = self._models.get(key)
+            if entry is not None:
+                loaded[key] = entry.load_seconds
+        return loaded
+
+    # ------------------------------------------------------------------
+    # 追い出し
+    # ------------------------------------------------------------------
+    def _resident_mb(self) -> float:
+        return float(sum(e.size_mb for e in self._models.values()))
+
+    def _evict_over_budget(self, keep: ModelKey) -> List[ModelKey]:
+        """予算を超えている間、最近使われていないモデルから追い出す (呼び出し側でロック済み)."""
+        evicted: List[ModelKey] = []
+        if self.max_mb is None:
+            return evicted
+        for key in list(self._models):
+            if self._resident_mb() <= self.max_mb:
+                break
+            if key == keep:
+                continue
+            del self._models[key]
+            self._evictions += 1
+            evicted.append(key)
+            logger.info(f"Evicted TSFM model {key[0]} ({key[1]}, {key[2]}) from the model pool")
+        if self._resident_mb() > self.max_mb:
+            logger.warning(
+                f"TSFM model {keep[0]} alone exceeds the model pool budget ({self._resident_mb():.0f}MB > {self.max_mb:.0f}MB)"
+            )
+        return evicted
+
+    def evict(self, model_id: str, dtype: str = "float32", device: str = "cpu") -> bool:
+        """指定したモデルをプールから外す. 外した場合は True."""
+        with self._lock:
+            entry = self._models.pop((str(model_id), str(dtype), str(device)), None)
+            if entry is not None:
+                self._evictions += 1
+        if entry is not None:
+            gc.collect()
+        return entry is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+        gc.collect()
+
+    def __contains__(self, key: ModelKey) -> bool:
+        with self._lock:
+            return tuple(key) in self._models
+
+    def stats(self) -> Dict[str, Any]:
+        """ヒット率・ロード時間・常駐モデルの情報."""
+        with self._lock:
+            requests = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / requests if requests else 0.0,
+                "evictions": self._evictions,
+                "resident_mb": self._resident_mb(),
+                "max_mb": self.max_mb,
+                "models": [
+                    {
+                        "model_id": e.key[0],
+                        "dtype": e.key[1],
+                        "device": e.key[2],
+                        "size_mb": e.size_mb,
+                        "load_seconds": e.load_seconds,
+                        "hits": e.hits,
+                    }
+                    for e in self._models.values()
+                ],
+                "load_seconds": {"|".join(k): list(v) for k, v in self._load_seconds.items()},
+            }
+
+
+_DEFAULT_POOL: Optional[ModelPool] = None
+_DEFAULT_POOL_LOCK = threading.Lock()
+
+
+def get_model_pool() -> ModelPool:
+    """プロセス共通のモデルプール (予算は ``NF_TSFM_POOL_MAX_MB``)."""
+    global _DEFAULT_POOL
+    with _DEFAULT_POOL_LOCK:
+        if _DEFAULT_POOL is None:
+            max_mb = os.getenv("NF_TSFM_POOL_MAX_MB")
+            _DEFAULT_POOL = ModelPool(max_mb=float(max_mb) if max_mb else None)
+        return _DEFAULT_POOL
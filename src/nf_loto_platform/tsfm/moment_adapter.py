@@ -18,7 +18,8 @@ import numpy as np
 import pandas as pd
 import torch
 
-from nf_loto_platform.tsfm.base import BaseTSFMAdapter
+from nf_loto_platform.tsfm.base import BaseTSFMAdapter, ForecastResult, TSFMCapabilities
+from nf_loto_platform.tsfm.model_pool import get_model_pool
 
 # -----------------------------------------------------------------------------
 # Optional Imports
@@ -52,18 +53,36 @@ class MomentAdapter(BaseTSFMAdapter):
         Args:
             model_name: モデル識別子 (例: "AutonLab/MOMENT-1-large")
             context_length: 入力系列長 (デフォルト: 512)
+            **kwargs: batch_size (1 回のフォワードパスに入れる系列数) など
         """
-        super().__init__(model_name, context_length, use_gpu, rag_context, **kwargs)
+        self.model_name = model_name
+        self.context_length = context_length or 512
+        self.use_gpu = use_gpu
+        self.rag_context = rag_context
+        # HF Model ID Mapping
+        self.hf_model_id = self._resolve_model_id(model_name)
+
+        super().__init__(
+            model_name,
+            TSFMCapabilities(
+                provider="AutonLab",
+                model_id=self.hf_model_id,
+                task_types=["forecasting", "embedding"],
+                context_length=self.context_length,
+                max_context_length=self.context_length,
+                license="MIT",
+                commercial_allowed=True,
+            ),
+            **kwargs,
+        )
         
         if not TRANSFORMERS_AVAILABLE:
             logger.warning("transformers library not found. MomentAdapter will default to mock mode.")
 
         self.device = self._select_device(use_gpu)
+        # predict の実行中だけプールのモデルを指す (それ以外は None)
         self.model = None
         self.config = None
-        
-        # HF Model ID Mapping
-        self.hf_model_id = self._resolve_model_id(model_name)
 
     def _resolve_model_id(self, model_name: str) -> str:
         """UI表示名からHuggingFace IDへのマッピング."""
@@ -83,148 +102,121 @@ class MomentAdapter(BaseTSFMAdapter):
         return torch.device("cpu")
 
     def _load_model(self):
-        """モデルをロードする (Lazy Loading)."""
-        if self.model is not None:
-            return
+        """モデルをプールから取得する (Lazy Loading, プロセス共通のモデルプールにロード済みなら再利用).
 
+        プールの LRU 追い出しを妨げないよう、アダプタはモデルへの参照を保持しない。
+        """
+        model = get_model_pool().get(
+            f"{self.hf_model_id}?seq_len={self.context_length}",
+            self._load_weights,
+            dtype="float32",
+            device=str(self.device),
+        )
+        self.config = getattr(model, "config", None)
+        return model
+
+    def warmup(self):
+        """重みをモデルプールにロードしておく."""
+        self._load_model()
+        return self
+
+    def _load_weights(self):
+        """重みを読み込んだモデルを返す."""
         logger.info(f"Loading MOMENT model from {self.hf_model_id} to {self.device}...")
         try:
             # MOMENTは現時点(2025)でAutoModelForTimeSeriesForecastingに対応していると仮定
             # 対応していない場合は、MOMENT独自のロードロジックをここに記述する
             
-            self.config = AutoConfig.from_pretrained(self.hf_model_id, trust_remote_code=True)
+            config = AutoConfig.from_pretrained(self.hf_model_id, trust_remote_code=True)
             
             # コンテキスト長の設定
             if self.context_length:
-                if hasattr(self.config, "seq_len"):
-                    self.config.seq_len = self.context_length
+                if hasattr(config, "seq_len"):
+                    config.seq_len = self.context_length
             
-            self.model = AutoModelForTimeSeriesForecasting.from_pretrained(
+            model = AutoModelForTimeSeriesForecasting.from_pretrained(
                 self.hf_model_id,
-                config=self.config,
+                config=config,
                 trust_remote_code=True,
                 torch_dtype=torch.float32 # MOMENTはfloat32推奨の場合が多い
             )
             
-            self.model.to(self.device)
-            self.model.eval()
+            model.to(self.device)
+            model.eval()
             logger.info("MOMENT model loaded successfully.")
+            return model
 
         except Exception as e:
             logger.error(f"Failed to load MOMENT model: {e}")
             raise RuntimeError(f"Could not load MOMENT model {self.hf_model_id}. Check internet connection or HF token.") from e
 
-    def _preprocess_series(self, y_series: np.ndarray) -> torch.Tensor:
+    def _preprocess_batch(self, context: np.ndarray) -> torch.Tensor:
         """
-        単一系列の前処理:
-        1. NaN処理 (線形補間)
-        2. スケーリング (Instance Normalization: (x - mean) / std)
-        3. Tensor化
+        バッチの前処理:
+        1. NaN処理 (系列ごとの線形補間)
+        2. Tensor化 (MOMENTはチャネル次元を要求するため (batch, n_channels=1, seq_len))
         """
-        # NaN 補間
-        if np.isnan(y_series).any():
-            y_series = pd.Series(y_series).interpolate().fillna(method='bfill').fillna(method='ffill').values
-
-        # NumPy -> Tensor
-        y_tensor = torch.tensor(y_series, dtype=torch.float32)
-        
-        # 長さ調整
-        if len(y_tensor) > self.context_length:
-            y_tensor = y_tensor[-self.context_length:]
-        
-        # Shape: (1, n_channels=1, seq_len)
-        # MOMENTはチャネル次元を要求する
-        return y_tensor.unsqueeze(0).unsqueeze(0)
+        if np.isnan(context).any():
+            context = pd.DataFrame(context.T).interpolate().bfill().ffill().to_numpy().T
+        return torch.tensor(context, dtype=torch.float32).unsqueeze(1)
 
     def predict(
         self, 
-        df: pd.DataFrame, 
-        horizon: int, 
+        history: pd.DataFrame,
+        horizon: int,
+        freq: Optional[str] = None,
+        exogenous: Optional[Dict[str, pd.DataFrame]] = None,
         confidence_level: Optional[float] = None,
         **kwargs
-    ) -> pd.DataFrame:
+    ) -> ForecastResult:
         """
-        予測実行.
+        予測実行 (系列長でバケット分けしたバッチ単位で推論する).
         """
-        self._load_model()
-        df = self._preprocess(df)
-        
-        results = []
-        unique_ids = df['unique_id'].unique()
-        
-        logger.info(f"MOMENT Prediction start: {len(unique_ids)} series, h={horizon}")
+        # 予測中だけモデルを参照し、終わったら手放す
+        self.model = self._load_model()
+        logger.info(f"MOMENT Prediction start: {history['unique_id'].nunique()} series, h={horizon}, batch_size={self.batch_size}")
+        try:
+            return self.predict_frame(history, horizon, freq=freq, context_length=self.context_length, column=self.model_name)
+        finally:
+            self.model = None
 
-        for uid in unique_ids:
-            group = df[df['unique_id'] == uid].sort_values('ds')
-            y_values = group['y'].values
-            
-            # 入力テンソル作成
-            input_tensor = self._preprocess_series(y_values).to(self.device)
-            # input_tensor shape: (1, 1, context_len)
-            
-            with torch.no_grad():
-                try:
-                    # MOMENTのフォワードパス
-                    # forecast taskの場合、future_masking等を内部で行うか、generateメソッドを使う
-                    # ここでは標準的なHF Forecasting APIを想定
-                    
-                    # 多くの場合、horizonを引数に渡すか、configで決まっている
-                    # model.generate() がある場合
-                    if hasattr(self.model, "generate"):
-                        outputs = self.model.generate(
-                            inputs=input_tensor,
-                            prediction_length=horizon
-                        )
-                        # outputs: (Batch, Samples, Horizon) or (Batch, Horizon)
-                        if outputs.dim() == 3:
-                            forecast = outputs.mean(dim=1)
-                        else:
-                            forecast = outputs
-                            
-                    else:
-                        # フォールバック: forwardを呼び出し、最後のステップの出力を取得など
-                        # ※実際のMOMENT実装に合わせる必要あり
-                        outputs = self.model(past_values=input_tensor)
-                        # logits shape: (Batch, Horizon, Dim) ???
-                        # 仮実装: logits属性があればそれを使う
-                        if hasattr(outputs, "logits"):
-                             forecast = outputs.logits
-                        elif hasattr(outputs, "prediction_logits"):
-                             forecast = outputs.prediction_logits
-                        else:
-                             # 最終手段: Tensorそのものが返ってくる場合
-                             forecast = outputs
-                    
-                    # Tensor -> Numpy (Batch=0)
-                    # forecast shape is expected to be (1, Horizon) or (1, 1, Horizon)
-                    forecast_np = forecast.cpu().numpy().flatten()[-horizon:]
-
-                except Exception as e:
-                    logger.warning(f"Prediction failed for {uid} with MOMENT: {e}. Returning NaNs.")
-                    forecast_np = np.full(horizon, np.nan)
-
-            # 結果DataFrame作成
-            last_ds = group['ds'].iloc[-1]
-            freq = pd.infer_freq(group['ds']) or 'D'
-            future_dates = pd.date_range(start=last_ds, periods=horizon + 1, freq=freq)[1:]
-            
-            # 長さが合わない場合のガード
-            if len(forecast_np) != len(future_dates):
-                logger.warning(f"Shape mismatch: forecast={len(forecast_np)}, dates={len(future_dates)}")
-                # 切り詰め or パディング
-                min_len = min(len(forecast_np), len(future_dates))
-                forecast_np = forecast_np[:min_len]
-                future_dates = future_dates[:min_len]
-
-            res_df = pd.DataFrame({
-                "unique_id": uid,
-                "ds": future_dates,
-                self.model_name: forecast_np
-            })
-            
-            results.append(res_df)
+    def _predict_batch(self, context: np.ndarray, mask: np.ndarray, horizon: int) -> np.ndarray:
+        """左パディング済みの ``(batch, width)`` 配列を 1 回のフォワードパスで予測する.
 
-        return pd.concat(results, ignore_index=True)
+        パディング位置は ``input_mask`` (観測値 = 1) で除外し、MOMENT の RevIN による
+        入力の正規化がパディング値を含めて計算されないようにする。
+        """
+        input_tensor = self._preprocess_batch(context).to(self.device)
+        # input_tensor shape: (batch, 1, context_len)
+        input_mask = torch.tensor(mask, dtype=torch.long, device=self.device)
+        # input_mask shape: (batch, context_len)
+
+        with torch.no_grad():
+            # MOMENTのフォワードパス
+            # forecast taskの場合、future_masking等を内部で行うか、generateメソッドを使う
+            # ここでは標準的なHF Forecasting APIを想定
+            if hasattr(self.model, "generate"):
+                outputs = self.model.generate(
+                    inputs=input_tensor,
+                    input_mask=input_mask,
+                    prediction_length=horizon
+                )
+                # outputs: (Batch, Samples, Horizon) or (Batch, Horizon)
+                forecast = outputs.mean(dim=1) if outputs.dim() == 3 else outputs
+            else:
+                # フォールバック: forwardを呼び出し、最後のステップの出力を取得など
+                # ※実際のMOMENT実装に合わせる必要あり
+                outputs = self.model(past_values=input_tensor, input_mask=input_mask)
+                if hasattr(outputs, "logits"):
+                    forecast = outputs.logits
+                elif hasattr(outputs, "prediction_logits"):
+                    forecast = outputs.prediction_logits
+                else:
+                    # 最終手段: Tensorそのものが返ってくる場合
+                    forecast = outputs
+
+        # (batch, ..., horizon) -> (batch, horizon): 末尾 horizon ステップを predict_arrays 側で取り出す
+        return forecast.float().cpu().numpy().reshape(len(context), -1)
 
     def fit(self, df: pd.DataFrame, **kwargs) -> 'MomentAdapter':
         """
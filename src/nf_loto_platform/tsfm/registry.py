@@ -1,18 +1,97 @@
 from __future__ import annotations
 
-from typing import Dict, Type
+import importlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
 
 from .base import BaseTSFMAdapter
 from .chronos_adapter import Chronos2ZeroShotAdapter
+from .model_pool import get_model_pool
+
+logger = logging.getLogger(__name__)
 
 _ADAPTERS: Dict[str, Type[BaseTSFMAdapter]] = {
     "Chronos2-ZeroShot": Chronos2ZeroShotAdapter,
 }
 
+# モデルプールを使うアダプタ (torch / transformers が必要なため、使うときに import する)
+# 表示名 -> (モジュール名, クラス名)。アダプタには model_name として表示名を渡す。
+_POOLED_ADAPTERS: Dict[str, Tuple[str, str]] = {
+    "Time-MoE-50M": ("time_moe_adapter", "TimeMoEAdapter"),
+    "Time-MoE-200M": ("time_moe_adapter", "TimeMoEAdapter"),
+    "Time-MoE-2.4B": ("time_moe_adapter", "TimeMoEAdapter"),
+    "MOMENT-Large": ("moment_adapter", "MomentAdapter"),
+    "MOMENT-Base": ("moment_adapter", "MomentAdapter"),
+    "MOMENT-Small": ("moment_adapter", "MomentAdapter"),
+}
+
+_PREWARM_LOCK = threading.Lock()
+_PREWARMED_FROM_ENV = False
+
 
-def get_adapter(model_name: str) -> BaseTSFMAdapter:
+def list_adapters() -> List[str]:
+    """登録済みのアダプタ名 (ソート済み)."""
+    return sorted({*_ADAPTERS, *_POOLED_ADAPTERS})
+
+
+def get_adapter(model_name: str, **kwargs: Any) -> BaseTSFMAdapter:
+    """表示名からアダプタを生成する. ``kwargs`` はアダプタのコンストラクタに渡す."""
+    if model_name in _ADAPTERS:
+        return _ADAPTERS[model_name](**kwargs)
     try:
-        adapter_cls = _ADAPTERS[model_name]
-    except KeyError as exc:  # pragma: no cover - defensive guard
+        module_name, class_name = _POOLED_ADAPTERS[model_name]
+    except KeyError as exc:
         raise ValueError(f"TSFM adapter for {model_name!r} is not registered") from exc
-    return adapter_cls()
+    adapter_cls = getattr(importlib.import_module(f".{module_name}", __package__), class_name)
+    return adapter_cls(model_name=model_name, **kwargs)
+
+
+def _env_model_names() -> List[str]:
+    return [n.strip() for n in os.getenv("NF_TSFM_PREWARM", "").split(",") if n.strip()]
+
+
+def prewarm(model_names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """起動時に TSFM の重みをプロセス共通のモデルプールへロードしておく.
+
+    Args:
+        model_names: 対象のアダプタ名。None の場合は環境変数 ``NF_TSFM_PREWARM`` (カンマ区切り)。
+
+    Returns:
+        アダプタ名 -> 準備にかかった秒数
+    """
+    if model_names is None:
+        model_names = _env_model_names()
+    elapsed: Dict[str, float] = {}
+    for name in model_names:
+        before = get_model_pool().stats()["misses"]
+        adapter = get_adapter(name)
+        start = time.perf_counter()
+        adapter.warmup()
+        elapsed[name] = time.perf_counter() - start
+        loaded = get_model_pool().stats()["misses"] - before
+        logger.info(f"Prewarmed TSFM adapter {name} in {elapsed[name]:.2f}s ({loaded} model(s) loaded)")
+    return elapsed
+
+
+def prewarm_from_env() -> Dict[str, float]:
+    """``NF_TSFM_PREWARM`` のアダプタをプロセスにつき 1 回だけプリウォームする.
+
+    オーケストレータやスイープワーカーの起動時に呼ばれる。fork で起動したワーカーは
+    親プロセスのモデルプールとこの状態を引き継ぐため、再ロードしない。
+    ロードに失敗したモデルは警告を出して読み飛ばす (起動自体は止めない)。
+    """
+    global _PREWARMED_FROM_ENV
+    with _PREWARM_LOCK:
+        if _PREWARMED_FROM_ENV:
+            return {}
+        _PREWARMED_FROM_ENV = True
+    elapsed: Dict[str, float] = {}
+    for name in _env_model_names():
+        try:
+            elapsed.update(prewarm([name]))
+        except Exception as e:
+            logger.warning(f"Failed to prewarm TSFM adapter {name}: {e}")
+    return elapsed
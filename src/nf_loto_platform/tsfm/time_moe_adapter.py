@@ -15,7 +15,8 @@ import numpy as np
 import pandas as pd
 import torch
 
-from nf_loto_platform.tsfm.base import BaseTSFMAdapter, TSFMCapabilities
+from nf_loto_platform.tsfm.base import BaseTSFMAdapter, ForecastResult, TSFMCapabilities
+from nf_loto_platform.tsfm.model_pool import get_model_pool
 
 # -----------------------------------------------------------------------------
 # Optional Imports (ライブラリがインストールされていない場合の対策)
@@ -54,19 +55,37 @@ class TimeMoEAdapter(BaseTSFMAdapter):
             context_length: 入力系列の最大長 (モデルの仕様に合わせる)
             use_gpu: GPUを利用するかどうか
             rag_context: RAGで検索された類似パターン情報 (現在はプロンプトとして未活用だがIFとして保持)
+            **kwargs: batch_size (1 回のフォワードパスに入れる系列数), compile など
         """
-        super().__init__(model_name, context_length, use_gpu, rag_context, **kwargs)
+        self.model_name = model_name
+        self.context_length = context_length or 512
+        self.use_gpu = use_gpu
+        self.rag_context = rag_context
+        # モデルの遅延ロード (メモリ節約のため predict/fit 時にロード)
+        # ここでは設定だけ確認
+        self.hf_model_id = self._resolve_model_id(model_name)
+
+        super().__init__(
+            model_name,
+            TSFMCapabilities(
+                provider="time-moe",
+                model_id=self.hf_model_id,
+                task_types=["forecasting"],
+                context_length=self.context_length,
+                max_context_length=self.context_length,
+                license="Apache-2.0",
+                hardware_pref="gpu-recommended",
+            ),
+            **kwargs,
+        )
         
         if not TRANSFORMERS_AVAILABLE:
             logger.warning("transformers library is not installed. TimeMoEAdapter will run in mock mode or fail.")
 
         self.device = self._select_device(use_gpu)
+        # predict の実行中だけプールのモデルを指す (それ以外は None)
         self.model = None
         self.config = None
-        
-        # モデルの遅延ロード (メモリ節約のため predict/fit 時にロード)
-        # ここでは設定だけ確認
-        self.hf_model_id = self._resolve_model_id(model_name)
 
     def _resolve_model_id(self, model_name: str) -> str:
         """UI表示名から実際のHuggingFace IDへのマッピング."""
@@ -85,43 +104,67 @@ class TimeMoEAdapter(BaseTSFMAdapter):
             return torch.device("mps")  # For Mac M-series
         return torch.device("cpu")
 
+    def _pool_model_id(self) -> str:
+        """モデルプールのキーに使う ID (設定の上書きを含める)."""
+        model_id = f"{self.hf_model_id}?context_length={self.context_length}"
+        return model_id + "&compile=1" if self.kwargs.get("compile", False) else model_id
+
     def _load_model(self):
-        """モデルをメモリにロードする."""
-        if self.model is not None:
-            return
+        """モデルをプールから取得する (プロセス共通のモデルプールにロード済みならディスクから読まない).
 
+        アダプタはモデルへの参照を保持しない (プールの LRU 追い出しでメモリを解放できるように、
+        予測のたびにプールから取得する)。
+        """
+        dtype = torch.bfloat16 if self.device.type == "cuda" else torch.float32
+        model = get_model_pool().get(
+            self._pool_model_id(),
+            lambda: self._load_weights(dtype),
+            dtype=str(dtype).replace("torch.", ""),
+            device=str(self.device),
+        )
+        self.config = getattr(model, "config", None)
+        return model
+
+    def warmup(self):
+        """重みをモデルプールにロードしておく."""
+        self._load_model()
+        return self
+
+    def _load_weights(self, dtype: torch.dtype):
+        """重みをディスク (または HF Hub) から読み込んだモデルを返す."""
         logger.info(f"Loading Time-MoE model from {self.hf_model_id} to {self.device}...")
         
         try:
             # Time-MoEの実装形態に依存するが、HF標準インターフェースを想定
-            self.config = AutoConfig.from_pretrained(self.hf_model_id)
+            config = AutoConfig.from_pretrained(self.hf_model_id)
             
             # コンテキスト長のオーバーライドがあれば適用
             if self.context_length:
                 # モデルによっては context_length, input_size, prediction_length など名称が異なる
-                if hasattr(self.config, "context_length"):
-                    self.config.context_length = self.context_length
+                if hasattr(config, "context_length"):
+                    config.context_length = self.context_length
             
             # モデルロード
-            self.model = AutoModelForTimeSeriesForecasting.from_pretrained(
+            model = AutoModelForTimeSeriesForecasting.from_pretrained(
                 self.hf_model_id,
-                config=self.config,
+                config=config,
                 trust_remote_code=True, # 多くの最新研究モデルで必要
-                torch_dtype=torch.bfloat16 if self.device.type == "cuda" else torch.float32
+                torch_dtype=dtype
             )
             
-            self.model.to(self.device)
-            self.model.eval()
+            model.to(self.device)
+            model.eval()
             
             # コンパイルによる高速化 (PyTorch 2.0+)
             if self.kwargs.get("compile", False) and hasattr(torch, "compile"):
                 try:
                     logger.info("Compiling model with torch.compile()...")
-                    self.model = torch.compile(self.model)
+                    model = torch.compile(model)
                 except Exception as e:
                     logger.warning(f"Model compilation failed: {e}")
 
             logger.info("Model loaded successfully.")
+            return model
 
         except Exception as e:
             logger.error(f"Failed to load Time-MoE model: {e}")
@@ -146,102 +189,64 @@ class TimeMoEAdapter(BaseTSFMAdapter):
 
     def predict(
         self, 
-        df: pd.DataFrame, 
-        horizon: int, 
+        history: pd.DataFrame,
+        horizon: int,
+        freq: Optional[str] = None,
+        exogenous: Optional[Dict[str, pd.DataFrame]] = None,
         confidence_level: Optional[float] = None,
         **kwargs
-    ) -> pd.DataFrame:
+    ) -> ForecastResult:
         """
         予測を実行する。
         
         Args:
-            df: 入力データフレーム (unique_id, ds, y)
+            history: 入力データフレーム (unique_id, ds, y)
+            freq: 予測日時の頻度 (None の場合は履歴から推定)
             horizon: 予測期間
             confidence_level: (Time-MoEが確率的出力に対応している場合のみ有効)
         """
-        self._load_model()
-        df = self._preprocess(df)
-        
-        results = []
-        unique_ids = df['unique_id'].unique()
-        
-        logger.info(f"Predicting {len(unique_ids)} series with horizon={horizon}...")
-        
-        for uid in unique_ids:
-            group = df[df['unique_id'] == uid]
-            
-            # 1. データ準備
-            # モデルの context_length に合わせて過去データを切り出す
-            past_values = group['y'].values
-            if len(past_values) > self.context_length:
-                past_values = past_values[-self.context_length:]
-            
-            # Tensor化
-            past_values_tensor = torch.tensor(past_values, dtype=torch.float32).unsqueeze(0).to(self.device)
-            # (Batch, Time) -> (1, T)
-            
-            # 外生変数があればここで処理 (Time-MoEが対応していれば)
-            # future_values = ...
-            
-            # 2. 推論
-            with torch.no_grad():
-                try:
-                    # generate メソッドを持つ生成モデルの場合
-                    if hasattr(self.model, "generate"):
-                        outputs = self.model.generate(
-                            inputs=past_values_tensor,
-                            prediction_length=horizon,
-                            num_return_sequences=1  # 決定論的予測
-                        )
-                        # output shape: (Batch, Samples, Horizon) or (Batch, Horizon)
-                        
-                        if outputs.dim() == 3:
-                            forecasts = outputs.mean(dim=1) # サンプル平均
-                        else:
-                            forecasts = outputs
-                            
-                        forecast_np = forecasts.cpu().numpy()[0] # (Horizon,)
-                    
-                    # 標準的な forward メソッドの場合
-                    else:
-                        # ダミーの未来入力が必要な場合がある
-                        outputs = self.model(past_values_tensor)
-                        # モデル仕様に合わせて logits や prediction を取得
-                        if hasattr(outputs, "logits"):
-                            forecast_np = outputs.logits[:, -horizon:, :].mean(dim=-1).cpu().numpy()[0]
-                        else:
-                            # Fallback logic
-                            raise NotImplementedError("Output parsing logic needed for this specific model architecture")
+        # 予測中だけモデルを参照し、終わったら手放す
+        self.model = self._load_model()
+        logger.info(f"Predicting {history['unique_id'].nunique()} series with horizon={horizon} (batch_size={self.batch_size})...")
 
-                except Exception as e:
-                    logger.error(f"Prediction failed for {uid}: {e}")
-                    # 失敗時は NaNs または 最後の値を埋める等のフォールバック
-                    forecast_np = np.full(horizon, np.nan)
+        # 系列長でバケット分けしたバッチ単位で推論する (BaseTSFMAdapter.predict_arrays)
+        # 分位点予測 (confidence_level) は Time-MoE が分布を出さないため conformal.py で後付けする
+        try:
+            return self.predict_frame(history, horizon, freq=freq, context_length=self.context_length, column=self.model_name)
+        finally:
+            self.model = None
 
-            # 3. 結果整形
-            last_ds = group['ds'].iloc[-1]
-            
-            # 日付生成 (Pandas の freq 推定に依存、あるいは D をデフォルトに)
-            freq = pd.infer_freq(group['ds']) or 'D'
-            future_dates = pd.date_range(start=last_ds, periods=horizon + 1, freq=freq)[1:]
-            
-            res_df = pd.DataFrame({
-                "unique_id": uid,
-                "ds": future_dates,
-                self.model_name: forecast_np
-            })
-            
-            # 分位点予測ロジック (Time-MoEが確率分布を返す場合)
-            if confidence_level:
-                # ここでは簡易的に不確実性を付与する例（実際はモデルのquantile出力を使う）
-                # Time-MoE が分布を出さない場合は空のまま、または conformal.py で後付けする
-                pass
+    def _predict_batch(self, context: np.ndarray, mask: np.ndarray, horizon: int) -> np.ndarray:
+        """左パディング済みの ``(batch, width)`` 配列を 1 回のフォワードパスで予測する.
 
-            results.append(res_df)
-        
-        # 全系列の結果を結合
-        final_df = pd.concat(results, ignore_index=True)
-        return final_df
+        パディング位置は ``attention_mask`` で除外し、観測値として扱わせない
+        (入力の正規化やアテンションがパディング値に引きずられないようにする)。
+        """
+        inputs = torch.tensor(context, dtype=torch.float32, device=self.device)
+        attention_mask = torch.tensor(mask, dtype=torch.long, device=self.device)
+
+        with torch.no_grad():
+            # generate メソッドを持つ生成モデルの場合
+            if hasattr(self.model, "generate"):
+                outputs = self.model.generate(
+                    inputs=inputs,
+                    attention_mask=attention_mask,
+                    prediction_length=horizon,
+                    num_return_sequences=1  # 決定論的予測
+                )
+                # output shape: (Batch, Samples, Horizon) or (Batch, Horizon)
+                forecasts = outputs.mean(dim=1) if outputs.dim() == 3 else outputs
+
+            # 標準的な forward メソッドの場合
+            else:
+                outputs = self.model(inputs, attention_mask=attention_mask)
+                # モデル仕様に合わせて logits や prediction を取得
+                if hasattr(outputs, "logits"):
+                    forecasts = outputs.logits[:, -horizon:, :].mean(dim=-1)
+                else:
+                    raise NotImplementedError("Output parsing logic needed for this specific model architecture")
+
+        return forecasts.float().cpu().numpy()
 
     def supports(
         self,
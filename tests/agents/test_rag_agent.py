@@ -9,6 +9,7 @@ import pandas as pd
 import pytest
 
 from nf_loto_platform.agents.rag_agent import RagAgent
+from nf_loto_platform.ml_analysis.distance_profile import PanelMatches
 
 @pytest.fixture
 def mock_config():
@@ -33,16 +34,17 @@ def sample_panel_data():
 
 @pytest.fixture
 def mock_search_result():
-    # search_similar_patterns の戻り値 (DataFrame)
-    return pd.DataFrame([
-        {"ds": "2023-01-01", "similarity": 0.95, "next_value": 100.0}, # Up
-        {"ds": "2022-01-01", "similarity": 0.90, "next_value": 105.0}, # Up
-        {"ds": "2021-01-01", "similarity": 0.85, "next_value": 5.0}    # Down
+    # search_panel の戻り値 (全系列分のマッチ + 系列ごとの統計)
+    matches = pd.DataFrame([
+        {"unique_id": "S1", "rank": 1, "ds": "2023-01-01", "similarity": 0.95, "next_val": 100.0, "window_values": [1.0]}, # Up
+        {"unique_id": "S1", "rank": 2, "ds": "2022-01-01", "similarity": 0.90, "next_val": 105.0, "window_values": [2.0]}, # Up
+        {"unique_id": "S1", "rank": 3, "ds": "2021-01-01", "similarity": 0.85, "next_val": 5.0, "window_values": [3.0]}    # Down
     ])
+    return PanelMatches.from_matches(matches, {"S1": 19.0})
 
 @patch("nf_loto_platform.agents.rag_agent.LLMClient")
 @patch("nf_loto_platform.agents.rag_agent.load_panel_by_loto")
-@patch("nf_loto_platform.agents.rag_agent.search_similar_patterns")
+@patch("nf_loto_platform.agents.rag_agent.search_panel")
 def test_search_workflow(
     mock_search_patterns, 
     mock_load_panel, 
@@ -70,12 +72,37 @@ def test_search_workflow(
     
     # 傾向分析のテスト: 2つがUp(>19), 1つがDown(<19) -> 66% Up -> Bullish
     assert len(s1_result["matches"]) == 3
-    assert s1_result["up_probability"] > 0.6
-    assert s1_result["trend_hint"] == "Bullish"
+    assert s1_result["stats"]["up_probability"] > 0.6
+    assert s1_result["stats"]["trend_hint"] == "Bullish"
+    assert [m["next_value"] for m in s1_result["matches"]] == [100.0, 105.0, 5.0]
     
-    # API呼び出しチェック
+    # API呼び出しチェック: パネル取得も検索も 1 回だけ
     mock_load_panel.assert_called_once()
     mock_search_patterns.assert_called_once()
+    queries = mock_search_patterns.call_args.args[1]
+    assert list(queries) == ["S1"]
+    assert queries["S1"].tolist() == list(range(10, 20))
+
+@patch("nf_loto_platform.agents.rag_agent.LLMClient")
+@patch("nf_loto_platform.agents.rag_agent.load_panel_by_loto")
+def test_search_uses_loaded_panel_for_all_series(mock_load_panel, mock_llm_cls, mock_config):
+    """全系列を取得済みパネルから検索し、DB への追加アクセスを行わない."""
+    cycle = [1.0, 5.0, 2.0, 8.0, 3.0, 9.0, 4.0, 7.0, 6.0, 0.0]
+    panel = pd.concat([
+        pd.DataFrame({"unique_id": uid, "ds": pd.date_range("2024-01-01", periods=40), "y": cycle * 4})
+        for uid in ["S2", "S1"]
+    ] + [pd.DataFrame({"unique_id": "S3", "ds": pd.date_range("2024-01-01", periods=5), "y": range(5)})])
+    mock_load_panel.return_value = panel.sample(frac=1.0, random_state=0)
+
+    result = RagAgent(mock_config).search("t", "loto6", ["S1", "S2", "S3"], horizon=5)
+
+    assert result["retrieved_series_count"] == 2
+    assert "S3" not in result["details"]  # 短すぎる系列は対象外
+    for uid in ["S1", "S2"]:
+        matches = result["details"][uid]["matches"]
+        assert len(matches) == 3
+        assert all(m["similarity"] == 1.0 for m in matches)  # 周期系列なので完全一致
+        assert all(m["next_value"] == 1.0 for m in matches)
 
 def test_empty_data_handling(mock_config):
     """データが存在しない場合のハンドリング."""
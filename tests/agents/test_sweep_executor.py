@@ -0,0 +1,221 @@
+"""
+Tests for SweepExecutor and ForecasterAgent.run_sweep の並列実行.
+
+予算内でのスケジューリング、RSS 上限による強制終了、
+並列実行時のベストモデル選択が逐次実行と一致することを確認する。
+"""
+
+import math
+import multiprocessing as mp
+import operator
+import os
+import pickle
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from nf_loto_platform.agents.domain import ExperimentRecipe
+from nf_loto_platform.agents.forecaster_agent import ForecasterAgent
+from nf_loto_platform.agents.sweep_executor import SweepExecutor, SweepTask, _PSUTIL_AVAILABLE
+
+pytestmark = pytest.mark.skipif(
+    "fork" not in mp.get_all_start_methods(), reason="fork start method is required"
+)
+
+
+def _failure(task, error):
+    return {"failed": task.model_name, "error": error}
+
+
+def test_fits_respects_cpu_gpu_and_memory_budget():
+    executor = SweepExecutor(cpu_budget=4, gpu_budget=1, memory_budget_mb=4096)
+    used = {"cpus": 2, "gpus": 0, "memory_mb": 2048}
+
+    assert executor.fits(SweepTask(0, "a", cpus=2, gpus=1, memory_mb=2048), used)
+    assert not executor.fits(SweepTask(1, "b", cpus=3), used)
+    assert not executor.fits(SweepTask(2, "c", gpus=2), used)
+    assert not executor.fits(SweepTask(3, "d", memory_mb=4096), used)
+
+
+def test_iter_outcomes_runs_tasks_concurrently_within_budget():
+    executor = SweepExecutor(cpu_budget=2, memory_budget_mb=10_000, poll_interval=0.05)
+    tasks = [SweepTask(i, f"m{i}", cpus=1, memory_mb=100) for i in range(4)]
+
+    def _fn(task):
+        time.sleep(0.5)
+        return (task.model_name, os.getpid(), os.environ["OMP_NUM_THREADS"])
+
+    start = time.time()
+    results = dict(executor.iter_outcomes(_fn, tasks, _failure))
+    elapsed = time.time() - start
+
+    assert sorted(t.model_name for t in results) == ["m0", "m1", "m2", "m3"]
+    assert all(r[2] == "1" for r in results.values())
+    assert len({r[1] for r in results.values()}) == 4
+    # 2 並列なので 4 タスク x 0.5 秒 が約 1 秒で終わる (逐次なら 2 秒)
+    assert elapsed < 1.9
+
+
+def test_iter_outcomes_reports_exceptions_and_crashes_as_failures():
+    executor = SweepExecutor(cpu_budget=2, memory_budget_mb=10_000, poll_interval=0.05)
+    tasks = [SweepTask(0, "ok"), SweepTask(1, "raises"), SweepTask(2, "crashes")]
+
+    def _fn(task):
+        if task.model_name == "raises":
+            raise ValueError("boom")
+        if task.model_name == "crashes":
+            os._exit(3)
+        return "done"
+
+    results = {t.model_name: r for t, r in executor.iter_outcomes(_fn, tasks, _failure)}
+
+    assert results["ok"] == "done"
+    assert "ValueError: boom" in results["raises"]["error"]
+    assert "code 3" in results["crashes"]["error"]
+
+
+def _child_square(x):
+    return x * x
+
+
+def test_iter_outcomes_workers_can_spawn_child_processes():
+    executor = SweepExecutor(cpu_budget=2, memory_budget_mb=10_000, poll_interval=0.05)
+
+    def _fn(task):
+        # DataLoader(num_workers>0) や process-pool を使うレシピ相当
+        with mp.get_context("fork").Pool(2) as pool:
+            return sum(pool.map(_child_square, range(4)))
+
+    results = {t.model_name: r for t, r in executor.iter_outcomes(_fn, [SweepTask(0, "pool")], _failure)}
+
+    assert results["pool"] == 14
+
+
+@pytest.mark.skipif(not _PSUTIL_AVAILABLE, reason="psutil is required")
+def test_iter_outcomes_kills_worker_exceeding_rss_limit():
+    executor = SweepExecutor(
+        cpu_budget=2, memory_budget_mb=10_000, max_worker_rss_mb=300, poll_interval=0.05
+    )
+
+    def _fn(task):
+        if task.model_name == "hog":
+            blob = bytearray(600 * 1024 * 1024)  # noqa: F841
+            time.sleep(30)
+        return "done"
+
+    tasks = [SweepTask(0, "hog"), SweepTask(1, "small")]
+    results = {t.model_name: r for t, r in executor.iter_outcomes(_fn, tasks, _failure)}
+
+    assert results["small"] == "done"
+    assert "exceeded limit" in results["hog"]["error"]
+
+
+@pytest.mark.skipif(not _PSUTIL_AVAILABLE, reason="psutil is required")
+def test_rss_limit_is_enforced_while_results_keep_arriving():
+    # 結果が poll_interval より短い間隔で届き続けても RSS の確認は毎回行う
+    executor = SweepExecutor(
+        cpu_budget=2, memory_budget_mb=10_000, max_worker_rss_mb=300, poll_interval=1.0
+    )
+
+    def _fn(task):
+        if task.model_name == "hog":
+            blob = bytearray(600 * 1024 * 1024)  # noqa: F841
+            time.sleep(30)
+        time.sleep(0.3)
+        return "done"
+
+    tasks = [SweepTask(0, "hog")] + [SweepTask(i, f"small{i}") for i in range(1, 9)]
+    order = [t.model_name for t, _ in executor.iter_outcomes(_fn, tasks, _failure)]
+
+    assert order.index("hog") < order.index("small8")
+
+
+def test_gpu_sweeps_use_spawn_unless_start_method_is_given():
+    executor = SweepExecutor(cpu_budget=2, gpu_budget=1, memory_budget_mb=10_000, poll_interval=0.05)
+    cpu_tasks = [SweepTask(0, "cpu")]
+    gpu_tasks = [SweepTask(0, "cpu"), SweepTask(1, "gpu", gpus=1)]
+
+    assert executor.context_for(cpu_tasks).get_start_method() == "fork"
+    assert executor.context_for(gpu_tasks).get_start_method() == "spawn"
+    assert SweepExecutor(start_method="fork").context_for(gpu_tasks).get_start_method() == "fork"
+
+    # spawn のワーカーには pickle 可能な関数を渡す
+    results = {t.model_name: r for t, r in executor.iter_outcomes(operator.attrgetter("model_name"), gpu_tasks[1:], _failure)}
+    assert results == {"gpu": "gpu"}
+
+
+def test_sweep_executor_from_env(monkeypatch):
+    monkeypatch.delenv("NF_SWEEP_MAX_WORKERS", raising=False)
+    assert SweepExecutor.from_env() is None
+    assert ForecasterAgent(runner_module=object())._sweep_executor is None
+
+    monkeypatch.setenv("NF_SWEEP_MAX_WORKERS", "3")
+    monkeypatch.setenv("NF_SWEEP_MAX_WORKER_RSS_MB", "512")
+    executor = SweepExecutor.from_env()
+    assert (executor.max_workers, executor.max_worker_rss_mb) == (3, 512.0)
+    assert isinstance(ForecasterAgent(runner_module=object())._sweep_executor, SweepExecutor)
+
+
+def test_forecaster_agent_pickles_for_spawned_workers():
+    from nf_loto_platform.ml import model_runner
+
+    agent = ForecasterAgent(sweep_executor=SweepExecutor(cpu_budget=1))
+
+    restored = pickle.loads(pickle.dumps(agent))
+
+    assert restored._runner is model_runner
+    assert restored._sweep_executor is None
+
+
+class _FakeRunner:
+    """モデル名ごとに固定の MAE を返す runner (完了順を入れ替えるため遅延を付ける)."""
+
+    scores = {"slow_best": 1.0, "tie_best": 1.0, "worse": 2.0, "broken": None}
+    delays = {"slow_best": 0.4, "tie_best": 0.0, "worse": 0.0, "broken": 0.0}
+
+    def run_loto_experiment(self, model_name, **kwargs):
+        time.sleep(self.delays[model_name])
+        if self.scores[model_name] is None:
+            raise RuntimeError("fit failed")
+        return pd.DataFrame(), {"run_id": f"run-{model_name}", "metrics": {"mae": self.scores[model_name]}}
+
+
+def _recipe(models):
+    return ExperimentRecipe(
+        models=models,
+        feature_sets=[],
+        search_backend="optuna",
+        num_samples=1,
+        time_budget_hours=None,
+        use_tsfm=False,
+        use_neuralforecast=True,
+        use_classical=False,
+        extra_params={"cpus": 1, "gpus": 0},
+    )
+
+
+def test_parallel_sweep_matches_sequential_best_model_selection():
+    task = SimpleNamespace(target_horizon=7, objective_metric="mae")
+    recipe = _recipe(["broken", "slow_best", "worse", "tie_best"])
+
+    sequential = ForecasterAgent(runner_module=_FakeRunner()).run_sweep(task, recipe, "t", "loto6", ["N1"])
+
+    streamed = []
+    executor = SweepExecutor(cpu_budget=4, memory_budget_mb=10_000, poll_interval=0.05)
+    parallel = ForecasterAgent(runner_module=_FakeRunner(), sweep_executor=executor).run_sweep(
+        task, recipe, "t", "loto6", ["N1"], on_outcome=streamed.append
+    )
+
+    # 同点の場合はレシピ内で先に現れるモデルが選ばれる (完了順ではない)
+    assert sequential.best_model_name == parallel.best_model_name == "slow_best"
+    assert parallel.metrics == sequential.metrics == {"mae": 1.0}
+    assert parallel.run_ids == sequential.run_ids
+    assert parallel.meta["best_run_id"] == "run-slow_best"
+    assert math.isnan(parallel.all_model_metrics["broken"]["mae"])
+    assert parallel.meta["sweep_results"][0]["single_run_meta"]["status"] == "failed"
+
+    # 完了したものから順に通知される
+    assert len(streamed) == 4
+    assert streamed[-1].best_model_name == "slow_best"
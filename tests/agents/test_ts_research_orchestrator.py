@@ -51,6 +51,18 @@ class DummyTSResearchStore:
     def insert_model_metric(self, **kwargs) -> None:
         self.metric_logs.append(kwargs)
 
+    def bulk_insert_model_metrics(self, trial_id: int, metric_rows) -> int:
+        rows = list(metric_rows)
+        for name, value, split, step, *rest in rows:
+            self.insert_model_metric(
+                trial_id=trial_id, metric_name=name, metric_value=value, split=split, step=step,
+                unique_id=rest[0] if rest else None,
+            )
+        return len(rows)
+
+    def insert_evaluation(self, trial_id: int, evaluation, split: str = "val") -> int:
+        return self.bulk_insert_model_metrics(trial_id, evaluation.metric_rows(split=split))
+
     def update_trial_status(self, trial_id: int, status: str) -> None:
         return None
 
@@ -106,3 +118,32 @@ def test_ts_research_orchestrator_registers_dataset_and_anomalies():
     assert store.anomaly_rows, "anomaly rows should be recorded"
     first_row = store.anomaly_rows[0]
     assert {"ts", "series_id", "score", "is_anomaly", "method"}.issubset(first_row.keys())
+
+
+
+def test_collect_evaluations_reads_single_run_and_sweep_meta():
+    from nf_loto_platform.agents.ts_research_orchestrator import _collect_evaluations
+
+    single = ExperimentOutcome(
+        best_model_name="AutoNHITS",
+        metrics={},
+        all_model_metrics={},
+        run_ids=["1"],
+        meta={"single_run_meta": {"model_name": "AutoNHITS", "evaluation": "eval-nhits"}},
+    )
+    sweep = ExperimentOutcome(
+        best_model_name="AutoNHITS",
+        metrics={},
+        all_model_metrics={},
+        run_ids=["1", "2", "3"],
+        meta={
+            "sweep_results": [
+                single.meta,
+                {"single_run_meta": {"model_name": "AutoTFT", "evaluation": "eval-tft"}},
+                {"single_run_meta": {"status": "failed", "error": "boom", "metrics": {}}},
+            ]
+        },
+    )
+
+    assert _collect_evaluations(single) == {"AutoNHITS": "eval-nhits"}
+    assert _collect_evaluations(sweep) == {"AutoNHITS": "eval-nhits", "AutoTFT": "eval-tft"}
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+import threading
+import time
+
+import psycopg2.extensions
+import pytest
+
+from nf_loto_platform.db import connection_pool
+from nf_loto_platform.db.connection_pool import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if self.conn.broken:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        self.conn.executed.append(sql)
+
+
+class FakeConnection:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.pid = os.getpid()
+        self.closed = 0
+        self.broken = False
+        self.status = psycopg2.extensions.STATUS_READY
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = psycopg2.extensions.STATUS_READY
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeConnect:
+    def __init__(self):
+        self.created = []
+
+    def __call__(self, **kwargs):
+        conn = FakeConnection(**kwargs)
+        self.created.append(conn)
+        return conn
+
+
+def _pool(**kwargs):
+    connect = FakeConnect()
+    kwargs.setdefault("minconn", 1)
+    kwargs.setdefault("maxconn", 2)
+    return ConnectionPool({"host": "db"}, connect=connect, **kwargs), connect
+
+
+def test_pool_reuses_connections_and_commits_on_exit():
+    pool, connect = _pool(statement_timeout_ms=5000)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    assert len(connect.created) == 1
+    assert first.commits == 2
+    assert connect.created[0].kwargs["options"] == "-c statement_timeout=5000"
+    stats = pool.stats()
+    assert stats["acquired"] == 2 and stats["idle"] == 1 and stats["in_use"] == 0
+
+
+def test_pool_rolls_back_on_error_and_close_releases():
+    pool, _ = _pool()
+
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            raise RuntimeError("boom")
+    assert conn.rollbacks == 1
+    assert pool.stats()["in_use"] == 0
+
+    borrowed = pool.connection()
+    borrowed.cursor().execute("SELECT 42")  # 属性は素の接続へ委譲される
+    borrowed.close()
+    assert pool.stats()["in_use"] == 0
+
+
+def test_pool_blocks_at_maxconn_and_times_out():
+    pool, _ = _pool(maxconn=1)
+    held = pool.connection()
+
+    with pytest.raises(PoolTimeout):
+        pool.acquire(timeout=0.05)
+
+    released = threading.Timer(0.1, held.close)
+    released.start()
+    conn = pool.acquire(timeout=2)
+    assert conn is held.raw
+    assert pool.stats()["timeouts"] == 1
+    assert pool.stats()["wait_seconds_max"] > 0.05
+
+
+def test_pool_discards_stale_connections_after_health_check():
+    pool, connect = _pool(health_check_interval=0.0)
+    with pool.connection() as conn:
+        pass
+    conn.broken = True
+
+    with pool.connection() as replacement:
+        pass
+
+    assert replacement is not conn
+    assert conn.closed
+    assert len(connect.created) == 2
+    assert pool.stats()["discarded"] == 1
+
+
+def test_pool_opens_connections_outside_the_lock():
+    locked = []
+
+    class CheckingConnect(FakeConnect):
+        def __call__(self, **kwargs):
+            free = pool._cond.acquire(blocking=False)
+            if free:
+                pool._cond.release()
+            locked.append(not free)
+            time.sleep(0.01)
+            return super().__call__(**kwargs)
+
+    connect = CheckingConnect()
+    pool = ConnectionPool({"host": "db"}, minconn=2, maxconn=8, connect=connect)
+
+    def _borrow():
+        with pool.connection():
+            time.sleep(0.02)
+
+    threads = [threading.Thread(target=_borrow) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert locked and not any(locked)  # prefill も貸し出し時の接続もロックの外で開く
+    stats = pool.stats()
+    assert stats["created"] == len(connect.created) <= 8
+    assert stats["size"] == stats["idle"] == len(connect.created)
+
+
+def _child_acquire(pool, queue):
+    with pool.connection() as conn:
+        queue.put((conn.pid, os.getpid()))
+
+
+@pytest.mark.skipif("fork" not in mp.get_all_start_methods(), reason="fork start method is required")
+def test_pool_opens_fresh_connections_after_fork():
+    pool, _ = _pool()
+    with pool.connection() as parent_conn:
+        pass
+
+    ctx = mp.get_context("fork")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child_acquire, args=(pool, queue))
+    proc.start()
+    conn_pid, child_pid = queue.get(timeout=10)
+    proc.join(timeout=10)
+
+    assert conn_pid == child_pid != os.getpid()
+    assert not parent_conn.closed  # 親の接続は子で閉じられない
+    with pool.connection() as again:
+        assert again is parent_conn
+
+
+def test_get_pool_is_shared_per_dsn(monkeypatch):
+    monkeypatch.setattr(connection_pool, "_POOLS", {})
+    a = connection_pool.get_pool({"host": "h1", "port": 5432})
+    b = connection_pool.get_pool({"port": 5432, "host": "h1"})
+    c = connection_pool.get_pool({"host": "h2", "port": 5432})
+
+    assert a is b
+    assert a is not c
+    assert [s["name"] for s in connection_pool.get_pool_stats()] == ["default", "pool1"]
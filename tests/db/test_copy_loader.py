@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nf_loto_platform.db import copy_loader
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def mogrify(self, query, params):
+        return (query.replace("%s", "'{}'") .format(*params)).encode("utf-8")
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append(sql)
+        self.description = [(name, oid) for name, oid in self.conn.column_oids.items()]
+
+    def copy_expert(self, sql, file, size=8192):
+        self.conn.copy_sql.append(sql)
+        if self.conn.copy_error is not None:
+            raise self.conn.copy_error
+        payload = self.conn.payload.encode("utf-8")
+        for i in range(0, len(payload), 7):  # 小さなチャンクで書き込みストリーミングを再現
+            file.write(payload[i : i + 7])
+
+
+class FakeCopyConnection:
+    """COPY ... TO STDOUT の CSV 出力を返すだけの psycopg2 接続もどき。"""
+
+    encoding = "UTF8"
+
+    def __init__(self, payload: str, copy_error=None, column_oids=None):
+        self.payload = payload
+        self.copy_error = copy_error
+        self.column_oids = dict(column_oids or {})
+        self.executed = []
+        self.copy_sql = []
+        self.rolled_back = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+CSV = (
+    "loto,unique_id,ds,y,hist_a,label\n"
+    "loto6,N1,2024-01-01,1.5,10,a\n"
+    "loto6,N1,2024-01-02,,11,\"\"\n"
+    "loto6,N2,2024-01-01,3,,b\n"
+)
+
+
+def test_read_frame_copy_decodes_with_dtypes():
+    conn = FakeCopyConnection(CSV)
+
+    df = copy_loader.read_frame_copy(
+        conn,
+        "SELECT * FROM nf_loto_hist WHERE loto = %s ORDER BY unique_id, ds",
+        params=["loto6"],
+        dtypes=copy_loader.PANEL_DTYPES,
+    )
+
+    assert conn.copy_sql == [
+        "COPY (SELECT * FROM nf_loto_hist WHERE loto = 'loto6' ORDER BY unique_id, ds) "
+        "TO STDOUT WITH (FORMAT csv, HEADER true)"
+    ]
+    assert pd.api.types.is_datetime64_any_dtype(df["ds"])
+    assert df["y"].dtype == np.float64
+    assert np.isnan(df.loc[1, "y"])
+    assert df["ds"].tolist() == list(pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-01"]))
+    assert np.isnan(df.loc[2, "hist_a"])
+    # NULL は欠損、クォートされた空文字列は空文字列のまま
+    assert df.loc[1, "label"] == ""
+    assert df["unique_id"].tolist() == ["N1", "N1", "N2"]
+
+
+def test_read_frame_copy_decodes_columns_by_database_type():
+    csv = "unique_id,ds,y,code,flag,n,payload\nN1,2024-01-01,1,001,t,7,1.5\nN2,2024-01-02,2,010,f,,\n"
+    conn = FakeCopyConnection(
+        csv,
+        column_oids={"unique_id": 25, "ds": 1082, "y": 1700, "code": 1043, "flag": 16, "n": 23, "payload": 3802},
+    )
+
+    df = copy_loader.read_frame_copy(conn, "SELECT * FROM t WHERE loto = %s", params=["loto6"])
+
+    assert conn.executed == ["SELECT * FROM (SELECT * FROM t WHERE loto = 'loto6') AS _copy_q LIMIT 0"]
+    # text 列は数値と推論せず、boolean は t/f を真偽値にする
+    assert df["code"].tolist() == ["001", "010"]
+    assert df["flag"].tolist() == [True, False]
+    assert pd.api.types.is_datetime64_any_dtype(df["ds"])
+    assert df["y"].dtype == np.float64
+    assert df["n"].iloc[0] == 7 and np.isnan(df["n"].iloc[1])
+    # 対応表に無い型 (jsonb など) は文字列で読む
+    assert df["payload"].iloc[0] == "1.5"
+
+
+def test_read_frame_copy_falls_back_to_pandas_coercion():
+    csv = "unique_id,ds,y\nN1,2024-01-01 00:00:00+09,1\nN1,2024-01-02 00:00:00+09,oops\n"
+    conn = FakeCopyConnection(csv)
+
+    df = copy_loader.read_frame_copy(conn, "SELECT * FROM t", dtypes=copy_loader.PANEL_DTYPES)
+
+    # 呼び出し側のトランザクションはロールバックしない
+    assert not conn.rolled_back
+    assert len(conn.copy_sql) == 2
+    assert df["y"].iloc[0] == 1.0
+    assert np.isnan(df["y"].iloc[1])
+    assert pd.api.types.is_datetime64_any_dtype(df["ds"])
+
+
+def test_read_frame_copy_surfaces_copy_errors_without_retry_or_rollback():
+    conn = FakeCopyConnection(CSV, copy_error=copy_loader.psycopg2.errors.InsufficientPrivilege("permission denied"))
+
+    with pytest.raises(copy_loader.psycopg2.errors.InsufficientPrivilege, match="permission denied"):
+        copy_loader.read_frame_copy(conn, "SELECT * FROM t", dtypes=copy_loader.PANEL_DTYPES)
+
+    assert len(conn.copy_sql) == 1
+    assert not conn.rolled_back
+
+
+def test_stream_copy_drains_output_when_reader_stops_early():
+    conn = FakeCopyConnection("x\n" * 200_000)
+
+    def _consume(reader):
+        reader.read(10)
+        raise ValueError("decode failed")
+
+    # 読み取り側が途中でパイプを閉じても COPY は正常終了し、読み取り側の例外だけが送出される
+    with pytest.raises(ValueError, match="decode failed"):
+        copy_loader._stream_copy(conn, "COPY ...", _consume)
+
+
+def test_read_frame_uses_read_sql_for_non_psycopg_connections(monkeypatch):
+    calls = []
+
+    def fake_read_sql(query, conn, params=None):
+        calls.append((query, params))
+        return pd.DataFrame({"x": [1]})
+
+    monkeypatch.setattr(copy_loader.pd, "read_sql", fake_read_sql)
+
+    copy_loader.read_frame("SELECT 1", object())
+    copy_loader.read_frame("SELECT %s", object(), params=[1])
+
+    assert calls == [("SELECT 1", None), ("SELECT %s", [1])]
+
+
+class _CopyInCursor:
+    def __init__(self, log):
+        self.log = log
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.log.append(("execute", " ".join(sql.split())))
+
+    def copy_expert(self, sql, file, size=8192):
+        chunks = []
+        while True:
+            data = file.read(size)
+            if not data:
+                break
+            chunks.append(data)
+        self.log.append(("copy", sql, b"".join(chunks).decode("utf-8")))
+
+
+def test_copy_frame_to_table_streams_csv_in_chunks():
+    log = []
+    conn = type("Conn", (), {"cursor": lambda self: _CopyInCursor(log)})()
+    df = pd.DataFrame(
+        {
+            "unique_id": ["N1", "N2", "N3"],
+            "ds": pd.to_datetime(["2024-01-01", None, "2024-01-03"]),
+            "y": [1.5, np.nan, 3.0],
+            "ignored": [0, 0, 0],
+        }
+    )
+
+    n = copy_loader.copy_frame_to_table(conn, df, "stage", ["unique_id", "ds", "y"], chunk_rows=1)
+
+    assert n == 3
+    kind, sql, payload = log[0]
+    assert sql == "COPY stage (unique_id, ds, y) FROM STDIN WITH (FORMAT csv)"
+    # NULL は空文字で送られる
+    assert payload == "N1,2024-01-01 00:00:00,1.5\nN2,,\nN3,2024-01-03 00:00:00,3.0\n"
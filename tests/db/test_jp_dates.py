@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nf_loto_platform.db import jp_dates
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    jp_dates.clear_cache()
+    yield
+    jp_dates.clear_cache()
+
+
+def test_parse_jp_dates_understands_kanji_and_slash_forms():
+    values = pd.Series(
+        ["2024年01月05日(金)", "2024/1/6", "2024-01-07", "2024年1月8日（月）", "2024-01-09 00:00:00", None]
+    )
+
+    parsed, report = jp_dates.parse_jp_dates(values, source="loto6")
+
+    expected = pd.to_datetime(["2024-01-05", "2024-01-06", "2024-01-07", "2024-01-08", "2024-01-09", None])
+    np.testing.assert_array_equal(parsed.to_numpy(), expected.to_numpy(dtype="datetime64[ns]"))
+    assert report.ok and report.n_unique == 5
+
+
+@pytest.mark.parametrize("fmt", ["%Y年%m月%d日(%a)", "%Y/%m/%d"])
+def test_parse_jp_dates_matches_legacy_replace_chain(fmt):
+    rng = np.random.default_rng(0)
+    values = pd.Series(rng.choice(pd.date_range("1994-10-06", periods=3000).strftime(fmt), size=10_000))
+
+    parsed = jp_dates.normalize_jp_dates(values)
+    legacy = pd.to_datetime(jp_dates.legacy_clean(values), errors="coerce")
+
+    np.testing.assert_array_equal(parsed.to_numpy(), legacy.to_numpy(dtype="datetime64[ns]"))
+
+
+def test_parse_failures_are_reported_per_source(caplog):
+    values = pd.Series(["2024/01/05", "不明", "2024/13/01", "不明"])
+
+    with caplog.at_level("WARNING", logger="nf_loto_platform.db.jp_dates"):
+        parsed, report = jp_dates.parse_jp_dates(values, source="num3")
+
+    assert parsed.isna().tolist() == [False, True, True, True]
+    assert (report.source, report.n_failed_rows, report.failed_values) == ("num3", 3, ["不明", "2024/13/01"])
+    assert "num3" in caplog.text
+
+
+def test_unique_strings_are_parsed_once_across_calls(monkeypatch):
+    calls = []
+    original = jp_dates._parse_unique
+    monkeypatch.setattr(jp_dates, "_parse_unique", lambda u: calls.append(list(u)) or original(u))
+
+    jp_dates.normalize_jp_dates(pd.Series(["2024/01/05", "2024/01/05", "2024/01/06"]))
+    jp_dates.normalize_jp_dates(pd.Series(["2024/01/06", "2024/01/07"]))
+
+    assert calls == [["2024/01/05", "2024/01/06"], ["2024/01/07"]]
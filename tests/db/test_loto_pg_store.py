@@ -128,3 +128,209 @@ def test_upsert_df_batches_and_calls_execute_values(monkeypatch):
     assert calls[0]["page_size"] == 2
     assert calls[1]["page_size"] == 1
     assert calls[0]["cursor"] is cursor
+
+
+def _draws(nums, y):
+    return pd.DataFrame(
+        {
+            "loto": ["loto6"] * len(nums),
+            "num": nums,
+            "ds": pd.to_datetime(["2024-01-01"] * len(nums)),
+            "unique_id": ["N1"] * len(nums),
+            "y": y,
+        }
+    )
+
+
+def test_row_hash_changes_only_with_row_content():
+    a, b, c = loto_pg_store._row_hashes(loto_pg_store._prepare_frame(_draws([1, 1, 1], [10, 10, 11])))
+
+    assert a == b
+    assert a != c
+
+
+def test_row_hash_is_independent_of_input_dtypes():
+    draws = _draws([1, 2], [10, 11])
+    recast = draws.astype({"ds": "datetime64[s]", "y": "float64"})
+
+    expected = loto_pg_store._row_hashes(loto_pg_store._prepare_frame(draws))
+    assert loto_pg_store._row_hashes(loto_pg_store._prepare_frame(recast)).tolist() == expected.tolist()
+
+
+def test_upsert_df_incremental_counts_inserted_updated_and_skipped(monkeypatch):
+    cursor = DummyCursor()
+    conn = DummyConnection(cursor)
+    monkeypatch.setattr(loto_pg_store, "_connect", lambda: conn)
+    calls = []
+
+    def fake_execute_values(cur, sql, chunk, page_size=None, fetch=False):
+        calls.append((sql, chunk, fetch))
+        # 3 行中、1 行は新規・1 行は内容が変わった更新・1 行はハッシュ一致で書き込まれない
+        return [("loto6", True), ("loto6", False)]
+
+    monkeypatch.setattr(loto_pg_store, "execute_values", fake_execute_values)
+
+    stats = loto_pg_store.upsert_df_incremental(_draws([1, 2, 3], [10, 11, 12]))
+
+    assert (stats.inserted, stats.updated, stats.skipped) == (1, 1, 1)
+    assert stats.by_loto == {"loto6": {"inserted": 1, "updated": 1, "skipped": 1}}
+    sql, chunk, fetch = calls[0]
+    assert "row_hash IS DISTINCT FROM EXCLUDED.row_hash" in sql
+    assert fetch is True
+    assert len(chunk[0]) == len(loto_pg_store.COLS) + 1
+    assert conn.commits == 1
+
+
+def test_run_incremental_etl_parses_only_new_draws(monkeypatch, tmp_path):
+    from nf_loto_platform.db.source_fetch import SourceFetcher
+
+    pd.DataFrame(
+        {"開催回": [1, 2, 3], "抽選日": ["2024/01/01", "2024/01/08", "2024/01/15"], "第1数字": [5, 6, 7]}
+    ).to_csv(tmp_path / "loto6.csv", index=False, encoding="cp932")
+    monkeypatch.setattr(loto_pg_store, "fetch_max_nums", lambda: {"loto6": 2})
+    captured = {}
+
+    def fake_upsert(df, batch_size=5000):
+        captured["df"] = df
+        return loto_pg_store.UpsertStats(inserted=len(df))
+
+    monkeypatch.setattr(loto_pg_store, "upsert_df_incremental", fake_upsert)
+
+    stats = loto_pg_store.run_incremental_etl(["https://example.com/csv/loto6"], fetcher=SourceFetcher(source_dir=tmp_path))
+    assert stats.inserted == 1
+    assert captured["df"]["num"].tolist() == [3]
+
+    loto_pg_store.run_incremental_etl(["https://example.com/csv/loto6"], fetcher=SourceFetcher(source_dir=tmp_path), lookback=1)
+    assert captured["df"]["num"].tolist() == [2, 3]
+
+
+def test_upsert_df_uses_copy_staging_for_copy_capable_connections(monkeypatch):
+    from nf_loto_platform.db import copy_loader
+
+    cursor = DummyCursor()
+    conn = DummyConnection(cursor)
+    copied = {}
+    monkeypatch.setattr(loto_pg_store, "_connect", lambda: conn)
+    monkeypatch.setattr(copy_loader, "supports_copy", lambda c: True)
+    monkeypatch.setattr(
+        copy_loader,
+        "copy_frame_to_table",
+        lambda c, frame, table, columns, chunk_rows: copied.update(frame=frame, table=table, columns=columns) or len(frame),
+    )
+    monkeypatch.setattr(loto_pg_store, "execute_values", lambda *a, **k: pytest.fail("execute_values must not be used"))
+
+    n = loto_pg_store.upsert_df(_draws([1, 2, 3], ["10", None, 12.0]), batch_size=2)
+
+    assert n == 3
+    assert copied["table"] == loto_pg_store.STAGING_TABLE
+    assert copied["columns"] == loto_pg_store.COLS
+    assert copied["frame"]["y"].tolist() == [10, 0, 12]
+    assert copied["frame"]["N7PM"].dtype == "int64"
+    statements = [sql for sql, _ in cursor.executed]
+    assert "pg_attribute" in statements[0]
+    assert "CREATE TEMP TABLE" in statements[1] and "ON COMMIT DROP" in statements[1]
+    assert "ON CONFLICT (loto, num, unique_id) DO UPDATE" in statements[2]
+    assert "row_hash" not in statements[2]
+    assert conn.commits == 1
+
+
+def test_upsert_df_writes_row_hash_only_when_the_column_exists(monkeypatch):
+    sent = {}
+    monkeypatch.setattr(
+        loto_pg_store, "execute_values", lambda cur, sql, chunk, page_size=None: sent.update(sql=sql, chunk=chunk)
+    )
+
+    for has_column in (False, True):
+        cursor = DummyCursor(fetchall_result=[(1,)] if has_column else [])
+        monkeypatch.setattr(loto_pg_store, "_connect", lambda: DummyConnection(cursor))
+
+        assert loto_pg_store.upsert_df(_draws([1, 2], [10, 11])) == 2
+        assert ("row_hash = EXCLUDED.row_hash" in sent["sql"]) is has_column
+        assert len(sent["chunk"][0]) == len(loto_pg_store.COLS) + has_column
+        assert cursor.executed[0][1] == (loto_pg_store.TABLE_NAME,)
+
+
+def test_full_and_incremental_upserts_write_the_same_row_hash(monkeypatch):
+    from nf_loto_platform.db import copy_loader
+
+    cursor = DummyCursor(fetchall_result=[(1,)])
+    conn = DummyConnection(cursor)
+    copied = {}
+    sent = []
+    monkeypatch.setattr(loto_pg_store, "_connect", lambda: conn)
+    monkeypatch.setattr(copy_loader, "supports_copy", lambda c: True)
+    monkeypatch.setattr(
+        copy_loader,
+        "copy_frame_to_table",
+        lambda c, frame, table, columns, chunk_rows: copied.update(frame=frame) or len(frame),
+    )
+    monkeypatch.setattr(
+        loto_pg_store, "execute_values", lambda cur, sql, chunk, page_size=None, fetch=False: sent.extend(chunk) or []
+    )
+    draws = _draws([1, 2], [10, 11])
+
+    loto_pg_store.upsert_df(draws)
+    loto_pg_store.upsert_df_incremental(draws)
+
+    # 全件ロード直後のインクリメンタル実行は、ハッシュ一致で全行スキップされる
+    assert copied["frame"]["row_hash"].tolist() == [row[-1] for row in sent]
+    assert "row_hash = EXCLUDED.row_hash" in cursor.executed[2][0]
+
+
+def test_bulk_load_stats_reports_rows_per_second():
+    stats = loto_pg_store.BulkLoadStats(rows=1000, seconds=0.5)
+
+    assert stats.rows_per_sec == 2000
+
+
+def _normalized():
+    draws = pd.DataFrame({"loto": ["loto6"], "num": [1], "ds": pd.to_datetime(["2024-01-01"]), "CO": [5000]})
+    numbers = pd.DataFrame({"loto": ["loto6"] * 2, "num": [1, 1], "position": [1, 2], "value": [10, 20]})
+    return draws, numbers
+
+
+def test_upsert_normalized_writes_draws_before_numbers(monkeypatch):
+    cursor = DummyCursor()
+    conn = DummyConnection(cursor)
+    monkeypatch.setattr(loto_pg_store, "_connect", lambda: conn)
+    calls = []
+    monkeypatch.setattr(loto_pg_store, "execute_values", lambda cur, sql, chunk, page_size=None: calls.append((sql, chunk)))
+
+    stats = loto_pg_store.upsert_normalized(*_normalized())
+
+    assert stats.rows == 3
+    (draw_sql, draw_rows), (num_sql, num_rows) = calls
+    assert f"INSERT INTO {loto_pg_store.DRAWS_TABLE}" in draw_sql and "ON CONFLICT (loto, num) DO UPDATE" in draw_sql
+    # ソースに無い賞金列は NULL
+    assert len(draw_rows[0]) == len(loto_pg_store.DRAW_COLS) and draw_rows[0][4] is None
+    assert f"INSERT INTO {loto_pg_store.NUMBERS_TABLE}" in num_sql
+    assert num_rows == [("loto6", 1, 1, 10), ("loto6", 1, 2, 20)]
+    assert conn.commits == 1
+
+
+def test_upsert_normalized_uses_copy_staging_per_table(monkeypatch):
+    from nf_loto_platform.db import copy_loader
+
+    cursor = DummyCursor()
+    conn = DummyConnection(cursor)
+    copied = []
+    monkeypatch.setattr(loto_pg_store, "_connect", lambda: conn)
+    monkeypatch.setattr(copy_loader, "supports_copy", lambda c: True)
+    monkeypatch.setattr(
+        copy_loader, "copy_frame_to_table", lambda c, frame, table, columns, chunk_rows: copied.append(table) or len(frame)
+    )
+
+    loto_pg_store.upsert_normalized(*_normalized())
+
+    assert copied == [f"{loto_pg_store.DRAWS_TABLE}_staging", f"{loto_pg_store.NUMBERS_TABLE}_staging"]
+    merges = [sql for sql, _ in cursor.executed if "INSERT INTO" in sql]
+    assert "DISTINCT ON (loto, num, position)" in merges[1]
+
+
+def test_normalized_schema_views_keep_panel_contract():
+    ddl = loto_pg_store.NORMALIZED_SCHEMA_DDL
+
+    assert "value    SMALLINT NOT NULL" in ddl
+    for view in (loto_pg_store.PANEL_VIEW, loto_pg_store.PANEL_EXOG_VIEW):
+        assert f"CREATE OR REPLACE VIEW {view} AS" in ddl
+    assert "AS unique_id" in ddl and "AS y" in ddl and "AS hist_co" in ddl
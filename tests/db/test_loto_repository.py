@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
 import pytest
 
@@ -165,5 +166,49 @@ def test_load_panel_by_loto_detects_missing_columns(monkeypatch, stub_connection
         loto_repository.load_panel_by_loto("nf_loto_hist", "loto6", ["N1"])
 
 
+def test_load_panel_by_loto_projects_requested_exog_columns(monkeypatch, stub_connection):
+    """exog_cols を指定すると SELECT * ではなく必要な列だけを取得する。"""
+
+    captured = {}
+
+    def fake_read_sql(query, conn, params):
+        captured["query"] = query
+        return pd.DataFrame({"unique_id": ["N1"], "ds": pd.to_datetime(["2024-01-01"]), "y": [1.0], "hist_co": [0]})
+
+    monkeypatch.setattr(loto_repository.pd, "read_sql", fake_read_sql)
+
+    loto_repository.load_panel_by_loto("nf_loto_panel_exog", "loto6", ["N1"], exog_cols=["hist_co"])
+
+    assert "SELECT unique_id, ds, y, hist_co" in captured["query"]
+    assert "*" not in captured["query"]
+    with pytest.raises(ValueError, match="不正な列名"):
+        loto_repository.load_panel_by_loto("nf_loto_panel_exog", "loto6", ["N1"], exog_cols=["hist_co; DROP"])
+
+
+def test_search_similar_patterns_matches_window_scan(monkeypatch, stub_connection):
+    """距離プロファイルによる検索が、全窓を走査した結果と同じ上位 top_k を返す。"""
+
+    rng = np.random.default_rng(0)
+    y = rng.integers(1, 44, size=200).astype(float)
+    ds = pd.date_range("2020-01-01", periods=len(y), freq="D")
+
+    def fake_read_sql(query, conn, params):
+        assert params == ["loto6", "N1"]
+        return pd.DataFrame({"ds": ds, "y": y})
+
+    monkeypatch.setattr(loto_repository.pd, "read_sql", fake_read_sql)
+
+    query_seq = y[-5:].tolist()
+    result = loto_repository.search_similar_patterns("nf_loto_hist", "loto6", "N1", query_seq, top_k=3)
+
+    dists = np.array([np.linalg.norm(y[i : i + 5] - y[-5:]) for i in range(len(y) - 5)])
+    best = np.argsort(dists, kind="stable")[:3]
+    assert list(result.columns) == ["ds", "similarity", "next_val", "window_values"]
+    assert result["ds"].tolist() == list(ds[best + 4])
+    np.testing.assert_allclose(result["similarity"], 1.0 / (1.0 + dists[best]))
+    assert result["next_val"].tolist() == y[best + 5].tolist()
+    assert result["window_values"].tolist() == [y[i : i + 5].tolist() for i in best]
+
+
 # To run:
 #   PYTEST_DISABLE_PLUGIN_AUTOLOAD=1 pytest tests/db/test_loto_repository.py -q
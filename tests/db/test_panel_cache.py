@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from nf_loto_platform.db import loto_repository, panel_cache
+from nf_loto_platform.db.panel_cache import PanelCache, PanelFingerprint
+
+
+class FakeServer:
+    """DB 側のテーブルを模した DataFrame と、フィンガープリント/取得関数。"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.fetches = []
+
+    @staticmethod
+    def _hash(df: pd.DataFrame) -> int:
+        return int(pd.util.hash_pandas_object(df, index=False).astype("int64").sum()) if len(df) else 0
+
+    def fingerprint(self, since_ds):
+        # 行ハッシュは max(ds) / since_ds の日付の行についてのみ計算する (fingerprint_sql と同じ)
+        max_ds = self.df["ds"].max() if len(self.df) else None
+        full = PanelFingerprint(
+            n_rows=len(self.df),
+            max_ds=None if max_ds is None else max_ds.isoformat(),
+            row_hash=self._hash(self.df[self.df["ds"] == max_ds]),
+        )
+        if since_ds is None:
+            return {"full": full, "prefix": PanelFingerprint(0, None, 0)}
+        since = pd.Timestamp(since_ds)
+        prefix_rows = int((self.df["ds"] <= since).sum())
+        return {"full": full, "prefix": PanelFingerprint(prefix_rows, None, self._hash(self.df[self.df["ds"] == since]))}
+
+    def fetch(self, after_ds):
+        self.fetches.append(after_ds)
+        out = self.df if after_ds is None else self.df[self.df["ds"] > pd.Timestamp(after_ds)]
+        return out.sort_values(["unique_id", "ds"]).reset_index(drop=True)
+
+
+def _panel(n_days: int) -> pd.DataFrame:
+    ds = pd.date_range("2024-01-01", periods=n_days, freq="D")
+    return pd.DataFrame(
+        {
+            "unique_id": ["N1"] * n_days + ["N2"] * n_days,
+            "ds": list(ds) * 2,
+            "y": [float(i) for i in range(n_days)] + [100.0 + i for i in range(n_days)],
+        }
+    )
+
+
+def _load(cache: PanelCache, server: FakeServer, uids=("N1", "N2")) -> pd.DataFrame:
+    return cache.load("nf_loto_hist", "loto6", list(uids), server.fingerprint, server.fetch)
+
+
+def test_panel_cache_hit_skips_fetch(tmp_path):
+    cache = PanelCache(tmp_path)
+    server = FakeServer(_panel(5))
+
+    first = _load(cache, server)
+    second = _load(cache, server, uids=("N2", "N1"))
+
+    assert server.fetches == [None]
+    assert cache.stats == {"hits": 1, "incremental": 0, "misses": 1}
+    pd.testing.assert_frame_equal(second, first, check_dtype=False)
+
+
+def test_panel_cache_fetches_only_new_rows(tmp_path):
+    cache = PanelCache(tmp_path)
+    server = FakeServer(_panel(5))
+    _load(cache, server)
+
+    server.df = _panel(7)
+    result = _load(cache, server)
+
+    assert server.fetches == [None, "2024-01-05T00:00:00"]
+    assert cache.stats["incremental"] == 1
+    pd.testing.assert_frame_equal(
+        result, _panel(7).sort_values(["unique_id", "ds"]).reset_index(drop=True), check_dtype=False
+    )
+
+
+def test_panel_cache_reloads_when_history_changes(tmp_path):
+    cache = PanelCache(tmp_path)
+    server = FakeServer(_panel(5))
+    _load(cache, server)
+
+    # キャッシュ済みの末尾の日付の行が更新された
+    changed = _panel(5)
+    changed.loc[4, "y"] = 999.0
+    server.df = changed
+    assert _load(cache, server).loc[4, "y"] == 999.0
+
+    # 新しい行の追加と同時に末尾の日付の行が更新された
+    appended = _panel(7)
+    appended.loc[4, "y"] = -1.0
+    server.df = appended
+    assert _load(cache, server).loc[4, "y"] == -1.0
+
+    # 過去行が削除された
+    server.df = appended.drop(index=0).reset_index(drop=True)
+    assert len(_load(cache, server)) == len(appended) - 1
+
+    assert server.fetches == [None, None, None, None]
+
+
+def test_fingerprint_sql_hashes_only_boundary_dates():
+    sql = " ".join(panel_cache.fingerprint_sql("nf_loto_hist", 2).split())
+    params = panel_cache.fingerprint_params("loto6", ["N1", "N2"], "2024-01-05")
+
+    assert sql.count("%s") == len(params)
+    assert sql.count("hashtext") == 2
+    assert "t.ds = m.max_ds" in sql and "t.ds = %s" in sql
+    assert params == ["loto6", "N1", "N2", "loto6", "N1", "N2", "2024-01-05", "2024-01-05", "loto6", "N1", "N2"]
+
+
+def test_panel_cache_evicts_least_recently_used(tmp_path):
+    cache = PanelCache(tmp_path)
+    server = FakeServer(_panel(50))
+    _load(cache, server, uids=("N1",))
+    _load(cache, server, uids=("N2",))
+    one_entry = max(e.n_bytes for e in cache.entries())
+
+    cache.max_bytes = int(one_entry * 2.5)
+    _load(cache, server, uids=("N1",))  # N1 を最近使用に
+    _load(cache, server, uids=("N1", "N2"))
+
+    keys = {e.key for e in cache.entries()}
+    assert PanelCache.make_key("nf_loto_hist", "loto6", ["N2"]) not in keys
+    assert PanelCache.make_key("nf_loto_hist", "loto6", ["N1"]) in keys
+
+
+def test_load_panel_by_loto_uses_cache_when_configured(monkeypatch, tmp_path):
+    monkeypatch.setenv("NF_PANEL_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(loto_repository, "get_connection", lambda: _NullConnection())
+    panel_cache._DEFAULT_CACHES.clear()
+
+    queries = []
+    data = _panel(3)
+
+    def fake_read_sql(query, conn, params):
+        queries.append(query)
+        if "hashtext" in query:
+            return pd.DataFrame(
+                {"n_rows": [6], "max_ds": [data["ds"].max()], "row_hash": [42], "prefix_rows": [0], "prefix_hash": [0]}
+            )
+        return data.copy()
+
+    monkeypatch.setattr(loto_repository.pd, "read_sql", fake_read_sql)
+
+    first = loto_repository.load_panel_by_loto("nf_loto_hist", "loto6", ["N1", "N2"])
+    second = loto_repository.load_panel_by_loto("nf_loto_hist", "loto6", ["N1", "N2"])
+
+    assert sum("SELECT *" in q for q in queries) == 1
+    assert sum("hashtext" in q for q in queries) == 2
+    pd.testing.assert_frame_equal(second, first, check_dtype=False)
+    panel_cache._DEFAULT_CACHES.clear()
+
+
+class _NullConnection:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from nf_loto_platform.db.source_fetch import SourceFetcher, detect_encoding
+
+CSV_JP = "開催回,抽選日,第1数字\n1,2024/01/01,10\n"
+
+
+def test_detect_encoding_from_raw_bytes():
+    assert detect_encoding(CSV_JP.encode("cp932")) == "cp932"
+    assert detect_encoding(CSV_JP.encode("utf-8")) == "utf-8"
+    assert detect_encoding(b"\xef\xbb\xbf" + CSV_JP.encode("utf-8")) == "utf-8-sig"
+
+
+def test_local_directory_stands_in_for_urls(tmp_path):
+    (tmp_path / "loto6.csv").write_bytes(CSV_JP.encode("cp932"))
+    (tmp_path / "mini").write_bytes(CSV_JP.encode("utf-8"))
+    fetcher = SourceFetcher(source_dir=tmp_path)
+
+    sources = fetcher.fetch_all(["https://loto-life.net/csv/loto6", "https://loto-life.net/csv/mini"])
+
+    assert [(s.encoding, s.origin) for s in sources] == [("cp932", "local"), ("utf-8", "local")]
+    with pytest.raises(FileNotFoundError):
+        fetcher.fetch("https://loto-life.net/csv/loto7")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    body = CSV_JP.encode("cp932")
+    etag = '"v1"'
+    requests: list = []
+
+    def do_GET(self):  # noqa: N802
+        type(self).requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_http_cache_revalidates_with_etag(tmp_path, server):
+    fetcher = SourceFetcher(cache_dir=tmp_path)
+    urls = [f"{server}/csv/loto6", f"{server}/csv/loto7"]
+
+    first = fetcher.fetch_all(urls)
+    second = fetcher.fetch_all(urls)
+
+    assert [s.origin for s in first] == ["network", "network"]
+    assert [s.origin for s in second] == ["cache", "cache"]
+    assert second[0].content == first[0].content and second[0].encoding == "cp932"
+    # 2 回目は If-None-Match 付きの条件付き GET だけで本体は再送されない
+    assert sorted(_Handler.requests, key=str) == [
+        ("/csv/loto6", '"v1"'),
+        ("/csv/loto6", None),
+        ("/csv/loto7", '"v1"'),
+        ("/csv/loto7", None),
+    ]
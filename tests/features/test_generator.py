@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nf_loto_platform.features import FeatureGenerator, expand_preset, generate_features, parse_feature_name
+from nf_loto_platform.ml.automodel_builder import split_exog_columns
+
+
+def _panel(seed=0):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for uid, n in {"N1": 120, "N2": 80, "N3": 5}.items():
+        y = rng.integers(1, 44, size=n).astype(float)
+        y[rng.random(n) < 0.05] = np.nan
+        frames.append(pd.DataFrame({"unique_id": uid, "ds": pd.date_range("2021-01-01", periods=n), "y": y}))
+    return pd.concat(frames).sample(frac=1.0, random_state=seed)
+
+
+def test_parse_feature_name():
+    assert parse_feature_name("hist_y_lag12").param == 12
+    spec = parse_feature_name("hist_y_mean_w30")
+    assert (spec.kind, spec.column, spec.stat, spec.param) == ("rolling", "y", "mean", 30)
+    assert parse_feature_name("futr_ds_dow").kind == "calendar"
+    assert parse_feature_name("stat_y_std").kind == "static"
+    with pytest.raises(ValueError):
+        parse_feature_name("y_mean_w7")
+
+
+@pytest.mark.parametrize("window", [1, 7, 30, 200])
+def test_rolling_and_lag_features_match_pandas(window):
+    df = _panel()
+    names = [f"hist_y_{stat}_w{window}" for stat in ("mean", "std", "min", "max")] + ["hist_y_lag3"]
+
+    out = FeatureGenerator(names).transform(df)
+
+    ref = df.sort_values(["unique_id", "ds"]).reset_index(drop=True)
+    grouped = ref.groupby("unique_id")["y"]
+    for stat in ("mean", "std", "min", "max"):
+        expected = getattr(grouped.rolling(window, min_periods=1), stat)().reset_index(level=0, drop=True).sort_index()
+        np.testing.assert_allclose(out[f"hist_y_{stat}_w{window}"], expected, rtol=1e-5, atol=1e-4)
+    np.testing.assert_allclose(out["hist_y_lag3"], grouped.shift(3), rtol=0)
+    pd.testing.assert_frame_equal(out[["unique_id", "ds", "y"]], ref)
+
+
+def test_calendar_and_static_features():
+    df = _panel()
+    out = generate_features(df, features=["futr_ds_year", "futr_ds_month", "futr_ds_dow", "stat_y_mean", "stat_y_max"])
+
+    assert out["futr_ds_year"].dtype == np.float32
+    np.testing.assert_array_equal(out["futr_ds_month"], out["ds"].dt.month)
+    np.testing.assert_array_equal(out["futr_ds_dow"], out["ds"].dt.dayofweek)
+    grouped = out.groupby("unique_id")["y"]
+    np.testing.assert_allclose(out["stat_y_mean"], grouped.transform("mean"), rtol=1e-6)
+    np.testing.assert_allclose(out["stat_y_max"], grouped.transform("max"))
+
+
+def test_full_preset_builds_prefixed_columns_for_split_exog():
+    df = _panel()
+    generator = FeatureGenerator.from_config(preset="full")
+
+    out = generator.transform(df)
+
+    assert generator.feature_names[:3] == ["hist_y_mean_w7", "hist_y_std_w7", "hist_y_mean_w30"]
+    assert "hist_y_lag120" in out.columns and "hist_y_max_w365" in out.columns
+    assert len(generator.feature_names) == len(set(generator.feature_names))
+    exog = split_exog_columns(out.columns)
+    assert set(exog.hist_exog + exog.futr_exog + exog.stat_exog) == set(generator.feature_names)
+    assert expand_preset(2, 10) == ["hist_y_lag1", "hist_y_lag2", "hist_y_mean_w7", "hist_y_std_w7", "hist_y_min_w7", "hist_y_max_w7"]
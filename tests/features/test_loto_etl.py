@@ -2,6 +2,7 @@ import pandas as pd
 import pytest
 
 from nf_loto_platform.db import loto_etl
+from nf_loto_platform.db.source_fetch import SourceFetcher
 
 
 def _build_sample_df():
@@ -26,17 +27,15 @@ def _build_numbers_df():
     )
 
 
-def test_build_long_dataframe_melts_numbers_and_sets_loto(monkeypatch):
+def test_build_long_dataframe_melts_numbers_and_sets_loto(tmp_path):
     """CSV から取得したデータが long 形式に展開されることを確認。"""
 
-    url_map = {
-        "https://example.com/csv/loto6": _build_sample_df(),
-        "https://example.com/csv/numbers3": _build_numbers_df(),
-    }
+    urls = ["https://example.com/csv/loto6", "https://example.com/csv/numbers3"]
+    # 取得元の代わりにローカルディレクトリの CSV を読む (loto6 は cp932, numbers3 は UTF-8)
+    _build_sample_df().to_csv(tmp_path / "loto6.csv", index=False, encoding="cp932")
+    _build_numbers_df().to_csv(tmp_path / "numbers3.csv", index=False, encoding="utf-8")
 
-    monkeypatch.setattr(loto_etl, "_read_csv_jp", lambda url: url_map[url].copy())
-
-    df = loto_etl.build_long_dataframe(list(url_map))
+    df = loto_etl.build_long_dataframe(urls, fetcher=SourceFetcher(source_dir=tmp_path))
 
     assert not df.empty
     assert set(["loto", "開催回", "ds", "unique_id", "y"]).issubset(df.columns)
@@ -51,15 +50,12 @@ def test_build_long_dataframe_melts_numbers_and_sets_loto(monkeypatch):
     assert sorted(num3_rows["y"].tolist()) == [1, 2, 3]
 
 
-def test_build_long_dataframe_returns_empty_frame_for_no_data(monkeypatch):
+def test_build_long_dataframe_returns_empty_frame_for_no_data(tmp_path):
     """すべての URL が空 DataFrame を返した場合も安全に空枠を返す。"""
 
-    def _empty_df(_):
-        return pd.DataFrame()
-
-    monkeypatch.setattr(loto_etl, "_read_csv_jp", _empty_df)
+    (tmp_path / "loto6.csv").write_bytes(b"")
 
-    df = loto_etl.build_long_dataframe(["https://example.com/csv/loto6"])
+    df = loto_etl.build_long_dataframe(["https://example.com/csv/loto6"], fetcher=SourceFetcher(source_dir=tmp_path))
     assert list(df.columns) == ["loto", "num", "ds", "unique_id", "y", "CO"]
     assert df.empty
 
@@ -88,3 +84,81 @@ def test_finalize_df_casts_numeric_columns_and_drops_bonus():
     assert finalized["CO"].dtype == "int64"
     assert pytest.approx(finalized.loc[0, "y"]) == 12.5
     assert pytest.approx(finalized.loc[0, "N1"]) == 1.0
+
+
+def test_streaming_etl_matches_batch_build_chunk_by_chunk(tmp_path):
+    """チャンク単位のストリーミングでも一括構築と同じ行が sink に届く。"""
+    n = 25
+    pd.DataFrame(
+        {
+            "開催回": range(1, n + 1),
+            "抽選日": pd.date_range("2024-01-01", periods=n, freq="W").strftime("%Y/%m/%d"),
+            "第1数字": range(n),
+            "第2数字": range(10, 10 + n),
+            "キャリーオーバー": [0] * n,
+        }
+    ).to_csv(tmp_path / "loto6.csv", index=False, encoding="cp932")
+    _build_numbers_df().to_csv(tmp_path / "numbers3.csv", index=False)
+    urls = ["https://example.com/csv/loto6", "https://example.com/csv/numbers3"]
+    fetcher = SourceFetcher(source_dir=tmp_path)
+    chunks = []
+
+    stats = loto_etl.run_streaming_etl(urls, fetcher=fetcher, sink=chunks.append, chunksize=10)
+
+    assert stats.chunks == 4  # loto6: 10 + 10 + 5 回, numbers3: 1 回
+    assert stats.rows == 2 * n + 3
+    assert all(len(c) <= 10 * 2 for c in chunks)
+    assert stats.peak_memory_mb is not None and stats.peak_memory_mb > 0
+
+    # ソースごとに列構成が異なるため loto 単位で比較する
+    key = ["num", "unique_id"]
+    batch = loto_etl.build_df_final(urls, fetcher=fetcher)
+    for loto in ("loto6", "num3"):
+        streamed = pd.concat([c for c in chunks if c["loto"].iloc[0] == loto], ignore_index=True)
+        expected = batch[batch["loto"] == loto][streamed.columns]
+        pd.testing.assert_frame_equal(
+            streamed.sort_values(key).reset_index(drop=True), expected.sort_values(key).reset_index(drop=True)
+        )
+
+
+def test_finalize_df_does_not_modify_its_input():
+    df = pd.DataFrame({"loto": ["loto6"], "開催回": ["7"], "y": ["1"], "N1PM": ["100"]})
+    before = df.copy()
+
+    loto_etl.finalize_df(df)
+
+    pd.testing.assert_frame_equal(df, before)
+
+
+def test_build_normalized_frames_stores_prizes_once_per_draw(tmp_path):
+    df = _build_sample_df().assign(**{"1等口数": [2], "1等賞金": [300]})
+    df.to_csv(tmp_path / "loto6.csv", index=False, encoding="cp932")
+    _build_numbers_df().to_csv(tmp_path / "numbers3.csv", index=False)
+    urls = ["https://example.com/csv/loto6", "https://example.com/csv/numbers3"]
+
+    draws, numbers = loto_etl.build_normalized_frames(urls, fetcher=SourceFetcher(source_dir=tmp_path), parse_workers=0)
+
+    assert list(draws.columns) == loto_etl.DRAW_COLS
+    assert draws[["loto", "num"]].values.tolist() == [["loto6", 1], ["num3", 2]]
+    assert draws["CO"].tolist()[0] == 5000 and pd.isna(draws["CO"].tolist()[1])
+    assert draws["N1PM"].tolist()[0] == 300
+    assert draws["ds"].tolist() == list(pd.to_datetime(["2024-01-01", "2024-02-01"]))
+
+    assert list(numbers.columns) == loto_etl.NUMBER_COLS
+    assert numbers["value"].dtype == "int16"
+    assert numbers.values.tolist() == [
+        ["loto6", 1, 1, 10],
+        ["loto6", 1, 2, 20],
+        ["num3", 2, 1, 1],
+        ["num3", 2, 2, 2],
+        ["num3", 2, 3, 3],
+    ]
+
+    # 縦持ちにすると long 形式と同じ (unique_id, y) になる
+    long = loto_etl.build_df_final(urls, fetcher=SourceFetcher(source_dir=tmp_path))
+    from_numbers = numbers.assign(unique_id="N" + numbers["position"].astype(str), y=numbers["value"].astype(float))
+    key = ["loto", "num", "unique_id"]
+    pd.testing.assert_frame_equal(
+        from_numbers[key + ["y"]].sort_values(key).reset_index(drop=True),
+        long[key + ["y"]].sort_values(key).reset_index(drop=True),
+    )
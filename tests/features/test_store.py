@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from nf_loto_platform.features.generator import FeatureGenerator
+from nf_loto_platform.features.store import FeatureSetRegistry, FeatureStore
+
+FEATURES = ["hist_y_lag1", "hist_y_lag5", "hist_y_mean_w7", "hist_y_std_w7", "hist_y_max_w30", "futr_ds_dow", "stat_y_mean"]
+
+
+def _panel(n_days=120, seed=0):
+    rng = np.random.default_rng(seed)
+    ds = pd.date_range("2023-01-01", periods=n_days, freq="D")
+    return pd.concat(
+        [pd.DataFrame({"unique_id": uid, "ds": ds, "y": rng.integers(1, 44, size=n_days).astype(float)}) for uid in ("N1", "N2")],
+        ignore_index=True,
+    )
+
+
+def _expected(panel):
+    return FeatureGenerator(FEATURES).transform(panel)
+
+
+def test_incremental_materialization_matches_full_recompute(tmp_path):
+    store = FeatureStore(tmp_path)
+    generator = FeatureGenerator(FEATURES)
+    panel = _panel()
+
+    first = store.materialize("nf_loto_hist", "loto6", panel[panel["ds"] < "2023-04-01"], generator)
+    second = store.materialize("nf_loto_hist", "loto6", panel, generator)
+    third = store.materialize("nf_loto_hist", "loto6", panel, generator)
+
+    assert (first.recomputed, second.appended, third.unchanged) == (2, 2, 2)
+    assert second.rows_computed == 2 * 30
+    assert third.rows_computed == 0
+    pd.testing.assert_frame_equal(store.features_for("nf_loto_hist", "loto6", panel, generator), _expected(panel))
+
+
+def test_new_rows_only_are_extended_from_stored_state(tmp_path):
+    store = FeatureStore(tmp_path)
+    generator = FeatureGenerator(FEATURES)
+    panel = _panel()
+    old, new = panel[panel["ds"] < "2023-04-20"], panel[panel["ds"] >= "2023-04-20"]
+
+    store.materialize("nf_loto_hist", "loto6", old, generator)
+    stats = store.materialize("nf_loto_hist", "loto6", new, generator)
+
+    assert stats.appended == 2
+    stored = store.load("nf_loto_hist", "loto6", ["N1", "N2"], generator)
+    expected = _expected(panel).astype({"ds": "datetime64[ns]"})
+    pd.testing.assert_frame_equal(stored, expected[stored.columns.tolist()])
+
+
+def test_recent_rows_overlapping_stored_tail_are_appended(tmp_path):
+    store = FeatureStore(tmp_path)
+    generator = FeatureGenerator(FEATURES)
+    panel = _panel()
+    store.materialize("nf_loto_hist", "loto6", panel[panel["ds"] < "2023-04-30"], generator)
+
+    # 直近 10 行 + 新しい 1 行だけを渡しても、保存済みの履歴は残る
+    recent = panel[panel["ds"] >= "2023-04-20"]
+    stats = store.materialize("nf_loto_hist", "loto6", recent, generator)
+
+    assert (stats.appended, stats.rows_computed) == (2, 2)
+    stored = store.load("nf_loto_hist", "loto6", ["N1", "N2"], generator)
+    expected = _expected(panel).astype({"ds": "datetime64[ns]"})
+    pd.testing.assert_frame_equal(stored, expected[stored.columns.tolist()])
+
+
+def test_recent_rows_not_matching_stored_tail_raise(tmp_path):
+    store = FeatureStore(tmp_path)
+    generator = FeatureGenerator(FEATURES)
+    panel = _panel()
+    store.materialize("nf_loto_hist", "loto6", panel[panel["ds"] < "2023-04-30"], generator)
+    before = store.load("nf_loto_hist", "loto6", ["N1", "N2"], generator)
+
+    recent = panel[panel["ds"] >= "2023-04-20"].copy()
+    recent.loc[recent.index[0], "y"] += 1.0
+    with pytest.raises(ValueError, match="full history"):
+        store.materialize("nf_loto_hist", "loto6", recent, generator)
+
+    pd.testing.assert_frame_equal(store.load("nf_loto_hist", "loto6", ["N1", "N2"], generator), before)
+
+
+def test_changed_history_is_recomputed(tmp_path):
+    store = FeatureStore(tmp_path)
+    generator = FeatureGenerator(FEATURES)
+    panel = _panel()
+    store.materialize("nf_loto_hist", "loto6", panel.iloc[:-1], generator)
+
+    fixed = panel.copy()
+    fixed.loc[len(panel) - 3, "y"] += 1.0  # N2 の過去行の修正
+    stats = store.materialize("nf_loto_hist", "loto6", fixed, generator)
+
+    assert (stats.unchanged, stats.recomputed) == (1, 1)
+    pd.testing.assert_frame_equal(store.features_for("nf_loto_hist", "loto6", fixed, generator), _expected(fixed))
+
+
+def test_features_are_point_in_time_correct(tmp_path):
+    store = FeatureStore(tmp_path)
+    generator = FeatureGenerator(FEATURES)
+    panel = _panel()
+
+    served = store.features_for("nf_loto_hist", "loto6", panel, generator, as_of="2023-03-15")
+
+    assert served["ds"].max() == pd.Timestamp("2023-03-15")
+    pd.testing.assert_frame_equal(served, _expected(panel[panel["ds"] <= "2023-03-15"]))
+
+
+class _Cursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.executed.append((" ".join(sql.split()), params))
+
+    def fetchone(self):
+        return self.rows.pop(0)
+
+
+class _Connection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self._cursor
+
+
+def test_feature_sets_are_registered_in_nf_feature_sets(tmp_path):
+    cursor = _Cursor([None, (7,)])
+    store = FeatureStore(tmp_path, registry=FeatureSetRegistry(lambda: _Connection(cursor)))
+    generator = FeatureGenerator(FEATURES)
+
+    store.materialize("nf_loto_hist", "loto6", _panel(20), generator, name="daily")
+    store.materialize("nf_loto_hist", "loto6", _panel(25), generator, name="daily")
+
+    assert len(cursor.executed) == 2  # 2 回目は状態に記録済みの ID を使う
+    insert_sql, params = cursor.executed[1]
+    assert insert_sql.startswith("INSERT INTO nf_feature_sets")
+    assert params[0] == "daily" and "stat_y_mean" not in params[2]
+    state = (store.set_dir("nf_loto_hist", "loto6", generator, "daily") / "_state.json").read_text()
+    assert '"feature_set_id": 7' in state
@@ -5,6 +5,7 @@ Validates the logic for Residual, CQR, and Adaptive conformal predictors,
 ensuring coverage guarantees and correct interval calculations.
 """
 
+
 import numpy as np
 import pandas as pd
 import pytest
@@ -13,7 +14,10 @@ from nf_loto_platform.ml.conformal import (
     ResidualConformalPredictor,
     CQRConformalPredictor,
     AdaptiveConformalPredictor,
+    OnlineConformalPredictor,
     get_conformal_predictor,
+    load_online_states,
+    save_online_states,
     PredictionIntervals
 )
 
@@ -152,6 +156,8 @@ def test_get_conformal_predictor_factory():
     
     cp3 = get_conformal_predictor("adaptive")
     assert isinstance(cp3, AdaptiveConformalPredictor)
+
+    assert isinstance(get_conformal_predictor("online"), OnlineConformalPredictor)
     
     with pytest.raises(ValueError, match="Unknown conformal method"):
         get_conformal_predictor("unknown_method")
@@ -197,4 +203,193 @@ def test_evaluate_coverage():
     assert stats["coverage_rate"] == 0.5
     assert stats["covered_count"] == 2
     assert stats["total_count"] == 4
-    assert stats["mean_width"] > 0
\ No newline at end of file
+    assert stats["mean_width"] > 0
+
+def test_conformalize_forecast_adds_interval_matrices(mock_point_data):
+    from nf_loto_platform.ml.conformal import conformalize_forecast
+    from nf_loto_platform.tsfm.base import ForecastResult
+
+    y_true, y_pred = mock_point_data
+    cp = ResidualConformalPredictor(alpha=0.2)
+    cp.calibrate(y_true, y_pred)
+    result = ForecastResult(
+        ids=["a", "b"],
+        start=pd.to_datetime(["2024-01-01", "2024-01-01"]).to_numpy(),
+        point=np.array([[1.0, 2.0], [3.0, 4.0]]),
+        model_name="M",
+    )
+
+    out = conformalize_forecast(result, cp)
+
+    np.testing.assert_allclose(out.quantiles["lo-80"], result.point - cp.q_val)
+    np.testing.assert_allclose(out.quantiles["hi-80"], result.point + cp.q_val)
+    assert {"M-lo-80", "M-hi-80"}.issubset(out.yhat.columns)
+
+    cqr = CQRConformalPredictor(alpha=0.2)
+    cqr.q_val = 0.5
+    with pytest.raises(ValueError):
+        conformalize_forecast(ForecastResult(ids=["a"], start=result.start[:1], point=[[1.0]]), cqr)
+    widened = conformalize_forecast(out, cqr)
+    np.testing.assert_allclose(widened.quantiles["hi-80"], result.point + cp.q_val + 0.5)
+
+
+# --- Online (ACI) Tests ---
+
+def _rank_quantile(scores, alpha):
+    n = len(scores)
+    k = int(np.ceil((n + 1) * (1 - alpha)))
+    return np.inf if k > n else np.sort(scores)[k - 1]
+
+
+def test_online_cp_matches_full_recalibration_without_adaptation():
+    rng = np.random.default_rng(0)
+    y = rng.normal(size=300)
+    y_hat = np.zeros(300)
+    cp = OnlineConformalPredictor(alpha=0.1, gamma=0.0)
+    cp.calibrate(y[:50], y_hat[:50])
+
+    for t in range(50, 300):
+        cp.update(y[t], y_hat[t])
+        assert cp.q_val == _rank_quantile(np.abs(y[: t + 1]), 0.1)
+
+    intervals = cp.predict(np.array([1.0, 2.0]))
+    assert np.allclose(intervals.y_upper - intervals.y_lower, 2 * cp.q_val)
+
+
+def test_online_cp_adapts_alpha_toward_target_coverage():
+    cp = OnlineConformalPredictor(alpha=0.1, gamma=0.05)
+    cp.calibrate(np.ones(20), np.zeros(20))  # 残差はすべて 1
+
+    covered = cp.update([0.5, 5.0], [0.0, 0.0])
+
+    assert covered.tolist() == [True, False]
+    # カバー: alpha_t += gamma * alpha, 外れ: alpha_t -= gamma * (1 - alpha)
+    assert cp.alpha_t == pytest.approx(0.1 + 0.05 * 0.1 - 0.05 * 0.9)
+    assert cp.empirical_coverage == 0.5
+
+    # 分布が急に広がると、固定 alpha より早くカバレッジが回復する
+    rng = np.random.default_rng(1)
+    shifted = rng.normal(scale=5.0, size=400)
+    fixed = OnlineConformalPredictor(alpha=0.1, gamma=0.0)
+    fixed.calibrate(rng.normal(size=500), np.zeros(500))
+    adaptive = OnlineConformalPredictor(alpha=0.1, gamma=0.05)
+    adaptive.calibrate(rng.normal(size=500), np.zeros(500))
+    assert adaptive.update(shifted, np.zeros(400)).mean() > fixed.update(shifted, np.zeros(400)).mean()
+
+
+def test_online_cp_rolling_window_forgets_old_scores():
+    cp = OnlineConformalPredictor(alpha=0.25, gamma=0.0, window=3)
+    cp.calibrate(np.array([100.0, 100.0, 100.0]), np.zeros(3))
+
+    cp.update([1.0, 2.0, 3.0], [0.0, 0.0, 0.0])
+
+    assert cp.to_state()["scores"] == [1.0, 2.0, 3.0]
+    assert cp.q_val == 3.0
+
+
+def test_online_cp_state_roundtrip_per_series(tmp_path):
+    rng = np.random.default_rng(2)
+    predictors = {}
+    for uid in ["N1", "N2"]:
+        cp = OnlineConformalPredictor(alpha=0.1, gamma=0.01, window=50)
+        cp.calibrate(rng.normal(size=80), np.zeros(80))
+        cp.update(rng.normal(size=5), np.zeros(5))
+        predictors[uid] = cp
+
+    path = tmp_path / "online_cp"
+    assert save_online_states(path, predictors) == 2
+    restored = load_online_states(path)
+
+    assert set(restored) == {"N1", "N2"}
+    for uid, cp in predictors.items():
+        assert restored[uid].to_state() == cp.to_state()
+        assert restored[uid].q_val == cp.q_val
+        nxt = rng.normal(size=3)
+        assert restored[uid].update(nxt, np.zeros(3)).tolist() == cp.update(nxt, np.zeros(3)).tolist()
+    assert load_online_states(tmp_path / "missing") == {}
+
+
+def test_save_online_states_writes_only_changed_series(tmp_path):
+    predictors = {}
+    for uid in ["N1", "N2", "N3"]:
+        cp = OnlineConformalPredictor(alpha=0.1, gamma=0.01)
+        cp.calibrate(np.arange(20.0), np.zeros(20))
+        predictors[uid] = cp
+    path = tmp_path / "online_cp"
+    assert save_online_states(path, predictors) == 3
+
+    restored = load_online_states(path)
+    restored["N2"].update([1.0], [0.0])
+    restored["N3"].update([], [])
+
+    assert save_online_states(path, restored) == 1
+    assert save_online_states(path, restored) == 0
+    assert load_online_states(path)["N2"].to_state() == restored["N2"].to_state()
+
+
+def test_online_state_path_must_be_a_directory(tmp_path):
+    cp = OnlineConformalPredictor(alpha=0.2, gamma=0.0)
+    cp.calibrate(np.arange(10.0), np.zeros(10))
+    path = tmp_path / "online_cp.json"
+    path.write_text("{}", encoding="utf-8")
+
+    with pytest.raises(NotADirectoryError):
+        save_online_states(path, {"N1": cp})
+    with pytest.raises(NotADirectoryError):
+        load_online_states(path)
+
+
+# --- Group-aware calibration ---
+
+def test_grouped_quantiles_match_scalar_calibration_per_group():
+    rng = np.random.default_rng(3)
+    ids = np.array(["calm", "volatile", "calm", "volatile"] * 10)
+    scale = np.where(ids == "calm", 1.0, 8.0)[:, None]
+    y_pred = np.zeros((40, 3))
+    y_true = rng.normal(size=(40, 3)) * scale * np.array([1.0, 2.0, 3.0])
+
+    per_series = ResidualConformalPredictor(alpha=0.1)
+    per_series.calibrate(y_true, y_pred, unique_ids=ids, group_by="series")
+    per_cell = ResidualConformalPredictor(alpha=0.1)
+    per_cell.calibrate(y_true, y_pred, unique_ids=ids, group_by="series_step")
+    per_step = ResidualConformalPredictor(alpha=0.1)
+    per_step.calibrate(y_true, y_pred, group_by="step")
+
+    scalar = ResidualConformalPredictor(alpha=0.1)
+    for i, uid in enumerate(["calm", "volatile"]):
+        scalar.calibrate(y_true[ids == uid], y_pred[ids == uid])
+        assert per_series.q_table[i] == scalar.q_val
+        for h in range(3):
+            scalar.calibrate(y_true[ids == uid, h], y_pred[ids == uid, h])
+            assert per_cell.q_table[i, h] == scalar.q_val
+    for h in range(3):
+        scalar.calibrate(y_true[:, h], y_pred[:, h])
+        assert per_step.q_table[h] == scalar.q_val
+    assert per_series.q_table[1] > 4 * per_series.q_table[0]
+
+
+def test_grouped_predict_broadcasts_and_falls_back_for_unknown_series():
+    ids = np.array(["a", "b"] * 20)
+    y_true = np.where(ids == "a", 1.0, 10.0)[:, None] * np.ones((40, 2))
+    cp = ResidualConformalPredictor(alpha=0.1)
+    cp.calibrate(y_true, np.zeros((40, 2)), unique_ids=ids, group_by="series_step")
+
+    intervals = cp.predict(np.zeros((3, 2)), unique_ids=np.array(["b", "a", "new"]))
+
+    np.testing.assert_allclose(intervals.y_upper, [[10.0, 10.0], [1.0, 1.0], [cp.q_val, cp.q_val]])
+    with pytest.raises(ValueError, match="unique_ids"):
+        cp.predict(np.zeros((3, 2)))
+
+
+def test_evaluate_coverage_reports_per_group():
+    y_true = np.array([[0.0, 5.0], [0.0, 0.0]])
+    lower = np.full((2, 2), -1.0)
+    upper = np.full((2, 2), 1.0)
+
+    stats = ResidualConformalPredictor.evaluate_coverage(y_true, lower, upper, groups=np.array(["a", "b"])[:, None])
+    by_step = ResidualConformalPredictor.evaluate_coverage(y_true, lower, upper, groups=np.arange(2))
+
+    assert stats["coverage_rate"] == 0.75
+    assert stats["by_group"]["coverage_rate"].tolist() == [0.5, 1.0]
+    assert by_step["by_group"]["coverage_rate"].tolist() == [1.0, 0.5]
+    assert by_step["by_group"]["total_count"].tolist() == [2, 2]
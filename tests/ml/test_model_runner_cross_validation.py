@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nf_loto_platform.ml import model_runner
+from nf_loto_platform.tsfm.base import ForecastResult
+
+
+def _panel_df() -> pd.DataFrame:
+    dates = pd.date_range("2024-01-01", periods=30, freq="D")
+    return pd.concat([
+        pd.DataFrame({"unique_id": "N1", "ds": dates, "y": np.arange(30, dtype=float)}),
+        pd.DataFrame({"unique_id": "N2", "ds": dates, "y": np.full(30, 5.0)}),
+    ], ignore_index=True)
+
+
+class _LastValueAdapter:
+    """直近値をそのまま horizon 点先まで伸ばす TSFM アダプタのスタブ."""
+
+    instances = 0
+
+    def __init__(self) -> None:
+        type(self).instances += 1
+        self.fit_calls = 0
+
+    def fit(self, df, **kwargs):
+        self.fit_calls += 1
+
+    def predict(self, history, horizon, freq="D", **kwargs):
+        last = history.sort_values("ds").groupby("unique_id").tail(1).sort_values("unique_id")
+        return ForecastResult(
+            ids=last["unique_id"].to_numpy(),
+            start=(last["ds"] + pd.Timedelta(days=1)).to_numpy(),
+            point=np.repeat(last["y"].to_numpy()[:, None], horizon, axis=1),
+        )
+
+
+class _RecordingStore:
+    def __init__(self) -> None:
+        self.windows = []
+        self.metrics = []
+
+    def insert_backtest_windows(self, trial_id, windows):
+        self.windows.extend(windows)
+        return len(self.windows)
+
+    def bulk_insert_model_metrics(self, trial_id, rows):
+        self.metrics.extend(rows)
+        return len(self.metrics)
+
+
+@pytest.fixture
+def mock_panel(monkeypatch):
+    calls = []
+
+    def _load(table_name, loto, unique_ids):
+        calls.append(unique_ids)
+        return _panel_df()
+
+    monkeypatch.setattr(model_runner.loto_repository, "load_panel_data", _load)
+    return calls
+
+
+def test_cross_validation_reuses_one_panel_and_adapter(monkeypatch, mock_panel):
+    _LastValueAdapter.instances = 0
+    monkeypatch.setattr(model_runner, "get_adapter", lambda name: _LastValueAdapter())
+    store = _RecordingStore()
+
+    preds, meta = model_runner.run_loto_cross_validation(
+        "nf_loto_panel", "loto6", ["N1", "N2"], model_name="Stub", backend="tsfm",
+        horizon=3, n_windows=4, step_size=2, store=store, trial_id=1,
+    )
+
+    assert len(mock_panel) == 1
+    assert _LastValueAdapter.instances == 1
+    assert sorted(preds["window"].unique().tolist()) == [0, 1, 2, 3]
+    cutoffs = [w["cutoff"] for w in meta["windows"]]
+    assert cutoffs == list(pd.to_datetime(["2024-01-21", "2024-01-23", "2024-01-25", "2024-01-27"]))
+    # N1 は 1 日 1 ずつ増えるので、直近値予測の MAE は (1 + 2 + 3) / 3 / 2 系列
+    for window in meta["windows"]:
+        assert window["metrics"]["mae"] == pytest.approx(1.0)
+    assert meta["metrics"]["mae"] == pytest.approx(1.0)
+    assert (preds["cutoff"] < preds["ds"]).all()
+    assert [w["window"] for w in store.windows] == [0, 1, 2, 3]
+    assert ("mae", pytest.approx(1.0), "cv", None) in store.metrics
+
+
+def test_cross_validation_refit_builds_fresh_adapters(monkeypatch, mock_panel):
+    _LastValueAdapter.instances = 0
+    monkeypatch.setattr(model_runner, "get_adapter", lambda name: _LastValueAdapter())
+
+    model_runner.run_loto_cross_validation(
+        "nf_loto_panel", "loto6", ["N1", "N2"], model_name="Stub", backend="tsfm",
+        horizon=2, n_windows=3, refit=True,
+    )
+
+    assert _LastValueAdapter.instances == 3
+
+
+def test_cross_validation_delegates_to_neuralforecast(monkeypatch, mock_panel):
+    seen = {}
+
+    class _FakeNF:
+        def cross_validation(self, df, n_windows, step_size, refit):
+            seen.update(n_rows=len(df), n_windows=n_windows, step_size=step_size, refit=refit)
+            rows = []
+            for w in range(n_windows):
+                cutoff = pd.Timestamp("2024-01-30") - pd.Timedelta(days=2 + step_size * (n_windows - 1 - w))
+                for uid in ["N1", "N2"]:
+                    for k in (1, 2):
+                        ds = cutoff + pd.Timedelta(days=k)
+                        y = float(ds.day - 1) if uid == "N1" else 5.0
+                        rows.append({"unique_id": uid, "ds": ds, "cutoff": cutoff, "y": y, "AutoNHITS": y + 1.0})
+            return pd.DataFrame(rows)
+
+    monkeypatch.setattr(model_runner, "_build_neuralforecast", lambda *a, **k: (_FakeNF(), ["fake"]))
+
+    preds, meta = model_runner.run_loto_cross_validation(
+        "nf_loto_panel", "loto6", ["N1", "N2"], model_name="AutoNHITS", backend="local",
+        horizon=2, n_windows=2, step_size=3,
+    )
+
+    assert seen == {"n_rows": 60, "n_windows": 2, "step_size": 3, "refit": False}
+    assert [w["metrics"]["mae"] for w in meta["windows"]] == [pytest.approx(1.0), pytest.approx(1.0)]
+    assert len(meta["evaluations"]) == 2
+    assert len(preds) == 8
+
+
+def test_forecast_tsfm_does_not_mutate_cached_yhat():
+    from nf_loto_platform.ml.panel import ColumnarPanel
+
+    results = []
+
+    class _KeepingAdapter(_LastValueAdapter):
+        def predict(self, history, horizon, freq="D", **kwargs):
+            result = super().predict(history, horizon, freq=freq)
+            results.append(result.renamed("LastValue"))
+            return results[-1]
+
+    df = _panel_df()
+    train, test = df[df["ds"] < "2024-01-28"], df[df["ds"] >= "2024-01-28"]
+
+    window = model_runner._forecast_tsfm(
+        _KeepingAdapter(), train, ColumnarPanel.from_frame(test), "LastValue", horizon=3
+    )
+
+    assert "y" in window.preds.columns
+    assert "y" not in results[0].yhat.columns
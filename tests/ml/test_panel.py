@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from nf_loto_platform.ml.panel import ColumnarPanel
+
+
+def _unsorted_panel_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "unique_id": ["B", "A", "A", "B", "A", "B"],
+            "ds": pd.to_datetime(
+                ["2024-01-02", "2024-01-03", "2024-01-01", "2024-01-01", "2024-01-02", "2024-01-03"]
+            ),
+            "y": [5.0, 3.0, 1.0, 4.0, 2.0, 6.0],
+            "hist_x": [50, 30, 10, 40, 20, 60],
+        }
+    )
+
+
+def test_from_frame_sorts_once_and_builds_offsets():
+    panel = ColumnarPanel.from_frame(_unsorted_panel_df())
+
+    assert panel.ids.tolist() == ["A", "B"]
+    assert panel.starts.tolist() == [0, 3]
+    assert panel.stops.tolist() == [3, 6]
+    assert panel.y.tolist() == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+    # 外生変数列も同じ順序で保持される
+    assert panel.frame["hist_x"].tolist() == [10, 20, 30, 40, 50, 60]
+
+
+def test_split_matches_groupby_semantics():
+    df = _unsorted_panel_df()
+    panel = ColumnarPanel.from_frame(df)
+    train, test = panel.split(horizon=1)
+
+    expected_train = (
+        df.sort_values(["unique_id", "ds"]).groupby("unique_id").head(2).reset_index(drop=True)
+    )
+    expected_test = df.sort_values(["unique_id", "ds"]).groupby("unique_id").tail(1).reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(train.to_frame(), expected_train)
+    pd.testing.assert_frame_equal(test.to_frame(), expected_test)
+    # ビューは基底配列を共有する (コピーなし)
+    assert train.y is panel.y
+    assert test.ds is panel.ds
+
+
+def test_tail_is_clipped_for_short_series():
+    panel = ColumnarPanel.from_frame(_unsorted_panel_df())
+    assert panel.tail(10).n_rows == 6
+    assert panel.head(10).n_rows == 0
+
+
+def test_align_behaves_like_left_merge():
+    panel = ColumnarPanel.from_frame(_unsorted_panel_df())
+    _, test = panel.split(horizon=2)
+
+    y = test.align(
+        ["A", "B", "A", "C", "B"],
+        pd.to_datetime(["2024-01-03", "2024-01-02", "2024-01-01", "2024-01-02", "2024-01-05"]),
+    )
+
+    # A@01-01 は学習側なのでテストビューには存在しない / C は未知の系列
+    np.testing.assert_array_equal(y, [3.0, 5.0, np.nan, np.nan, np.nan])
+
+
+def test_iter_series_yields_views():
+    panel = ColumnarPanel.from_frame(_unsorted_panel_df())
+    collected = {uid: values.tolist() for uid, _, values in panel.tail(2).iter_series()}
+    assert collected == {"A": [2.0, 3.0], "B": [5.0, 6.0]}
+
+
+def test_cutoff_views_are_rolling_origin_windows():
+    df = pd.DataFrame({
+        "unique_id": ["A"] * 10 + ["B"] * 6,
+        "ds": list(pd.date_range("2024-01-01", periods=10)) + list(pd.date_range("2024-01-05", periods=6)),
+        "y": np.arange(16, dtype=float),
+    })
+    panel = ColumnarPanel.from_frame(df)
+
+    views = panel.cutoff_views(horizon=2, n_windows=3, step_size=1)
+
+    assert len(views) == 3
+    (train0, test0), (_, test1), (train2, test2) = views
+    assert test0.y is panel.y  # ビューで基底配列を共有する
+    assert test2.to_frame()["y"].tolist() == panel.split(2)[1].to_frame()["y"].tolist()
+    assert test1.to_frame()["y"].tolist() == [7.0, 8.0, 13.0, 14.0]
+    assert test0.to_frame()["y"].tolist() == [6.0, 7.0, 12.0, 13.0]
+    assert train0.lengths.tolist() == [6, 2]
+    assert train2.lengths.tolist() == [8, 4]
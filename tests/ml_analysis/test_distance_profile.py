@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from nf_loto_platform.ml_analysis import distance_profile as dp
+
+
+def _brute_force(series, query, normalize=False):
+    m = len(query)
+    out = []
+    for i in range(len(series) - m + 1):
+        w = series[i : i + m]
+        q = query
+        if normalize:
+            w = (w - w.mean()) / w.std() if w.std() > 0 else np.zeros(m)
+            q = (q - q.mean()) / q.std() if q.std() > 0 else np.zeros(m)
+        out.append(np.linalg.norm(w - q))
+    return np.array(out)
+
+
+@pytest.mark.parametrize("m", [3, 16, 100])
+@pytest.mark.parametrize("normalize", [False, True])
+def test_distance_profile_matches_brute_force(m, normalize):
+    rng = np.random.default_rng(0)
+    series = rng.integers(1, 44, size=600).astype(float)
+    query = rng.integers(1, 44, size=m).astype(float)
+
+    got = dp.distance_profile(series, query, normalize=normalize)
+
+    np.testing.assert_allclose(got, _brute_force(series, query, normalize), atol=1e-6)
+
+
+def test_distance_profile_handles_flat_windows_in_normalized_mode():
+    series = np.array([5.0, 5.0, 5.0, 1.0, 2.0, 3.0])
+    flat = dp.distance_profile(series, [7.0, 7.0, 7.0], normalize=True)
+    ramp = dp.distance_profile(series, [10.0, 20.0, 30.0], normalize=True)
+
+    assert flat[0] == 0.0
+    assert np.allclose(flat[1:], np.sqrt(3))
+    assert ramp[0] == pytest.approx(np.sqrt(3))
+    assert ramp[3] == pytest.approx(0.0, abs=1e-6)
+
+
+def test_top_k_indices_orders_by_distance_then_position():
+    profile = np.array([3.0, 1.0, 2.0, 1.0, np.nan, 0.5])
+
+    assert dp.top_k_indices(profile, 3).tolist() == [5, 1, 3]
+    assert dp.top_k_indices(profile, 10).tolist() == [5, 1, 3, 2, 0, 4]
+
+
+def test_find_similar_windows_returns_exact_distances_and_respects_max_start():
+    rng = np.random.default_rng(1)
+    series = rng.normal(size=300)
+    query = series[290:]  # 最後の窓と完全一致するが、max_start で除外される
+
+    starts, dist = dp.find_similar_windows(series, query, top_k=4, max_start=len(series) - len(query))
+    expected = _brute_force(series, query)[: len(series) - len(query)]
+
+    assert starts.tolist() == np.argsort(expected, kind="stable")[:4].tolist()
+    np.testing.assert_allclose(dist, np.sort(expected)[:4], rtol=1e-12)
+
+    exact_starts, exact_dist = dp.find_similar_windows(series, query, top_k=1)
+    assert exact_starts.tolist() == [290]
+    assert exact_dist[0] == 0.0
+
+
+@pytest.mark.parametrize("m", [5, 80])
+@pytest.mark.parametrize("normalize", [False, True])
+def test_distance_profile_batches_stacked_series(m, normalize):
+    rng = np.random.default_rng(2)
+    series = rng.integers(1, 44, size=(3, 400)).astype(float)
+    queries = rng.integers(1, 44, size=(3, m)).astype(float)
+
+    got = dp.distance_profile(series, queries, normalize=normalize)
+
+    for row in range(3):
+        np.testing.assert_allclose(got[row], _brute_force(series[row], queries[row], normalize), atol=1e-6)
+
+
+def test_search_panel_matches_per_series_search():
+    import pandas as pd
+
+    rng = np.random.default_rng(3)
+    lengths = {"N1": 200, "N2": 200, "N3": 150, "N4": 6}
+    panel = pd.concat([
+        pd.DataFrame({"unique_id": uid, "ds": pd.date_range("2020-01-01", periods=n), "y": rng.integers(1, 44, size=n)})
+        for uid, n in lengths.items()
+    ]).sample(frac=1.0, random_state=0)
+    queries = {uid: panel[panel["unique_id"] == uid].sort_values("ds")["y"].to_numpy()[-8:] for uid in lengths}
+
+    result = dp.search_panel(panel, queries, top_k=4)
+
+    assert list(result.matches.columns) == dp.PANEL_MATCH_COLUMNS
+    assert list(result.stats.index) == ["N1", "N2", "N3"]  # N4 は履歴が足りない
+    for uid in ["N1", "N2", "N3"]:
+        series = panel[panel["unique_id"] == uid].sort_values("ds")
+        y = series["y"].to_numpy(dtype=float)
+        starts, dist = dp.find_similar_windows(y, queries[uid], top_k=4, max_start=len(y) - 8)
+        expected = dp.build_match_frame(series["ds"].to_numpy(), y, starts, dist, 8)
+        pd.testing.assert_frame_equal(result.for_series(uid), expected)
+        stats = result.stats.loc[uid]
+        assert stats["n_matches"] == 4
+        assert stats["up_probability"] == np.mean(expected["next_val"] > queries[uid][-1])
+        assert stats["mean_next_val"] == pytest.approx(expected["next_val"].mean())
@@ -1,9 +1,11 @@
 import numpy as np
 import pandas as pd
+import pytest
 
 from nf_loto_platform.ml_analysis.error_breakdown import (
     build_error_breakdown,
     build_time_series_metrics,
+    group_error_metrics,
 )
 
 
@@ -46,3 +48,44 @@ def test_build_time_series_metrics_basic():
 
     # 誤差が全て 0 ではないこと
     assert (out["mae"] > 0).any()
+
+
+def test_build_error_breakdown_matches_metric_functions_per_group():
+    from nf_loto_platform.ml_analysis import metrics
+
+    df = _make_dummy_df()
+    df.loc[5, "unique_id"] = None  # 欠損キーもひとつのグループ
+    out = build_error_breakdown(df, group_keys=("loto", "unique_id"))
+
+    assert list(out.columns) == ["loto", "unique_id", "mae", "rmse", "smape"]
+    assert out["loto"].tolist() == ["loto6", "loto6", "loto7", "loto7", "loto7"]
+    assert out["unique_id"].tolist()[:4] == ["A", "B", "A", "B"]
+    assert pd.isna(out["unique_id"].iloc[4])
+    for row in out.itertuples():
+        mask = (df["loto"] == row.loto) & (
+            df["unique_id"].isna() if pd.isna(row.unique_id) else df["unique_id"] == row.unique_id
+        )
+        g = df[mask]
+        assert row.mae == pytest.approx(metrics.mae(g["y"], g["y_hat"]))
+        assert row.rmse == pytest.approx(metrics.rmse(g["y"], g["y_hat"]))
+        assert row.smape == pytest.approx(metrics.smape(g["y"], g["y_hat"]))
+
+
+def test_group_error_metrics_combines_keys_and_time_buckets():
+    df = _make_dummy_df()
+
+    out = group_error_metrics(df, group_keys=["loto"], freq="2D", sort=True)
+
+    assert list(out.columns) == ["loto", "ds", "mae", "rmse", "smape"]
+    assert len(out) == 4  # loto6: 1/1-2, 1/3-4 / loto7: 1/3-4, 1/5-6
+    row = out[(out["loto"] == "loto7") & (out["ds"] == pd.Timestamp("2024-01-05"))].iloc[0]
+    assert row["mae"] == pytest.approx(0.75)
+
+
+def test_build_time_series_metrics_keeps_empty_buckets():
+    df = _make_dummy_df().iloc[[0, 5]]
+
+    out = build_time_series_metrics(df, freq="2D")
+
+    assert len(out) == 3
+    assert np.isnan(out.loc[1, "mae"])
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nf_loto_platform.ml_analysis import metrics
+from nf_loto_platform.ml_analysis.evaluation import evaluate_all, long_to_matrices
+
+
+def _matrices(seed=0, n=4, h=6):
+    rng = np.random.default_rng(seed)
+    y = rng.integers(1, 44, size=(n, h)).astype(float)
+    yhat = y + rng.normal(scale=2.0, size=(n, h))
+    return y, yhat
+
+
+def test_evaluate_all_matches_pure_functions_on_every_axis():
+    y, yhat = _matrices()
+    y[1, 2] = np.nan  # 欠損は除外される
+    lower, upper = yhat - 1.5, yhat + 1.5
+
+    result = evaluate_all(y, yhat, lower, upper, ids=["a", "b", "c", "d"])
+
+    valid = ~np.isnan(y)
+    overall = result.overall()
+    assert overall["mae"] == pytest.approx(metrics.mae(y[valid], yhat[valid]))
+    assert overall["rmse"] == pytest.approx(metrics.rmse(y[valid], yhat[valid]))
+    assert overall["smape"] == pytest.approx(metrics.smape(y[valid], yhat[valid]))
+    assert overall["coverage_90"] == pytest.approx(metrics.coverage(y[valid], lower[valid], upper[valid]))
+
+    per_series = result.per_series()
+    assert list(per_series.index) == ["a", "b", "c", "d"]
+    for i, uid in enumerate(per_series.index):
+        row_valid = valid[i]
+        assert per_series.loc[uid, "mape"] == pytest.approx(metrics.mape(y[i][row_valid], yhat[i][row_valid]))
+    # 方向正解率は系列内の隣接ステップのみで数える
+    assert per_series.loc["a", "directional_accuracy"] == pytest.approx(metrics.directional_accuracy(y[0], yhat[0]))
+
+    per_step = result.per_step()
+    assert list(per_step.index) == [1, 2, 3, 4, 5, 6]
+    assert per_step.loc[3, "mae"] == pytest.approx(metrics.mae(y[[0, 2, 3], 2], yhat[[0, 2, 3], 2]))
+    assert np.isnan(per_step.loc[1, "directional_accuracy"])
+    assert result.counts["mae"] == valid.sum()
+
+
+def test_metric_rows_cover_global_step_and_series_values():
+    y, yhat = _matrices(n=2, h=3)
+
+    result = evaluate_all(y, yhat, ids=["N1", "N2"], metrics=["mae", "directional_accuracy"])
+    rows = result.metric_rows(split="test")
+
+    assert "coverage_90" not in result.metric_names
+    assert ("mae", result.overall()["mae"], "test", None, None) in rows
+    assert {(r[0], r[3]) for r in rows if r[3] is not None} == {
+        ("mae", 1), ("mae", 2), ("mae", 3), ("directional_accuracy", 2), ("directional_accuracy", 3)
+    }
+    # split は常に同じ値で、系列別の値は unique_id 列に入る
+    assert {r[2] for r in rows} == {"test"}
+    assert {r[4] for r in rows if r[3] is None} == {None, "N1", "N2"}
+    assert all(r[3] is None for r in rows if r[4] is not None)
+    assert all(np.isfinite(r[1]) for r in rows)
+
+
+def test_long_to_matrices_orders_by_id_and_time_and_pads():
+    df = pd.DataFrame({
+        "unique_id": ["b", "a", "a", "b", "a"],
+        "ds": pd.to_datetime(["2024-01-02", "2024-01-02", "2024-01-01", "2024-01-01", "2024-01-03"]),
+        "y": [4.0, 2.0, 1.0, 3.0, 5.0],
+    })
+
+    ids, (mat,) = long_to_matrices(df, ["y"])
+
+    assert ids.tolist() == ["a", "b"]
+    np.testing.assert_array_equal(mat, [[1.0, 2.0, 5.0], [3.0, 4.0, np.nan]])
@@ -1,4 +1,5 @@
 import numpy as np
+import pytest
 
 from nf_loto_platform.ml_analysis import metrics
 
@@ -44,3 +45,75 @@ def test_coverage_basic():
     c = metrics.coverage(y, lower, upper)
     # 3/4 が区間内
     assert abs(c - 0.75) < 1e-9
+
+
+def _chunks(arr, sizes):
+    out, start = [], 0
+    for size in sizes:
+        out.append(arr[start : start + size])
+        start += size
+    return out
+
+
+def test_accumulators_chunked_update_matches_pure_functions():
+    rng = np.random.default_rng(0)
+    y = rng.integers(1, 44, size=1000).astype(float)
+    yhat = y + rng.normal(scale=3.0, size=1000)
+    accs = metrics.point_metric_accumulators()
+    pinball = metrics.Pinball(0.9)
+    for y_chunk, yhat_chunk in zip(_chunks(y, [1, 300, 0, 499, 200]), _chunks(yhat, [1, 300, 0, 499, 200])):
+        for acc in accs.values():
+            acc.update(y_chunk, yhat_chunk)
+        pinball.update(y_chunk, yhat_chunk)
+
+    assert accs["mae"].result() == pytest.approx(metrics.mae(y, yhat))
+    assert accs["rmse"].result() == pytest.approx(metrics.rmse(y, yhat))
+    assert accs["smape"].result() == pytest.approx(metrics.smape(y, yhat))
+    assert accs["mape"].result() == pytest.approx(metrics.mape(y, yhat))
+    # チャンク境界をまたぐ階差も数えられている
+    assert accs["directional_accuracy"].pairs == 999
+    assert accs["directional_accuracy"].result() == pytest.approx(metrics.directional_accuracy(y, yhat))
+    assert pinball.result() == pytest.approx(metrics.pinball_loss(y, yhat, q=0.9))
+
+
+def test_accumulators_merge_matches_single_pass():
+    rng = np.random.default_rng(1)
+    y = rng.normal(size=600)
+    yhat = y + rng.normal(scale=0.5, size=600)
+    lower, upper = yhat - 0.8, yhat + 0.8
+
+    parts = []
+    for sl in (slice(0, 250), slice(250, 250), slice(250, 600)):
+        da = metrics.DirectionalAccuracy().update(y[sl], yhat[sl])
+        cov = metrics.Coverage().update(y[sl], lower[sl], upper[sl])
+        parts.append((da, cov))
+    da, cov = metrics.DirectionalAccuracy(), metrics.Coverage()
+    for part_da, part_cov in parts:
+        da.merge(part_da)
+        cov.merge(part_cov)
+
+    assert da.result() == pytest.approx(metrics.directional_accuracy(y, yhat))
+    assert cov.result() == pytest.approx(metrics.coverage(y, lower, upper))
+    with pytest.raises(ValueError):
+        metrics.Pinball(0.1).merge(metrics.Pinball(0.9))
+    with pytest.raises(TypeError):
+        metrics.MAE().merge(metrics.RMSE())
+
+
+def test_empty_accumulators_return_nan_and_accept_generators():
+    assert np.isnan(metrics.MAE().result())
+    assert np.isnan(metrics.DirectionalAccuracy().update([1.0], [2.0]).result())
+    assert metrics.mae((v for v in [1.0, 2.0]), iter([2.0, 4.0])) == 1.5
+
+
+def test_pointwise_terms_keep_shape_and_match_pure_functions():
+    y = np.array([[1.0, 2.0], [3.0, 5.0]])
+    yhat = np.array([[2.0, 2.0], [1.0, 5.0]])
+
+    terms = metrics.pointwise_terms("smape", y, yhat)
+
+    assert terms.shape == (2, 2)
+    assert metrics.SMAPE.scale * terms.mean() == pytest.approx(metrics.smape(y, yhat))
+    assert np.sqrt(metrics.pointwise_terms("rmse", y, yhat).mean()) == pytest.approx(metrics.rmse(y, yhat))
+    with pytest.raises(ValueError):
+        metrics.pointwise_terms("pinball", y, yhat)
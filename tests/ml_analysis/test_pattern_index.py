@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from nf_loto_platform.ml_analysis import distance_profile as dp
+from nf_loto_platform.ml_analysis import pattern_index as pi
+from nf_loto_platform.ml_analysis.pattern_index import PatternIndex, PatternIndexStore
+
+
+def _history(n, seed=0):
+    rng = np.random.default_rng(seed)
+    ds = pd.date_range("2000-01-01", periods=n, freq="D")
+    y = rng.integers(1, 44, size=n).astype(float)
+    return ds, y
+
+
+def test_pattern_index_search_matches_full_scan(tmp_path):
+    ds, y = _history(3000)
+    query = y[-12:]
+    index = PatternIndex(tmp_path / "idx", window=12)
+    index.update(ds, y)
+
+    starts, dist = index.search(query, top_k=5, max_start=len(y) - 12)
+    ref_starts, ref_dist = dp.find_similar_windows(y, query, top_k=5, max_start=len(y) - 12)
+
+    assert starts.tolist() == ref_starts.tolist()
+    np.testing.assert_allclose(dist, ref_dist)
+
+
+def test_pattern_index_appends_only_new_windows(tmp_path):
+    ds, y = _history(500)
+    index = PatternIndex(tmp_path / "idx", window=10)
+
+    assert index.update(ds[:400], y[:400]) == 400
+    paa_before = np.array(index._paa)
+    assert index.update(ds, y) == 100
+    assert index.update(ds, y) == 0
+
+    # 既存のスケッチは書き換わらず、新しい窓の分だけ増えている
+    assert index.n_windows == 491
+    np.testing.assert_array_equal(np.asarray(index._paa)[: len(paa_before)], paa_before)
+    fresh = PatternIndex(tmp_path / "fresh", window=10)
+    fresh.update(ds, y)
+    np.testing.assert_array_equal(np.asarray(index._paa), np.asarray(fresh._paa))
+    np.testing.assert_array_equal(np.asarray(index._blocks), np.asarray(fresh._blocks))
+
+    # 再オープンしても状態が復元される
+    reopened = PatternIndex(tmp_path / "idx", window=10)
+    assert reopened.update(ds, y) == 0
+    assert reopened.search(y[-10:], top_k=1)[0].tolist() == [490]
+
+
+def test_pattern_index_rebuilds_when_history_changes(tmp_path):
+    ds, y = _history(200)
+    index = PatternIndex(tmp_path / "idx", window=5)
+    index.update(ds, y)
+
+    y2 = y.copy()
+    y2[3] += 1
+    assert index.update(ds, y2) == 200
+    assert np.asarray(index._values)[3] == y2[3]
+
+
+def test_pattern_index_tail_only_verification_skips_prefix_check(tmp_path):
+    ds, y = _history(200)
+    index = PatternIndex(tmp_path / "idx", window=5)
+    index.update(ds[:150], y[:150])
+
+    # 末尾 1 窓分より前の変更は verify_prefix=False では検出しない (追記のみ)
+    y2 = y.copy()
+    y2[3] += 1
+    assert index.update(ds, y2, verify_prefix=False) == 50
+    # 末尾 1 窓分の変更は常に検出して作り直す
+    y3 = y2.copy()
+    y3[198] += 1
+    assert index.update(ds[:199], y3[:199], verify_prefix=False) == 199
+
+
+def test_pattern_index_search_prunes_blocks(tmp_path, monkeypatch):
+    rng = np.random.default_rng(3)
+    n = 20 * pi._BLOCK_SIZE
+    y = np.cumsum(rng.normal(size=n))
+    ds = pd.date_range("2000-01-01", periods=n, freq="D")
+    index = PatternIndex(tmp_path / "idx", window=16)
+    index.update(ds, y)
+    query = y[1000:1016] + 0.01
+
+    evaluated = []
+    real = pi.exact_distances
+
+    def counting(series, q, starts):
+        evaluated.append(len(starts))
+        return real(series, q, starts)
+
+    monkeypatch.setattr(pi, "exact_distances", counting)
+    starts, dist = index.search(query, top_k=3)
+    ref_starts, ref_dist = dp.find_similar_windows(y, query, top_k=3)
+
+    assert starts.tolist() == ref_starts.tolist()
+    np.testing.assert_allclose(dist, ref_dist)
+    assert sum(evaluated) < index.n_windows // 4
+
+
+def test_pattern_index_search_matches_brute_force_with_large_offset(tmp_path):
+    # 値が大きい系列では float32 スケッチの丸め誤差が距離より大きくなる
+    n, window = 4 * pi._BLOCK_SIZE, 16
+    ds = pd.date_range("2000-01-01", periods=n, freq="D")
+    for seed in range(30):
+        rng = np.random.default_rng(seed)
+        y = 1e8 + np.cumsum(rng.normal(size=n))
+        query = y[n // 2 : n // 2 + window] + rng.normal(scale=0.5, size=window)
+        index = PatternIndex(tmp_path / f"idx{seed}", window=window)
+        index.update(ds, y)
+
+        starts, dist = index.search(query, top_k=5)
+        brute = dp.exact_distances(y, query, np.arange(index.n_windows))
+        ref_starts = np.lexsort((np.arange(len(brute)), brute))[:5]
+
+        assert starts.tolist() == ref_starts.tolist(), seed
+        np.testing.assert_allclose(dist, brute[ref_starts])
+
+
+def test_pattern_index_discards_partial_writes_from_interrupted_update(tmp_path):
+    ds, y = _history(300)
+    index = PatternIndex(tmp_path / "idx", window=10)
+    index.update(ds[:200], y[:200])
+    # メタデータを書く前に落ちた更新の書きかけ (values だけが先に伸びている)
+    with open(tmp_path / "idx.values.f64", "ab") as f:
+        np.arange(7, dtype=np.float64).tofile(f)
+
+    reopened = PatternIndex(tmp_path / "idx", window=10)
+    assert reopened.update(ds, y) == 100
+
+    fresh = PatternIndex(tmp_path / "fresh", window=10)
+    fresh.update(ds, y)
+    for suffix in (".values.f64", ".ds.i64", ".paa.f32", ".blk.f32"):
+        assert (tmp_path / f"idx{suffix}").read_bytes() == (tmp_path / f"fresh{suffix}").read_bytes(), suffix
+
+
+def test_store_search_returns_repository_schema(tmp_path):
+    ds, y = _history(300)
+    store = PatternIndexStore(tmp_path)
+
+    result = store.search("nf_loto_hist", "loto6", "N1", ds, y, y[-8:], top_k=3)
+
+    assert list(result.columns) == dp.MATCH_COLUMNS
+    assert len(result) == 3
+    assert result["similarity"].is_monotonic_decreasing
+    first = result.iloc[0]
+    end = list(ds).index(first["ds"])
+    assert first["window_values"] == y[end - 7 : end + 1].tolist()
+    assert first["next_val"] == y[end + 1]
+
+
+def test_store_search_panel_matches_in_memory_search(tmp_path):
+    ds, y1 = _history(300, seed=1)
+    _, y2 = _history(300, seed=2)
+    panel = pd.concat([
+        pd.DataFrame({"unique_id": "N1", "ds": ds, "y": y1}),
+        pd.DataFrame({"unique_id": "N2", "ds": ds, "y": y2}),
+    ])
+    queries = {"N2": y2[-6:], "N1": y1[-6:]}
+
+    got = PatternIndexStore(tmp_path).search_panel("nf_loto_hist", "loto6", panel, queries, top_k=3)
+    expected = dp.search_panel(panel, queries, top_k=3)
+
+    # インデックスは日付を ns 精度で保持する
+    pd.testing.assert_frame_equal(got.matches, expected.matches.astype({"ds": "datetime64[ns]"}))
+    pd.testing.assert_frame_equal(got.stats, expected.stats)
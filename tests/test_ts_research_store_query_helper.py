@@ -20,3 +20,107 @@ def test_ts_research_store_has_get_metrics_for_experiment() -> None:
     # self + experiment_id の 2 引数であることを確認
     assert len(params) == 2
     assert params[1].name == "experiment_id"
+
+
+def test_insert_forecast_result_writes_rows_from_arrays(monkeypatch) -> None:
+    import numpy as np
+    import pandas as pd
+
+    from nf_loto_platform.tsfm.base import ForecastResult
+
+    written = []
+    store = TSResearchStore(DB_CONFIG)
+    monkeypatch.setattr(store, "_insert_forecast_rows", lambda rows: written.extend(rows))
+    result = ForecastResult(
+        ids=["N1", "N2"],
+        start=pd.to_datetime(["2024-01-02", "2024-01-05"]).to_numpy(),
+        point=np.array([[1.0, 2.0], [3.0, 4.0]]),
+        quantiles={"lo-80": np.zeros((2, 2)), "hi-80": np.ones((2, 2))},
+    )
+
+    assert store.insert_forecast_result(7, result) == 4
+    assert written[0] == (7, pd.Timestamp("2024-01-02").to_pydatetime(), "N1", 1.0, 0.0, 1.0, None, None)
+    assert written[3][1:4] == (pd.Timestamp("2024-01-06").to_pydatetime(), "N2", 4.0)
+
+
+def test_insert_evaluation_writes_metric_rows_in_bulk(monkeypatch) -> None:
+    import numpy as np
+
+    from nf_loto_platform.ml_analysis.evaluation import evaluate_all
+
+    store = TSResearchStore(DB_CONFIG)
+    written = []
+    monkeypatch.setattr(store, "bulk_insert_model_metrics", lambda trial_id, rows: written.extend(rows) or len(written))
+    evaluation = evaluate_all(np.array([[1.0, 2.0]]), np.array([[2.0, 2.0]]), ids=["N1"], metrics=["mae"])
+
+    assert store.insert_evaluation(7, evaluation, split="test") == 4
+    assert written == [
+        ("mae", 0.5, "test", None, None),
+        ("mae", 1.0, "test", 1, None),
+        ("mae", 0.0, "test", 2, None),
+        ("mae", 0.5, "test", None, "N1"),
+    ]
+
+
+class _RecordingCursor:
+    def __init__(self, log):
+        self.log = log
+        self.description = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.log.append((" ".join(sql.split()), params))
+
+    def fetchall(self):
+        return []
+
+
+class _RecordingConn:
+    def __init__(self, log):
+        self.log = log
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return _RecordingCursor(self.log)
+
+    def commit(self):
+        return None
+
+
+def test_get_metrics_for_experiment_returns_only_aggregated_rows(monkeypatch) -> None:
+    log = []
+    store = TSResearchStore(DB_CONFIG)
+    monkeypatch.setattr(store, "_conn", lambda: _RecordingConn(log))
+
+    store.get_metrics_for_experiment(3)
+    store.get_metric_breakdown_for_experiment(3, split="cv")
+
+    overall_sql, overall_params = log[0]
+    assert "mm.step IS NULL AND mm.unique_id IS NULL" in overall_sql
+    assert overall_params == (3,)
+    breakdown_sql, breakdown_params = log[1]
+    assert "mm.split = %s AND (mm.step IS NOT NULL OR mm.unique_id IS NOT NULL)" in breakdown_sql
+    assert breakdown_params == (3, "cv")
+
+
+def test_bulk_insert_model_metrics_accepts_rows_with_and_without_unique_id(monkeypatch) -> None:
+    from nf_loto_platform.db import ts_research_store
+
+    log = []
+    captured = []
+    store = TSResearchStore(DB_CONFIG)
+    monkeypatch.setattr(store, "_conn", lambda: _RecordingConn(log))
+    monkeypatch.setattr(ts_research_store, "execute_values", lambda cur, sql, rows: captured.extend(rows))
+
+    assert store.bulk_insert_model_metrics(5, [("mae", 1, "cv", None), ("mae", 2.0, "val", None, "N1")]) == 2
+    assert captured == [(5, "mae", 1.0, "cv", None, None), (5, "mae", 2.0, "val", None, "N1")]
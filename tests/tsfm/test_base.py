@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nf_loto_platform.ml.panel import ColumnarPanel
+from nf_loto_platform.tsfm.base import (
+    BaseTSFMAdapter,
+    ForecastResult,
+    TSFMCapabilities,
+    future_dates,
+    length_buckets,
+    pad_context,
+    padding_mask,
+)
+
+
+class _LastValueAdapter(BaseTSFMAdapter):
+    """バッチごとの入力を記録し、最終値を horizon 回繰り返すテスト用アダプタ."""
+
+    def __init__(self, fail_width=None, **kwargs):
+        super().__init__("LastValue", TSFMCapabilities(provider="test", model_id="last", task_types=["forecasting"]), **kwargs)
+        self.calls = []
+        self.fail_width = fail_width
+
+    def predict(self, history, horizon, freq=None, exogenous=None, **kwargs):
+        return self.predict_frame(history, horizon, freq=freq)
+
+    def _predict_batch(self, context, mask, horizon):
+        self.calls.append((context.copy(), mask.copy()))
+        if context.shape[1] == self.fail_width:
+            raise RuntimeError("boom")
+        return np.repeat(context[:, -1:], horizon, axis=1)
+
+
+def _frame(lengths):
+    return pd.concat([
+        pd.DataFrame({"unique_id": uid, "ds": pd.date_range("2024-01-01", periods=n, freq="D"), "y": np.arange(n) + 100.0 * i})
+        for i, (uid, n) in enumerate(lengths.items())
+    ], ignore_index=True)
+
+
+def test_pad_context_left_pads_and_truncates():
+    panel = ColumnarPanel.from_frame(_frame({"a": 3, "b": 6}))
+
+    values, lengths = pad_context(panel, context_length=4)
+
+    assert lengths.tolist() == [3, 4]
+    assert values.tolist() == [[0.0, 0.0, 1.0, 2.0], [102.0, 103.0, 104.0, 105.0]]
+    assert padding_mask(lengths, 4).tolist() == [[False, True, True, True], [True, True, True, True]]
+
+
+def test_length_buckets_group_similar_lengths():
+    buckets = length_buckets(np.array([5, 1, 4, 2, 3]), batch_size=2)
+
+    assert [b.tolist() for b in buckets] == [[1, 3], [4, 2], [0]]
+
+
+def test_future_dates_matches_date_range_per_series():
+    last = pd.to_datetime(["2024-01-31", "2024-02-29", "2024-01-31"]).to_numpy()
+
+    for freq in ("D", "MS", "h"):
+        out = future_dates(last, 3, freq)
+        for row, start in zip(out, last):
+            np.testing.assert_array_equal(row, pd.date_range(start, periods=4, freq=freq)[1:].to_numpy())
+
+
+def test_predict_frame_batches_and_isolates_failed_batches():
+    adapter = _LastValueAdapter(fail_width=2, batch_size=2)
+
+    out = adapter.predict_frame(_frame({"a": 5, "b": 2, "c": 4}), horizon=2)
+    assert isinstance(out, ForecastResult)
+
+    assert [c[0].shape for c in adapter.calls] == [(2, 4), (1, 5)]
+    assert adapter.calls[0][1].tolist() == [[False, False, True, True], [True, True, True, True]]
+    by_uid = out.yhat.groupby("unique_id")["LastValue"].apply(list).to_dict()
+    assert by_uid["a"] == [4.0, 4.0]
+    assert by_uid["c"] == [203.0, 203.0]
+    assert by_uid["b"] == [101.0, 101.0]
+    assert out.yhat["ds"].tolist()[:2] == [pd.Timestamp("2024-01-06"), pd.Timestamp("2024-01-07")]
+
+    failing = _LastValueAdapter(fail_width=4, batch_size=2)
+    out = failing.predict_frame(_frame({"a": 5, "b": 2, "c": 4}), horizon=1)
+    assert out.yhat.set_index("unique_id")["LastValue"].isna().to_dict() == {"a": False, "b": True, "c": True}
+
+
+def test_predict_arrays_requires_batched_protocol_up_front():
+    class _NoBatch(BaseTSFMAdapter):
+        def predict(self, history, horizon, freq=None, exogenous=None, **kwargs):
+            return self.predict_frame(history, horizon, freq=freq)
+
+    adapter = _NoBatch("NoBatch", TSFMCapabilities(provider="test", model_id="none", task_types=["forecasting"]))
+
+    with pytest.raises(NotImplementedError):
+        adapter.predict_arrays(np.ones((2, 3)), np.array([3, 3]), horizon=1)
+
+
+def test_predict_arrays_treats_batch_not_implemented_as_failed_batch():
+    class _Unparseable(_LastValueAdapter):
+        def _predict_batch(self, context, mask, horizon):
+            if context.shape[1] == 2:
+                raise NotImplementedError("Output parsing logic needed")
+            return super()._predict_batch(context, mask, horizon)
+
+    out = _Unparseable(batch_size=1).predict_frame(_frame({"a": 5, "b": 2}), horizon=1)
+
+    assert out.yhat.set_index("unique_id")["LastValue"].isna().to_dict() == {"a": False, "b": True}
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nf_loto_platform.tsfm.base import ForecastResult
+
+
+def _result(n_series=3, horizon=4, freq="D"):
+    return ForecastResult(
+        ids=[f"s{i}" for i in range(n_series)],
+        start=pd.date_range("2024-01-31", periods=n_series, freq=freq).to_numpy(),
+        point=np.arange(n_series * horizon, dtype=float).reshape(n_series, horizon),
+        freq=freq,
+        quantiles={"lo-90": np.zeros((n_series, horizon)), "hi-90": np.ones((n_series, horizon))},
+        model_name="M",
+    )
+
+
+def test_yhat_is_built_lazily_and_cached():
+    result = _result()
+    assert result._frame is None
+
+    frame = result.yhat
+
+    assert result.yhat is frame
+    assert list(frame.columns) == ["unique_id", "ds", "M", "M-lo-90", "M-hi-90"]
+    assert frame["unique_id"].tolist()[:5] == ["s0"] * 4 + ["s1"]
+    assert frame["M"].tolist() == list(range(12))
+    assert frame["ds"].iloc[:4].tolist() == list(pd.date_range("2024-01-31", periods=4, freq="D"))
+
+
+def test_dates_follow_calendar_frequencies():
+    result = _result(n_series=2, horizon=3, freq="ME")
+
+    assert pd.DatetimeIndex(result.dates()[1]).equals(pd.date_range("2024-02-29", periods=3, freq="ME").as_unit("ns"))
+
+
+def test_from_frame_round_trips_and_renamed_shares_arrays():
+    original = _result()
+    rebuilt = ForecastResult.from_frame(original.yhat.sample(frac=1.0, random_state=0), "M")
+
+    np.testing.assert_array_equal(rebuilt.point, original.point)
+    np.testing.assert_array_equal(rebuilt.quantiles["hi-90"], original.quantiles["hi-90"])
+    assert rebuilt.freq == "D"
+    assert rebuilt.dates().tolist() == original.dates().tolist()
+
+    renamed = rebuilt.renamed("Other")
+    assert np.shares_memory(renamed.point, rebuilt.point)
+    assert "Other-lo-90" in renamed.yhat.columns
+
+    with pytest.raises(ValueError):
+        ForecastResult.from_frame(original.yhat.iloc[:-1], "M")
+
+
+def test_add_quantiles_invalidates_frame():
+    result = _result()
+    _ = result.yhat
+
+    result.add_quantiles({"lo-80": result.point - 1})
+
+    assert result.yhat["M-lo-80"].tolist() == (result.point.ravel() - 1).tolist()
+
+
+def test_long_frame_assembly_is_fast_for_large_panels():
+    n_series, horizon = 10_000, 28
+    result = ForecastResult(
+        ids=np.array([f"s{i}" for i in range(n_series)], dtype=object),
+        start=np.full(n_series, np.datetime64("2024-01-01", "ns")),
+        point=np.random.default_rng(0).normal(size=(n_series, horizon)),
+        quantiles={"lo-90": np.zeros((n_series, horizon)), "hi-90": np.ones((n_series, horizon))},
+        model_name="M",
+    )
+
+    start = time.perf_counter()
+    frame = result.yhat
+    elapsed = time.perf_counter() - start
+
+    assert len(frame) == n_series * horizon
+    assert elapsed < 1.0
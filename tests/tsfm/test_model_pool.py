@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from nf_loto_platform.tsfm.model_pool import ModelPool
+
+
+class FakeRss:
+    """ロードのたびに指定量だけ RSS が増える (追い出しでは減らない) 擬似 RSS."""
+
+    def __init__(self):
+        self.mb = 1000.0
+
+    def __call__(self):
+        return self.mb
+
+
+def _loader(rss, size_mb, name, calls):
+    def load():
+        calls.append(name)
+        rss.mb += size_mb
+        return {"name": name}
+
+    return load
+
+
+def test_pool_reuses_loaded_models_and_reports_hit_rate():
+    rss = FakeRss()
+    pool = ModelPool(rss_fn=rss)
+    calls = []
+
+    first = pool.get("m1", _loader(rss, 100, "m1", calls))
+    second = pool.get("m1", _loader(rss, 100, "m1", calls))
+    other_device = pool.get("m1", _loader(rss, 100, "m1-gpu", calls), device="cuda")
+
+    assert first is second
+    assert other_device is not first
+    assert calls == ["m1", "m1-gpu"]
+    stats = pool.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+    assert stats["resident_mb"] == pytest.approx(200)
+    assert [m["hits"] for m in stats["models"]] == [1, 0]
+
+
+def test_pool_evicts_least_recently_used_over_budget():
+    rss = FakeRss()
+    pool = ModelPool(max_mb=250, rss_fn=rss)
+    calls = []
+
+    pool.get("a", _loader(rss, 100, "a", calls))
+    pool.get("b", _loader(rss, 100, "b", calls))
+    pool.get("a", _loader(rss, 100, "a", calls))  # b が最も古くなる
+    pool.get("c", _loader(rss, 100, "c", calls))
+
+    assert ("a", "float32", "cpu") in pool
+    assert ("b", "float32", "cpu") not in pool
+    assert ("c", "float32", "cpu") in pool
+    assert pool.stats()["evictions"] == 1
+
+    # 予算より大きいモデルも単独では保持する
+    pool.get("huge", _loader(rss, 400, "huge", calls))
+    assert [m["model_id"] for m in pool.stats()["models"]] == ["huge"]
+
+
+def test_pool_loads_each_model_once_under_concurrency():
+    pool = ModelPool(rss_fn=lambda: None)
+    calls = []
+
+    def slow_load():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.get("m", slow_load))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert len({id(r) for r in results}) == 1
+    assert pool.stats()["hits"] == 7
+
+
+def test_prewarm_records_load_times_and_failed_loads_are_not_cached():
+    pool = ModelPool(rss_fn=lambda: None)
+
+    loaded = pool.prewarm([("m1", object, "float32", "cpu"), ("m2", object, "bfloat16", "cuda")])
+
+    assert set(loaded) == {("m1", "float32", "cpu"), ("m2", "bfloat16", "cuda")}
+    assert all(v >= 0 for v in loaded.values())
+
+    def broken():
+        raise OSError("weights not found")
+
+    with pytest.raises(OSError):
+        pool.get("bad", broken)
+    assert ("bad", "float32", "cpu") not in pool
+    assert pool.evict("m1") and not pool.evict("m1")
@@ -0,0 +1,84 @@
+"""
+Tests for TSFM registry のプリウォーム.
+
+モデルプールを使うアダプタ (Time-MoE / MOMENT) が表示名で取得・プリウォームでき、
+NF_TSFM_PREWARM による起動時のプリウォームがプロセスにつき 1 回だけ行われることを確認する。
+"""
+
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+# transformers が無い環境でもアダプタモジュールを import できるようにする
+sys.modules.setdefault("transformers", MagicMock())
+
+from nf_loto_platform.tsfm import model_pool, registry
+from nf_loto_platform.tsfm import moment_adapter, time_moe_adapter
+
+
+@pytest.fixture(autouse=True)
+def fresh_model_pool(monkeypatch):
+    pool = model_pool.ModelPool()
+    monkeypatch.setattr(model_pool, "_DEFAULT_POOL", pool)
+    monkeypatch.setattr(registry, "_PREWARMED_FROM_ENV", False)
+    return pool
+
+
+@pytest.fixture
+def loaded_ids(monkeypatch):
+    """両アダプタの重みロードを差し替え、ロードした HF モデル ID を記録する."""
+    ids = []
+    for module in (time_moe_adapter, moment_adapter):
+        config = MagicMock()
+        config.from_pretrained.return_value = MagicMock()
+        model = MagicMock()
+        model.from_pretrained.side_effect = lambda model_id, **kw: ids.append(model_id) or MagicMock()
+        monkeypatch.setattr(module, "AutoConfig", config, raising=False)
+        monkeypatch.setattr(module, "AutoModelForTimeSeriesForecasting", model, raising=False)
+    return ids
+
+
+def test_get_adapter_resolves_pooled_adapters_by_display_name():
+    adapter = registry.get_adapter("Time-MoE-50M", context_length=64)
+
+    assert isinstance(adapter, time_moe_adapter.TimeMoEAdapter)
+    assert adapter.hf_model_id == "maple77/Time-MoE-50M"
+    assert adapter.context_length == 64
+    assert isinstance(registry.get_adapter("MOMENT-Large"), moment_adapter.MomentAdapter)
+    assert {"Chronos2-ZeroShot", "Time-MoE-50M", "MOMENT-Large"} <= set(registry.list_adapters())
+    with pytest.raises(ValueError, match="not registered"):
+        registry.get_adapter("Unknown-TSFM")
+
+
+def test_prewarm_loads_pooled_weights_once(loaded_ids, fresh_model_pool):
+    elapsed = registry.prewarm(["Time-MoE-50M", "MOMENT-Large"])
+
+    assert set(elapsed) == {"Time-MoE-50M", "MOMENT-Large"}
+    assert loaded_ids == ["maple77/Time-MoE-50M", "AutonLab/MOMENT-1-large"]
+
+    # 以降のアダプタはプールから取得し、ディスクから読み直さない
+    registry.get_adapter("Time-MoE-50M").warmup()
+    assert len(loaded_ids) == 2
+    assert fresh_model_pool.stats()["hits"] == 1
+
+
+def test_prewarm_from_env_runs_once_and_skips_failures(loaded_ids, monkeypatch):
+    monkeypatch.setenv("NF_TSFM_PREWARM", "Time-MoE-50M, Unknown-TSFM")
+
+    assert set(registry.prewarm_from_env()) == {"Time-MoE-50M"}
+    assert registry.prewarm_from_env() == {}
+    assert loaded_ids == ["maple77/Time-MoE-50M"]
+
+
+def test_orchestrator_prewarms_on_startup_but_forecaster_agent_does_not(loaded_ids, monkeypatch):
+    from nf_loto_platform.agents.forecaster_agent import ForecasterAgent
+    from nf_loto_platform.agents.orchestrator import AgentOrchestrator
+
+    monkeypatch.setenv("NF_TSFM_PREWARM", "MOMENT-Large")
+
+    ForecasterAgent(runner_module=object())
+    assert loaded_ids == []
+
+    AgentOrchestrator()
+    assert loaded_ids == ["AutonLab/MOMENT-1-large"]
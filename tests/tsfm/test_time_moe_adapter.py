@@ -18,11 +18,21 @@ import torch
 # (実際の環境では必要だが、テスト環境ではモックで済ませる場合もあるため)
 sys.modules["transformers"] = MagicMock()
 
+from nf_loto_platform.tsfm import model_pool
+from nf_loto_platform.tsfm.base import ForecastResult
 from nf_loto_platform.tsfm.time_moe_adapter import TimeMoEAdapter
 
 
 # --- Fixtures ---
 
+@pytest.fixture(autouse=True)
+def fresh_model_pool(monkeypatch):
+    """テストごとにプロセス共通のモデルプールを空にする."""
+    pool = model_pool.ModelPool()
+    monkeypatch.setattr(model_pool, "_DEFAULT_POOL", pool)
+    return pool
+
+
 @pytest.fixture
 def mock_panel_df():
     """テスト用のパネルデータを作成."""
@@ -59,9 +69,10 @@ def mock_hf_components():
         # Modelのモック
         model_instance = MagicMock()
         # generate() メソッドの戻り値を設定 (Batch, Samples, Horizon)
-        # 2系列, 1サンプル, 12ホライゾン
-        mock_output = torch.rand(1, 1, 12) # バッチサイズはループ内で1つずつ処理される想定
-        model_instance.generate.return_value = mock_output
+        # 入力バッチの系列数・要求ホライゾンに合わせた乱数を返す
+        model_instance.generate.side_effect = lambda inputs, prediction_length, **kw: torch.rand(
+            inputs.shape[0], 1, prediction_length
+        )
         
         # forward() メソッドの戻り値 (logits)
         mock_logits = MagicMock()
@@ -108,24 +119,51 @@ def test_predict_flow(mock_panel_df, mock_hf_components):
     preds = adapter.predict(mock_panel_df, horizon=horizon)
     
     # 検証 1: 戻り値の形式
-    assert isinstance(preds, pd.DataFrame)
+    assert isinstance(preds, ForecastResult)
+    assert preds.point.shape == (2, horizon)
+    yhat = preds.yhat
     expected_cols = {"unique_id", "ds", "Time-MoE-Test"}
-    assert expected_cols.issubset(preds.columns)
+    assert expected_cols.issubset(yhat.columns)
     
     # 検証 2: データ量 (2系列 * 12時点 = 24行)
-    assert len(preds) == 2 * horizon
-    assert preds["unique_id"].nunique() == 2
+    assert len(yhat) == 2 * horizon
+    assert yhat["unique_id"].nunique() == 2
     
     # 検証 3: モデル呼び出し
-    # 各系列ごとに generate が呼ばれているはず (2回)
-    assert mock_model.generate.call_count == 2
+    # 同じ長さの 2 系列は 1 バッチにまとめて generate される (1回)
+    assert mock_model.generate.call_count == 1
     
     # 入力テンソルの形状チェック
     # 直近 context_length 分が渡されているか
     call_args = mock_model.generate.call_args_list[0]
     input_tensor = call_args.kwargs['inputs']
-    # shape: (1, seq_len) -> (1, 50)
-    assert input_tensor.shape == (1, 50) 
+    # shape: (n_series, seq_len) -> (2, 50)
+    assert input_tensor.shape == (2, 50)
+    assert not yhat["Time-MoE-Test"].isna().any()
+
+
+def test_predict_buckets_series_by_length(mock_hf_components):
+    """長さの異なる系列が batch_size ごと・長さ順にまとめられるか."""
+    _, _, mock_model = mock_hf_components
+    lengths = {"A": 30, "B": 12, "C": 29, "D": 11}
+    df = pd.concat([
+        pd.DataFrame({"unique_id": uid, "ds": pd.date_range("2023-01-01", periods=n, freq="D"), "y": np.arange(n, dtype=float)})
+        for uid, n in lengths.items()
+    ], ignore_index=True)
+
+    adapter = TimeMoEAdapter(model_name="Time-MoE-Test", batch_size=2)
+    preds = adapter.predict(df, horizon=3)
+
+    # 短い 2 系列 (D, B) と長い 2 系列 (C, A) の 2 バッチ。各バッチはその最大長までしかパディングしない
+    shapes = [c.kwargs["inputs"].shape for c in mock_model.generate.call_args_list]
+    assert shapes == [(2, 12), (2, 30)]
+    short = mock_model.generate.call_args_list[0].kwargs["inputs"]
+    assert short[0].tolist() == [0.0] + list(range(11))  # D は先頭値で左パディング
+    # パディング位置は attention_mask で除外される
+    short_mask = mock_model.generate.call_args_list[0].kwargs["attention_mask"]
+    assert short_mask.tolist() == [[0] + [1] * 11, [1] * 12]
+    assert len(preds.yhat) == 4 * 3
+    assert preds.yhat.groupby("unique_id")["ds"].min().tolist() == [pd.Timestamp("2023-01-31"), pd.Timestamp("2023-01-13"), pd.Timestamp("2023-01-30"), pd.Timestamp("2023-01-12")]
 
 
 def test_predict_with_context_truncation(mock_panel_df, mock_hf_components):
@@ -146,6 +184,34 @@ def test_predict_with_context_truncation(mock_panel_df, mock_hf_components):
     assert input_tensor.shape[-1] == 10
 
 
+def test_adapters_share_pooled_weights(mock_panel_df, mock_hf_components, fresh_model_pool):
+    """同じモデル・設定のアダプタは 2 回目以降ディスクから読み直さない."""
+    _, MockModel, mock_model = mock_hf_components
+
+    TimeMoEAdapter(model_name="Time-MoE-Test").predict(mock_panel_df, horizon=3)
+    second = TimeMoEAdapter(model_name="Time-MoE-Test")
+    second.predict(mock_panel_df, horizon=3)
+    TimeMoEAdapter(model_name="Time-MoE-Test", context_length=10).warmup()
+
+    assert mock_model.generate.call_count == 2
+    assert MockModel.from_pretrained.call_count == 2  # context_length の違う設定のみ再ロード
+    stats = fresh_model_pool.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_adapter_does_not_pin_pooled_model(mock_panel_df, mock_hf_components, fresh_model_pool):
+    """予測後のアダプタはモデルを参照せず、プールから追い出されたモデルは次の予測で読み直す."""
+    _, MockModel, _ = mock_hf_components
+    adapter = TimeMoEAdapter(model_name="Time-MoE-Test")
+
+    adapter.predict(mock_panel_df, horizon=3)
+    assert adapter.model is None
+
+    fresh_model_pool.clear()
+    adapter.predict(mock_panel_df, horizon=3)
+    assert MockModel.from_pretrained.call_count == 2
+
+
 def test_model_load_failure():
     """モデルロード失敗時のエラーハンドリング."""
     with patch("nf_loto_platform.tsfm.time_moe_adapter.AutoConfig") as MockConfig: